@@ -2,23 +2,37 @@ import os
 import json
 import logging
 import aiohttp
+import asyncio
 import time
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Callable, AsyncIterator
 from config import Config
+from model_routing import resolve_route, escalation_reason, routing_stats
+from llm_resilience import call_with_retry, stream_with_retry, latency_tracker, single_flight
+from llm_backends import LLMBackend, get_backend
 
 logger = logging.getLogger(__name__)
 
 class AliLLMClient:
-    """阿里云大模型API客户端"""
+    """阿里云大模型API客户端（模型路由、重试和统计；上游调用由 Config.LLM_BACKEND 选择的后端完成）"""
     
-    def __init__(self):
-        """初始化客户端"""
-        self.api_key = Config.get_ali_api_key()
-        self.base_url = Config.ALI_BASE_URL
+    def __init__(self, backend: Optional[LLMBackend] = None):
+        """
+        初始化客户端
+        
+        Args:
+            backend: 指定后端，不传时每次调用按 Config.LLM_BACKEND 选择
+        """
+        self._backend = backend
         self.model = Config.ALI_MODEL_NAME
-        self.timeout = 30  # 默认超时时间30秒
+        self.timeout = 30  # 默认超时时间30秒（设置了文本时间预算时取两者较小值）
+    
+    @property
+    def backend(self) -> LLMBackend:
+        return self._backend or get_backend()
     
-    async def generate_response(self, prompt: str, max_tokens: int = 2000, temperature: float = 0.7) -> str:
+    async def generate_response(self, prompt: str, max_tokens: int = 2000, temperature: float = 0.7,
+                                route: Optional[str] = None,
+                                validator: Optional[Callable[[str], float]] = None) -> str:
         """
         生成回复
         
@@ -26,59 +40,18 @@ class AliLLMClient:
             prompt: 提示词
             max_tokens: 最大生成token数
             temperature: 温度参数，控制随机性
+            route: 路由名称（Agent名称），按 Config.MODEL_ROUTING 选择候选模型
+            validator: 响应校验函数，返回置信度（0~1），置信度不足时升级到下一级模型
             
         Returns:
             生成的回复文本
         """
+        messages = [
+            {"role": "system", "content": "你是一个专业的IPO风险评估专家，负责分析文本的情感等级。"},
+            {"role": "user", "content": prompt}
+        ]
         try:
-            # 构建请求参数
-            request_data = {
-                "model": self.model,
-                "messages": [
-                    {"role": "system", "content": "你是一个专业的IPO风险评估专家，负责分析文本的情感等级。"},
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": max_tokens,
-                "temperature": temperature
-            }
-            
-            # 发送请求
-            start_time = time.time()
-            async with aiohttp.ClientSession() as session:
-                headers = {
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {self.api_key}"
-                }
-                
-                # 使用兼容模式API
-                api_url = f"{self.base_url}/chat/completions"
-                
-                async with session.post(
-                    api_url,
-                    headers=headers,
-                    json=request_data,
-                    timeout=self.timeout
-                ) as response:
-                    response_data = await response.json()
-                    
-                    # 记录响应时间
-                    elapsed_time = time.time() - start_time
-                    logger.debug(f"LLM响应时间: {elapsed_time:.2f}秒")
-                    
-                    # 处理错误
-                    if response.status != 200:
-                        error_msg = response_data.get("error", {}).get("message", "未知错误")
-                        logger.error(f"LLM API错误 ({response.status}): {error_msg}")
-                        raise Exception(f"LLM API错误: {error_msg}")
-                    
-                    # 提取生成的文本
-                    try:
-                        generated_text = response_data["choices"][0]["message"]["content"]
-                        return generated_text
-                    except (KeyError, IndexError) as e:
-                        logger.error(f"解析LLM响应失败: {str(e)}, 响应: {response_data}")
-                        raise Exception(f"解析LLM响应失败: {str(e)}")
-                        
+            return await self._routed_completion(messages, max_tokens, temperature, route, validator)
         except aiohttp.ClientError as e:
             logger.error(f"LLM API请求失败: {str(e)}")
             raise Exception(f"LLM API请求失败: {str(e)}")
@@ -86,69 +59,21 @@ class AliLLMClient:
             logger.error(f"LLM生成失败: {str(e)}")
             raise Exception(f"LLM生成失败: {str(e)}")
     
-    async def call_llm(self, system_prompt: str, user_message: str) -> Dict:
+    async def call_llm(self, system_prompt: str, user_message: str, route: Optional[str] = "聊天") -> Dict:
         """
         调用LLM进行对话
         用于聊天API的异步调用
         """
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ]
         try:
-            # 构建请求参数
-            request_data = {
-                "model": self.model,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
-                "max_tokens": 2000,
-                "temperature": 0.7
+            generated_text = await self._routed_completion(messages, 2000, 0.7, route, None)
+            return {
+                "success": True,
+                "response": generated_text
             }
-            
-            # 发送请求
-            start_time = time.time()
-            async with aiohttp.ClientSession() as session:
-                headers = {
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {self.api_key}"
-                }
-                
-                # 使用兼容模式API
-                api_url = f"{self.base_url}/chat/completions"
-                
-                async with session.post(
-                    api_url,
-                    headers=headers,
-                    json=request_data,
-                    timeout=self.timeout
-                ) as response:
-                    response_data = await response.json()
-                    
-                    # 记录响应时间
-                    elapsed_time = time.time() - start_time
-                    logger.debug(f"LLM响应时间: {elapsed_time:.2f}秒")
-                    
-                    # 处理错误
-                    if response.status != 200:
-                        error_msg = response_data.get("error", {}).get("message", "未知错误")
-                        logger.error(f"LLM API错误 ({response.status}): {error_msg}")
-                        return {
-                            "success": False,
-                            "error": f"LLM API错误: {error_msg}"
-                        }
-                    
-                    # 提取生成的文本
-                    try:
-                        generated_text = response_data["choices"][0]["message"]["content"]
-                        return {
-                            "success": True,
-                            "response": generated_text
-                        }
-                    except (KeyError, IndexError) as e:
-                        logger.error(f"解析LLM响应失败: {str(e)}, 响应: {response_data}")
-                        return {
-                            "success": False,
-                            "error": f"解析LLM响应失败: {str(e)}"
-                        }
-                        
         except aiohttp.ClientError as e:
             logger.error(f"LLM API请求失败: {str(e)}")
             return {
@@ -159,5 +84,152 @@ class AliLLMClient:
             logger.error(f"LLM生成失败: {str(e)}")
             return {
                 "success": False,
-                "error": f"LLM生成失败: {str(e)}"
-            }
\ No newline at end of file
+                "error": str(e)
+            }
+    
+    async def stream_response(self, prompt: str, max_tokens: int = 2000, temperature: float = 0.7,
+                              route: Optional[str] = None,
+                              validator: Optional[Callable[[str], float]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式生成回复
+        
+        逐段产出 {"type": "delta", "content": 片段}，最后产出
+        {"type": "final", "content": 完整回复, "escalated": 是否升级}。
+        第一级模型的输出边生成边转发；结果需要升级时由后续模型重新生成（非流式），
+        此时 final 中的完整回复以升级后的结果为准。调用失败时抛出异常。
+        """
+        messages = [
+            {"role": "system", "content": "你是一个专业的IPO风险评估专家，负责分析文本的情感等级。"},
+            {"role": "user", "content": prompt}
+        ]
+        async for event in self._routed_stream(messages, max_tokens, temperature, route, validator):
+            yield event
+    
+    async def stream_llm(self, system_prompt: str, user_message: str,
+                         route: Optional[str] = "聊天") -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式对话，用于聊天API
+        事件格式同 stream_response；调用失败时产出 {"type": "error", "error": 错误信息} 后结束
+        """
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ]
+        try:
+            async for event in self._routed_stream(messages, 2000, 0.7, route, None):
+                yield event
+        except Exception as e:
+            logger.error(f"LLM流式生成失败: {str(e)}")
+            yield {"type": "error", "error": str(e)}
+    
+    async def _routed_completion(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float,
+                                 route: Optional[str], validator: Optional[Callable[[str], float]]) -> str:
+        """按路由配置调用模型；完全相同的请求同时在途时合并为一次上游调用"""
+        key = single_flight.make_key(self.backend.name, self.model, route, messages, max_tokens, temperature)
+        return await single_flight.do(
+            key, lambda: self._tiered_completion(messages, max_tokens, temperature, route, validator), route
+        )
+    
+    async def _tiered_completion(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float,
+                                 route: Optional[str], validator: Optional[Callable[[str], float]],
+                                 first_tier: int = 0, escalations: Optional[List[tuple]] = None) -> str:
+        """
+        按路由配置依次调用候选模型，直到结果无需升级或已是最强模型
+        
+        Args:
+            first_tier: 从第几级模型开始（流式调用第一级后需要升级时从第二级开始）
+            escalations: 此前已发生的升级记录 [(模型, 升级原因)]
+        """
+        route_config = resolve_route(route, self.model)
+        tiers = route_config["tiers"]
+        escalations = list(escalations or [])
+        
+        for index, model in enumerate(tiers):
+            if index < first_tier:
+                continue
+            # 429/5xx/超时/连接错误按退避重试，必要时发出对冲请求
+            generated_text = await call_with_retry(
+                lambda timeout: self._chat_completion(model, messages, max_tokens, temperature, timeout),
+                model, route, self.timeout, retryable_errors=self.backend.retryable_errors
+            )
+            
+            reason = None if index == len(tiers) - 1 else escalation_reason(generated_text, route_config, validator)
+            if reason is None:
+                routing_stats.record_request(route, model, escalations)
+                return generated_text
+            
+            logger.info(f"路由 {route or 'default'} 模型 {model} 结果需要升级（{reason}），改用 {tiers[index + 1]}")
+            escalations.append((model, reason))
+    
+    async def _routed_stream(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float,
+                             route: Optional[str],
+                             validator: Optional[Callable[[str], float]]) -> AsyncIterator[Dict[str, Any]]:
+        """流式调用路由的第一级模型，输出完成后按路由配置判断是否升级"""
+        route_config = resolve_route(route, self.model)
+        tiers = route_config["tiers"]
+        model = tiers[0]
+        
+        parts = []
+        async for delta in stream_with_retry(
+            lambda timeout: self._stream_completion(model, messages, max_tokens, temperature, timeout),
+            model, route, self.timeout, retryable_errors=self.backend.retryable_errors
+        ):
+            parts.append(delta)
+            yield {"type": "delta", "content": delta}
+        generated_text = "".join(parts)
+        
+        reason = None if len(tiers) == 1 else escalation_reason(generated_text, route_config, validator)
+        if reason is None:
+            routing_stats.record_request(route, model, [])
+            yield {"type": "final", "content": generated_text, "escalated": False}
+            return
+        
+        logger.info(f"路由 {route or 'default'} 模型 {model} 流式结果需要升级（{reason}），改用 {tiers[1]}")
+        generated_text = await self._tiered_completion(
+            messages, max_tokens, temperature, route, validator, first_tier=1, escalations=[(model, reason)]
+        )
+        yield {"type": "final", "content": generated_text, "escalated": True}
+    
+    async def _stream_completion(self, model: str, messages: List[Dict[str, str]], max_tokens: int,
+                                 temperature: float, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """调用一次流式生成，逐段产出生成的文本，记录延迟、token和费用"""
+        start_time = time.time()
+        success = False
+        usage = None
+        try:
+            async for chunk in self.backend.stream(model, messages, max_tokens, temperature, timeout or self.timeout):
+                if chunk.usage:
+                    usage = chunk.usage
+                if chunk.content:
+                    yield chunk.content
+            
+            logger.debug(f"LLM流式响应时间({model}): {time.time() - start_time:.2f}秒")
+            success = True
+        finally:
+            routing_stats.record_call(model, time.time() - start_time, usage, success)
+    
+    async def _chat_completion(self, model: str, messages: List[Dict[str, str]], max_tokens: int,
+                               temperature: float, timeout: Optional[float] = None) -> str:
+        """调用一次生成，记录延迟、token和费用"""
+        start_time = time.time()
+        success = False
+        cancelled = False
+        usage = None
+        try:
+            result = await self.backend.generate(model, messages, max_tokens, temperature, timeout or self.timeout)
+            
+            # 记录响应时间
+            elapsed_time = time.time() - start_time
+            logger.debug(f"LLM响应时间({model}): {elapsed_time:.2f}秒")
+            
+            usage = result.usage
+            success = True
+            latency_tracker.record(model, elapsed_time)
+            return result.text
+        except asyncio.CancelledError:
+            # 对冲请求中落后的一方被取消，不计为失败
+            cancelled = True
+            raise
+        finally:
+            if not cancelled:
+                routing_stats.record_call(model, time.time() - start_time, usage, success)
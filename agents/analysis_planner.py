@@ -0,0 +1,312 @@
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import threading
+from models import SentimentResult
+from agents.tag_agents import PLAN_SKIP_REASON
+from config import Config
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 跳过企业识别时记录的原因
+COMPANY_SKIP_REASON = "分析计划跳过企业识别"
+
+# 策略字段及默认值
+#   cascade: 是否先做情感分析再决定下游分析；为 False 时三个Agent全部并行执行（原有行为）
+#   skip_tags_levels: 情感等级属于这些等级且风险规则得分低于 risk_score_threshold 时跳过标签分析
+#   risk_score_threshold: 负面等级规则得分之和达到该值时，无论情感等级如何都分析标签
+#   tag_scope: all 分析全部标签 / prescreen 只分析预筛选命中的候选标签
+#   skip_companies_levels: 情感等级属于这些等级时跳过企业识别
+POLICY_DEFAULTS = {
+    "description": "",
+    "cascade": False,
+    "skip_tags_levels": [],
+    "risk_score_threshold": 1,
+    "tag_scope": "all",
+    "skip_companies_levels": [],
+}
+
+# 内置分析策略，可通过 Config.ANALYSIS_POLICIES 新增或覆盖
+BUILTIN_ANALYSIS_POLICIES = {
+    "full": {
+        "description": "完整分析：情感、标签、企业识别全部并行执行",
+        "cascade": False,
+    },
+    "cascade": {
+        "description": "级联分析：中性/正面且未命中负面规则的文本跳过标签分析",
+        "cascade": True,
+        "skip_tags_levels": ["中性", "正面"],
+        "risk_score_threshold": 1,
+    },
+    "economy": {
+        "description": "节省模式：在级联分析基础上只分析预筛选命中的候选标签",
+        "cascade": True,
+        "skip_tags_levels": ["中性", "正面"],
+        "risk_score_threshold": 2,
+        "tag_scope": "prescreen",
+    },
+}
+
+
+def available_policies() -> Dict[str, dict]:
+    """返回全部可用策略（内置策略 + Config.ANALYSIS_POLICIES 中的自定义策略）"""
+    policies = {name: {**POLICY_DEFAULTS, **policy} for name, policy in BUILTIN_ANALYSIS_POLICIES.items()}
+    for name, policy in (Config.ANALYSIS_POLICIES or {}).items():
+        policies[name] = {**policies.get(name, POLICY_DEFAULTS), **policy}
+    return policies
+
+
+def validate_policy(policy: dict) -> dict:
+    """校验策略字段，返回补全默认值后的策略；字段非法时抛出 ValueError"""
+    if not isinstance(policy, dict):
+        raise ValueError("分析策略必须是字典格式")
+    unknown = set(policy) - set(POLICY_DEFAULTS)
+    if unknown:
+        raise ValueError(f"未知的策略字段: {', '.join(sorted(unknown))}")
+
+    merged = {**POLICY_DEFAULTS, **policy}
+    if merged["tag_scope"] not in ("all", "prescreen"):
+        raise ValueError("tag_scope 只能是 all / prescreen")
+    for key in ("skip_tags_levels", "skip_companies_levels"):
+        if not isinstance(merged[key], list):
+            raise ValueError(f"{key} 必须是列表")
+    try:
+        merged["risk_score_threshold"] = float(merged["risk_score_threshold"])
+    except (TypeError, ValueError):
+        raise ValueError("risk_score_threshold 必须是数字")
+    merged["cascade"] = bool(merged["cascade"])
+    return merged
+
+
+def validate_policies(policies: Dict[str, dict]) -> None:
+    """校验一组自定义策略，字段非法时抛出 ValueError"""
+    if not isinstance(policies, dict):
+        raise ValueError("ANALYSIS_POLICIES必须是字典格式")
+    builtin = available_policies()
+    for name, policy in policies.items():
+        if not isinstance(policy, dict):
+            raise ValueError(f"策略 {name} 必须是字典格式")
+        base = {key: value for key, value in builtin.get(name, {}).items() if key in POLICY_DEFAULTS}
+        try:
+            validate_policy({**base, **policy})
+        except ValueError as e:
+            raise ValueError(f"策略 {name} 无效: {e}")
+
+
+class AnalysisPlanStats:
+    """按策略统计分析计划执行的LLM调用次数以及相对完整分析节省的调用次数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._policies: Dict[str, Dict[str, int]] = {}
+
+    def record(self, plan: dict):
+        with self._lock:
+            counts = self._policies.setdefault(plan["policy"], {
+                "articles": 0,
+                "llm_calls": 0,
+                "baseline_calls": 0,
+                "saved_calls": 0,
+                "tags_skipped_articles": 0,
+                "tags_skipped": 0,
+                "companies_skipped": 0,
+            })
+            counts["articles"] += 1
+            counts["llm_calls"] += plan["llm_calls"]
+            counts["baseline_calls"] += plan["baseline_calls"]
+            counts["saved_calls"] += plan["saved_calls"]
+            counts["tags_skipped"] += plan["tags_skipped"]
+            if not plan["run_tags"] and plan["tags_skipped"]:
+                counts["tags_skipped_articles"] += 1
+            if plan["company_skipped"]:
+                counts["companies_skipped"] += 1
+
+    def snapshot(self) -> dict:
+        """返回各策略的统计（含节省比例）"""
+        with self._lock:
+            return {
+                name: {
+                    **counts,
+                    "saved_rate": round(counts["saved_calls"] / counts["baseline_calls"], 4)
+                    if counts["baseline_calls"] else None
+                }
+                for name, counts in self._policies.items()
+            }
+
+
+class AnalysisPlanner:
+    """
+    分析计划器：按策略决定每篇文本需要调用哪些Agent
+
+    级联策略先执行情感分析，再根据情感等级和规则得分决定是否分析标签（以及分析哪些标签）、
+    是否识别企业；非级联策略与原有行为一致，三个Agent并行执行。
+    LLM调用次数按 情感1次 + 每个标签1次 + 企业识别1次 计算（不含预筛选 enforce 模式自身节省的调用）。
+    """
+
+    def __init__(self, sentiment_agent, tag_agents, company_agent):
+        self.sentiment_agent = sentiment_agent
+        self.tag_agents = tag_agents
+        self.company_agent = company_agent
+        self.stats = AnalysisPlanStats()
+
+    def resolve_policy(self, name: Optional[str] = None,
+                       overrides: Optional[dict] = None) -> Tuple[str, dict]:
+        """
+        解析策略：请求指定的策略 > Config.ANALYSIS_POLICY，并应用请求级覆盖字段
+
+        Raises:
+            ValueError: 策略不存在或字段非法
+        """
+        name = name or Config.ANALYSIS_POLICY or "full"
+        policies = available_policies()
+        if name not in policies:
+            raise ValueError(f"分析策略 {name} 不存在，可用策略: {', '.join(policies)}")
+
+        policy = {key: value for key, value in policies[name].items() if key in POLICY_DEFAULTS}
+        if overrides:
+            if not isinstance(overrides, dict):
+                raise ValueError("策略覆盖参数必须是字典格式")
+            policy.update(overrides)
+        return name, validate_policy(policy)
+
+    def plan(self, content: str, sentiment: Optional[SentimentResult], policy_name: str, policy: dict,
+             enable_tags: bool = True, enable_companies: bool = True, enable_sentiment: bool = True) -> dict:
+        """
+        根据情感分析结果和规则得分生成下游分析计划
+
+        Args:
+            sentiment: 情感分析结果；未执行情感分析时使用规则匹配结果判断等级
+
+        Returns:
+            {"policy", "sentiment_level", "risk_score", "run_tags", "tag_names", "run_companies",
+             "llm_calls", "baseline_calls", "saved_calls", "tags_skipped", "company_skipped", "reasons"}
+        """
+        all_tags = list(self.tag_agents.tag_agents.keys())
+        run_tags = enable_tags
+        tag_names = None
+        run_companies = enable_companies
+        reasons: List[str] = []
+        level = sentiment.level if sentiment else None
+        risk_score = 0.0
+
+        if policy["cascade"]:
+            matches = self.sentiment_agent.match_rules(content)
+            risk_score = sum(
+                match["score"] for level_name, match in matches.items()
+                if level_name != "_positions" and "负面" in level_name
+            )
+            if level is None:
+                level = max(self.sentiment_agent._level_scores(matches).items(), key=lambda x: x[1])[0]
+
+            if run_tags and level in policy["skip_tags_levels"] and risk_score < policy["risk_score_threshold"]:
+                run_tags = False
+                reasons.append(f"情感等级为{level}且风险规则得分{risk_score:g}低于{policy['risk_score_threshold']:g}，跳过标签分析")
+            if run_tags and policy["tag_scope"] == "prescreen":
+                tag_names = [tag_name for tag_name in self.tag_agents.prescreener.screen(content) if tag_name in all_tags]
+                reasons.append(f"只分析预筛选候选标签: {', '.join(tag_names) or '无'}")
+                if not tag_names:
+                    run_tags = False
+            if run_companies and level in policy["skip_companies_levels"]:
+                run_companies = False
+                reasons.append(f"情感等级为{level}，跳过企业识别")
+
+        baseline_calls = int(enable_sentiment) + (len(all_tags) if enable_tags else 0) + int(enable_companies)
+        tags_called = (len(tag_names) if tag_names is not None else len(all_tags)) if run_tags else 0
+        llm_calls = int(enable_sentiment) + tags_called + int(run_companies)
+
+        return {
+            "policy": policy_name,
+            "sentiment_level": level,
+            "risk_score": risk_score,
+            "run_tags": run_tags,
+            "tag_names": tag_names if run_tags else [],
+            "run_companies": run_companies,
+            "llm_calls": llm_calls,
+            "baseline_calls": baseline_calls,
+            "saved_calls": baseline_calls - llm_calls,
+            "tags_skipped": (len(all_tags) - tags_called) if enable_tags else 0,
+            "company_skipped": enable_companies and not run_companies,
+            "reasons": reasons,
+        }
+
+    async def analyze_tags(self, content: str, plan: dict) -> list:
+        """按计划执行标签分析，跳过的标签直接判定为否"""
+        if not plan["run_tags"]:
+            return await self.tag_agents.analyze_tags(content, tag_names=[])
+        return await self.tag_agents.analyze_tags(content, tag_names=plan["tag_names"])
+
+    async def run(self, content: str, policy_name: Optional[str] = None, overrides: Optional[dict] = None,
+                  enable_sentiment: bool = True, enable_tags: bool = True,
+                  enable_companies: bool = True) -> Dict[str, Any]:
+        """
+        按策略分析单篇文本
+
+        单个Agent失败时对应结果为空（情感为 None，标签/企业为空列表），与批量解析的处理方式一致
+
+        Returns:
+            {"sentiment": SentimentResult|None, "tags": List[TagResult], "companies": List[CompanyName], "plan": dict}
+
+        Raises:
+            ValueError: 策略不存在或字段非法
+        """
+        policy_name, policy = self.resolve_policy(policy_name, overrides)
+
+        sentiment = None
+        if policy["cascade"]:
+            if enable_sentiment:
+                sentiment = await self.sentiment_agent.analyze_sentiment(content)
+            plan = self.plan(content, sentiment, policy_name, policy, enable_tags, enable_companies, enable_sentiment)
+
+            tasks = []
+            if enable_tags:
+                tasks.append(self.analyze_tags(content, plan))
+            if plan["run_companies"]:
+                tasks.append(self.company_agent.analyze_companies(content))
+            results = list(await asyncio.gather(*tasks, return_exceptions=True))
+            tags = results.pop(0) if enable_tags else []
+            companies = results.pop(0) if plan["run_companies"] else []
+        else:
+            plan = self.plan(content, None, policy_name, policy, enable_tags, enable_companies, enable_sentiment)
+
+            tasks = []
+            if enable_sentiment:
+                tasks.append(self.sentiment_agent.analyze_sentiment(content))
+            if enable_tags:
+                tasks.append(self.tag_agents.analyze_tags(content))
+            if enable_companies:
+                tasks.append(self.company_agent.analyze_companies(content))
+            results = list(await asyncio.gather(*tasks, return_exceptions=True))
+            sentiment = results.pop(0) if enable_sentiment else None
+            tags = results.pop(0) if enable_tags else []
+            companies = results.pop(0) if enable_companies else []
+
+        if isinstance(sentiment, Exception):
+            logger.error(f"情感分析失败: {sentiment}")
+            sentiment = None
+        if isinstance(tags, Exception):
+            logger.error(f"标签分析失败: {tags}")
+            tags = []
+        if isinstance(companies, Exception):
+            logger.error(f"企业识别失败: {companies}")
+            companies = []
+
+        if sentiment is not None:
+            plan["sentiment_level"] = sentiment.level
+        self.stats.record(plan)
+        return {"sentiment": sentiment, "tags": tags, "companies": companies, "plan": plan}
+
+    def get_stats(self) -> dict:
+        """获取各策略节省LLM调用的统计"""
+        return {
+            "default_policy": Config.ANALYSIS_POLICY,
+            "policies": {
+                name: policy.get("description", "") for name, policy in available_policies().items()
+            },
+            "stats": self.stats.snapshot(),
+        }
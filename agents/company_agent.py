@@ -1,6 +1,7 @@
 from typing import List
 from pydantic import BaseModel
 import re
+import json
 import logging
 import inspect
 from models import CompanyName
@@ -45,7 +46,7 @@ class CompanyAgent:
             prompt = self._build_company_prompt(text)
             
             # 调用LLM进行企业识别
-            generated = self.llm_client.generate_response(prompt)
+            generated = self.llm_client.generate_response(prompt, route="企业识别", validator=self._response_confidence)
             if inspect.isawaitable(generated):
                 response = await generated
             else:
@@ -132,6 +133,16 @@ class CompanyAgent:
             # 任何异常下，兜底返回简单拼接
             return f"{template}\n\n{content}"
     
+    def _response_confidence(self, response: str) -> float:
+        """模型路由使用的响应置信度：返回合法JSON数组为1，否则为0（需要靠启发式规则提取）"""
+        json_match = re.search(r'\[.*?\]', response or "", re.DOTALL)
+        if not json_match:
+            return 0.0
+        try:
+            return 1.0 if isinstance(json.loads(json_match.group(0)), list) else 0.0
+        except json.JSONDecodeError:
+            return 0.0
+    
     def _parse_company_response(self, response: str) -> List[str]:
         """解析LLM响应，提取企业名称"""
         try:
@@ -0,0 +1,108 @@
+import re
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+# 关键词数量不超过该值时 find 逐个调用 str.find（C实现，关键词少时比纯Python逐字扫描更快），
+# 超过后使用自动机单次扫描，耗时与关键词数量无关
+DIRECT_SCAN_MAX_KEYWORDS = 200
+
+
+class KeywordMatcher:
+    """Aho-Corasick 多模式匹配器，一次扫描文本即可找出所有命中的关键词（包括相互重叠的关键词）
+
+    匹配器构建后只读，可在多个协程/线程间共享；规则变更时构建新的匹配器整体替换即可。
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = sorted({keyword for keyword in keywords if keyword})
+
+        # 状态转移表、失败指针和每个状态的输出（已合并失败链上的输出）
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[str, ...]] = [()]
+
+        for keyword in self.keywords:
+            self._add(keyword)
+        self._build_fail_links()
+
+        # 关键词首字符集合：根状态下用正则（C实现）跳过不可能开始匹配的字符
+        first_chars = ''.join(sorted(self._goto[0]))
+        self._first_char_pattern = re.compile(f"[{re.escape(first_chars)}]") if first_chars else None
+
+    def _add(self, keyword: str):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state] = (keyword,)
+
+    def _build_fail_links(self):
+        # 按层（BFS）计算失败指针，子状态的输出合并失败状态的输出
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail
+                self._output[next_state] = self._output[next_state] + self._output[fail]
+                queue.append(next_state)
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str]]:
+        """逐个产出命中结果 (起始位置, 关键词)，按结束位置排序"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        root = goto[0]
+        search_first = self._first_char_pattern.search if self._first_char_pattern else None
+        length = len(text)
+        state = 0
+        index = 0
+
+        while index < length:
+            if state == 0:
+                # 根状态下直接跳到下一个可能开始匹配的位置
+                found = search_first(text, index) if search_first else None
+                if found is None:
+                    return
+                index = found.start()
+                state = root[text[index]]
+            else:
+                char = text[index]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0)
+
+            if output[state]:
+                for keyword in output[state]:
+                    yield index - len(keyword) + 1, keyword
+            index += 1
+
+    def find(self, text: str) -> Dict[str, int]:
+        """返回命中的关键词及其首次出现的位置"""
+        text = text or ""
+        found: Dict[str, int] = {}
+        if len(self.keywords) <= DIRECT_SCAN_MAX_KEYWORDS:
+            for keyword in self.keywords:
+                position = text.find(keyword)
+                if position >= 0:
+                    found[keyword] = position
+            return found
+
+        for position, keyword in self.iter_matches(text):
+            if keyword not in found:
+                found[keyword] = position
+        return found
+
+    def count(self, text: str) -> Dict[str, int]:
+        """返回命中的关键词及其出现次数"""
+        counts: Dict[str, int] = {}
+        for _, keyword in self.iter_matches(text or ""):
+            counts[keyword] = counts.get(keyword, 0) + 1
+        return counts
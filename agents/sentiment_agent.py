@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 import inspect
 from pydantic import BaseModel
 import re
@@ -7,9 +7,26 @@ from config import Config
 import logging
 import json
 from agents.ali_llm_client import AliLLMClient
+from agents.keyword_matcher import KeywordMatcher
 
 logger = logging.getLogger(__name__)
 
+# 上下文组合词：组合中的词全部出现时加分
+NEGATIVE_COMBINATIONS = [
+    ["处罚", "违规", "违法"],
+    ["问题", "风险", "危机"],
+    ["下降", "减少", "降低"],
+    ["质疑", "怀疑", "不确定"],
+    ["纠纷", "争议", "冲突"]
+]
+POSITIVE_COMBINATIONS = [
+    ["增长", "提升", "改善"],
+    ["成功", "突破", "创新"],
+    ["合作", "签约", "协议"],
+    ["认证", "认可", "好评"],
+    ["稳定", "正常", "良好"]
+]
+
 class SentimentAgent:
     """情感分析Agent，专门负责5个情感等级的分类判断"""
     
@@ -46,6 +63,74 @@ class SentimentAgent:
                 "description": "能提升公司价值和市场信心的信息，涉及重大技术突破、核心产品认证、重要奖项、重大战略合作、经营业绩超预期等"
             }
         }
+        
+        # 将全部规则编译为一个多模式匹配器，规则匹配只需扫描一次文本
+        self.reload_rules()
+    
+    def reload_rules(self, sentiment_levels: Optional[dict] = None) -> None:
+        """
+        重新编译规则匹配器（规则变更后调用，支持运行时热更新）
+        
+        Args:
+            sentiment_levels: 新的情感等级规则，为空时按当前 self.sentiment_levels 重新编译
+        """
+        levels = sentiment_levels if sentiment_levels is not None else self.sentiment_levels
+        
+        terms = set()
+        for level_rule in levels.values():
+            terms.update(level_rule["keywords"])
+            terms.update(level_rule["strong_signals"])
+        for combo in NEGATIVE_COMBINATIONS + POSITIVE_COMBINATIONS:
+            terms.update(combo)
+        
+        # 规则和匹配器作为整体替换，进行中的分析继续使用旧规则
+        self._compiled_rules = (levels, KeywordMatcher(terms))
+        self.sentiment_levels = levels
+        logger.info(f"情感规则编译完成，共 {len(terms)} 个匹配词")
+    
+    def match_rules(self, content: str, compiled_rules: Optional[tuple] = None) -> dict:
+        """
+        单次扫描文本，返回每个情感等级的命中情况
+        
+        Args:
+            compiled_rules: 调用方已取得的规则快照 (levels, matcher)，为空时使用当前规则
+        
+        Returns:
+            {等级名称: {"score", "hit_count", "keywords", "strong_signals", "context_score"}}，
+            另含 "_positions": {命中词: 首次出现位置}
+        """
+        levels, matcher = compiled_rules or self._compiled_rules
+        positions = matcher.find(content)
+        
+        negative_context = float(sum(
+            1 for combo in NEGATIVE_COMBINATIONS if all(word in positions for word in combo)
+        ))
+        positive_context = float(sum(
+            1 for combo in POSITIVE_COMBINATIONS if all(word in positions for word in combo)
+        ))
+        
+        matches = {"_positions": positions}
+        for level_name, level_rule in levels.items():
+            keywords = [keyword for keyword in level_rule["keywords"] if keyword in positions]
+            strong_signals = [signal for signal in level_rule["strong_signals"] if signal in positions]
+            
+            # 负面等级使用负面组合词，正面/中性等级使用正面组合词
+            if "负面" in level_name:
+                context_score = negative_context
+            elif "正面" in level_name or "中性" in level_name:
+                context_score = positive_context
+            else:
+                context_score = 0.0
+            
+            matches[level_name] = {
+                # 关键词1分，强信号2分（权重更高）
+                "score": len(keywords) * 1.0 + len(strong_signals) * 2.0 + context_score,
+                "hit_count": len(keywords) + len(strong_signals),
+                "keywords": keywords,
+                "strong_signals": strong_signals,
+                "context_score": context_score
+            }
+        return matches
     
     async def analyze_sentiment(self, content: str) -> SentimentResult:
         """
@@ -58,13 +143,10 @@ class SentimentAgent:
             情感分析结果
         """
         try:
-            # 使用最新运行时提示词（允许配置热更新），并安全插入内容
-            runtime_prompt = Config.AGENT_PROMPTS.get("情感分析", self.prompt_template)
-            template = runtime_prompt or Config.SENTIMENT_PROMPT_TEMPLATE
-            prompt = self._fill_content_into_template(template, content)
+            prompt = self._build_prompt(content)
             
             # 调用LLM获取分析结果，兼容同步/异步实现
-            generated = self.llm_client.generate_response(prompt)
+            generated = self.llm_client.generate_response(prompt, route="情感分析", validator=self._response_confidence)
             if inspect.isawaitable(generated):
                 response = await generated
             else:
@@ -77,6 +159,42 @@ class SentimentAgent:
             logger.error(f"LLM情感分析失败: {str(e)}")
             # 出错时使用规则匹配作为备选方案
             return self._rule_based_analysis(content)
+    
+    async def analyze_sentiment_stream(self, content: str) -> AsyncIterator[dict]:
+        """
+        流式分析文本的情感等级
+        
+        逐段产出模型输出 {"type": "delta", "content": 片段}（情感等级和分析原因的部分文本），
+        最后产出 {"type": "result", "data": SentimentResult}。
+        结果需要升级到更强模型或LLM调用失败时，最终结果可能与已推送的片段不同，以 result 为准。
+        """
+        stream_response = getattr(self.llm_client, "stream_response", None)
+        if stream_response is None:
+            # LLM客户端不支持流式输出时退回一次性分析
+            yield {"type": "result", "data": await self.analyze_sentiment(content)}
+            return
+        
+        try:
+            response = ""
+            async for event in stream_response(self._build_prompt(content), route="情感分析",
+                                               validator=self._response_confidence):
+                if event["type"] == "delta":
+                    yield event
+                else:
+                    response = event["content"]
+            logger.debug(f"LLM情感分析原始响应: {response}")
+            result = self._parse_llm_response(response, content)
+        except Exception as e:
+            logger.error(f"LLM情感分析失败: {str(e)}")
+            # 出错时使用规则匹配作为备选方案
+            result = self._rule_based_analysis(content)
+        yield {"type": "result", "data": result}
+    
+    def _build_prompt(self, content: str) -> str:
+        """使用最新运行时提示词（允许配置热更新），并安全插入内容"""
+        runtime_prompt = Config.AGENT_PROMPTS.get("情感分析", self.prompt_template)
+        template = runtime_prompt or Config.SENTIMENT_PROMPT_TEMPLATE
+        return self._fill_content_into_template(template, content)
 
     def _fill_content_into_template(self, template: str, content: str) -> str:
         """将内容安全地填充到模板中，避免str.format对花括号的误解析。
@@ -104,6 +222,16 @@ class SentimentAgent:
             # 任何异常下，兜底返回简单拼接
             return f"{template}\n\n{content}"
     
+    def _response_confidence(self, response: str) -> float:
+        """模型路由使用的响应置信度：给出标准情感等级为1，等级无法识别为0.5，缺少情感等级为0"""
+        sentiment_match = re.search(r"情感等级[：:]\s*([^\n]+)", response or "")
+        if not sentiment_match:
+            return 0.0
+        level_text = sentiment_match.group(1)
+        if any(level in level_text for level in ("负面三级", "负面二级", "负面一级", "中性", "正面")):
+            return 1.0
+        return 0.5
+    
     def _parse_llm_response(self, response: str, original_text: str) -> SentimentResult:
         """解析LLM的响应，提取情感等级和分析原因"""
         try:
@@ -138,129 +266,64 @@ class SentimentAgent:
     
     def _rule_based_analysis(self, content: str) -> SentimentResult:
         """使用规则匹配进行情感分析（作为备选方案）"""
-        # 分析每个情感等级
-        level_scores = {}
-        
-        for level_name, level_rule in self.sentiment_levels.items():
-            score = self._calculate_level_score(content, level_rule)
-            level_scores[level_name] = score
+        # 匹配和原因说明使用同一份规则快照，期间热更新规则不会导致等级缺失
+        compiled_rules = self._compiled_rules
+        matches = self.match_rules(content, compiled_rules)
         
         # 选择得分最高的情感等级
+        level_scores = self._level_scores(matches)
         best_level = max(level_scores.items(), key=lambda x: x[1])
         
         # 生成原因说明
-        reason = self._generate_sentiment_reason(content, best_level[0], best_level[1])
+        reason = self._generate_sentiment_reason(content, best_level[0], matches, compiled_rules[0])
         
         return SentimentResult(
             level=best_level[0],
             reason=reason
         )
     
-    def _calculate_level_score(self, content: str, level_rule: dict) -> float:
-        """计算某个情感等级的得分"""
-        score = 0.0
-        
-        # 关键词匹配得分
-        keyword_matches = []
-        for keyword in level_rule["keywords"]:
-            if keyword in content:
-                keyword_matches.append(keyword)
-                score += 1.0
-        
-        # 强信号匹配得分（权重更高）
-        strong_signal_matches = []
-        for signal in level_rule["strong_signals"]:
-            if signal in content:
-                strong_signal_matches.append(signal)
-                score += 2.0  # 强信号权重更高
-        
-        # 上下文分析得分
-        context_score = self._analyze_context_score(content, level_rule)
-        score += context_score
-        
-        return score
+    def _level_scores(self, matches: dict) -> dict:
+        """从匹配结果中提取各等级得分"""
+        return {level_name: match["score"] for level_name, match in matches.items() if level_name != "_positions"}
     
-    def _analyze_context_score(self, content: str, level_rule: dict) -> float:
-        """分析上下文得分"""
-        context_score = 0.0
-        
-        # 检查是否有相关的负面词汇组合（基于情感等级名称判断）
-        level_name = list(self.sentiment_levels.keys())[list(self.sentiment_levels.values()).index(level_rule)]
-        if "负面" in level_name:  # 负面情感
-            negative_combinations = [
-                ["处罚", "违规", "违法"],
-                ["问题", "风险", "危机"],
-                ["下降", "减少", "降低"],
-                ["质疑", "怀疑", "不确定"],
-                ["纠纷", "争议", "冲突"]
-            ]
-            
-            for combo in negative_combinations:
-                if all(word in content for word in combo):
-                    context_score += 1.0
-        
-        # 检查是否有相关的正面词汇组合
-        elif "正面" in level_name or "中性" in level_name:  # 正面或中性情感
-            positive_combinations = [
-                ["增长", "提升", "改善"],
-                ["成功", "突破", "创新"],
-                ["合作", "签约", "协议"],
-                ["认证", "认可", "好评"],
-                ["稳定", "正常", "良好"]
-            ]
-            
-            for combo in positive_combinations:
-                if all(word in content for word in combo):
-                    context_score += 1.0
-        
-        return context_score
-    
-    def _generate_sentiment_reason(self, content: str, level: str, score: float) -> str:
-        """生成情感分析原因说明"""
-        level_rule = self.sentiment_levels[level]
+    def _generate_sentiment_reason(self, content: str, level: str, matches: dict, levels: dict) -> str:
+        """生成情感分析原因说明（levels 为匹配时使用的规则快照）"""
+        level_rule = levels[level]
+        level_match = matches[level]
         reasons = []
         
         # 添加情感等级描述
         reasons.append(f"判定为{level}: {level_rule['description']}")
         
         # 添加关键词匹配信息
-        keyword_matches = []
-        for keyword in level_rule["keywords"]:
-            if keyword in content:
-                keyword_matches.append(keyword)
-        
+        keyword_matches = level_match["keywords"]
         if keyword_matches:
             reasons.append(f"检测到相关关键词: {', '.join(keyword_matches[:5])}")  # 最多显示5个
         
         # 添加强信号匹配信息
-        strong_signal_matches = []
-        for signal in level_rule["strong_signals"]:
-            if signal in content:
-                strong_signal_matches.append(signal)
-        
+        strong_signal_matches = level_match["strong_signals"]
         if strong_signal_matches:
             reasons.append(f"检测到强信号: {', '.join(strong_signal_matches)}")
         
         # 添加得分信息
-        reasons.append(f"综合评分: {score:.2f}")
+        reasons.append(f"综合评分: {level_match['score']:.2f}")
         
         # 添加相关上下文
-        context = self._find_relevant_context(content, level_rule["keywords"])
+        context = self._find_relevant_context(content, keyword_matches, matches["_positions"])
         if context:
             reasons.append(f"相关上下文: {context}")
         
         return "；".join(reasons)
     
-    def _find_relevant_context(self, content: str, keywords: List[str]) -> str:
-        """查找关键词相关的上下文"""
+    def _find_relevant_context(self, content: str, keywords: List[str], positions: dict) -> str:
+        """查找关键词相关的上下文（位置来自规则匹配结果，无需再次搜索）"""
         for keyword in keywords:
-            if keyword in content:
-                pos = content.find(keyword)
-                start = max(0, pos - 100)
-                end = min(len(content), pos + len(keyword) + 100)
-                context = content[start:end].strip()
-                if len(context) > 50:
-                    return context[:200] + "..." if len(context) > 200 else context
+            pos = positions[keyword]
+            start = max(0, pos - 100)
+            end = min(len(content), pos + len(keyword) + 100)
+            context = content[start:end].strip()
+            if len(context) > 50:
+                return context[:200] + "..." if len(context) > 200 else context
         return ""
     
     async def get_sentiment_summary(self, content: str) -> dict:
@@ -280,10 +343,7 @@ class SentimentAgent:
             
             # 备选方案：使用规则匹配
             # 分析所有情感等级的得分
-            level_scores = {}
-            for level_name, level_rule in self.sentiment_levels.items():
-                score = self._calculate_level_score(content, level_rule)
-                level_scores[level_name] = score
+            level_scores = self._level_scores(self.match_rules(content))
             
             # 按得分排序
             sorted_levels = sorted(level_scores.items(), key=lambda x: x[1], reverse=True)
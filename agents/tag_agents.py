@@ -1,14 +1,181 @@
-from typing import List
+from typing import Dict, List, Optional
+from collections import deque
 import inspect
 import logging
+import re
+import threading
 from models import TagResult
 from agents.ali_llm_client import AliLLMClient
+from agents.keyword_matcher import KeywordMatcher
 from config import Config
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 预筛选排除的标签使用的分析原因
+PRESCREEN_REASON = "否（预筛选）：文本未命中该标签的关键词规则，未调用LLM分析"
+# 分析计划跳过的标签使用的分析原因
+PLAN_SKIP_REASON = "否（分析计划跳过）：根据情感分析结果和规则得分判定无需分析该标签，未调用LLM分析"
+
+# 标签预筛选规则，由各标签定义中的关键概念整理而来；规则宁宽勿严，只用于排除明显无关的标签
+TAG_PRESCREEN_RULES = {
+    "同业竞争": {
+        "keywords": ["同业竞争", "相同业务", "相似业务", "类似业务", "利益冲突", "利润转移", "竞争关系", "独立性"],
+        "patterns": [r"(控股股东|实际控制人|实控人).{0,20}(控制|旗下|投资).{0,20}(企业|公司)"]
+    },
+    "股权与控制权": {
+        "keywords": ["控制权", "实际控制人", "实控人", "控股股东", "股权结构", "质押", "冻结", "查封", "平仓", "股权转让", "一致行动"],
+        "patterns": [r"(减持|增持|转让).{0,10}股"]
+    },
+    "关联交易": {
+        "keywords": ["关联交易", "关联方", "关联关系", "关联企业", "公允", "利益输送", "调节利润", "非关联化"],
+        "patterns": [r"关联.{0,6}(注销|转让)"]
+    },
+    "历史沿革与股东核查": {
+        "keywords": ["历史沿革", "代持", "突击入股", "三类股东", "契约型基金", "资管计划", "信托计划", "股东核查", "入股", "增资", "股东"],
+        "patterns": [r"(申报|上市)前.{0,10}(入股|增资|转让)"]
+    },
+    "重大违法违规": {
+        "keywords": ["违法", "违规", "处罚", "罚款", "刑事", "立案", "调查", "安全生产", "事故", "环保", "环境保护", "污染",
+                     "产品质量", "召回", "税务", "偷税", "逃税", "劳动", "社保", "欠薪", "贿赂", "行贿", "整改", "警示函"],
+        "patterns": [r"(被|遭).{0,6}(查处|处罚|通报|约谈)"]
+    },
+    "收入与成本": {
+        "keywords": ["收入", "营收", "成本", "毛利", "利润", "业绩", "产能", "订单", "虚增", "财务数据"],
+        "patterns": [r"(净利|盈利|亏损)"]
+    },
+    "财务内控不规范": {
+        "keywords": ["内控", "内部控制", "个人卡", "个人账户", "资金占用", "占用资金", "账外", "体外", "资金循环", "粉饰", "造假", "挪用"],
+        "patterns": [r"(转贷|票据融资|资金拆借)"]
+    },
+    "客户与供应商": {
+        "keywords": ["客户", "供应商", "采购", "销售", "集中度", "依赖", "经销商", "前员工"],
+        "patterns": [r"前[五5]大"]
+    },
+    "资产质量与减值": {
+        "keywords": ["应收", "逾期", "存货", "积压", "商誉", "减值", "坏账", "跌价", "计提", "资产质量"],
+        "patterns": [r"(账龄|周转率)"]
+    },
+    "研发与技术": {
+        "keywords": ["研发", "技术", "专利", "知识产权", "资本化", "授权", "核心技术", "侵权"],
+        "patterns": [r"(自主|核心).{0,4}(研发|技术)"]
+    },
+    "募集资金用途": {
+        "keywords": ["募集资金", "募资", "募投", "流动资金", "偿还", "融资", "发行", "IPO", "上市"],
+        "patterns": [r"(补充|偿还).{0,6}(资金|贷款)"]
+    },
+    "突击分红与对赌协议": {
+        "keywords": ["分红", "派息", "股利", "对赌", "估值调整", "回购", "市值挂钩", "业绩承诺", "特殊权利"],
+        "patterns": [r"(现金|大额).{0,4}分配"]
+    },
+    "市场传闻与负面报道": {
+        "keywords": ["传闻", "负面", "曝光", "质疑", "举报", "报道", "舆论", "舆情", "热搜", "澄清", "网传", "爆料", "维权", "投诉"],
+        "patterns": [r"(媒体|记者|网友).{0,10}(发现|指出|反映)"]
+    },
+    "行业政策与环境": {
+        "keywords": ["政策", "监管", "法规", "行业", "市场风险", "冲击", "颠覆", "收紧", "限制", "关税", "制裁", "疫情", "集采"],
+        "patterns": [r"(出台|发布|实施).{0,10}(办法|规定|通知|意见)"]
+    }
+}
+
+
+class TagPrescreener:
+    """基于关键词和正则规则的标签预筛选器，找出可能涉及的候选标签"""
+
+    def __init__(self, rules: Dict[str, dict]):
+        keyword_tags: Dict[str, List[str]] = {}
+        patterns: Dict[str, re.Pattern] = {}
+        for tag_name, rule in rules.items():
+            for keyword in rule.get("keywords", []):
+                keyword_tags.setdefault(keyword, []).append(tag_name)
+            if rule.get("patterns"):
+                patterns[tag_name] = re.compile("|".join(f"(?:{pattern})" for pattern in rule["patterns"]))
+
+        self.rules = rules
+        self._keyword_tags = keyword_tags
+        self._patterns = patterns
+        self._matcher = KeywordMatcher(keyword_tags.keys())
+
+    def screen(self, content: str) -> Dict[str, List[str]]:
+        """
+        返回候选标签及命中的证据（关键词或正则匹配文本）
+
+        未出现在结果中的标签视为与文本明显无关
+        """
+        candidates: Dict[str, List[str]] = {}
+        for keyword in self._matcher.find(content):
+            for tag_name in self._keyword_tags[keyword]:
+                candidates.setdefault(tag_name, []).append(keyword)
+
+        for tag_name, pattern in self._patterns.items():
+            match = pattern.search(content)
+            if match:
+                candidates.setdefault(tag_name, []).append(match.group(0))
+        return candidates
+
+
+class TagPrescreenStats:
+    """影子模式统计：以LLM结果为准，计算预筛选在每个标签上的精确率、召回率和可节省的调用比例"""
+
+    def __init__(self, tag_names: List[str], max_misses: int = 50):
+        self._lock = threading.Lock()
+        self._tag_names = list(tag_names)
+        self._max_misses = max_misses
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.articles = 0
+            self._counts = {tag_name: {"tp": 0, "fp": 0, "fn": 0, "tn": 0} for tag_name in self._tag_names}
+            # 最近被预筛选错误排除的样本，便于补充规则
+            self._misses = deque(maxlen=self._max_misses)
+
+    def record(self, content: str, candidates: Dict[str, List[str]], results: List[TagResult]):
+        """记录一篇文章的预筛选结果与LLM结果的对比（LLM调用失败的标签不计入）"""
+        with self._lock:
+            self.articles += 1
+            for result in results:
+                counts = self._counts.get(result.tag)
+                if counts is None or result.reason.startswith(("分析失败", "分析异常")):
+                    continue
+
+                is_candidate = result.tag in candidates
+                if is_candidate:
+                    counts["tp" if result.belongs else "fp"] += 1
+                elif result.belongs:
+                    counts["fn"] += 1
+                    self._misses.append({
+                        "tag": result.tag,
+                        "content": content[:200],
+                        "llm_reason": result.reason[:200]
+                    })
+                else:
+                    counts["tn"] += 1
+
+    def snapshot(self) -> dict:
+        """返回各标签和整体的统计指标"""
+        def metrics(counts: Dict[str, int]) -> dict:
+            total = sum(counts.values())
+            positives = counts["tp"] + counts["fp"]
+            actual = counts["tp"] + counts["fn"]
+            return {
+                **counts,
+                "precision": round(counts["tp"] / positives, 4) if positives else None,
+                "recall": round(counts["tp"] / actual, 4) if actual else None,
+                # 生效后可跳过的LLM调用比例
+                "skip_rate": round((counts["fn"] + counts["tn"]) / total, 4) if total else None
+            }
+
+        with self._lock:
+            overall = {key: sum(counts[key] for counts in self._counts.values()) for key in ("tp", "fp", "fn", "tn")}
+            return {
+                "articles": self.articles,
+                "overall": metrics(overall),
+                "tags": {tag_name: metrics(counts) for tag_name, counts in self._counts.items()},
+                "recent_misses": list(self._misses)
+            }
+
 class TagAgent:
     """单个标签分析Agent"""
 
@@ -33,7 +200,7 @@ class TagAgent:
             prompt = self._build_analysis_prompt(content)
             
             # 调用LLM进行分析，兼容同步/异步客户端
-            generated = self.llm_client.generate_response(prompt)
+            generated = self.llm_client.generate_response(prompt, route=self.tag_name, validator=self._response_confidence)
             if inspect.isawaitable(generated):
                 response = await generated
             else:
@@ -110,6 +277,15 @@ class TagAgent:
             # 任何异常下，兜底返回简单拼接
             return f"{template}\n\n{content}"
     
+    def _response_confidence(self, response: str) -> float:
+        """模型路由使用的响应置信度：明确给出判断结果为1，只能从开头推断为0.5，无法判断为0"""
+        response = (response or "").strip()
+        if "判断结果：是" in response or "判断结果：否" in response:
+            return 1.0
+        if "是" in response[:20] or "否" in response[:20]:
+            return 0.5
+        return 0.0
+    
     def _parse_llm_response(self, response: str) -> tuple:
         """解析LLM的响应"""
         try:
@@ -188,14 +364,49 @@ class TagAgents:
             custom_prompt = Config.AGENT_PROMPTS.get(tag_name)
             self.tag_agents[tag_name] = TagAgent(tag_name, description, self.llm_client, custom_prompt)
         
+        # 标签预筛选规则与影子模式统计
+        self.prescreen_stats = TagPrescreenStats(list(self.tag_definitions.keys()))
+        self.reload_prescreen_rules()
+        
         logger.info(f"标签分析系统初始化完成，共创建 {len(self.tag_agents)} 个标签分析agent")
     
-    async def analyze_tags(self, content: str) -> List[TagResult]:
+    def reload_prescreen_rules(self, custom_rules: Optional[Dict[str, dict]] = None) -> None:
+        """
+        重新编译预筛选规则（内置规则 + Config.TAG_PRESCREEN_RULES 中的自定义规则）
+        
+        Args:
+            custom_rules: 新的自定义规则，按标签覆盖内置规则；为空时使用 Config.TAG_PRESCREEN_RULES
+        """
+        if custom_rules is None:
+            custom_rules = Config.TAG_PRESCREEN_RULES or {}
+        
+        rules = {tag_name: TAG_PRESCREEN_RULES.get(tag_name, {}) for tag_name in self.tag_definitions}
+        rules.update({
+            tag_name: rule for tag_name, rule in custom_rules.items()
+            if tag_name in self.tag_definitions
+        })
+        
+        # 编译成功（正则合法）后再替换
+        self.prescreener = TagPrescreener(rules)
+        Config.TAG_PRESCREEN_RULES = custom_rules
+        logger.info("标签预筛选规则编译完成")
+    
+    def get_prescreen_stats(self) -> dict:
+        """获取预筛选影子模式统计"""
+        return {"mode": Config.TAG_PRESCREEN_MODE, **self.prescreen_stats.snapshot()}
+    
+    async def analyze_tags(self, content: str, tag_names: Optional[List[str]] = None,
+                           skip_reason: str = PLAN_SKIP_REASON) -> List[TagResult]:
         """
         使用14个专门的agent分析文本中的所有标签
         
+        预筛选生效（enforce）时，未命中规则的标签直接判定为否，不调用LLM；
+        影子模式（shadow）下仍分析全部标签，并记录预筛选与LLM结果的对比统计。
+        
         Args:
             content: 文本内容
+            tag_names: 只分析这些标签（由分析计划指定），其余标签直接判定为否；为空时分析全部标签
+            skip_reason: 未指定分析的标签使用的分析原因
             
         Returns:
             标签分析结果列表
@@ -203,8 +414,20 @@ class TagAgents:
         logger.info(f"开始标签分析，文本长度: {len(content)}")
         results = []
         
+        mode = Config.TAG_PRESCREEN_MODE
+        candidates = self.prescreener.screen(content) if mode in ("shadow", "enforce") else None
+        if candidates is not None:
+            logger.info(f"预筛选候选标签({mode}): {list(candidates.keys())}")
+        
         # 逐个调用每个标签分析agent
         for tag_name, agent in self.tag_agents.items():
+            if tag_names is not None and tag_name not in tag_names:
+                results.append(TagResult(tag=tag_name, belongs=False, reason=skip_reason))
+                continue
+            if mode == "enforce" and tag_name not in candidates:
+                results.append(TagResult(tag=tag_name, belongs=False, reason=PRESCREEN_REASON))
+                continue
+            
             logger.info(f"正在分析标签: {tag_name}")
             
             try:
@@ -223,6 +446,10 @@ class TagAgents:
                     reason=f"分析异常: {str(e)}"
                 ))
         
+        # 只分析部分标签时无法与完整的LLM结果对比，不计入影子模式统计
+        if mode == "shadow" and tag_names is None:
+            self.prescreen_stats.record(content, candidates, results)
+        
         logger.info(f"标签分析完成，共分析 {len(results)} 个标签")
         return results
     
@@ -1,8 +1,10 @@
 import requests
 import json
 import time
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from config import Config
+from model_routing import resolve_route, escalation_reason, routing_stats
+from llm_resilience import LLMCallError, call_with_retry_sync
 
 class AliLLMClient:
     def __init__(self):
@@ -29,11 +31,18 @@ class AliLLMClient:
         """
         
         try:
-            response = self._call_api(prompt)
+            response = self._call_routed(prompt, "摘要", self._summary_confidence)
             return response.strip()
         except Exception as e:
             return f"摘要生成失败: {str(e)}"
     
+    def _summary_confidence(self, response: str) -> float:
+        """模型路由使用的摘要置信度：空摘要为0，明显超长为0.5"""
+        summary = (response or "").strip()
+        if not summary:
+            return 0.0
+        return 1.0 if len(summary) <= 200 else 0.5
+    
     def extract_companies(self, content: str):
         """
         识别文本中涉及的企业
@@ -170,16 +179,46 @@ class AliLLMClient:
         """兼容旧版本的摘要生成接口"""
         return self.generate_summary(content)
     
-    def _call_api(self, prompt: str) -> str:
-        """调用阿里云通义千问API"""
+    def _call_routed(self, prompt: str, route: str, validator: Optional[Callable[[str], float]] = None) -> str:
+        """按 Config.MODEL_ROUTING 依次调用候选模型，结果无需升级或已是最强模型时返回"""
+        route_config = resolve_route(route, self.model_name)
+        tiers = route_config["tiers"]
+        escalations = []
+        for index, model in enumerate(tiers):
+            response = self._call_api(prompt, model, route)
+            reason = None if index == len(tiers) - 1 else escalation_reason(response, route_config, validator)
+            if reason is None:
+                routing_stats.record_request(route, model, escalations)
+                return response
+            escalations.append((model, reason))
+    
+    def _call_api(self, prompt: str, model: Optional[str] = None, route: Optional[str] = None) -> str:
+        """调用阿里云通义千问API（429/5xx/超时/连接错误按退避重试）"""
+        model = model or self.model_name
+        try:
+            return call_with_retry_sync(
+                lambda timeout: self._request_once(prompt, model, timeout), model, route, 30,
+                retryable_errors=(requests.exceptions.Timeout, requests.exceptions.ConnectionError)
+            )
+        except requests.exceptions.RequestException as e:
+            print(f"请求异常: {e}")
+            raise Exception(f"网络请求失败: {str(e)}")
+        except Exception as e:
+            print(f"其他异常: {e}")
+            raise Exception(f"API调用异常: {str(e)}")
+    
+    def _request_once(self, prompt: str, model: str, timeout: float) -> str:
+        """发送一次请求（接口地址随 Config.LLM_BACKEND 切换，mock 时请求本地模拟服务）"""
+        from llm_backends import backend_endpoint
+        base_url, api_key = backend_endpoint()
         headers = {
-            "Authorization": f"Bearer {self.api_key}",
+            "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
         
         # 阿里云通义千问API请求格式
         data = {
-            "model": self.model_name,
+            "model": model,
             "messages": [
                 {
                     "role": "user",
@@ -190,18 +229,23 @@ class AliLLMClient:
             "max_tokens": 1000
         }
         
+        start_time = time.time()
+        usage = None
+        success = False
         try:
             response = requests.post(
-                f"{self.base_url}/chat/completions",
+                f"{base_url}/chat/completions",
                 headers=headers,
                 json=data,
-                timeout=30
+                timeout=timeout
             )
             
             print(f"API响应状态码: {response.status_code}")
             
             if response.status_code == 200:
                 result = response.json()
+                usage = result.get("usage")
+                success = True
                 # 阿里云通义千问的响应格式
                 if "choices" in result and len(result["choices"]) > 0:
                     return result["choices"][0]["message"]["content"]
@@ -211,14 +255,9 @@ class AliLLMClient:
                     print(f"响应格式: {result}")
                     return str(result)
             else:
-                raise Exception(f"API调用失败: {response.status_code} - {response.text}")
-                
-        except requests.exceptions.RequestException as e:
-            print(f"请求异常: {e}")
-            raise Exception(f"网络请求失败: {str(e)}")
-        except Exception as e:
-            print(f"其他异常: {e}")
-            raise Exception(f"API调用异常: {str(e)}")
+                raise LLMCallError(f"API调用失败: {response.status_code} - {response.text}", status=response.status_code)
+        finally:
+            routing_stats.record_call(model, time.time() - start_time, usage, success)
     
     def _parse_sentiment_response(self, response: str) -> Dict:
         """解析情感分析响应"""
@@ -257,7 +296,7 @@ class AliLLMClient:
             full_prompt = f"{system_prompt}\n\n用户问题：{user_message}"
             
             # 调用API
-            response = self._call_api(full_prompt)
+            response = self._call_routed(full_prompt, "聊天")
             
             return {
                 "success": True,
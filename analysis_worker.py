@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+分析工作进程
+从任务队列（work_queue.py）领取文章，执行完整的分析流程（情感/标签/企业识别、摘要、SimHash重复检测）并保存结果。
+每个进程内同时处理最多 --concurrency 个任务；启动多个进程（--workers，或在同一台机器上多次运行本脚本）即可横向扩展，
+jieba 分词、SimHash 等CPU密集步骤分散到各进程，不再占用API进程的事件循环。
+
+用法:
+    python analysis_worker.py [--workers N] [--concurrency N] [--db PATH]
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+from typing import Any, Dict, List, Optional, Set
+
+from config import Config
+from ingestion_daemon import DuplicateWindow, analyze_item
+from result_database_new import ResultDatabase
+from text_deduplicator import init_jieba
+from work_queue import WorkQueue
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisWorker:
+    """单个工作进程：循环领取任务、分析、保存并确认"""
+
+    def __init__(self, worker_id: str, concurrency: int = 4, result_db_path: str = 'data/analysis_results.db',
+                 planner=None):
+        self.worker_id = worker_id
+        self.concurrency = max(1, concurrency)
+        self.queue = WorkQueue()
+        self.result_db = ResultDatabase(result_db_path)
+        self.duplicates = DuplicateWindow(self.result_db)
+        self.planner = planner
+        self._stopping = False
+        self.stats = {'succeeded': 0, 'failed': 0, 'dead': 0}
+
+    def _create_planner(self):
+        from agents.sentiment_agent import SentimentAgent
+        from agents.tag_agents import TagAgents
+        from agents.company_agent import CompanyAgent
+        from agents.analysis_planner import AnalysisPlanner
+        return AnalysisPlanner(SentimentAgent(), TagAgents(), CompanyAgent())
+
+    def stop(self):
+        """处理完当前领取的任务后退出"""
+        self._stopping = True
+
+    def _load_articles(self, tasks: List[Dict[str, Any]]) -> Dict[int, Optional[Dict[str, Any]]]:
+        """取出任务对应的文章：database 源从舆情数据库读取，其他数据源使用任务携带的记录"""
+        from database_manager import UnifiedDatabaseManager
+
+        articles = {}
+        database_ids = [task['article_id'] for task in tasks if task['payload'] is None and task['article_id'] is not None]
+        rows = UnifiedDatabaseManager().get_sentiment_database().get_rows_by_ids(database_ids) if database_ids else {}
+        for task in tasks:
+            if task['payload'] is not None:
+                # 上游ID不在本地 original_id 的ID空间，按 external_id 去重（兼容修改前入队、未携带 external_id 的记录）
+                payload = task['payload']
+                external_id = payload.get('external_id') or (
+                    f"{task['source']}:{payload['id']}" if payload.get('id') is not None else None
+                )
+                articles[task['id']] = {**payload, 'original_id': None, 'external_id': external_id}
+            elif task['article_id'] in rows:
+                articles[task['id']] = {**rows[task['article_id']], 'original_id': task['article_id']}
+            else:
+                articles[task['id']] = None
+        return articles
+
+    def _fail(self, task: Dict[str, Any], error: str):
+        status = self.queue.fail(task['id'], self.worker_id, error)
+        self.stats['dead' if status == 'dead' else 'failed'] += 1
+
+    async def _heartbeat(self, held: Set[int]):
+        """处理期间定期续租，批次耗时超过可见性超时也不会被其他工作进程重复领取"""
+        interval = max(1.0, Config.WORK_QUEUE_VISIBILITY_TIMEOUT / 3)
+        while True:
+            await asyncio.sleep(interval)
+            for task_id in list(held):
+                if task_id in held and not await asyncio.to_thread(self.queue.extend, task_id, self.worker_id):
+                    logger.warning(f"任务 {task_id} 续租失败（租约已被其他工作进程接管）")
+                    held.discard(task_id)
+
+    async def process(self, tasks: List[Dict[str, Any]]):
+        """分析一批任务：成功保存（或结果已存在）的任务确认完成，其余按重试策略处理"""
+        held = {task['id'] for task in tasks}
+        heartbeat = asyncio.create_task(self._heartbeat(held))
+        try:
+            await self._process(tasks, held)
+        finally:
+            heartbeat.cancel()
+
+    async def _process(self, tasks: List[Dict[str, Any]], held: Set[int]):
+        articles = self._load_articles(tasks)
+
+        async def analyze(task):
+            article = articles[task['id']]
+            if article is None:
+                raise LookupError(f"文章 {task['article_id']} 不存在")
+            return await analyze_item(self.planner, article)
+
+        results = await asyncio.gather(*(analyze(task) for task in tasks), return_exceptions=True)
+
+        analyzed_tasks, analyzed = [], []
+        for task, result in zip(tasks, results):
+            if not isinstance(result, BaseException) and result is not None:
+                analyzed_tasks.append(task)
+                analyzed.append(result)
+                continue
+            held.discard(task['id'])
+            if isinstance(result, BaseException):
+                self._fail(task, f"{type(result).__name__}: {result}")
+            elif result is None:
+                # 内容为空，无需分析
+                self.queue.ack(task['id'], self.worker_id)
+
+        for task, save_data in zip(analyzed_tasks, await self.duplicates.annotate(analyzed)):
+            held.discard(task['id'])
+            save_result = self.result_db.save_analysis_result({**save_data, 'session_id': f"worker-{self.worker_id}"})
+            if save_result['success'] or save_result.get('duplicate', False):
+                self.queue.ack(task['id'], self.worker_id)
+                self.stats['succeeded'] += 1
+            else:
+                self._fail(task, save_result.get('message', '保存失败'))
+
+    async def run(self):
+        if self.planner is None:
+            self.planner = self._create_planner()
+        logger.info(f"工作进程 {self.worker_id} 启动，并发 {self.concurrency}")
+        while not self._stopping:
+            tasks = self.queue.claim(self.worker_id, self.concurrency)
+            if not tasks:
+                await asyncio.sleep(Config.WORK_QUEUE_POLL_INTERVAL)
+                continue
+            await self.process(tasks)
+        logger.info(f"工作进程 {self.worker_id} 退出: {self.stats}")
+
+
+def run_worker(concurrency: int, result_db_path: str):
+    """工作进程入口（SIGTERM/SIGINT 时处理完当前任务后退出）"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(process)d - %(levelname)s - %(message)s')
+    # 先加载jieba词典，第一批任务的去重不再承担加载时间
+    init_jieba()
+    worker = AnalysisWorker(f"{socket.gethostname()}-{os.getpid()}", concurrency, result_db_path)
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    asyncio.run(worker.run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='从任务队列领取文章并分析')
+    parser.add_argument('--workers', type=int, default=Config.WORKER_PROCESSES, help='工作进程数')
+    parser.add_argument('--concurrency', type=int, default=Config.WORKER_CONCURRENCY, help='每个进程同时处理的任务数')
+    parser.add_argument('--db', default='data/analysis_results.db', help='分析结果数据库路径')
+    args = parser.parse_args()
+
+    # 旧记录迁移在启动工作进程前执行一次
+    ResultDatabase(args.db).migrate()
+
+    if args.workers <= 1:
+        run_worker(args.concurrency, args.db)
+        return
+
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(args.concurrency, args.db), name=f"analysis-worker-{index}")
+        for index in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+
+    def forward(signum, _frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,14 +6,84 @@ API数据源管理器
 import requests
 import json
 import logging
-from typing import Dict, List, Any, Optional, Union
+import os
+import random
+import threading
+from collections import deque
+from typing import Dict, List, Any, Optional, Union, Tuple, AsyncIterator
 from datetime import datetime
 import asyncio
 import aiohttp
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
+
+from config import Config
 
 logger = logging.getLogger(__name__)
 
+# 需要重试的HTTP状态码
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# 翻页请求重试的退避参数（秒）
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8
+
+
+class APISyncError(Exception):
+    """自动翻页/增量同步中某页请求重试后仍失败"""
+
+
+class SyncStateStore:
+    """增量同步高水位，按同步键保存在JSON文件中"""
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+    
+    def _file(self) -> str:
+        return self.path or Config.API_SYNC_STATE_FILE
+    
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self._file(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"加载同步状态失败: {str(e)}")
+            return {}
+    
+    def get(self, key: str) -> Dict[str, Any]:
+        with self._lock:
+            return self._load().get(key, {})
+    
+    def set(self, key: str, state: Dict[str, Any]):
+        with self._lock:
+            states = self._load()
+            states[key] = state
+            directory = os.path.dirname(self._file())
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # 先写临时文件再替换，避免写入中断损坏状态文件
+            temp_path = f"{self._file()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(states, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self._file())
+    
+    def all(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._load()
+    
+    def clear(self, key: Optional[str] = None):
+        """清除指定同步键（或全部）的高水位，下次同步重新全量拉取"""
+        with self._lock:
+            states = self._load() if key else {}
+            states.pop(key, None)
+            if os.path.exists(self._file()):
+                with open(self._file(), 'w', encoding='utf-8') as f:
+                    json.dump(states, f, ensure_ascii=False, indent=2)
+
+
+sync_state_store = SyncStateStore()
+
 @dataclass
 class APIConfig:
     """API配置类"""
@@ -42,16 +112,16 @@ class APIDataSourceManager:
     def __init__(self):
         self.api_config: Optional[APIConfig] = None
         self.session: Optional[aiohttp.ClientSession] = None
+        self._session_loop = None
         
     async def __aenter__(self):
-        """异步上下文管理器入口"""
-        self.session = aiohttp.ClientSession()
+        """异步上下文管理器入口（会话在多次调用间复用，不在退出时关闭）"""
+        self._get_session()
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """异步上下文管理器出口"""
-        if self.session:
-            await self.session.close()
+        return False
     
     def configure_api(self, config: APIConfig):
         """配置API连接"""
@@ -97,12 +167,12 @@ class APIDataSourceManager:
         if self.api_config and self.api_config.query_params:
             params.update(self.api_config.query_params)
         
-        # 时间范围参数
-        if query_params.start_time and query_params.end_time:
+        # 时间范围参数（增量同步时只有开始时间）
+        if query_params.start_time or query_params.end_time:
             time_field = query_params.time_field
             params[time_field] = {
-                "start": query_params.start_time,
-                "end": query_params.end_time
+                key: value for key, value in (("start", query_params.start_time), ("end", query_params.end_time))
+                if value
             }
         
         # 分页参数
@@ -119,48 +189,85 @@ class APIDataSourceManager:
         
         return params
     
-    async def get_data(self, query_params: QueryParams) -> Dict[str, Any]:
-        """从API获取数据"""
-        if not self.api_config:
-            return {
-                'success': False,
-                'error': 'API未配置',
-                'message': '请先配置API连接'
-            }
+    def build_headers(self, etag: Optional[str] = None) -> Dict[str, str]:
+        """构建请求头（含认证信息）"""
+        headers = {}
+        if self.api_config.headers:
+            headers.update(self.api_config.headers)
+        
+        # 添加认证信息
+        if self.api_config.auth_type == "api_key" and self.api_config.auth_config:
+            auth_config = self.api_config.auth_config
+            if auth_config.get('header_name'):
+                headers[auth_config['header_name']] = auth_config.get('api_key', '')
+        elif self.api_config.auth_type == "bearer" and self.api_config.auth_config:
+            token = self.api_config.auth_config.get('token', '')
+            headers['Authorization'] = f"Bearer {token}"
+        
+        # 条件请求：数据未变化时API返回304
+        if etag:
+            headers['If-None-Match'] = etag
+        return headers
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """取得复用的会话（连接池），会话已关闭或属于其他事件循环时重新创建"""
+        loop = asyncio.get_running_loop()
+        if self.session is None or self.session.closed or self._session_loop is not loop:
+            self.session = aiohttp.ClientSession()
+            self._session_loop = loop
+        return self.session
+    
+    async def close(self):
+        """关闭会话"""
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+    
+    async def _request_page(self, query_params: QueryParams,
+                            etag: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        请求一页数据
         
+        Returns:
+            (与 get_data 相同格式的结果, 请求信息 {'retryable', 'not_modified', 'etag', 'total_reported', 'item_count'})
+        """
+        meta = {'retryable': False, 'not_modified': False, 'etag': None, 'total_reported': False, 'item_count': 0}
         try:
-            # 构建请求参数
-            params = self.build_query_params(query_params)
-            
-            # 构建请求头
-            headers = {}
-            if self.api_config.headers:
-                headers.update(self.api_config.headers)
-            
-            # 添加认证信息
-            if self.api_config.auth_type == "api_key" and self.api_config.auth_config:
-                auth_config = self.api_config.auth_config
-                if auth_config.get('header_name'):
-                    headers[auth_config['header_name']] = auth_config.get('api_key', '')
-            elif self.api_config.auth_type == "bearer" and self.api_config.auth_config:
-                token = self.api_config.auth_config.get('token', '')
-                headers['Authorization'] = f"Bearer {token}"
+            # 构建请求参数（嵌套的参数值按JSON字符串发送）
+            params = {
+                key: json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else value
+                for key, value in self.build_query_params(query_params).items()
+            }
             
             # 发送请求
             timeout = aiohttp.ClientTimeout(total=self.api_config.timeout)
-            async with self.session.get(
+            async with self._get_session().get(
                 self.api_config.url,
                 params=params,
-                headers=headers,
+                headers=self.build_headers(etag),
                 timeout=timeout
             ) as response:
+                meta['etag'] = response.headers.get('ETag')
+                
+                if response.status == 304:
+                    meta['not_modified'] = True
+                    meta['etag'] = meta['etag'] or etag
+                    return {
+                        'success': True,
+                        'data': [],
+                        'total': 0,
+                        'page': query_params.page,
+                        'page_size': query_params.page_size,
+                        'total_pages': 0
+                    }, meta
                 
                 if response.status != 200:
+                    meta['retryable'] = response.status in RETRYABLE_STATUS
                     return {
                         'success': False,
                         'error': f'API请求失败: HTTP {response.status}',
                         'message': f'API返回状态码: {response.status}'
-                    }
+                    }, meta
                 
                 # 解析响应
                 try:
@@ -170,16 +277,18 @@ class APIDataSourceManager:
                         'success': False,
                         'error': f'响应解析失败: {str(e)}',
                         'message': 'API返回的数据不是有效的JSON格式'
-                    }
+                    }, meta
                 
                 # 处理分页数据
                 if isinstance(data, dict):
                     # 检查是否有分页信息
                     items = data.get('data', data.get('items', data.get('results', [])))
+                    meta['total_reported'] = 'total' in data or 'count' in data
                     total = data.get('total', data.get('count', len(items)))
                 else:
                     items = data if isinstance(data, list) else []
                     total = len(items)
+                meta['item_count'] = len(items)
                 
                 # 应用字段映射
                 mapped_items = self.apply_field_mapping(items)
@@ -191,21 +300,177 @@ class APIDataSourceManager:
                     'page': query_params.page,
                     'page_size': query_params.page_size,
                     'total_pages': (total + query_params.page_size - 1) // query_params.page_size
-                }
+                }, meta
                 
         except asyncio.TimeoutError:
+            meta['retryable'] = True
             return {
                 'success': False,
                 'error': '请求超时',
                 'message': f'API请求超时（{self.api_config.timeout}秒）'
-            }
+            }, meta
+        except aiohttp.ClientError as e:
+            meta['retryable'] = True
+            logger.error(f"API请求失败: {str(e)}")
+            return {
+                'success': False,
+                'error': f'API请求失败: {str(e)}',
+                'message': f'连接API时发生错误: {str(e)}'
+            }, meta
         except Exception as e:
             logger.error(f"API请求失败: {str(e)}")
             return {
                 'success': False,
                 'error': f'API请求失败: {str(e)}',
                 'message': f'连接API时发生错误: {str(e)}'
+            }, meta
+    
+    async def get_data(self, query_params: QueryParams) -> Dict[str, Any]:
+        """从API获取数据"""
+        if not self.api_config:
+            return {
+                'success': False,
+                'error': 'API未配置',
+                'message': '请先配置API连接'
             }
+        
+        result, _ = await self._request_page(query_params)
+        return result
+    
+    async def _fetch_page(self, query_params: QueryParams,
+                          etag: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """请求一页数据，超时、连接错误、429和5xx按指数退避（全抖动）重试"""
+        for retry_index in range(Config.API_SYNC_MAX_RETRIES + 1):
+            result, meta = await self._request_page(query_params, etag)
+            if result['success'] or not meta['retryable'] or retry_index == Config.API_SYNC_MAX_RETRIES:
+                return result, meta
+            delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** retry_index)))
+            logger.warning(f"第 {query_params.page} 页请求失败（{result.get('error')}），{delay:.1f}秒后重试")
+            await asyncio.sleep(delay)
+    
+    async def iter_pages(self, query_params: QueryParams,
+                         etag: Optional[str] = None) -> AsyncIterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        自动翻页，按页码顺序逐页产出 (结果, 请求信息)
+        
+        从 query_params.page 开始：第一页返回总数时，其余页按 Config.API_SYNC_CONCURRENCY 并发请求
+        （保持页码顺序产出，同时在途的页数不超过并发数）；未返回总数时顺序翻页，直到某页记录数少于页大小。
+        未配置分页参数（pagination_config）时只请求一页。任一页重试后仍失败时抛出 APISyncError。
+        """
+        if not self.api_config:
+            raise APISyncError('请先配置API连接')
+        
+        first, meta = await self._fetch_page(query_params, etag)
+        if not first['success']:
+            raise APISyncError(first['message'])
+        yield first, meta
+        if meta['not_modified'] or not self.api_config.pagination_config:
+            return
+        
+        def page_params(page: int) -> QueryParams:
+            return replace(query_params, page=page)
+        
+        if not meta['total_reported']:
+            page, count = query_params.page, meta['item_count']
+            while count >= query_params.page_size:
+                page += 1
+                result, page_meta = await self._fetch_page(page_params(page))
+                if not result['success']:
+                    raise APISyncError(f"第 {page} 页: {result['message']}")
+                count = page_meta['item_count']
+                yield result, page_meta
+            return
+        
+        remaining = iter(range(query_params.page + 1, first['total_pages'] + 1))
+        pending = deque()
+        
+        def schedule():
+            page = next(remaining, None)
+            if page is not None:
+                pending.append((page, asyncio.ensure_future(self._fetch_page(page_params(page)))))
+        
+        for _ in range(max(1, Config.API_SYNC_CONCURRENCY)):
+            schedule()
+        try:
+            while pending:
+                page, task = pending.popleft()
+                result, page_meta = await task
+                if not result['success']:
+                    raise APISyncError(f"第 {page} 页: {result['message']}")
+                schedule()
+                yield result, page_meta
+        finally:
+            for _, task in pending:
+                task.cancel()
+    
+    async def iter_records(self, query_params: QueryParams) -> AsyncIterator[List[Dict[str, Any]]]:
+        """自动翻页，逐页产出字段映射后的记录"""
+        async for result, _ in self.iter_pages(query_params):
+            if result['data']:
+                yield result['data']
+    
+    def sync_state_key(self, query_params: QueryParams) -> str:
+        """增量同步状态的键：API地址 + 固定查询参数 + 时间字段"""
+        fixed_params = {**(self.api_config.query_params or {}), **(query_params.custom_params or {})}
+        return json.dumps([self.api_config.url, fixed_params, query_params.time_field],
+                          ensure_ascii=False, sort_keys=True, default=str)
+    
+    async def sync(self, query_params: QueryParams, id_field: str = 'id') -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        增量同步：只拉取高水位之后的新记录，逐页产出
+        
+        高水位记录已同步记录的最大时间、该时间点上已同步的记录ID和第一页的ETag，
+        持久化在 Config.API_SYNC_STATE_FILE。下次同步从该时间开始查询（含该时间点，
+        按ID排除已同步的记录），请求参数未变时携带 If-None-Match，API返回304即无新数据。
+        全部页面产出完成后才更新高水位，中途失败或停止时下次重新拉取（至少一次）。
+        """
+        key = self.sync_state_key(query_params)
+        state = sync_state_store.get(key)
+        time_field = query_params.time_field
+        watermark = state.get('watermark')
+        seen_ids = set(state.get('ids', []))
+        
+        if watermark and (not query_params.start_time or query_params.start_time < watermark):
+            query_params = replace(query_params, start_time=watermark)
+        params_signature = json.dumps(self.build_query_params(replace(query_params, page=1)),
+                                      ensure_ascii=False, sort_keys=True, default=str)
+        etag = state.get('etag') if state.get('params') == params_signature else None
+        
+        new_watermark, new_ids, first_etag, synced = watermark, set(seen_ids), None, 0
+        async for result, meta in self.iter_pages(query_params, etag):
+            if meta['not_modified']:
+                logger.info("API数据未变化（304），无新数据")
+                return
+            if first_etag is None:
+                first_etag = meta['etag'] or ''
+            
+            records = []
+            for record in result['data']:
+                time_value = record.get(time_field)
+                time_value = str(time_value) if time_value else None
+                record_id = record.get(id_field)
+                if watermark and time_value:
+                    if time_value < watermark or (time_value == watermark and record_id in seen_ids):
+                        continue
+                if time_value:
+                    if new_watermark is None or time_value > new_watermark:
+                        new_watermark, new_ids = time_value, set()
+                    if time_value == new_watermark and record_id is not None:
+                        new_ids.add(record_id)
+                records.append(record)
+            
+            if records:
+                synced += len(records)
+                yield records
+        
+        sync_state_store.set(key, {
+            'watermark': new_watermark,
+            'ids': sorted(new_ids, key=str),
+            'etag': first_etag or None,
+            'params': params_signature,
+            'last_synced': synced,
+            'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        })
     
     async def test_connection(self) -> Dict[str, Any]:
         """测试API连接"""
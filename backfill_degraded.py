@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+降级结果回填
+LLM熔断或调用失败期间，分析结果由规则分析产生并标记为降级（processing_status = 'degraded'）。
+LLM服务恢复后运行本脚本，按完整策略重新分析这些结果并覆盖原记录；重新分析仍有LLM调用失败的记录保持降级状态。
+
+用法:
+    python backfill_degraded.py [--db PATH] [--batch-size N] [--limit N]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from config import Config
+from result_database_new import ResultDatabase, DEGRADED_STATUS
+from llm_resilience import llm_deadline, collect_llm_calls, circuit_breaker
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def reanalyze(planner, content: str) -> tuple:
+    """重新分析一条内容，返回 (分析字段, 是否仍为降级)"""
+    from ali_llm_client import AliLLMClient
+
+    started = time.time()
+    with llm_deadline(Config.LLM_ITEM_DEADLINE), collect_llm_calls() as llm_calls:
+        analysis = await planner.run(content, "full")
+        summary = AliLLMClient().generate_summary(content)
+
+    degraded = any(call["error"] for call in llm_calls)
+    sentiment = analysis["sentiment"]
+    data = {
+        'summary': summary,
+        'sentiment_level': sentiment.level if sentiment else '未知',
+        'sentiment_reason': sentiment.reason if sentiment else '无原因',
+        'companies': [company.name for company in analysis["companies"]],
+        'tag_results': {tag.tag: {'belongs': tag.belongs, 'reason': tag.reason} for tag in analysis["tags"]},
+        'processing_time': round(time.time() - started, 2),
+        'processing_status': DEGRADED_STATUS if degraded else 'completed',
+    }
+    return data, degraded
+
+
+async def backfill(db_path: str, batch_size: int = 50, limit: int = 0) -> dict:
+    """
+    回填降级结果
+
+    Returns:
+        {'processed', 'recovered', 'still_degraded'}
+    """
+    from agents.sentiment_agent import SentimentAgent
+    from agents.tag_agents import TagAgents
+    from agents.company_agent import CompanyAgent
+    from agents.analysis_planner import AnalysisPlanner
+
+    result_db = ResultDatabase(db_path)
+    planner = AnalysisPlanner(SentimentAgent(), TagAgents(), CompanyAgent())
+    stats = {'processed': 0, 'recovered': 0, 'still_degraded': 0}
+
+    after_id = 0
+    while not limit or stats['processed'] < limit:
+        rows = result_db.get_degraded_results(limit=batch_size, after_id=after_id)
+        if not rows:
+            break
+
+        for row in rows:
+            if limit and stats['processed'] >= limit:
+                break
+            after_id = row['id']
+
+            # 熔断期间停止回填，避免把结果再次写成降级
+            if not circuit_breaker.is_available():
+                logger.warning("LLM服务熔断中，停止回填")
+                return stats
+
+            data, degraded = await reanalyze(planner, row['content'] or row['title'] or '')
+            stats['processed'] += 1
+            if degraded:
+                stats['still_degraded'] += 1
+                logger.warning(f"结果 {row['id']} 重新分析仍有LLM调用失败，保持降级状态")
+                continue
+
+            update_result = result_db.update_reanalyzed_result(row['id'], data)
+            if update_result['success']:
+                stats['recovered'] += 1
+            else:
+                stats['still_degraded'] += 1
+                logger.error(f"结果 {row['id']} 更新失败: {update_result['message']}")
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='重新分析降级结果并回填')
+    parser.add_argument('--db', default='data/analysis_results.db', help='分析结果数据库路径')
+    parser.add_argument('--batch-size', type=int, default=50, help='每批读取的记录数')
+    parser.add_argument('--limit', type=int, default=0, help='最多处理的记录数，0 表示全部')
+    args = parser.parse_args()
+
+    stats = asyncio.run(backfill(args.db, args.batch_size, args.limit))
+    print(f"回填完成: 处理 {stats['processed']} 条，恢复 {stats['recovered']} 条，"
+          f"仍为降级 {stats['still_degraded']} 条")
+
+
+if __name__ == "__main__":
+    main()
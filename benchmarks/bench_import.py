@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+导入和启动耗时基准
+- importtime：在子进程中以 python -X importtime 导入 main，统计总耗时、main 直接导入的模块中累计耗时最高的几个，以及自身耗时最高的模块
+- serve（--serve）：启动 uvicorn，测量进程启动到存活（/api/health 可访问）、到就绪（/api/health/ready 返回200）的时间，
+  以及第一次和第二次请求 /openapi.json（加载全部路由模块）的延迟
+
+用法:
+    python benchmarks/bench_import.py [--module main] [--top 25] [--serve] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """解析 -X importtime 输出：import time: self [us] | cumulative | imported package"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        entries.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip())) // 2,
+            'self_ms': int(self_us) / 1000,
+            'cumulative_ms': int(cumulative_us) / 1000,
+        })
+    return entries
+
+
+def bench_importtime(module: str, top: int) -> Dict[str, Any]:
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                               cwd=ROOT, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if completed.returncode != 0:
+        return {'error': completed.stderr.strip().splitlines()[-1] if completed.stderr else 'import failed'}
+    entries = parse_importtime(completed.stderr)
+    # 子模块先于父模块输出，目标模块的直接导入是紧挨在它之前、深度为1的条目
+    target = next(index for index, entry in enumerate(entries) if entry['module'] == module and entry['depth'] == 0)
+    direct = []
+    for entry in reversed(entries[:target]):
+        if entry['depth'] == 0:
+            break
+        if entry['depth'] == 1:
+            direct.append(entry)
+    return {
+        'wall_seconds': round(wall, 4),
+        'import_ms': entries[target]['cumulative_ms'],
+        'modules': len(entries),
+        'top_cumulative': sorted(direct, key=lambda entry: entry['cumulative_ms'], reverse=True)[:top],
+        'top_self': sorted(entries, key=lambda entry: entry['self_ms'], reverse=True)[:top],
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _get(url: str, timeout: float = 5):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def bench_serve(timeout: float = 60) -> Dict[str, Any]:
+    port = _free_port()
+    base = f'http://127.0.0.1:{port}'
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port), '--log-level', 'warning'],
+                               cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    result: Dict[str, Any] = {}
+    try:
+        while 'live_seconds' not in result or 'ready_seconds' not in result:
+            if process.poll() is not None:
+                result['error'] = process.stderr.read().decode('utf-8', 'replace').strip()[-2000:]
+                return result
+            if time.perf_counter() - started > timeout:
+                result['error'] = 'timeout'
+                return result
+            if 'live_seconds' not in result and _get(f'{base}/api/health', 1) == 200:
+                result['live_seconds'] = round(time.perf_counter() - started, 4)
+            if 'live_seconds' in result and _get(f'{base}/api/health/ready', 1) == 200:
+                result['ready_seconds'] = round(time.perf_counter() - started, 4)
+            time.sleep(0.02)
+
+        for label in ('first_openapi_seconds', 'second_openapi_seconds'):
+            request_started = time.perf_counter()
+            _get(f'{base}/openapi.json', timeout)
+            result[label] = round(time.perf_counter() - request_started, 4)
+        with urllib.request.urlopen(f'{base}/api/health/ready', timeout=5) as response:
+            result['startup'] = json.loads(response.read())
+        return result
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='导入和启动耗时基准')
+    parser.add_argument('--module', default='main', help='要导入的模块')
+    parser.add_argument('--top', type=int, default=25, help='列出耗时最高的模块数')
+    parser.add_argument('--serve', action='store_true', help='同时测量uvicorn启动到存活、就绪的时间')
+    parser.add_argument('--output', help='结果JSON文件')
+    args = parser.parse_args()
+
+    results = {'importtime': bench_importtime(args.module, args.top)}
+    if args.serve:
+        results['serve'] = bench_serve()
+
+    importtime = results['importtime']
+    if 'error' in importtime:
+        print(f"导入 {args.module} 失败: {importtime['error']}")
+    else:
+        print(f"导入 {args.module}: {importtime['import_ms']}ms（{importtime['modules']} 个模块，进程总耗时 {importtime['wall_seconds']}s）")
+        for entry in importtime['top_cumulative']:
+            print(f"  {entry['cumulative_ms']:>10.1f}ms  {entry['module']}")
+    if 'serve' in results:
+        print(f"启动: {json.dumps(results['serve'], ensure_ascii=False)}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+分词冷启动基准
+每个场景在独立的子进程中运行，测量：
+- jieba词典加载：没有缓存文件时（解析词典并生成缓存）和从 Config.JIEBA_CACHE_FILE 缓存加载时
+- 第一个去重请求的延迟：不预加载（请求内加载词典）和启动时预加载
+- 分词缓存：含重复标题、模板段落的语料上，缓存开启与关闭时的去重耗时及命中率
+
+用法:
+    python benchmarks/bench_startup.py [--count 2000] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _child(scenario: str, count: int):
+    """子进程：运行一个场景，结果以一行JSON输出"""
+    sys.path.insert(0, ROOT)
+    from corpus import articles
+
+    result = {}
+    started = time.perf_counter()
+    import text_deduplicator
+    from text_deduplicator import DuplicateDetectionManager, init_jieba, tokenization_cache
+    result['import_seconds'] = time.perf_counter() - started
+
+    if scenario in ('jieba_init', 'first_request_preloaded'):
+        result['jieba_init_seconds'] = init_jieba()
+
+    texts = [{'id': item['id'], 'content': item['content'], 'publish_time': item['publish_time']}
+             for item in articles(count)]
+    manager = DuplicateDetectionManager({'similarity_threshold': 0.6, 'hamming_threshold': 25})
+    if scenario in ('first_request_cold', 'first_request_preloaded'):
+        # 少于 SIMHASH_POOL_MIN_BATCH 条，在当前进程内计算，只反映词典加载对第一个请求的影响
+        started = time.perf_counter()
+        manager.detect_duplicates(texts[:20])
+        result['first_request_seconds'] = time.perf_counter() - started
+    elif scenario == 'token_cache':
+        init_jieba()
+        # 一半文本再计算一次，模拟重复推送和回填
+        workload = [item['content'] for item in texts] + [item['content'] for item in texts[:count // 2]]
+        started = time.perf_counter()
+        for content in workload:
+            text_deduplicator.SimHash(content)
+        result['dedup_seconds'] = time.perf_counter() - started
+        result['texts'] = len(workload)
+        result['cache'] = tokenization_cache.snapshot()
+    print(json.dumps(result))
+
+
+def _run(scenario: str, count: int, env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', scenario, '--count', str(count)],
+        env={**os.environ, **env}, cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='jieba冷启动和分词缓存基准')
+    parser.add_argument('--count', type=int, default=2000, help='合成文章数')
+    parser.add_argument('--output', help='结果JSON文件')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child, args.count)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_env = {'JIEBA_CACHE_FILE': os.path.join(tmp_dir, 'jieba.cache')}
+        results = {
+            'jieba_init_no_cache': _run('jieba_init', args.count, cache_env),
+            'jieba_init_from_cache': _run('jieba_init', args.count, cache_env),
+            'first_request_cold': _run('first_request_cold', args.count, cache_env),
+            'first_request_preloaded': _run('first_request_preloaded', args.count, cache_env),
+            'token_cache_on': _run('token_cache', args.count, cache_env),
+            'token_cache_off': _run('token_cache', args.count, {**cache_env, 'TOKEN_CACHE_MAX_ENTRIES': '0'}),
+        }
+
+    for name, result in results.items():
+        print(f"{name:26s} {json.dumps(result, ensure_ascii=False)}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
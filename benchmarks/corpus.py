@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+基准测试用的合成中文新闻语料
+按固定随机种子生成，同样的参数每次得到同样的数据；一部分文章带有相同的模板段落（免责声明、来源说明），
+一部分是已有文章的改写转载，用于覆盖分词缓存和SimHash重复检测的真实场景。
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List
+
+COMPANIES = ['中原环保股份有限公司', '云图控股股份有限公司', '郑州银行', '宇通客车', '牧原食品', '中国平安',
+             '招商银行', '万科企业', '比亚迪', '宁德时代', '隆基绿能', '海康威视', '格力电器', '美的集团']
+REGIONS = ['郑州市', '宜城市', '襄阳市', '成都市', '武汉市', '洛阳市', '开封市', '南阳市']
+EVENTS = [
+    '{company}2025年度第一期科技创新债券成功发行，本次票据发行规模{amount}亿元，发行期限{years}年，票面利率{rate}%。',
+    '{region}市委副书记带队赴{company}开展招商引资活动，双方就产业合作、项目落地等事项进行了深入交流。',
+    '{company}发布公告称，公司拟投资{amount}亿元建设新能源产业基地，项目建成后预计年产值超过{years}0亿元。',
+    '{company}因信息披露违规收到{region}证监局警示函，公司表示将认真整改并加强内部管理。',
+    '{company}上半年实现营业收入{amount}亿元，同比增长{rate}%，净利润较去年同期有所下降。',
+    '{region}召开重点项目推进会，{company}等{years}家企业现场签约，总投资额达{amount}亿元。',
+    '受市场波动影响，{company}股价连续{years}个交易日下跌，累计跌幅超过{rate}%，引发投资者关注。',
+    '{company}获得{region}人民政府颁发的科技进步奖，公司研发投入占营业收入比例达到{rate}%。',
+]
+BOILERPLATE = [
+    '免责声明：本文内容仅供参考，不构成任何投资建议，投资者据此操作风险自担。',
+    '本文来源于网络公开信息，如有侵权请联系删除。',
+    '更多资讯请关注本站财经频道，第一时间获取最新市场动态。',
+]
+TITLES = ['{company}最新动态', '{region}经济发展观察', '{company}发布重要公告', '财经快讯：{company}',
+          '{region}招商引资取得新进展', '{company}业绩解读']
+
+
+def _fill(template: str, rng: random.Random) -> str:
+    return template.format(
+        company=rng.choice(COMPANIES), region=rng.choice(REGIONS),
+        amount=rng.randint(1, 200), years=rng.randint(2, 9), rate=round(rng.uniform(0.5, 30), 2),
+    )
+
+
+def iter_articles(count: int, seed: int = 20250101, duplicate_ratio: float = 0.15,
+                  boilerplate_ratio: float = 0.4) -> Iterator[Dict[str, Any]]:
+    """
+    生成 count 篇合成文章
+
+    Args:
+        duplicate_ratio: 改写转载（与之前某篇只差少量字词）的比例
+        boilerplate_ratio: 末尾带模板段落的比例
+    """
+    rng = random.Random(seed)
+    recent: List[str] = []
+    start = datetime(2025, 1, 1)
+    for index in range(count):
+        if recent and rng.random() < duplicate_ratio:
+            content = rng.choice(recent).replace('，', '。', 1).replace('公司', '该公司', 1)
+        else:
+            content = ''.join(_fill(rng.choice(EVENTS), rng) for _ in range(rng.randint(2, 6)))
+            recent.append(content)
+            if len(recent) > 500:
+                recent.pop(0)
+        if rng.random() < boilerplate_ratio:
+            content += rng.choice(BOILERPLATE)
+        yield {
+            'id': index + 1,
+            'title': _fill(rng.choice(TITLES), rng),
+            'content': content,
+            'source': rng.choice(['新浪财经', '东方财富', '证券时报', '本地新闻']),
+            'publish_time': (start + timedelta(minutes=7 * index)).strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
+
+def articles(count: int, **kwargs) -> List[Dict[str, Any]]:
+    return list(iter_articles(count, **kwargs))
+
+
+SENTIMENT_LEVELS = ['负面三级（重大风险）', '负面二级（显著风险）', '负面一级（潜在风险/关注点）', '中性', '正面']
+
+
+def iter_analysis_results(count: int, seed: int = 20250101, **kwargs) -> Iterator[Dict[str, Any]]:
+    """
+    生成 count 条分析结果（ResultDatabase.save_analysis_result 的参数格式），文章与 iter_articles 相同，
+    情感等级、命中标签和企业随机分配
+    """
+    from result_database_new import TAG_NAMES
+
+    rng = random.Random(seed + 1)
+    for article in iter_articles(count, seed=seed, **kwargs):
+        level = rng.choices(SENTIMENT_LEVELS, weights=[1, 3, 5, 8, 3])[0]
+        tag_results = {}
+        for tag_name in rng.sample(TAG_NAMES, rng.randint(0, 3)):
+            tag_results[tag_name] = {'belongs': True, 'reason': f'文本涉及{tag_name}相关事项'}
+        yield {
+            'original_id': article['id'],
+            'title': article['title'],
+            'content': article['content'],
+            'summary': article['content'][:100],
+            'source': article['source'],
+            'publish_time': article['publish_time'],
+            'sentiment_level': level,
+            'sentiment_reason': f'根据文本内容判断为{level}',
+            'companies': ','.join(rng.sample(COMPANIES, rng.randint(0, 3))),
+            'tag_results': tag_results,
+            'processing_time': round(rng.uniform(1, 10), 2),
+        }
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+端到端基准套件
+在合成中文新闻语料（benchmarks/corpus.py）上测量分析链路的热点路径，每组基准在独立的子进程和临时工作目录
+（各自的 data/ 数据库）中运行：
+- csv_import：DatabaseManager.import_csv_data 流式导入
+- simhash：指纹计算（进程池 / 当前进程）、SimHash索引写入和查找
+- results：逐条 save_analysis_result 与批量 save_analysis_results 写入，列表/搜索/统计查询，
+  各导出接口（CSV、JSON、Excel）
+- batch_parse：本地模拟LLM服务（mock_llm_server.py）下 /api/batch_parse 的端到端吞吐
+- startup（--with-startup）：汇总 bench_startup.py 和 bench_import.py 的结果
+
+语料规模：small 1千条、medium 10万条、large 100万条（--rows 可指定任意条数）。逐条保存、导出接口和
+batch_parse 的单条成本高，分别只使用前 SINGLE_SAVE_ROWS、导出接口自身上限和 --llm-items 条。
+
+结果写入 JSON（默认 benchmarks/results/<规模>-<时间>.json），每项基准给出一个主指标及方向；
+传入 --baseline 时与基线比较，主指标变差超过阈值（默认 DEFAULT_THRESHOLD，基线文件的 thresholds
+可按基准覆盖）记为回归，进程以状态码1退出。
+
+用法:
+    python benchmarks/run_benchmarks.py --size small
+    python benchmarks/run_benchmarks.py --size medium --only simhash,results --baseline benchmarks/baselines/medium.json
+    python benchmarks/run_benchmarks.py --size small --save-baseline benchmarks/baselines/small.json
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SIZES = {'small': 1000, 'medium': 100000, 'large': 1000000}
+GROUPS = ('csv_import', 'simhash', 'results', 'batch_parse')
+
+# 主指标变差超过该比例记为回归；耗时类指标波动较大的基准放宽
+DEFAULT_THRESHOLD = 0.2
+THRESHOLDS = {
+    'batch_parse': 0.3,
+    'query_list_first_page': 0.5,
+    'query_context_search': 0.5,
+}
+
+# 流式处理的块大小（同时限制内存占用）
+CHUNK_ROWS = 50000
+# 逐条保存（每条单独连接和提交）只测前 N 条
+SINGLE_SAVE_ROWS = 2000
+BULK_SAVE_BATCH = 1000
+SIMHASH_INLINE_ROWS = 5000
+SIMHASH_LOOKUP_SAMPLES = 10000
+QUERY_REPEATS = 20
+
+
+def _entry(metric: str, value: float, higher_is_better: bool, **details) -> Dict[str, Any]:
+    return {'metric': metric, 'value': round(value, 4), 'higher_is_better': higher_is_better, **details}
+
+
+def _throughput(rows: int, seconds: float, **details) -> Dict[str, Any]:
+    return _entry('rows_per_second', rows / max(seconds, 1e-9), True, rows=rows, seconds=round(seconds, 4), **details)
+
+
+def _timings(func: Callable[[], Any], repeats: int = QUERY_REPEATS) -> Dict[str, Any]:
+    """重复执行 repeats 次（先执行一次预热），主指标为中位数耗时"""
+    func()
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return _entry('median_ms', statistics.median(samples), False,
+                  p95_ms=round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+                  repeats=repeats)
+
+
+def _chunks(iterable, size: int) -> Iterator[List[Any]]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_corpus_csv(path: str, rows: int):
+    """按 DatabaseManager.import_csv_data 识别的中文表头写出语料"""
+    from corpus import iter_articles
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['标题', '内容', '来源', '发布时间'])
+        for article in iter_articles(rows):
+            writer.writerow([article['title'], article['content'], article['source'], article['publish_time']])
+
+
+# ---------- 子进程：各组基准 ----------
+
+def bench_csv_import(rows: int, args) -> Dict[str, Any]:
+    from database import DatabaseManager
+
+    write_corpus_csv('corpus.csv', rows)
+    size_mb = os.path.getsize('corpus.csv') / 1024 / 1024
+    db = DatabaseManager('data/sentiment_analysis.db')
+    started = time.perf_counter()
+    result = db.import_csv_data('corpus.csv')
+    seconds = time.perf_counter() - started
+    if not result['success']:
+        raise RuntimeError(result['message'])
+    return {'csv_import': _throughput(result['imported'], seconds, file_mb=round(size_mb, 1))}
+
+
+def bench_simhash(rows: int, args) -> Dict[str, Any]:
+    from corpus import iter_articles
+    from fingerprint_service import compute_simhashes, fingerprint_service
+    from text_deduplicator import SimHash, TextDeduplicator, init_jieba
+
+    init_jieba()
+    fingerprint_service.warm_up()
+    # 与 /api/batch_parse 相同的去重参数
+    deduplicator = TextDeduplicator(similarity_threshold=0.6, hamming_threshold=25)
+    fingerprint_seconds = index_seconds = 0.0
+    inline_texts: List[str] = []
+    samples: List[int] = []
+    duplicates = 0
+    for chunk in _chunks(iter_articles(rows), CHUNK_ROWS):
+        texts = [article['content'] for article in chunk]
+        if len(inline_texts) < SIMHASH_INLINE_ROWS:
+            inline_texts.extend(texts[:SIMHASH_INLINE_ROWS - len(inline_texts)])
+
+        started = time.perf_counter()
+        values = fingerprint_service.fingerprint(texts)
+        fingerprint_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        for article, value in zip(chunk, values):
+            result = deduplicator.add_text(str(article['id']), article['content'], article['publish_time'],
+                                           simhash_value=value)
+            duplicates += result['is_duplicate']
+        index_seconds += time.perf_counter() - started
+        if len(samples) < SIMHASH_LOOKUP_SAMPLES:
+            samples.extend(values[:SIMHASH_LOOKUP_SAMPLES - len(samples)])
+
+    # 当前进程内计算（分词缓存清空，与进程池的首轮计算可比）
+    from text_deduplicator import tokenization_cache
+    tokenization_cache.clear()
+    started = time.perf_counter()
+    compute_simhashes(inline_texts)
+    inline_seconds = time.perf_counter() - started
+
+    lookups = [SimHash.from_value(value) for value in samples]
+    started = time.perf_counter()
+    candidates = sum(len(deduplicator._find_similar_texts(simhash)) for simhash in lookups)
+    lookup_seconds = time.perf_counter() - started
+    fingerprint_service.shutdown()
+
+    return {
+        'simhash_fingerprint': _throughput(rows, fingerprint_seconds, workers=fingerprint_service.workers,
+                                           cache=fingerprint_service.cache_stats()['pool']),
+        'simhash_fingerprint_inline': _throughput(len(inline_texts), inline_seconds),
+        'simhash_index_add': _throughput(rows, index_seconds, duplicates=duplicates),
+        'simhash_index_lookup': _throughput(len(lookups), lookup_seconds,
+                                            avg_matches=round(candidates / max(len(lookups), 1), 2)),
+    }
+
+
+def bench_results(rows: int, args) -> Dict[str, Any]:
+    from corpus import iter_analysis_results
+    from fastapi.testclient import TestClient
+    from result_database_new import TAG_NAMES, ResultDatabase
+
+    results: Dict[str, Any] = {}
+
+    single_rows = min(rows, SINGLE_SAVE_ROWS)
+    single_db = ResultDatabase('data/single_save.db')
+    started = time.perf_counter()
+    for data in iter_analysis_results(single_rows):
+        single_db.save_analysis_result(data)
+    results['save_single'] = _throughput(single_rows, time.perf_counter() - started)
+
+    # 导出和查询接口读取 data/analysis_results.db
+    result_db = ResultDatabase('data/analysis_results.db')
+    saved = 0
+    started = time.perf_counter()
+    for batch in _chunks(iter_analysis_results(rows), BULK_SAVE_BATCH):
+        response = result_db.save_analysis_results(batch)
+        if not response['success']:
+            raise RuntimeError(response['message'])
+        saved += response['saved']
+    bulk = results['save_bulk'] = _throughput(saved, time.perf_counter() - started, batch_size=BULK_SAVE_BATCH)
+    bulk['speedup_vs_single'] = round(bulk['value'] / max(results['save_single']['value'], 1e-9), 2)
+
+    middle_id = max(1, saved // 2)
+    queries = {
+        'query_list_first_page': lambda: result_db.get_analysis_result_list(page=1, page_size=50),
+        'query_list_deep_offset': lambda: result_db.get_analysis_result_list(page=max(1, saved // 100), page_size=50),
+        'query_list_keyset': lambda: result_db.get_analysis_result_list(page_size=50, after_id=middle_id),
+        'query_list_keyword': lambda: result_db.get_analysis_result_list(page_size=50, search_keyword='证监局'),
+        'query_list_tags': lambda: result_db.get_analysis_result_list(page_size=50, tags=[TAG_NAMES[0]]),
+        'query_search_conditions': lambda: result_db.search_analysis_results(
+            {'query': '郑州银行', 'sentiment_level': '负面二级（显著风险）'}, page=1, page_size=20),
+        'query_context_search': lambda: result_db.search_context_results(['信息披露', '招商引资'], limit=20),
+        'query_dashboard': lambda: result_db.get_dashboard_statistics(),
+    }
+    for name, query in queries.items():
+        results[name] = _timings(query)
+
+    # 导出接口（经过完整应用，包括按需加载的路由）；接口自身最多导出 10000 条
+    import main
+    with TestClient(main.app) as client:
+        exports = {
+            'export_csv': ('POST', '/api/results/export', {'format': 'csv', 'auto_deduplicate': False}),
+            'export_json': ('POST', '/api/results/export', {'format': 'json', 'auto_deduplicate': False}),
+            'export_json_download': ('GET', '/api/results/export/json?auto_deduplicate=false', None),
+            'export_excel': ('GET', '/api/results/export/excel', None),
+        }
+        for name, (method, url, payload) in exports.items():
+            started = time.perf_counter()
+            response = client.request(method, url, json=payload)
+            seconds = time.perf_counter() - started
+            if response.status_code != 200:
+                results[name] = {'error': f"HTTP {response.status_code}: {response.text[:200]}"}
+                continue
+            results[name] = _entry('seconds', seconds, False, bytes=len(response.content))
+    return results
+
+
+def bench_batch_parse(rows: int, args) -> Dict[str, Any]:
+    """模拟LLM服务下 /api/batch_parse 的吞吐（只分析前 --llm-items 条）"""
+    import mock_llm_server
+    from database import DatabaseManager
+
+    items = min(rows, args.llm_items)
+    write_corpus_csv('corpus.csv', items)
+    DatabaseManager('data/sentiment_analysis.db').import_csv_data('corpus.csv')
+
+    settings = mock_llm_server.MockSettings(
+        latency=args.mock_latency, latency_ms=args.mock_latency_ms, latency_jitter_ms=args.mock_latency_ms / 4,
+        error_rate=args.mock_error_rate,
+    )
+    server, _, loop = mock_llm_server.start_in_thread(mock_llm_server.MockLLMServer(settings), port=args.mock_port)
+
+    from fastapi.testclient import TestClient
+    import main
+    events: Dict[str, int] = {}
+    complete: Dict[str, Any] = {}
+    try:
+        with TestClient(main.app) as client:
+            deadline = time.time() + 60
+            while client.get('/api/health/ready').status_code != 200 and time.time() < deadline:
+                time.sleep(0.1)
+            server.reset_stats()
+            started = time.perf_counter()
+            with client.stream('POST', '/api/batch_parse', json={'data_range': 'all'}) as response:
+                for line in response.iter_lines():
+                    if not line.startswith('data:'):
+                        continue
+                    event = json.loads(line[5:])
+                    events[event['type']] = events.get(event['type'], 0) + 1
+                    if event['type'] == 'complete':
+                        complete = event
+                        # 完成事件之后是去重和自动导出，不计入分析吞吐
+                        break
+            seconds = time.perf_counter() - started
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+
+    stats = server.snapshot()
+    return {
+        'batch_parse': _throughput(
+            complete.get('success_count', 0), seconds,
+            processed=complete.get('total_processed', 0), failed=complete.get('failed_count', 0), events=events,
+            llm_requests=stats['requests'], llm_errors=stats['errors'], llm_by_task=stats['by_task'],
+            mock_latency_ms=stats['latency_ms'],
+        )
+    }
+
+
+CHILDREN = {
+    'csv_import': bench_csv_import,
+    'simhash': bench_simhash,
+    'results': bench_results,
+    'batch_parse': bench_batch_parse,
+}
+
+
+def _child(group: str, rows: int, args):
+    """子进程：在当前工作目录（临时目录）中运行一组基准，结果以一行JSON输出"""
+    sys.path[:0] = [ROOT, BENCH_DIR]
+    os.makedirs('data', exist_ok=True)
+    # 应用按相对路径挂载模板和静态文件
+    for name in ('templates', 'static'):
+        if not os.path.exists(name):
+            os.symlink(os.path.join(ROOT, name), name)
+    print(json.dumps(CHILDREN[group](rows, args), ensure_ascii=False))
+
+
+# ---------- 父进程：调度、汇总和回归比较 ----------
+
+def run_group(group: str, rows: int, args, work_dir: str) -> Dict[str, Any]:
+    group_dir = os.path.join(work_dir, group)
+    os.makedirs(group_dir, exist_ok=True)
+    command = [sys.executable, os.path.abspath(__file__), '--child', group, '--rows', str(rows),
+               '--llm-items', str(args.llm_items), '--mock-port', str(args.mock_port),
+               '--mock-latency', args.mock_latency, '--mock-latency-ms', str(args.mock_latency_ms),
+               '--mock-error-rate', str(args.mock_error_rate)]
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')]))}
+    if group == 'batch_parse':
+        env.update({'LLM_BACKEND': 'mock', 'LLM_MOCK_BASE_URL': f'http://127.0.0.1:{args.mock_port}/v1'})
+    started = time.perf_counter()
+    process = subprocess.run(command, cwd=group_dir, env=env, capture_output=True, text=True)
+    if process.returncode != 0:
+        return {group: {'error': process.stderr.strip()[-2000:]}}
+    output = json.loads(process.stdout.strip().splitlines()[-1])
+    print(f"[{group}] 完成，耗时 {time.perf_counter() - started:.1f}s")
+    return output
+
+
+def run_startup(args) -> Dict[str, Any]:
+    """运行 bench_startup.py 和 bench_import.py，取关键数值作为主指标"""
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for script, key in (('bench_startup.py', 'startup'), ('bench_import.py', 'import')):
+            output = os.path.join(tmp_dir, f'{key}.json')
+            process = subprocess.run([sys.executable, os.path.join(BENCH_DIR, script), '--output', output],
+                                     cwd=ROOT, capture_output=True, text=True)
+            if process.returncode != 0:
+                results[key] = {'error': process.stderr.strip()[-2000:]}
+                continue
+            with open(output, 'r', encoding='utf-8') as f:
+                results[key] = json.load(f)
+
+    if 'error' not in results.get('startup', {'error': True}):
+        startup = results['startup']
+        results['jieba_init_from_cache'] = _entry('seconds', startup['jieba_init_from_cache']['jieba_init_seconds'], False)
+        results['first_request_preloaded'] = _entry('seconds', startup['first_request_preloaded']['first_request_seconds'], False)
+    if 'error' not in results.get('import', {'error': True}):
+        importtime = results['import']['importtime']
+        if 'error' not in importtime:
+            results['import_main'] = _entry('import_ms', importtime['import_ms'], False, modules=importtime['modules'])
+    return results
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """与基线比较主指标，返回每项基准的变化；主指标变差超过阈值的标记 regression"""
+    overrides = {**THRESHOLDS, **baseline.get('thresholds', {})}
+    rows = []
+    for name, entry in current['benchmarks'].items():
+        base = baseline.get('benchmarks', {}).get(name)
+        if not isinstance(entry, dict) or 'value' not in entry or not base or 'value' not in base:
+            continue
+        if entry['metric'] != base['metric'] or not base['value']:
+            continue
+        change = (entry['value'] - base['value']) / base['value']
+        worse = -change if entry['higher_is_better'] else change
+        limit = overrides.get(name, threshold)
+        rows.append({'name': name, 'metric': entry['metric'], 'baseline': base['value'], 'current': entry['value'],
+                     'change': round(change, 4), 'threshold': limit, 'regression': worse > limit})
+    return rows
+
+
+def _meta(size: str, rows: int) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'size': size,
+        'rows': rows,
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def _print_results(benchmarks: Dict[str, Any]):
+    for name, entry in benchmarks.items():
+        if not isinstance(entry, dict):
+            continue
+        if 'error' in entry:
+            print(f"  {name:32s} 失败: {entry['error'].splitlines()[-1] if entry['error'] else ''}")
+        elif 'value' in entry:
+            print(f"  {name:32s} {entry['metric']:>16s} = {entry['value']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分析、去重、存储和导出热点路径的端到端基准')
+    parser.add_argument('--size', choices=SIZES, default='small', help='语料规模')
+    parser.add_argument('--rows', type=int, help='语料条数（覆盖 --size）')
+    parser.add_argument('--only', help=f"只运行指定的组，逗号分隔：{','.join(GROUPS)}")
+    parser.add_argument('--llm-items', type=int, default=100, help='batch_parse 分析的条数')
+    parser.add_argument('--mock-port', type=int, default=8901)
+    parser.add_argument('--mock-latency', default='lognormal', help='模拟LLM服务的延迟分布')
+    parser.add_argument('--mock-latency-ms', type=float, default=50.0)
+    parser.add_argument('--mock-error-rate', type=float, default=0.0)
+    parser.add_argument('--with-startup', action='store_true', help='同时运行 bench_startup.py 和 bench_import.py')
+    parser.add_argument('--output', help='结果JSON文件（默认 benchmarks/results/<规模>-<时间>.json）')
+    parser.add_argument('--baseline', help='基线结果JSON文件，主指标变差超过阈值时以状态码1退出')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='默认回归阈值（比例）')
+    parser.add_argument('--save-baseline', help='把本次结果另存为基线文件')
+    parser.add_argument('--work-dir', help='保留各组的临时工作目录（数据库、语料CSV）到该目录')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    rows = args.rows or SIZES[args.size]
+    if args.child:
+        _child(args.child, rows, args)
+        return
+
+    groups = [group.strip() for group in args.only.split(',')] if args.only else list(GROUPS)
+    unknown = [group for group in groups if group not in CHILDREN]
+    if unknown:
+        parser.error(f"未知的基准组: {', '.join(unknown)}")
+
+    results = {'meta': _meta(args.size if not args.rows else 'custom', rows), 'benchmarks': {}}
+    print(f"语料 {rows} 条，运行: {', '.join(groups)}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        work_dir = args.work_dir or tmp_dir
+        for group in groups:
+            results['benchmarks'].update(run_group(group, rows, args, work_dir))
+    if args.with_startup:
+        results['benchmarks'].update(run_startup(args))
+    _print_results(results['benchmarks'])
+
+    output = args.output or os.path.join(BENCH_DIR, 'results', f"{results['meta']['size']}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        results['comparison'] = compare(results, baseline, args.threshold)
+        print(f"与基线 {args.baseline}（提交 {baseline.get('meta', {}).get('commit')}）比较:")
+        for row in results['comparison']:
+            flag = '回归' if row['regression'] else '    '
+            print(f"  {flag} {row['name']:32s} {row['baseline']:>12} -> {row['current']:<12} ({row['change']:+.1%})")
+        if any(row['regression'] for row in results['comparison']):
+            exit_code = 1
+
+    for path in filter(None, [output, args.save_baseline]):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {output}")
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,13 +4,17 @@ Chat API - 智能问答功能
 """
 
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Any
+import asyncio
 import json
 import logging
 from agents.ali_llm_client import AliLLMClient
 from database_manager import UnifiedDatabaseManager
 from config import Config
+from chat_context import DEFAULT_CONTEXT_FIELDS, context_retriever, pack_context
+from chat_memory import conversation_memory
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +30,14 @@ class ChatRequest(BaseModel):
     search_results: Optional[List[Dict[str, Any]]] = []
     knowledge_base_fields: Optional[List[str]] = []
     conversation_history: Optional[List[ChatMessage]] = []
+    conversation_id: Optional[str] = None  # 对话ID，对话记忆按对话缓存在服务端
+
+class ChatStreamRequest(BaseModel):
+    message: str
+    conversation_id: Optional[str] = None  # 对话ID，对话记忆和同一轮问题的检索结果按对话缓存
+    result_ids: Optional[List[int]] = None  # 只在这些结果中检索（页面当前的搜索结果），为空时检索全库
+    knowledge_base_fields: Optional[List[str]] = []
+    conversation_history: Optional[List[ChatMessage]] = []
 
 class ChatResponse(BaseModel):
     success: bool
@@ -37,6 +49,23 @@ def get_db_manager():
     """获取数据库管理器实例"""
     return UnifiedDatabaseManager()
 
+# 回答返回后在后台整理对话记忆的任务（保留引用，避免任务被回收）
+_memory_tasks = set()
+
+async def _load_memory(conversation_id: Optional[str], conversation_history: List[ChatMessage]) -> Dict[str, Any]:
+    """取得本轮使用的对话记忆（最近消息原文 + 早期对话摘要）"""
+    return await conversation_memory.get_context(
+        conversation_id, [{"role": msg.role, "content": msg.content} for msg in conversation_history]
+    )
+
+def _remember_turn(conversation_id: Optional[str], question: str, answer: str):
+    """在后台记录本轮问答并整理对话记忆，不占用本轮响应时间"""
+    if not conversation_id:
+        return
+    task = asyncio.create_task(conversation_memory.record_turn(conversation_id, question, answer))
+    _memory_tasks.add(task)
+    task.add_done_callback(_memory_tasks.discard)
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_ai(
     request: ChatRequest,
@@ -55,10 +84,11 @@ async def chat_with_ai(
         llm_client = AliLLMClient()
         
         # 构建上下文信息
+        memory = await _load_memory(request.conversation_id, request.conversation_history or [])
         context_info = _build_context(
             search_results=request.search_results or [],
             knowledge_base_fields=request.knowledge_base_fields or [],
-            conversation_history=request.conversation_history or []
+            memory=memory
         )
         
         # 构建系统提示词
@@ -74,6 +104,7 @@ async def chat_with_ai(
         )
         
         if response.get("success"):
+            _remember_turn(request.conversation_id, user_message, response.get("response", ""))
             return ChatResponse(
                 success=True,
                 response=response.get("response", "抱歉，没有获取到回答"),
@@ -97,10 +128,66 @@ async def chat_with_ai(
             error=error_msg
         )
 
+@router.post("/chat/stream")
+async def chat_with_ai_stream(
+    request: ChatStreamRequest,
+    db_manager: UnifiedDatabaseManager = Depends(get_db_manager)
+):
+    """
+    流式智能问答接口（SSE）
+    在服务端从分析结果库检索相关数据，按token预算打包上下文后流式返回回答
+    事件：context（检索到的结果ID）、delta（回答片段）、done（完整回答）、error（调用失败）
+    """
+    if not request.message or not request.message.strip():
+        raise HTTPException(status_code=400, detail="问题不能为空")
+    
+    # 检索相关结果并按token预算打包
+    retrieved = context_retriever.retrieve(
+        db_manager.get_result_database(), request.message,
+        conversation_id=request.conversation_id, result_ids=request.result_ids
+    )
+    fields = request.knowledge_base_fields or DEFAULT_CONTEXT_FIELDS
+    context_items, context_ids, context_tokens = pack_context(retrieved["rows"], fields)
+    memory = await _load_memory(request.conversation_id, request.conversation_history or [])
+    system_prompt = _build_system_prompt({
+        "search_results": context_items,
+        "conversation_summary": memory["summary"],
+        "conversation_history": _format_history(memory["messages"]),
+        "total_results": len(retrieved["rows"]),
+        "fields_used": fields,
+        "retrieved": True
+    })
+    
+    llm_client = AliLLMClient()
+    user_message = request.message.strip()
+    
+    async def generate_stream():
+        yield f"data: {json.dumps({'type': 'context', 'result_ids': context_ids, 'terms': retrieved['terms'], 'tokens': context_tokens, 'history_tokens': memory['tokens'], 'cached': retrieved['cached']})}\n\n"
+        async for event in llm_client.stream_llm(system_prompt=system_prompt, user_message=user_message):
+            if event["type"] == "delta":
+                yield f"data: {json.dumps({'type': 'delta', 'content': event['content']})}\n\n"
+            elif event["type"] == "final":
+                _remember_turn(request.conversation_id, user_message, event["content"])
+                yield f"data: {json.dumps({'type': 'done', 'response': event['content'], 'context_used': len(context_items)})}\n\n"
+            else:
+                error_msg = f"AI服务错误: {event['error']}"
+                logger.error(f"LLM调用失败: {event['error']}")
+                yield f"data: {json.dumps({'type': 'error', 'error': error_msg})}\n\n"
+    
+    return StreamingResponse(
+        generate_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 def _build_context(
     search_results: List[Dict[str, Any]], 
     knowledge_base_fields: List[str],
-    conversation_history: List[ChatMessage]
+    memory: Dict[str, Any]
 ) -> Dict[str, Any]:
     """构建上下文信息"""
     
@@ -132,24 +219,21 @@ def _build_context(
                     **item_data
                 })
     
-    # 处理对话历史
-    recent_history = []
-    if conversation_history:
-        # 只保留最近的5轮对话
-        recent_conversations = conversation_history[-10:]  # 最多10条消息，即5轮对话
-        for msg in recent_conversations:
-            recent_history.append({
-                "角色": "用户" if msg.role == "user" else "助手",
-                "内容": msg.content
-            })
-    
     return {
         "search_results": context_data,
-        "conversation_history": recent_history,
+        "conversation_summary": memory["summary"],
+        "conversation_history": _format_history(memory["messages"]),
         "total_results": len(search_results),
         "fields_used": knowledge_base_fields
     }
 
+def _format_history(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """处理对话历史（已由对话记忆按token预算截取）"""
+    return [
+        {"角色": "用户" if msg["role"] == "user" else "助手", "内容": msg["content"]}
+        for msg in messages
+    ]
+
 def _build_system_prompt(context_info: Dict[str, Any]) -> str:
     """构建系统提示词"""
     
@@ -172,7 +256,8 @@ def _build_system_prompt(context_info: Dict[str, Any]) -> str:
     
     # 添加搜索结果上下文
     if context_info["search_results"]:
-        system_prompt += f"\n当前搜索结果数据（共{context_info['total_results']}条，显示前10条）：\n"
+        source = "从数据库中检索到的相关数据" if context_info.get("retrieved") else "当前搜索结果数据"
+        system_prompt += f"\n{source}（共{context_info['total_results']}条，显示前{len(context_info['search_results'])}条）：\n"
         for item in context_info["search_results"]:
             system_prompt += f"\n【数据{item['序号']}】\n"
             for key, value in item.items():
@@ -180,10 +265,14 @@ def _build_system_prompt(context_info: Dict[str, Any]) -> str:
                     system_prompt += f"{key}: {value}\n"
         
         system_prompt += f"\n使用的字段: {', '.join(context_info['fields_used'])}\n"
+    elif context_info.get("retrieved"):
+        system_prompt += "\n注意：数据库中没有检索到与问题相关的数据，请如实告知用户，并建议换用企业名称或风险关键词提问。\n"
     else:
         system_prompt += "\n注意：当前没有搜索结果数据，请提醒用户先进行数据搜索。\n"
     
-    # 添加对话历史
+    # 添加早期对话摘要和最近的对话历史
+    if context_info.get("conversation_summary"):
+        system_prompt += f"\n此前对话摘要：\n{context_info['conversation_summary']}\n"
     if context_info["conversation_history"]:
         system_prompt += "\n对话历史：\n"
         for msg in context_info["conversation_history"]:
@@ -206,7 +295,9 @@ async def get_chat_status():
             "success": True,
             "status": "available",
             "message": "智能问答服务正常",
-            "model": config.ALI_MODEL_NAME
+            "model": config.ALI_MODEL_NAME,
+            "retrieval_cache": context_retriever.cache.snapshot(),
+            "conversation_memory": conversation_memory.snapshot()
         }
     except Exception as e:
         return {
@@ -224,6 +315,7 @@ async def get_model_info():
             "success": True,
             "model_name": config.ALI_MODEL_NAME,
             "base_url": config.ALI_BASE_URL,
+            "backend": config.LLM_BACKEND,
             "available_models": [
                 {"value": "qwen-turbo", "label": "通义千问-Turbo (快速响应)"},
                 {"value": "qwen-plus", "label": "通义千问-Plus (平衡性能)"},
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+智能问答上下文检索
+- 检索词：问题中出现的企业名称、风险标签名称（关键词索引匹配），加上按标点和疑问词切分出的片段
+- 检索：在分析结果库的全文索引中检索相关结果（ResultDatabase.search_context_results）
+- 打包：按 token 预算依次放入相关度最高的结果，字段值过长时截断
+- 缓存：同一对话同一轮问题的检索结果缓存 Config.CHAT_RETRIEVAL_CACHE_TTL 秒（重新生成回答、断线重连不再检索）
+"""
+
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from agents.keyword_matcher import KeywordMatcher
+from config import Config
+from result_database_new import TAG_NAMES
+
+# 未指定知识库字段时放入上下文的字段
+DEFAULT_CONTEXT_FIELDS = ['title', 'content', 'summary', 'sentiment_level', 'companies']
+# 单个字段值的最大字符数
+MAX_FIELD_LENGTH = 500
+# 每个问题最多使用的检索词数
+MAX_TERMS = 16
+# 企业名称词表的刷新间隔（秒）
+VOCABULARY_TTL = 300
+
+# 切分问题的疑问词和虚词（只取不会出现在企业名称、风险词中的词）
+QUESTION_WORDS = [
+    "有哪些", "哪些", "什么", "怎么样", "怎么", "怎样", "如何", "是否", "有没有", "请问", "请帮我", "帮我",
+    "一下", "分析", "总结", "介绍", "相关", "关于", "情况", "最近", "近期", "目前", "以及", "还有", "或者",
+    "的", "了", "吗", "呢", "吧",
+]
+_SPLIT_PATTERN = re.compile(
+    r"[\s,，.。!！?？:：;；、\"“”'‘’()（）\[\]【】<>《》]+|" + "|".join(map(re.escape, QUESTION_WORDS))
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的token数：中文约每字1个token，其他字符约每4个1个token"""
+    if not text:
+        return 0
+    cjk = len(re.findall(r"[一-鿿]", text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def extract_terms(question: str, matcher: Optional[KeywordMatcher] = None) -> List[str]:
+    """
+    从问题中提取检索词
+
+    词表（企业名称、标签名称）命中的词排在前面；其余片段不超过6个字时整体作为检索词，
+    更长的片段按4个字的窗口（步长2）拆分，以便全文索引按命中数量排序
+    """
+    terms = []
+    if matcher is not None:
+        terms.extend(keyword for _, keyword in matcher.iter_matches(question))
+
+    for segment in _SPLIT_PATTERN.split(question or ""):
+        segment = segment.strip()
+        if len(segment) < 2:
+            continue
+        if len(segment) <= 6:
+            terms.append(segment)
+        else:
+            terms.extend(segment[start:start + 4] for start in range(0, len(segment) - 3, 2))
+            if (len(segment) - 4) % 2:
+                terms.append(segment[-4:])
+
+    return list(dict.fromkeys(terms))[:MAX_TERMS]
+
+
+def pack_context(rows: List[Dict[str, Any]], fields: Optional[List[str]] = None,
+                 token_budget: Optional[int] = None) -> Tuple[List[Dict[str, Any]], List[int], int]:
+    """
+    按token预算打包上下文，rows 应已按相关度排序
+
+    Returns:
+        (上下文条目 [{"序号", 字段...}], 放入上下文的结果ID, 使用的token数)；放不下的结果整条跳过
+    """
+    fields = fields or DEFAULT_CONTEXT_FIELDS
+    token_budget = Config.CHAT_CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+
+    items = []
+    result_ids = []
+    used_tokens = 0
+    for row in rows:
+        item_data = {}
+        for field in fields:
+            value = row.get(field)
+            if value is None or value == "":
+                continue
+            if isinstance(value, (list, dict)):
+                value = json.dumps(value, ensure_ascii=False)
+            elif isinstance(value, str) and len(value) > MAX_FIELD_LENGTH:
+                value = value[:MAX_FIELD_LENGTH] + "..."
+            item_data[field] = value
+        if not item_data:
+            continue
+
+        tokens = estimate_tokens("".join(f"{key}: {value}\n" for key, value in item_data.items()))
+        if used_tokens + tokens > token_budget:
+            continue
+        used_tokens += tokens
+        items.append({"序号": len(items) + 1, **item_data})
+        result_ids.append(row.get("id"))
+    return items, result_ids, used_tokens
+
+
+class RetrievalCache:
+    """按（对话ID, 问题, 检索范围）缓存检索结果，超过 Config.CHAT_RETRIEVAL_CACHE_TTL 秒失效"""
+
+    def __init__(self, max_entries: int = 256):
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > Config.CHAT_RETRIEVAL_CACHE_TTL:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: tuple, value: dict):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class ContextRetriever:
+    """在分析结果库中检索问题相关的结果，检索结果按对话轮次缓存"""
+
+    def __init__(self):
+        self.cache = RetrievalCache()
+        self._lock = threading.Lock()
+        # {数据库路径: (加载时间, 词表匹配器)}
+        self._matchers: Dict[str, tuple] = {}
+
+    def _vocabulary_matcher(self, result_db) -> KeywordMatcher:
+        """企业名称和标签名称的词表匹配器，按数据库缓存，定期刷新以包含新识别的企业"""
+        with self._lock:
+            cached = self._matchers.get(result_db.db_path)
+        if cached and time.monotonic() - cached[0] < VOCABULARY_TTL:
+            return cached[1]
+
+        matcher = KeywordMatcher(TAG_NAMES + [name for name in result_db.get_company_names() if len(name) >= 2])
+        with self._lock:
+            self._matchers[result_db.db_path] = (time.monotonic(), matcher)
+        return matcher
+
+    def retrieve(self, result_db, question: str, conversation_id: Optional[str] = None,
+                 result_ids: Optional[List[int]] = None) -> dict:
+        """
+        检索问题相关的结果
+
+        Args:
+            conversation_id: 对话ID，同一对话同一问题的检索结果会被缓存
+            result_ids: 只在这些结果中检索（页面当前的搜索结果）
+
+        Returns:
+            {"terms": 检索词, "rows": 按相关度排序的结果, "cached": 是否命中缓存}
+        """
+        question = (question or "").strip()
+        scope = tuple(result_ids) if result_ids is not None else None
+        key = (result_db.db_path, conversation_id or "", question, scope)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+        terms = extract_terms(question, self._vocabulary_matcher(result_db))
+        search_result = result_db.search_context_results(terms, limit=Config.CHAT_RETRIEVAL_LIMIT,
+                                                         result_ids=result_ids)
+        if not search_result.get("success"):
+            # 检索失败不缓存，下次重试
+            return {"terms": terms, "rows": [], "cached": False}
+
+        retrieved = {"terms": terms, "rows": search_result["data"]}
+        self.cache.put(key, retrieved)
+        return {**retrieved, "cached": False}
+
+
+# 进程内共享的检索器
+context_retriever = ContextRetriever()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+智能问答对话记忆
+- 最近的对话按 Config.CHAT_HISTORY_TOKEN_BUDGET 保留原文
+- 超出预算的早期对话合并进对话摘要（增量更新：每次只把新移出窗口的消息和已有摘要交给LLM），
+  摘要不超过 Config.CHAT_SUMMARY_TOKEN_BUDGET
+- 对话状态按对话ID缓存在服务端，每轮回答结束后在后台整理，不占用下一轮的响应时间；
+  服务重启或对话过期后，用客户端上传的对话历史重建
+因此无论对话多长，每轮提示词中的对话部分都不超过两个预算之和
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from chat_context import estimate_tokens
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_SYSTEM_PROMPT = """你负责维护一段智能问答对话的摘要。
+请把"已有摘要"和"新增对话"合并为一段新的摘要，保留用户关注的企业、风险、问题和助手给出的关键结论，
+去掉寒暄和重复内容。只输出摘要本身，不超过{max_chars}个字。"""
+
+
+def message_tokens(message: Dict[str, str]) -> int:
+    """单条消息的token数（含角色前缀）"""
+    return estimate_tokens(message.get("content", "")) + 2
+
+
+def split_recent(messages: List[Dict[str, str]], token_budget: int) -> tuple:
+    """
+    从最新的消息向前保留，直到达到token预算
+
+    Returns:
+        (需要移出窗口的早期消息, 保留原文的最近消息)
+    """
+    used = 0
+    index = len(messages)
+    while index > 0:
+        tokens = message_tokens(messages[index - 1])
+        if used + tokens > token_budget:
+            break
+        used += tokens
+        index -= 1
+    return messages[:index], messages[index:]
+
+
+def truncate_summary(summary: str, token_budget: int) -> str:
+    """摘要超过预算时保留末尾（较新）的内容"""
+    while summary and estimate_tokens(summary) > token_budget:
+        summary = summary[len(summary) // 10 or 1:]
+    return summary
+
+
+def fallback_summary(summary: str, evicted: List[Dict[str, str]]) -> str:
+    """LLM不可用时的摘要：在已有摘要后追加被移出窗口的用户问题"""
+    questions = [message["content"][:60] for message in evicted if message.get("role") == "user"]
+    if not questions:
+        return summary
+    addition = "用户曾询问：" + "；".join(questions)
+    return f"{summary}\n{addition}" if summary else addition
+
+
+class ConversationMemory:
+    """按对话ID缓存对话状态（最近消息原文 + 早期对话摘要）"""
+
+    def __init__(self, max_conversations: int = 1000):
+        self._lock = threading.Lock()
+        self._max_conversations = max_conversations
+        self._conversations: "OrderedDict[str, dict]" = OrderedDict()
+        self.summaries = 0
+        self.summary_failures = 0
+
+    def _state(self, conversation_id: str, create: bool = False) -> Optional[dict]:
+        """取出对话状态，超过 Config.CHAT_MEMORY_TTL 秒未使用的对话视为不存在"""
+        with self._lock:
+            state = self._conversations.get(conversation_id)
+            if state is not None and time.monotonic() - state["updated"] > Config.CHAT_MEMORY_TTL:
+                del self._conversations[conversation_id]
+                state = None
+            if state is None:
+                if not create:
+                    return None
+                state = {"summary": "", "messages": [], "lock": asyncio.Lock(), "updated": time.monotonic()}
+                self._conversations[conversation_id] = state
+            state["updated"] = time.monotonic()
+            self._conversations.move_to_end(conversation_id)
+            while len(self._conversations) > self._max_conversations:
+                self._conversations.popitem(last=False)
+            return state
+
+    async def get_context(self, conversation_id: Optional[str],
+                          client_history: Optional[List[Dict[str, str]]] = None) -> dict:
+        """
+        取得本轮提示词使用的对话上下文
+
+        Args:
+            conversation_id: 对话ID，为空时不缓存（只按预算截取客户端历史，早期对话用规则摘要）
+            client_history: 客户端上传的对话历史，服务端没有该对话的状态时用于重建
+
+        Returns:
+            {"summary": 早期对话摘要, "messages": 最近消息原文, "tokens": 对话部分的token数}
+        """
+        client_history = [message for message in client_history or [] if message.get("content")]
+        if not conversation_id:
+            evicted, recent = split_recent(client_history, Config.CHAT_HISTORY_TOKEN_BUDGET)
+            summary = truncate_summary(fallback_summary("", evicted), Config.CHAT_SUMMARY_TOKEN_BUDGET)
+            return self._context(summary, recent)
+
+        state = self._state(conversation_id)
+        if state is None:
+            state = self._state(conversation_id, create=True)
+            async with state["lock"]:
+                if not state["messages"] and not state["summary"]:
+                    state["messages"] = list(client_history)
+                    await self._compact(state)
+
+        # 等待上一轮回答后的后台整理完成
+        async with state["lock"]:
+            return self._context(state["summary"], list(state["messages"]))
+
+    async def record_turn(self, conversation_id: Optional[str], question: str, answer: str):
+        """记录一轮问答，并把超出预算的早期消息合并进摘要（在回答返回后调用）"""
+        if not conversation_id:
+            return
+        state = self._state(conversation_id, create=True)
+        async with state["lock"]:
+            state["messages"].extend([
+                {"role": "user", "content": question},
+                {"role": "assistant", "content": answer},
+            ])
+            await self._compact(state)
+
+    def clear(self, conversation_id: str):
+        with self._lock:
+            self._conversations.pop(conversation_id, None)
+
+    async def _compact(self, state: dict):
+        evicted, recent = split_recent(state["messages"], Config.CHAT_HISTORY_TOKEN_BUDGET)
+        if not evicted:
+            return
+        state["summary"] = await self._summarize(state["summary"], evicted)
+        state["messages"] = recent
+
+    async def _summarize(self, summary: str, evicted: List[Dict[str, str]]) -> str:
+        """把移出窗口的消息合并进已有摘要，LLM调用失败时使用规则摘要"""
+        from agents.ali_llm_client import AliLLMClient
+
+        budget = Config.CHAT_SUMMARY_TOKEN_BUDGET
+        dialogue = "\n".join(
+            f"{'用户' if message.get('role') == 'user' else '助手'}: {message['content']}" for message in evicted
+        )
+        result = await AliLLMClient().call_llm(
+            system_prompt=SUMMARY_SYSTEM_PROMPT.format(max_chars=budget),
+            user_message=f"已有摘要：\n{summary or '（无）'}\n\n新增对话：\n{dialogue}",
+            route="对话摘要"
+        )
+        if result.get("success") and result.get("response", "").strip():
+            self.summaries += 1
+            return truncate_summary(result["response"].strip(), budget)
+
+        self.summary_failures += 1
+        logger.warning(f"对话摘要生成失败，使用规则摘要: {result.get('error')}")
+        return truncate_summary(fallback_summary(summary, evicted), budget)
+
+    def _context(self, summary: str, messages: List[Dict[str, str]]) -> dict:
+        tokens = estimate_tokens(summary) + sum(message_tokens(message) for message in messages)
+        return {"summary": summary, "messages": messages, "tokens": tokens}
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            conversations = len(self._conversations)
+        return {"conversations": conversations, "summaries": self.summaries,
+                "summary_failures": self.summary_failures}
+
+
+# 进程内共享的对话记忆
+conversation_memory = ConversationMemory()
@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -28,6 +29,54 @@ class Config:
     ALI_MODEL_NAME = os.getenv("ALI_MODEL_NAME", "qwen-turbo")  # 使用qwen-turbo模型
     ALI_BASE_URL = os.getenv("ALI_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1")  # 阿里云通义千问API端点
     
+    # 模型分级路由：按Agent（情感分析/企业识别/各标签名称/摘要/聊天/default）配置由快到强的候选模型，
+    # 结果无法解析、置信度低于 min_confidence 或包含 escalate_on 中的词时升级到下一级模型；
+    # 未配置时只使用 ALI_MODEL_NAME。例:
+    # {"情感分析": {"tiers": ["qwen-turbo", "qwen-plus"], "min_confidence": 0.6, "escalate_on": ["负面三级"]}}
+    MODEL_ROUTING = json.loads(os.getenv("MODEL_ROUTING", "{}"))
+    # 模型价格（元/千token，用于估算费用，可按实际价格调整）
+    MODEL_PRICES = {
+        "qwen-turbo": {"input": 0.0003, "output": 0.0006},
+        "qwen-plus": {"input": 0.0008, "output": 0.002},
+        "qwen-max": {"input": 0.0024, "output": 0.0096},
+    }
+    
+    # LLM调用容错：429/5xx/超时/连接错误按指数退避（全抖动）重试
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+    LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", 0.5))  # 秒
+    LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", 8))  # 秒
+    # 单篇文本全部LLM调用（情感、标签、企业识别、摘要）共享的时间预算，秒；0 表示不限
+    LLM_ITEM_DEADLINE = float(os.getenv("LLM_ITEM_DEADLINE", 180))
+    # 对冲请求：请求耗时超过该模型近期延迟的分位数（至少 LLM_HEDGE_MIN_SAMPLES 个样本）时再发一个相同请求
+    LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "False").lower() == "true"
+    LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", 0.95))
+    LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20))
+    
+    # LLM熔断：最近 LLM_BREAKER_WINDOW 次请求中失败率达到 LLM_BREAKER_ERROR_RATE 时熔断，
+    # 熔断期间Agent直接使用规则分析（结果标记为降级，待 backfill_degraded.py 回填），
+    # 冷却 LLM_BREAKER_COOLDOWN 秒后放行 LLM_BREAKER_HALF_OPEN_CALLS 个试探请求
+    LLM_BREAKER_ENABLED = os.getenv("LLM_BREAKER_ENABLED", "True").lower() == "true"
+    LLM_BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", 20))
+    LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", 10))
+    LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", 0.5))
+    LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", 30))  # 秒
+    LLM_BREAKER_HALF_OPEN_CALLS = int(os.getenv("LLM_BREAKER_HALF_OPEN_CALLS", 2))
+    
+    # 完全相同的LLM请求同时在途时合并为一次上游调用
+    LLM_SINGLE_FLIGHT_ENABLED = os.getenv("LLM_SINGLE_FLIGHT_ENABLED", "True").lower() == "true"
+    
+    # /api/analyze 的情感分析和流式聊天边生成边推送模型输出（流式请求不对冲、不合并）
+    LLM_STREAM_ENABLED = os.getenv("LLM_STREAM_ENABLED", "True").lower() == "true"
+    
+    # 智能问答服务端检索：每个问题最多检索的结果数、上下文token预算、同一轮对话检索结果的缓存时间
+    CHAT_RETRIEVAL_LIMIT = int(os.getenv("CHAT_RETRIEVAL_LIMIT", 20))
+    CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", 3000))
+    CHAT_RETRIEVAL_CACHE_TTL = float(os.getenv("CHAT_RETRIEVAL_CACHE_TTL", 600))  # 秒
+    # 对话记忆：最近对话原文的token预算、早期对话摘要的token预算、对话状态的闲置过期时间
+    CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", 1500))
+    CHAT_SUMMARY_TOKEN_BUDGET = int(os.getenv("CHAT_SUMMARY_TOKEN_BUDGET", 400))
+    CHAT_MEMORY_TTL = float(os.getenv("CHAT_MEMORY_TTL", 7200))  # 秒
+    
     # 服务器配置
     HOST = os.getenv("HOST", "0.0.0.0")
     PORT = int(os.getenv("PORT", 8000))
@@ -35,10 +84,73 @@ class Config:
     
     # 数据文件路径
     DATA_FILE_PATH = "data/sentiment_data.csv"
+    # 文件数据源：上传文件解析后的本地存储目录、上传文件和本地存储的磁盘配额
+    FILE_SOURCE_DIR = os.getenv("FILE_SOURCE_DIR", "data/file_source")
+    FILE_SOURCE_DISK_QUOTA_MB = float(os.getenv("FILE_SOURCE_DISK_QUOTA_MB", 2048))
+    # API数据源批量拉取：并发请求的页数、每页失败重试次数、增量同步高水位的保存文件
+    API_SYNC_CONCURRENCY = int(os.getenv("API_SYNC_CONCURRENCY", 4))
+    API_SYNC_MAX_RETRIES = int(os.getenv("API_SYNC_MAX_RETRIES", 3))
+    API_SYNC_STATE_FILE = os.getenv("API_SYNC_STATE_FILE", "config/api_sync_state.json")
+    
+    # 持续采集分析（ingestion_daemon.py）：是否随应用启动、数据源（auto/database/api）、轮询间隔、
+    # 每批条数、批内并发数；积压达到阈值或延迟超过上限时按追赶并发处理，延迟超过上限时告警
+    INGEST_DAEMON_ENABLED = os.getenv("INGEST_DAEMON_ENABLED", "False").lower() == "true"
+    INGEST_SOURCE = os.getenv("INGEST_SOURCE", "auto")
+    INGEST_INTERVAL = float(os.getenv("INGEST_INTERVAL", 60))  # 秒
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 20))
+    INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", 2))
+    INGEST_CATCHUP_CONCURRENCY = int(os.getenv("INGEST_CATCHUP_CONCURRENCY", 8))
+    INGEST_BACKLOG_THRESHOLD = int(os.getenv("INGEST_BACKLOG_THRESHOLD", 200))
+    INGEST_MAX_LAG = float(os.getenv("INGEST_MAX_LAG", 1800))  # 秒，0 表示不告警
+    # inline 在API进程内分析 / queue 只写入任务队列，由 analysis_worker.py 的工作进程分析
+    INGEST_MODE = os.getenv("INGEST_MODE", "inline")
+    
+    # 分析任务队列（work_queue.py）和工作进程（analysis_worker.py）：队列数据库、租约时长（秒，超时未确认的任务重新可见）、
+    # 最多领取次数（超过后转入死信）、空闲时轮询间隔（秒）、默认工作进程数和每个进程的并发任务数
+    WORK_QUEUE_DB = os.getenv("WORK_QUEUE_DB", "data/work_queue.db")
+    WORK_QUEUE_VISIBILITY_TIMEOUT = float(os.getenv("WORK_QUEUE_VISIBILITY_TIMEOUT", 600))
+    WORK_QUEUE_MAX_ATTEMPTS = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", 5))
+    WORK_QUEUE_POLL_INTERVAL = float(os.getenv("WORK_QUEUE_POLL_INTERVAL", 2))
+    WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", 2))
+    WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", 4))
+    
+    # SimHash指纹计算进程池（fingerprint_service.py）：进程数（0 表示在当前进程内计算）、
+    # 每个任务的文本数、少于多少条时不使用进程池
+    SIMHASH_POOL_WORKERS = int(os.getenv("SIMHASH_POOL_WORKERS", min(4, os.cpu_count() or 1)))
+    SIMHASH_POOL_CHUNK_SIZE = int(os.getenv("SIMHASH_POOL_CHUNK_SIZE", 200))
+    SIMHASH_POOL_MIN_BATCH = int(os.getenv("SIMHASH_POOL_MIN_BATCH", 50))
+    
+    # jieba前缀词典序列化缓存文件（启动时从缓存加载，为空时使用jieba默认的临时目录）；
+    # 分词结果LRU缓存（每句一个条目）的最大条目数和估算内存上限（MB），任一为 0 时不缓存
+    JIEBA_CACHE_FILE = os.getenv("JIEBA_CACHE_FILE", "data/jieba.cache")
+    TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", 100000))
+    TOKEN_CACHE_MAX_MB = float(os.getenv("TOKEN_CACHE_MAX_MB", 64))
+    
+    # 路由模块默认在请求第一次命中时加载；为 true 时在启动预热阶段全部加载（常驻部署，不在意启动耗时）
+    PRELOAD_ROUTERS = os.getenv("PRELOAD_ROUTERS", "False").lower() == "true"
+    
+    # LLM后端（llm_backends.py）：dashscope 阿里云百炼 / mock 本地模拟服务（mock_llm_server.py，离线压测用）；
+    # 模拟服务地址；后端批量调用的默认并发数
+    LLM_BACKEND = os.getenv("LLM_BACKEND", "dashscope")
+    LLM_MOCK_BASE_URL = os.getenv("LLM_MOCK_BASE_URL", "http://127.0.0.1:8900/v1")
+    LLM_BATCH_CONCURRENCY = int(os.getenv("LLM_BATCH_CONCURRENCY", 8))
     
     # 分析配置
     MAX_CONTENT_LENGTH = 2000  # 最大内容长度
-    BATCH_SIZE = 100  # 批处理大小 
+    BATCH_SIZE = 100  # 批处理大小
+
+    # 标签预筛选：off 关闭 / shadow 影子模式（全部标签仍调用LLM，只统计预筛选的精确率和召回率）/
+    # enforce 生效（未命中规则的标签不调用LLM，直接判定为否）
+    TAG_PRESCREEN_MODE = os.getenv("TAG_PRESCREEN_MODE", "shadow")
+    # 自定义预筛选规则，覆盖内置规则: {"标签名": {"keywords": [...], "patterns": [...]}}
+    TAG_PRESCREEN_RULES = {}
+
+    # 分析计划策略：full 完整分析 / cascade 级联分析 / economy 节省模式，或 ANALYSIS_POLICIES 中的自定义策略
+    ANALYSIS_POLICY = os.getenv("ANALYSIS_POLICY", "full")
+    # 自定义分析策略，新增或覆盖内置策略:
+    # {"策略名": {"cascade": true, "skip_tags_levels": [...], "risk_score_threshold": 1,
+    #             "tag_scope": "all|prescreen", "skip_companies_levels": [...]}}
+    ANALYSIS_POLICIES = {}
 
     # 提示词模板配置（可在配置页修改）
     TAG_PROMPT_TEMPLATE = (
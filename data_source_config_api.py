@@ -6,13 +6,15 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends
 from fastapi.responses import JSONResponse
 from typing import Optional, Dict, Any, List
+import asyncio
 import json
 import tempfile
 import os
 import logging
 
 from unified_data_source_manager import UnifiedDataSourceManager, QueryParams
-from api_data_source_manager import APIConfig
+from api_data_source_manager import APIConfig, sync_state_store
+from config import Config
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +23,9 @@ router = APIRouter(prefix="/api/data-source", tags=["数据源配置"])
 # 全局数据源管理器实例
 data_source_manager = UnifiedDataSourceManager()
 
+# 上传文件每次读取的字节数
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 @router.get("/status")
 async def get_data_source_status():
     """获取当前数据源状态"""
@@ -86,20 +91,27 @@ async def upload_data_file(
     try:
         # 验证文件类型
         file_extension = file.filename.split('.')[-1].lower()
-        if file_extension not in ['csv', 'json']:
-            raise HTTPException(status_code=400, detail="只支持CSV和JSON文件")
-        
-        # 检查文件大小（10MB限制）
-        file_content = await file.read()
-        if len(file_content) > 10 * 1024 * 1024:  # 10MB
-            raise HTTPException(status_code=400, detail="文件大小不能超过10MB")
+        if file_extension not in ['csv', 'json', 'jsonl']:
+            raise HTTPException(status_code=400, detail="只支持CSV、JSON和JSON Lines文件")
         
-        # 保存临时文件
+        # 分块写入临时文件（不整体读入内存），超过磁盘配额时中止
+        quota = Config.FILE_SOURCE_DISK_QUOTA_MB * 1024 * 1024
         with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_extension}') as temp_file:
-            temp_file.write(file_content)
             temp_file_path = temp_file.name
         
         try:
+            file_size = 0
+            with open(temp_file_path, 'wb') as temp_file:
+                while True:
+                    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    file_size += len(chunk)
+                    if file_size > quota:
+                        raise HTTPException(status_code=400,
+                                            detail=f"文件大小不能超过{Config.FILE_SOURCE_DISK_QUOTA_MB:g}MB")
+                    temp_file.write(chunk)
+            
             # 解析字段映射
             mapping_dict = None
             if field_mapping:
@@ -108,12 +120,15 @@ async def upload_data_file(
                 except json.JSONDecodeError:
                     raise HTTPException(status_code=400, detail="字段映射格式错误")
             
-            # 配置文件数据源
-            result = data_source_manager.configure_file_source(
-                file_path=temp_file_path,
-                file_type=file_extension,
-                field_mapping=mapping_dict,
-                encoding=encoding
+            # 配置文件数据源（解析大文件耗时较长，在线程池中执行，不阻塞事件循环）
+            result = await asyncio.get_running_loop().run_in_executor(
+                None,
+                lambda: data_source_manager.configure_file_source(
+                    file_path=temp_file_path,
+                    file_type=file_extension,
+                    field_mapping=mapping_dict,
+                    encoding=encoding
+                )
             )
             
             if result['success']:
@@ -177,6 +192,37 @@ async def clear_file_data():
         logger.error(f"清除文件数据失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"清除文件数据失败: {str(e)}")
 
+@router.get("/api/sync-state")
+async def get_api_sync_state():
+    """查看API增量同步的高水位"""
+    try:
+        return JSONResponse(
+            status_code=200,
+            content={
+                "success": True,
+                "states": [{"key": key, **state} for key, state in sync_state_store.all().items()]
+            }
+        )
+    except Exception as e:
+        logger.error(f"获取同步状态失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取同步状态失败: {str(e)}")
+
+@router.delete("/api/sync-state")
+async def clear_api_sync_state(key: Optional[str] = None):
+    """清除API增量同步的高水位（不指定key时清除全部），下次同步重新全量拉取"""
+    try:
+        sync_state_store.clear(key)
+        return JSONResponse(
+            status_code=200,
+            content={
+                "success": True,
+                "message": "同步状态已清除"
+            }
+        )
+    except Exception as e:
+        logger.error(f"清除同步状态失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"清除同步状态失败: {str(e)}")
+
 @router.get("/fields/suggestions")
 async def get_field_suggestions():
     """获取字段映射建议"""
@@ -194,9 +240,8 @@ async def get_field_suggestions():
             }
         elif source_info['source_type'] == 'file' and source_info['status'] == 'configured':
             # 对于文件，分析实际数据字段
-            if data_source_manager.uploaded_data:
-                sample_item = data_source_manager.uploaded_data[0]
-                available_fields = list(sample_item.keys())
+            if data_source_manager.file_store and data_source_manager.file_store.fields:
+                available_fields = data_source_manager.file_store.fields
                 suggestions = {
                     "content": [f for f in available_fields if any(keyword in f.lower() for keyword in ['content', 'text', 'body', 'message'])],
                     "title": [f for f in available_fields if any(keyword in f.lower() for keyword in ['title', 'subject', 'headline', 'name'])],
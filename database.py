@@ -2,21 +2,68 @@
 # -*- coding: utf-8 -*-
 
 import sqlite3
-import pandas as pd
+import csv
+import io
 import os
-from typing import List, Dict, Optional, Any
+import threading
+import time
+from operator import itemgetter
+from typing import Callable, List, Dict, Optional, Any
 from datetime import datetime
 import logging
+from pagination import (INVALID_CURSOR, InvalidCursorError, build_page, count_rows, decode_cursor, keyset_condition,
+                        total_pages)
+from stats_rollup import (DAY_EXPR, add_rollups, dimension, drop_rollup_triggers, install_rollup_triggers,
+                          read_rollup, read_rollup_total, rebuild_rollups, whole_day_range)
 
 logger = logging.getLogger(__name__)
 
+# 统计汇总维度，由 sentiment_data 上的触发器增量维护
+SENTIMENT_ROLLUP_DIMENSIONS = [
+    dimension('total', "''"),
+    dimension('sentiment', "IFNULL({r}.sentiment_level, '')", day=DAY_EXPR),
+    dimension('industry', "IFNULL({r}.industry, '')"),
+    dimension('company', "IFNULL({r}.company_name, '')"),
+    dimension('source', "IFNULL({r}.source, '')"),
+]
+SENTIMENT_ROLLUP_COLUMNS = ['sentiment_level', 'publish_time', 'industry', 'company_name', 'source']
+
+# CSV导入的列映射：表字段 -> 可接受的列名（按优先级）
+CSV_COLUMN_ALIASES = [
+    ('title', ['标题', 'title']),
+    ('content', ['内容', 'content']),
+    ('source', ['来源', 'source']),
+    ('publish_time', ['发布时间', 'publish_time']),
+    ('company_name', ['公司名称', 'company_name']),
+    ('industry', ['行业', 'industry']),
+    ('sentiment_level', ['情感等级', 'sentiment_level']),
+    ('risk_tags', ['风险标签', 'risk_tags']),
+    ('analysis_reason', ['分析原因', 'analysis_reason']),
+]
+# 导入文件超过该大小、且估计导入行数不少于表中已有行数的 DEFER_INDEX_MIN_RATIO 倍时（实测约 0.2 倍以上时更快），
+# 导入期间删除索引和汇总触发器，导入完成后一次性重建索引并补计导入行的汇总数据
+# （重建索引要扫描整张表，已有数据远多于导入数据时逐行维护索引更快）
+DEFER_INDEX_MIN_BYTES = 20 * 1024 * 1024
+DEFER_INDEX_MIN_RATIO = 0.2
+# 估计CSV行数时读取的文件开头字节数
+CSV_SAMPLE_BYTES = 1024 * 1024
+
+# 本进程中已完成表结构初始化的数据库文件（构造函数在每个请求中调用，初始化只需执行一次）
+_initialized_paths = set()
+_init_lock = threading.Lock()
+
 class DatabaseManager:
     """数据库管理器，负责舆情数据的存储和查询"""
     
     def __init__(self, db_path: str = "data/sentiment_analysis.db"):
         self.db_path = db_path
         self.ensure_db_directory()
-        self.init_database()
+        
+        path_key = os.path.abspath(db_path)
+        with _init_lock:
+            if path_key not in _initialized_paths or not os.path.exists(db_path):
+                self.init_database()
+                _initialized_paths.add(path_key)
     
     def ensure_db_directory(self):
         """确保数据库目录存在"""
@@ -46,6 +93,16 @@ class DatabaseManager:
                     )
                 ''')
                 
+                # 其他进程正在进行延迟索引的批量导入时，索引和触发器由导入结束时统一重建
+                import_running = self._deferred_import_running(cursor)
+                
+                # keyset分页和时间范围查询使用的索引
+                if not import_running:
+                    cursor.execute('''
+                        CREATE INDEX IF NOT EXISTS idx_sentiment_data_publish_time
+                        ON sentiment_data (IFNULL(publish_time, ''), id)
+                    ''')
+                
                 # 创建字段配置表
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS field_config (
@@ -81,6 +138,12 @@ class DatabaseManager:
                         VALUES (?, ?, ?, ?, ?, ?, ?)
                     ''', field)
                 
+                # 统计汇总表触发器，首次安装时从头计算
+                if not import_running and install_rollup_triggers(cursor, 'sentiment_data',
+                                                                  SENTIMENT_ROLLUP_DIMENSIONS,
+                                                                  SENTIMENT_ROLLUP_COLUMNS):
+                    rebuild_rollups(cursor, 'sentiment_data', SENTIMENT_ROLLUP_DIMENSIONS)
+                
                 conn.commit()
                 logger.info("数据库初始化完成")
                 
@@ -88,70 +151,100 @@ class DatabaseManager:
             logger.error(f"数据库初始化失败: {str(e)}")
             raise
     
-    def import_csv_data(self, csv_path: str, chunk_size: int = 1000) -> Dict[str, Any]:
-        """导入CSV数据到数据库"""
+    def import_csv_data(self, csv_path: str, chunk_size: int = 5000,
+                        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                        defer_indexes: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        流式导入CSV数据到数据库
+
+        逐行读取（内存占用与文件大小无关），列映射只在读取表头时计算一次，
+        每 chunk_size 行在一个事务中用 executemany 批量插入。
+
+        Args:
+            chunk_size: 每个事务插入的行数
+            progress_callback: 每提交一批后调用，参数为
+                {'processed', 'imported', 'skipped', 'bytes_read', 'total_bytes', 'rows_per_second'}
+            defer_indexes: 导入期间是否删除时间索引和汇总触发器、导入后一次性重建；
+                为空时按文件大小和表中已有行数自动决定（见 DEFER_INDEX_MIN_BYTES / DEFER_INDEX_MIN_RATIO）
+        """
         try:
             if not os.path.exists(csv_path):
                 raise FileNotFoundError(f"CSV文件不存在: {csv_path}")
             
-            # 读取CSV文件
-            df = pd.read_csv(csv_path, encoding='utf-8')
-            logger.info(f"CSV文件读取成功，共{len(df)}行数据")
-            
-            # 标准化列名
-            df.columns = [col.strip() for col in df.columns]
+            total_bytes = os.path.getsize(csv_path)
             
-            # 处理数据并插入数据库
-            total_imported = 0
-            total_skipped = 0
+            started = time.time()
+            stats = {'processed': 0, 'imported': 0, 'skipped': 0}
             
-            with sqlite3.connect(self.db_path) as conn:
-                for i in range(0, len(df), chunk_size):
-                    chunk = df.iloc[i:i+chunk_size]
-                    
-                    for _, row in chunk.iterrows():
-                        try:
-                            # 准备数据
-                            data = {
-                                'title': str(row.get('标题', row.get('title', ''))),
-                                'content': str(row.get('内容', row.get('content', ''))),
-                                'source': str(row.get('来源', row.get('source', ''))),
-                                'publish_time': str(row.get('发布时间', row.get('publish_time', ''))),
-                                'company_name': str(row.get('公司名称', row.get('company_name', ''))),
-                                'industry': str(row.get('行业', row.get('industry', ''))),
-                                'sentiment_level': str(row.get('情感等级', row.get('sentiment_level', ''))),
-                                'risk_tags': str(row.get('风险标签', row.get('risk_tags', ''))),
-                                'analysis_reason': str(row.get('分析原因', row.get('analysis_reason', '')))
-                            }
-                            
-                            # 插入数据
-                            cursor = conn.cursor()
-                            cursor.execute('''
-                                INSERT INTO sentiment_data 
-                                (title, content, source, publish_time, company_name, industry, sentiment_level, risk_tags, analysis_reason)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            ''', (
-                                data['title'], data['content'], data['source'], data['publish_time'],
-                                data['company_name'], data['industry'], data['sentiment_level'], 
-                                data['risk_tags'], data['analysis_reason']
-                            ))
-                            
-                            total_imported += 1
-                            
-                        except Exception as e:
-                            logger.warning(f"跳过行数据: {str(e)}")
-                            total_skipped += 1
-                            continue
-                    
+            with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f, \
+                    sqlite3.connect(self.db_path) as conn:
+                reader = csv.reader(f)
+                header = [col.strip() for col in next(reader, [])]
+                width = len(header)
+                if not width:
+                    raise ValueError("CSV文件缺少表头")
+                
+                # 列映射只计算一次：缺失的列指向每行末尾追加的空字符串
+                indexes = []
+                for _, aliases in CSV_COLUMN_ALIASES:
+                    index = next((header.index(alias) for alias in aliases if alias in header), width)
+                    indexes.append(index)
+                get_values = itemgetter(*indexes)
+                mapping = {field: header[index] for (field, _), index in zip(CSV_COLUMN_ALIASES, indexes) if index < width}
+                logger.info(f"CSV列映射: {mapping}")
+                
+                def report():
+                    if progress_callback:
+                        elapsed = max(time.time() - started, 1e-6)
+                        progress_callback({
+                            **stats,
+                            'bytes_read': min(f.buffer.tell(), total_bytes),
+                            'total_bytes': total_bytes,
+                            'rows_per_second': round(stats['processed'] / elapsed)
+                        })
+                
+                cursor = conn.cursor()
+                if defer_indexes is None:
+                    defer_indexes = self._should_defer_indexes(cursor, csv_path, total_bytes)
+                if defer_indexes:
+                    after_id = self._drop_import_indexes(cursor)
                     conn.commit()
-                    logger.info(f"已处理 {i+len(chunk)}/{len(df)} 行数据")
+                
+                try:
+                    batch = []
+                    for row in reader:
+                        stats['processed'] += 1
+                        if not any(row):
+                            stats['skipped'] += 1
+                            continue
+                        if len(row) != width:
+                            row = (row + [''] * width)[:width]
+                        row.append('')
+                        batch.append(get_values(row))
+                        
+                        if len(batch) >= chunk_size:
+                            self._insert_import_batch(conn, batch, stats)
+                            batch = []
+                            report()
+                    if batch:
+                        self._insert_import_batch(conn, batch, stats)
+                    report()
+                finally:
+                    if defer_indexes:
+                        logger.info("正在重建索引和统计汇总表...")
+                        self._restore_import_indexes(cursor, after_id)
+                        conn.commit()
             
+            elapsed = time.time() - started
+            logger.info(f"CSV导入完成: {stats['processed']} 行，耗时 {elapsed:.1f} 秒"
+                        f"（{stats['processed'] / max(elapsed, 1e-6):.0f} 行/秒）")
             return {
                 'success': True,
-                'total_rows': len(df),
-                'imported': total_imported,
-                'skipped': total_skipped,
-                'message': f"数据导入完成，成功导入{total_imported}条，跳过{total_skipped}条"
+                'total_rows': stats['processed'],
+                'imported': stats['imported'],
+                'skipped': stats['skipped'],
+                'elapsed': round(elapsed, 2),
+                'message': f"数据导入完成，成功导入{stats['imported']}条，跳过{stats['skipped']}条"
             }
             
         except Exception as e:
@@ -162,6 +255,100 @@ class DatabaseManager:
                 'message': f"数据导入失败: {str(e)}"
             }
     
+    def _insert_import_batch(self, conn, batch: List[tuple], stats: Dict[str, int]):
+        """在一个事务中插入一批导入数据；整批失败时逐行重试，跳过出错的行"""
+        insert_sql = f'''
+            INSERT INTO sentiment_data ({', '.join(field for field, _ in CSV_COLUMN_ALIASES)})
+            VALUES ({', '.join(['?'] * len(CSV_COLUMN_ALIASES))})
+        '''
+        try:
+            conn.executemany(insert_sql, batch)
+            conn.commit()
+            stats['imported'] += len(batch)
+            return
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.warning(f"批量插入失败，逐行重试: {str(e)}")
+        
+        for values in batch:
+            try:
+                conn.execute(insert_sql, values)
+                stats['imported'] += 1
+            except sqlite3.Error as e:
+                logger.warning(f"跳过行数据: {str(e)}")
+                stats['skipped'] += 1
+        conn.commit()
+    
+    def _should_defer_indexes(self, cursor, csv_path: str, total_bytes: int) -> bool:
+        """按文件大小和估计导入行数与表中已有行数的比例，决定导入期间是否删除索引和汇总触发器"""
+        if total_bytes < DEFER_INDEX_MIN_BYTES:
+            return False
+        
+        # 按文件开头的样本估计行数（内容中的换行在引号内，按CSV解析计数）
+        with open(csv_path, 'rb') as f:
+            sample = f.read(CSV_SAMPLE_BYTES)
+        sample_rows = sum(1 for _ in csv.reader(io.StringIO(sample.decode('utf-8', errors='ignore')))) - 1
+        estimated_rows = total_bytes * max(sample_rows, 1) // max(len(sample), 1)
+        # 汇总表的 total 维度即表中行数，无需全表计数
+        existing_rows = read_rollup_total(cursor, 'total')
+        defer = estimated_rows >= existing_rows * DEFER_INDEX_MIN_RATIO
+        logger.info(f"估计导入 {estimated_rows} 行，表中已有 {existing_rows} 行，"
+                    f"{'导入期间删除索引和汇总触发器' if defer else '导入期间保留索引和汇总触发器'}")
+        return defer
+    
+    def _deferred_import_running(self, cursor) -> bool:
+        """是否有存活的进程正在进行延迟索引的批量导入（导入进程异常退出时清除遗留标记）"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS import_state (
+                name TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
+        cursor.execute("SELECT value FROM import_state WHERE name = 'deferred_import_pid'")
+        row = cursor.fetchone()
+        if not row:
+            return False
+        
+        try:
+            os.kill(int(row[0]), 0)
+            return True
+        except PermissionError:
+            return True
+        except (OSError, ValueError):
+            logger.warning(f"批量导入进程 {row[0]} 已退出，重建时间索引和汇总触发器")
+            cursor.execute("DELETE FROM import_state WHERE name = 'deferred_import_pid'")
+            return False
+    
+    def _drop_import_indexes(self, cursor) -> int:
+        """
+        批量导入前删除时间索引和汇总触发器，并记录导入标记防止其他连接在导入期间重建
+
+        Returns:
+            导入前的最大ID，导入后只补计此后插入的行
+        """
+        self._deferred_import_running(cursor)
+        cursor.execute(
+            "INSERT OR REPLACE INTO import_state (name, value) VALUES ('deferred_import_pid', ?)",
+            (str(os.getpid()),)
+        )
+        cursor.execute('DROP INDEX IF EXISTS idx_sentiment_data_publish_time')
+        drop_rollup_triggers(cursor, 'sentiment_data')
+        cursor.execute('SELECT IFNULL(MAX(id), 0) FROM sentiment_data')
+        return cursor.fetchone()[0]
+    
+    def _restore_import_indexes(self, cursor, after_id: int):
+        """
+        批量导入后重建时间索引，重新安装汇总触发器，只把ID大于 after_id 的行（导入期间插入的行）计入汇总数据，
+        清除导入标记。导入期间对已有行的修改和删除不会计入，需要时用 stats_rollup.py 从头重建
+        """
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_sentiment_data_publish_time
+            ON sentiment_data (IFNULL(publish_time, ''), id)
+        ''')
+        install_rollup_triggers(cursor, 'sentiment_data', SENTIMENT_ROLLUP_DIMENSIONS, SENTIMENT_ROLLUP_COLUMNS)
+        add_rollups(cursor, 'sentiment_data', SENTIMENT_ROLLUP_DIMENSIONS, after_id)
+        cursor.execute("DELETE FROM import_state WHERE name = 'deferred_import_pid'")
+    
     def get_data(self, 
                  fields: Optional[List[str]] = None,
                  filters: Optional[Dict[str, Any]] = None,
@@ -169,40 +356,43 @@ class DatabaseManager:
                  page: int = 1,
                  page_size: int = 50,
                  sort_by: str = 'publish_time',
-                 sort_order: str = 'DESC') -> Dict[str, Any]:
-        """查询数据"""
+                 sort_order: str = 'DESC',
+                 cursor: Optional[str] = None,
+                 count: str = 'exact') -> Dict[str, Any]:
+        """
+        查询数据
+
+        传入 cursor 时使用 (sort_by, id) 上的 keyset 分页，忽略 page；
+        count 控制计数方式: exact 精确 / approx 近似 / none 不计数。
+        游标无效或与排序方式不匹配时返回 error_code 为 INVALID_CURSOR 的失败结果。
+        """
         try:
+            direction = 'next'
+            cursor_key = None
+
             with sqlite3.connect(self.db_path) as conn:
+                db_cursor = conn.cursor()
+
                 # 构建查询字段
                 if fields is None:
                     fields = ['*']
                 
                 field_str = ', '.join(fields)
                 
+                # 校验排序字段，避免拼接任意SQL
+                db_cursor.execute("PRAGMA table_info(sentiment_data)")
+                columns = [col[1] for col in db_cursor.fetchall()]
+                if sort_by not in columns:
+                    sort_by = 'publish_time'
+                sort_order = 'ASC' if sort_order.upper() == 'ASC' else 'DESC'
+                sort = f"{sort_by} {sort_order}"
+                
+                # 解析分页游标（必须由相同排序方式的查询生成）
+                if cursor:
+                    cursor_key, direction = decode_cursor(cursor, sort)
+                
                 # 构建WHERE子句
-                where_conditions = []
-                params = []
-                
-                if filters:
-                    for field, value in filters.items():
-                        if isinstance(value, dict) and 'start' in value and 'end' in value:
-                            # 时间范围过滤 - 统一处理，精确到分钟（与get_data_count保持一致）
-                            start_time = self._normalize_time_format(value['start'])
-                            end_time = self._normalize_time_format(value['end'])
-                            
-                            # 使用BETWEEN查询，确保时间范围完全匹配
-                            where_conditions.append(f"{field} BETWEEN ? AND ?")
-                            params.extend([start_time, end_time])
-                            
-                            # 记录时间范围查询参数，用于调试
-                            logger.debug(f"get_data时间范围查询: {field} BETWEEN '{start_time}' AND '{end_time}'")
-                        elif isinstance(value, (list, tuple)):
-                            placeholders = ','.join(['?' for _ in value])
-                            where_conditions.append(f"{field} IN ({placeholders})")
-                            params.extend(value)
-                        else:
-                            where_conditions.append(f"{field} = ?")
-                            params.append(value)
+                where_conditions, params = self._build_filter_conditions(filters)
                 
                 if search:
                     search_fields = ['title', 'content', 'company_name', 'industry']
@@ -216,50 +406,64 @@ class DatabaseManager:
                 if where_conditions:
                     where_clause = "WHERE " + " AND ".join(where_conditions)
                 
-                # 构建排序
-                order_clause = f"ORDER BY {sort_by} {sort_order.upper()}"
-                
-                # 构建分页
-                offset = (page - 1) * page_size
-                limit_clause = f"LIMIT {page_size} OFFSET {offset}"
+                # 获取总记录数
+                total_count, total_exact = count_rows(db_cursor, 'sentiment_data', where_clause, params, count)
+                
+                # 排序键: NULL 统一视为空字符串，保证游标比较与排序一致
+                sort_key = f"IFNULL({sort_by}, '')"
+                query_order = sort_order
+                query_params = list(params)
+                page_where = where_clause
+                if cursor_key is not None:
+                    condition, keyset_params, query_order = keyset_condition(
+                        [sort_key, 'id'], cursor_key, sort_order, direction
+                    )
+                    page_where = f"{where_clause} AND {condition}" if where_clause else f"WHERE {condition}"
+                    query_params += keyset_params
+                    limit_clause = f"LIMIT {page_size + 1}"
+                else:
+                    offset = (page - 1) * page_size
+                    limit_clause = f"LIMIT {page_size + 1} OFFSET {offset}"
                 
-                # 执行查询
+                # 执行查询，末尾附带排序键和id用于生成游标
                 query = f"""
-                    SELECT {field_str} FROM sentiment_data 
-                    {where_clause} 
-                    {order_clause} 
+                    SELECT {field_str}, {sort_key}, id FROM sentiment_data 
+                    {page_where} 
+                    ORDER BY {sort_key} {query_order}, id {query_order} 
                     {limit_clause}
                 """
                 
-                cursor = conn.cursor()
-                cursor.execute(query, params)
-                rows = cursor.fetchall()
-                
-                # 获取总记录数
-                count_query = f"""
-                    SELECT COUNT(*) FROM sentiment_data {where_clause}
-                """
-                cursor.execute(count_query, params)
-                total_count = cursor.fetchone()[0]
+                db_cursor.execute(query, query_params)
+                result_columns = [description[0] for description in db_cursor.description][:-2]
+                rows, page_info = build_page(
+                    db_cursor.fetchall(), page_size, lambda row: list(row[-2:]), direction,
+                    has_previous=cursor_key is not None or page > 1, sort=sort
+                )
                 
                 # 格式化结果
                 if fields == ['*']:
-                    # 获取列名
-                    cursor.execute("PRAGMA table_info(sentiment_data)")
-                    columns = [col[1] for col in cursor.fetchall()]
-                    result = [dict(zip(columns, row)) for row in rows]
+                    result = [dict(zip(result_columns, row[:-2])) for row in rows]
                 else:
-                    result = [dict(zip(fields, row)) for row in rows]
+                    result = [dict(zip(fields, row[:-2])) for row in rows]
                 
                 return {
                     'success': True,
                     'data': result,
                     'total': total_count,
+                    'total_exact': total_exact,
                     'page': page,
                     'page_size': page_size,
-                    'total_pages': (total_count + page_size - 1) // page_size
+                    'total_pages': total_pages(total_count, page_size),
+                    **page_info
                 }
                 
+        except InvalidCursorError as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'error_code': INVALID_CURSOR,
+                'message': str(e)
+            }
         except Exception as e:
             logger.error(f"数据查询失败: {str(e)}")
             return {
@@ -268,6 +472,35 @@ class DatabaseManager:
                 'message': f"数据查询失败: {str(e)}"
             }
     
+    def _build_filter_conditions(self, filters: Optional[Dict[str, Any]]):
+        """构建过滤条件，返回 (条件列表, 参数列表)"""
+        where_conditions = []
+        params = []
+        
+        if filters:
+            for field, value in filters.items():
+                if isinstance(value, dict) and 'start' in value and 'end' in value:
+                    # 时间范围过滤 - 统一处理，精确到分钟
+                    start_time = self._normalize_time_format(value['start'])
+                    end_time = self._normalize_time_format(value['end'])
+                    
+                    # 使用BETWEEN查询，确保时间范围完全匹配
+                    # 注意：BETWEEN是包含边界的，所以这里的时间范围是 [start_time, end_time]
+                    where_conditions.append(f"{field} BETWEEN ? AND ?")
+                    params.extend([start_time, end_time])
+                    
+                    # 记录时间范围查询参数，用于调试
+                    logger.debug(f"时间范围查询: {field} BETWEEN '{start_time}' AND '{end_time}'")
+                elif isinstance(value, (list, tuple)):
+                    placeholders = ','.join(['?' for _ in value])
+                    where_conditions.append(f"{field} IN ({placeholders})")
+                    params.extend(value)
+                else:
+                    where_conditions.append(f"{field} = ?")
+                    params.append(value)
+        
+        return where_conditions, params
+    
     def get_data_count(self, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """查询数据量，使用统一的时间范围处理"""
         try:
@@ -275,30 +508,7 @@ class DatabaseManager:
                 cursor = conn.cursor()
                 
                 # 构建WHERE子句
-                where_conditions = []
-                params = []
-                
-                if filters:
-                    for field, value in filters.items():
-                        if isinstance(value, dict) and 'start' in value and 'end' in value:
-                            # 时间范围过滤 - 统一处理，精确到分钟
-                            start_time = self._normalize_time_format(value['start'])
-                            end_time = self._normalize_time_format(value['end'])
-                            
-                            # 使用BETWEEN查询，确保时间范围完全匹配
-                            # 注意：BETWEEN是包含边界的，所以这里的时间范围是 [start_time, end_time]
-                            where_conditions.append(f"{field} BETWEEN ? AND ?")
-                            params.extend([start_time, end_time])
-                            
-                            # 记录时间范围查询参数，用于调试
-                            logger.debug(f"时间范围查询: {field} BETWEEN '{start_time}' AND '{end_time}'")
-                        elif isinstance(value, (list, tuple)):
-                            placeholders = ','.join(['?' for _ in value])
-                            where_conditions.append(f"{field} IN ({placeholders})")
-                            params.extend(value)
-                        else:
-                            where_conditions.append(f"{field} = ?")
-                            params.append(value)
+                where_conditions, params = self._build_filter_conditions(filters)
                 
                 where_clause = ""
                 if where_conditions:
@@ -325,6 +535,65 @@ class DatabaseManager:
                 'message': f"数据量查询失败: {str(e)}"
             }
     
+    def get_rows_after(self, after_id: int = 0, limit: int = 100) -> Dict[str, Any]:
+        """
+        按 id 顺序读取 id 大于 after_id 的数据（持续采集按水位读取新数据）
+
+        Returns:
+            {'success', 'data', 'remaining': 本批之后仍未读取的行数}
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.row_factory = sqlite3.Row
+                cursor = conn.cursor()
+                cursor.execute('SELECT * FROM sentiment_data WHERE id > ? ORDER BY id LIMIT ?', (after_id, limit))
+                rows = [dict(row) for row in cursor.fetchall()]
+
+                last_id = rows[-1]['id'] if rows else after_id
+                cursor.execute('SELECT COUNT(*) FROM sentiment_data WHERE id > ?', (last_id,))
+                remaining = cursor.fetchone()[0]
+
+                return {
+                    'success': True,
+                    'data': rows,
+                    'remaining': remaining
+                }
+
+        except Exception as e:
+            logger.error(f"读取新数据失败: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"读取新数据失败: {str(e)}"
+            }
+
+    def get_ids_after(self, after_id: int = 0, limit: int = 1000,
+                      filters: Optional[Dict[str, Any]] = None) -> List[int]:
+        """按 id 顺序读取 id 大于 after_id 且满足过滤条件的 id（按主键范围扫描，批量入队时逐批调用）"""
+        where_conditions, params = self._build_filter_conditions(filters)
+        where_conditions.insert(0, 'id > ?')
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT id FROM sentiment_data WHERE {' AND '.join(where_conditions)} ORDER BY id LIMIT ?",
+                [after_id] + params + [limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def get_rows_by_ids(self, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """按 id 批量读取数据，返回 {id: 行}（不存在的 id 不出现在结果中）"""
+        if not ids:
+            return {}
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.row_factory = sqlite3.Row
+                placeholders = ','.join('?' * len(ids))
+                rows = conn.execute(f'SELECT * FROM sentiment_data WHERE id IN ({placeholders})', list(ids)).fetchall()
+                return {row['id']: dict(row) for row in rows}
+        except Exception as e:
+            logger.error(f"按ID读取数据失败: {str(e)}")
+            return {}
+
     def _normalize_time_format(self, time_str: str) -> str:
         """标准化时间格式，将ISO格式转换为数据库格式，精确到分钟"""
         try:
@@ -451,40 +720,11 @@ class DatabaseManager:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 
-                # 总记录数
-                cursor.execute("SELECT COUNT(*) FROM sentiment_data")
-                total_records = cursor.fetchone()[0]
-                
-                # 情感等级分布
-                cursor.execute("""
-                    SELECT sentiment_level, COUNT(*) as count 
-                    FROM sentiment_data 
-                    WHERE sentiment_level IS NOT NULL AND sentiment_level != ''
-                    GROUP BY sentiment_level
-                """)
-                sentiment_distribution = dict(cursor.fetchall())
-                
-                # 行业分布
-                cursor.execute("""
-                    SELECT industry, COUNT(*) as count 
-                    FROM sentiment_data 
-                    WHERE industry IS NOT NULL AND industry != ''
-                    GROUP BY industry
-                    ORDER BY count DESC
-                    LIMIT 10
-                """)
-                industry_distribution = dict(cursor.fetchall())
-                
-                # 公司分布
-                cursor.execute("""
-                    SELECT company_name, COUNT(*) as count 
-                    FROM sentiment_data 
-                    WHERE company_name IS NOT NULL AND company_name != ''
-                    GROUP BY company_name
-                    ORDER BY count DESC
-                    LIMIT 10
-                """)
-                company_distribution = dict(cursor.fetchall())
+                # 所有计数从统计汇总表读取
+                total_records = read_rollup_total(cursor, 'total')
+                sentiment_distribution = read_rollup(cursor, 'sentiment')
+                industry_distribution = read_rollup(cursor, 'industry', limit=10)
+                company_distribution = read_rollup(cursor, 'company', limit=10)
                 
                 return {
                     'success': True,
@@ -541,28 +781,29 @@ class DatabaseManager:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 
-                date_filter = ""
-                params = []
-                if start_date and end_date:
+                if not (start_date and end_date):
+                    total_records = read_rollup_total(cursor, 'total')
+                    sentiment_distribution = read_rollup(cursor, 'sentiment', skip_empty=False)
+                elif whole_day_range(start_date, end_date):
+                    # 按整天对齐的时间范围直接汇总按日计数
+                    start_day, end_day = whole_day_range(start_date, end_date)
+                    sentiment_distribution = read_rollup(cursor, 'sentiment', start_day, end_day, skip_empty=False)
+                    total_records = sum(sentiment_distribution.values())
+                else:
                     date_filter = "WHERE publish_time BETWEEN ? AND ?"
                     params = [start_date, end_date]
-                
-                # 获取情感等级分布
-                cursor.execute(f'''
-                    SELECT sentiment_level, COUNT(*) as count
-                    FROM sentiment_data
-                    {date_filter}
-                    GROUP BY sentiment_level
-                    ORDER BY count DESC
-                ''', params)
-                
-                sentiment_distribution = dict(cursor.fetchall())
-                
-                # 获取总记录数
-                cursor.execute(f'''
-                    SELECT COUNT(*) FROM sentiment_data {date_filter}
-                ''', params)
-                total_records = cursor.fetchone()[0]
+                    
+                    # 获取情感等级分布
+                    cursor.execute(f'''
+                        SELECT sentiment_level, COUNT(*) as count
+                        FROM sentiment_data
+                        {date_filter}
+                        GROUP BY sentiment_level
+                        ORDER BY count DESC
+                    ''', params)
+                    
+                    sentiment_distribution = dict(cursor.fetchall())
+                    total_records = sum(sentiment_distribution.values())
                 
                 return {
                     'total_records': total_records,
@@ -573,6 +814,29 @@ class DatabaseManager:
             logger.error(f"获取情感分析统计失败: {str(e)}")
             return {}
     
+    def rebuild_rollups(self) -> Dict[str, Any]:
+        """从头重新计算统计汇总表"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                rebuild_rollups(cursor, 'sentiment_data', SENTIMENT_ROLLUP_DIMENSIONS)
+                conn.commit()
+                total = read_rollup_total(cursor, 'total')
+            
+            logger.info(f"统计汇总表重建完成，共{total}条记录")
+            return {
+                'success': True,
+                'message': f"统计汇总表重建完成，共{total}条记录"
+            }
+            
+        except Exception as e:
+            logger.error(f"重建统计汇总表失败: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"重建统计汇总表失败: {str(e)}"
+            }
+    
     def cleanup_old_records(self, days_to_keep: int = 90) -> int:
         """清理旧的舆情记录"""
         try:
@@ -7,9 +7,13 @@
 """
 
 from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Optional, Any
 from pydantic import BaseModel
 from database_manager import UnifiedDatabaseManager
+from pagination import INVALID_CURSOR
+import asyncio
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -53,6 +57,10 @@ class DataResponse(BaseModel):
     page: Optional[int] = None
     page_size: Optional[int] = None
     total_pages: Optional[int] = None
+    total_exact: Optional[bool] = None
+    has_more: Optional[bool] = None
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
     message: Optional[str] = None
     error: Optional[str] = None
 
@@ -90,6 +98,8 @@ async def get_data(
     page_size: int = Query(50, ge=1, le=1000, description="每页大小"),
     sort_by: str = Query('publish_time', description="排序字段"),
     sort_order: str = Query('DESC', description="排序方向"),
+    cursor: Optional[str] = Query(None, description="分页游标，传入时忽略页码"),
+    count: str = Query('exact', regex="^(exact|approx|none)$", description="计数方式"),
     db_manager: UnifiedDatabaseManager = Depends(get_db_manager)
 ):
     """查询舆情数据"""
@@ -119,14 +129,20 @@ async def get_data(
             page=page,
             page_size=page_size,
             sort_by=sort_by,
-            sort_order=sort_order
+            sort_order=sort_order,
+            cursor=cursor,
+            count=count
         )
         
         if result['success']:
             return DataResponse(**result)
+        elif result.get('error_code') == INVALID_CURSOR:
+            raise HTTPException(status_code=400, detail=result['message'])
         else:
             raise HTTPException(status_code=500, detail=result['message'])
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"查询数据失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"查询数据失败: {str(e)}")
@@ -190,6 +206,25 @@ async def get_statistics(
         logger.error(f"获取统计信息失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取统计信息失败: {str(e)}")
 
+@router.post("/statistics/rebuild")
+async def rebuild_statistics(
+    db_manager: UnifiedDatabaseManager = Depends(get_db_manager)
+):
+    """从头重建统计汇总表"""
+    try:
+        result = db_manager.rebuild_rollups()
+        
+        if result['success']:
+            return result
+        else:
+            raise HTTPException(status_code=500, detail=f"{result['sentiment_database']}; {result['result_database']}")
+            
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"重建统计汇总表失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"重建统计汇总表失败: {str(e)}")
+
 @router.get("/data-count", response_model=DataCountResponse)
 async def get_data_count(
     time_field: str = Query(..., description="时间字段名"),
@@ -229,7 +264,7 @@ async def get_data_count(
 @router.post("/import", response_model=DataResponse)
 async def import_csv_data(
     csv_path: str,
-    chunk_size: int = Query(1000, ge=100, le=10000, description="批处理大小"),
+    chunk_size: int = Query(5000, ge=100, le=50000, description="批处理大小"),
     db_manager: UnifiedDatabaseManager = Depends(get_db_manager)
 ):
     """导入CSV数据"""
@@ -251,6 +286,47 @@ async def import_csv_data(
         logger.error(f"导入CSV数据失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"导入CSV数据失败: {str(e)}")
 
+@router.post("/import/stream")
+async def import_csv_data_stream(
+    csv_path: str,
+    chunk_size: int = Query(5000, ge=100, le=50000, description="批处理大小"),
+    db_manager: UnifiedDatabaseManager = Depends(get_db_manager)
+):
+    """
+    导入CSV数据并通过SSE推送进度
+    事件：progress（已处理行数、字节数、速度）、complete（导入结果）
+    """
+    sentiment_db = db_manager.get_sentiment_database()
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    def on_progress(progress: Dict[str, Any]):
+        loop.call_soon_threadsafe(queue.put_nowait, {'type': 'progress', **progress})
+    
+    def run_import():
+        result = sentiment_db.import_csv_data(csv_path, chunk_size, progress_callback=on_progress)
+        loop.call_soon_threadsafe(queue.put_nowait, {'type': 'complete', **result})
+    
+    # 导入在线程池中执行，不阻塞事件循环
+    loop.run_in_executor(None, run_import)
+    
+    async def generate_stream():
+        while True:
+            event = await queue.get()
+            yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+            if event['type'] == 'complete':
+                break
+    
+    return StreamingResponse(
+        generate_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @router.get("/time-range", response_model=TimeRangeResponse)
 async def get_time_range(
     db_manager: UnifiedDatabaseManager = Depends(get_db_manager)
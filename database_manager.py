@@ -250,6 +250,16 @@ class UnifiedDatabaseManager:
             logger.error(f"获取综合统计失败: {str(e)}")
             return {}
     
+    def rebuild_rollups(self) -> Dict[str, Any]:
+        """从头重建两个数据库的统计汇总表"""
+        sentiment_result = self.sentiment_db.rebuild_rollups()
+        result_result = self.result_db.rebuild_rollups()
+        return {
+            "success": sentiment_result.get('success', False) and result_result.get('success', False),
+            "sentiment_database": sentiment_result.get('message'),
+            "result_database": result_result.get('message')
+        }
+    
     def validate_database_integrity(self) -> Dict[str, Any]:
         """验证数据库完整性"""
         try:
@@ -369,7 +369,7 @@ def auto_export_after_dedup():
         result_db = ResultDatabase(db_path)
         
         # 获取所有记录
-        all_results = result_db.get_analysis_results(page=1, page_size=10000)
+        all_results = result_db.get_analysis_results(page=1, page_size=10000, include_reasons=True)
         
         if not all_results['success']:
             return {
@@ -450,7 +450,7 @@ def enhanced_export_data(export_format='json', include_metadata=True, filter_tag
         result_db = ResultDatabase(db_path)
         
         # 获取所有记录
-        all_results = result_db.get_analysis_results(page=1, page_size=10000)
+        all_results = result_db.get_analysis_results(page=1, page_size=10000, include_reasons=True)
         
         if not all_results['success']:
             return {
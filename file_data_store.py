@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+文件数据源的本地存储
+上传的CSV / JSON / JSON Lines 文件逐条解析（不整体读入内存），写入本地SQLite文件：
+- 导入时先写入暂存表，完成后按时间字段排序写入正式表，rowid 即按时间排序的序号
+- 时间范围查询只需两次索引查找确定 rowid 区间，总数 = 区间长度，分页按 rowid 区间读取，
+  复杂度为 O(log n + 页大小)，与数据量和页码无关
+- 存储目录 Config.FILE_SOURCE_DIR 的总大小受 Config.FILE_SOURCE_DISK_QUOTA_MB 限制，超出时中止导入；
+  文件数据源配置只保存在进程内存中，重启后旧存储无法再使用，应用启动时清理（purge_stores）
+"""
+
+import csv
+import json
+import logging
+import os
+import sqlite3
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# 每个事务写入的记录数
+INSERT_BATCH_SIZE = 5000
+# 增量解析JSON时每次读取的字符数
+JSON_READ_SIZE = 1024 * 1024
+# JSON对象中包含数据数组的键（与原有的整体解析逻辑一致）
+JSON_ARRAY_KEYS = ('data', 'items', 'results')
+
+
+class DiskQuotaExceeded(Exception):
+    """文件数据源存储超出磁盘配额"""
+
+
+def disk_quota_bytes() -> int:
+    return int(Config.FILE_SOURCE_DISK_QUOTA_MB * 1024 * 1024)
+
+
+def _store_paths() -> List[str]:
+    """存储目录中的全部文件（存储文件及其日志文件）"""
+    try:
+        names = os.listdir(Config.FILE_SOURCE_DIR)
+    except FileNotFoundError:
+        return []
+    return [os.path.join(Config.FILE_SOURCE_DIR, name) for name in names if '.db' in name]
+
+
+def directory_usage(exclude: tuple = ()) -> int:
+    """存储目录已占用的字节数（不含 exclude 中的存储文件）"""
+    excluded = tuple(os.path.basename(path) for path in exclude)
+    usage = 0
+    for path in _store_paths():
+        if os.path.basename(path).startswith(excluded):
+            continue
+        try:
+            usage += os.path.getsize(path)
+        except FileNotFoundError:
+            pass
+    return usage
+
+
+def purge_stores() -> int:
+    """删除存储目录中的全部存储（应用启动时调用，此时没有正在使用的存储），返回删除的文件数"""
+    removed = 0
+    for path in _store_paths():
+        try:
+            os.unlink(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    if removed:
+        logger.info(f"已清理文件数据源的旧存储文件 {removed} 个: {Config.FILE_SOURCE_DIR}")
+    return removed
+
+
+class _JsonStreamReader:
+    """按块读取文本流并逐个解析JSON值，内存占用只与单个值的大小有关"""
+
+    def __init__(self, f):
+        self._f = f
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._f.read(JSON_READ_SIZE)
+        if not chunk:
+            self._eof = True
+            return False
+        # 丢弃已解析的部分，避免缓冲区无限增长
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self, skip: str = '') -> str:
+        """跳过空白和 skip 中的字符，返回下一个字符（已到结尾时返回空字符串）"""
+        while True:
+            while self._pos < len(self._buffer) and (self._buffer[self._pos].isspace()
+                                                     or self._buffer[self._pos] in skip):
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str, skip: str = ''):
+        if self.peek(skip) != char:
+            raise ValueError(f"JSON格式错误：缺少 {char}")
+        self._pos += 1
+
+    def decode(self) -> Any:
+        # raw_decode 不跳过前导空白（如 "key": value 冒号后的空格、缩进换行）
+        if not self.peek():
+            raise ValueError("JSON文件不完整")
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # 数字等值可能被缓冲区截断（如 123 后面还有 4），未到文件末尾时补读后重新解析
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def iter_array(self) -> Iterator[Any]:
+        """逐个解析数组元素（调用前已读过 [）"""
+        while True:
+            char = self.peek(',')
+            if char == ']':
+                self._pos += 1
+                return
+            if not char:
+                raise ValueError("JSON文件不完整")
+            yield self.decode()
+
+
+def iter_json_records(f) -> Iterator[Dict[str, Any]]:
+    """
+    增量解析JSON文件中的记录
+
+    支持：顶层数组；包含 data / items / results 数组的对象（取第一个出现的数组键，流式读取）；
+    其他对象整体视为一条记录
+    """
+    reader = _JsonStreamReader(f)
+    char = reader.peek()
+    if char == '[':
+        reader.expect('[')
+        yield from reader.iter_array()
+        return
+    if char != '{':
+        raise ValueError("JSON文件必须是数组或对象")
+
+    reader.expect('{')
+    record = {}
+    while True:
+        char = reader.peek(',')
+        if char == '}':
+            yield record
+            return
+        if not char:
+            raise ValueError("JSON文件不完整")
+        key = reader.decode()
+        reader.expect(':')
+        if key in JSON_ARRAY_KEYS and reader.peek() == '[':
+            reader.expect('[')
+            yield from reader.iter_array()
+            return
+        record[key] = reader.decode()
+
+
+def iter_json_lines(f) -> Iterator[Dict[str, Any]]:
+    """逐行解析JSON Lines文件，跳过空行"""
+    for line_number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"第 {line_number} 行不是合法的JSON: {e}")
+
+
+def detect_json_lines(file_path: str, encoding: str) -> bool:
+    """判断JSON文件是否为JSON Lines格式（第一行是完整的JSON对象，且后面还有其他行）"""
+    with open(file_path, 'r', encoding=encoding) as f:
+        # 只读取有限长度：整个数组写在一行的大文件不会被整行读入内存
+        line = f.readline(JSON_READ_SIZE)
+        while line and not line.strip():
+            line = f.readline(JSON_READ_SIZE)
+        if not line.endswith('\n') or not line.lstrip().startswith('{'):
+            return False
+        try:
+            json.loads(line)
+        except json.JSONDecodeError:
+            return False
+        return any(line.strip() for line in f)
+
+
+class FileDataStore:
+    """一个上传文件对应的本地存储（只读查询）"""
+
+    def __init__(self, db_path: str, time_field: str = 'publish_time'):
+        self.db_path = db_path
+        self.time_field = time_field
+        self.total = 0
+        self.fields: List[str] = []
+
+    @classmethod
+    def build(cls, file_path: str, file_type: str, field_mapping: Optional[Dict[str, str]] = None,
+              encoding: str = 'utf-8', time_field: str = 'publish_time',
+              replaces: Optional['FileDataStore'] = None) -> 'FileDataStore':
+        """
+        解析上传文件并建立本地存储
+
+        Args:
+            replaces: 导入成功后将被替换删除的存储，不计入目录占用
+
+        Raises:
+            DiskQuotaExceeded: 存储超出磁盘配额
+            ValueError: 文件格式不支持或内容不合法
+        """
+        os.makedirs(Config.FILE_SOURCE_DIR, exist_ok=True)
+        store = cls(os.path.join(Config.FILE_SOURCE_DIR, f"{uuid.uuid4().hex}.db"), time_field)
+        quota = disk_quota_bytes() - directory_usage((replaces.db_path,) if replaces else ())
+        try:
+            store._load(file_path, file_type.lower(), field_mapping, encoding, quota)
+        except BaseException:
+            store.remove()
+            raise
+        return store
+
+    def _iter_records(self, file_path: str, file_type: str, encoding: str) -> Iterator[Dict[str, Any]]:
+        if file_type == 'csv':
+            with open(file_path, 'r', encoding=encoding, newline='') as f:
+                reader = csv.DictReader(f)
+                reader.fieldnames = [name.strip().lstrip('﻿') for name in reader.fieldnames or []]
+                for row in reader:
+                    # 与原 pandas 读取一致：空单元格视为缺失
+                    yield {key: value for key, value in row.items() if key is not None and value != ''}
+        elif file_type in ('json', 'jsonl'):
+            if file_type == 'jsonl' or detect_json_lines(file_path, encoding):
+                with open(file_path, 'r', encoding=encoding) as f:
+                    yield from iter_json_lines(f)
+            else:
+                with open(file_path, 'r', encoding=encoding) as f:
+                    yield from iter_json_records(f)
+        else:
+            raise ValueError(f"不支持的文件格式: {file_type}")
+
+    def _load(self, file_path: str, file_type: str, field_mapping: Optional[Dict[str, str]], encoding: str,
+              quota: int):
+        """导入记录，quota 为本存储可用的字节数（配额减去目录中其他存储的占用）"""
+        mapping = list((field_mapping or {}).items())
+
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('PRAGMA journal_mode = OFF')
+            cursor.execute('PRAGMA synchronous = OFF')
+            cursor.execute('CREATE TABLE staging (time_key TEXT, data TEXT)')
+            cursor.execute('PRAGMA page_size')
+            page_size = cursor.fetchone()[0]
+
+            fields = {}
+            batch = []
+            for item in self._iter_records(file_path, file_type, encoding):
+                if not isinstance(item, dict):
+                    continue
+                if mapping:
+                    item = {system_field: item[file_field] for system_field, file_field in mapping if file_field in item}
+                fields.update(dict.fromkeys(item))
+                time_value = item.get(self.time_field)
+                batch.append((str(time_value) if time_value else None, json.dumps(item, ensure_ascii=False)))
+
+                if len(batch) >= INSERT_BATCH_SIZE:
+                    cursor.executemany('INSERT INTO staging (time_key, data) VALUES (?, ?)', batch)
+                    conn.commit()
+                    batch = []
+                    cursor.execute('PRAGMA page_count')
+                    if cursor.fetchone()[0] * page_size > quota:
+                        raise DiskQuotaExceeded(f"文件数据超出磁盘配额（存储目录共 {Config.FILE_SOURCE_DISK_QUOTA_MB:g}MB）")
+            if batch:
+                cursor.executemany('INSERT INTO staging (time_key, data) VALUES (?, ?)', batch)
+
+            # 按时间排序写入正式表，rowid 即时间顺序的序号（无时间的记录排在最前）
+            cursor.execute('CREATE TABLE records (seq INTEGER PRIMARY KEY, time_key TEXT, data TEXT)')
+            cursor.execute('INSERT INTO records (time_key, data) SELECT time_key, data FROM staging ORDER BY time_key, rowid')
+            cursor.execute('DROP TABLE staging')
+            cursor.execute('CREATE INDEX idx_records_time ON records (time_key)')
+            cursor.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+            cursor.execute('SELECT COUNT(*) FROM records')
+            self.total = cursor.fetchone()[0]
+            self.fields = list(fields)
+            cursor.executemany('INSERT INTO meta (key, value) VALUES (?, ?)', [
+                ('time_field', self.time_field),
+                ('total', str(self.total)),
+                ('fields', json.dumps(self.fields, ensure_ascii=False)),
+            ])
+            conn.commit()
+        # 回收暂存表占用的空间
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('VACUUM')
+
+        if os.path.getsize(self.db_path) > quota:
+            raise DiskQuotaExceeded(f"文件数据超出磁盘配额（存储目录共 {Config.FILE_SOURCE_DISK_QUOTA_MB:g}MB）")
+        logger.info(f"文件数据源导入完成，共 {self.total} 条记录: {self.db_path}")
+
+    def _seq_range(self, cursor, start_time: Optional[str], end_time: Optional[str]) -> tuple:
+        """时间范围对应的 rowid 区间 [lo, hi]（两次索引查找），无数据时 hi < lo"""
+        if start_time is None and end_time is None:
+            return 1, self.total
+        cursor.execute('''
+            SELECT seq FROM records WHERE time_key IS NOT NULL AND time_key >= ?
+            ORDER BY time_key, seq LIMIT 1
+        ''', (start_time or '',))
+        row = cursor.fetchone()
+        if row is None:
+            return 1, 0
+        lo = row[0]
+        if end_time is None:
+            return lo, self.total
+        cursor.execute('''
+            SELECT seq FROM records WHERE time_key IS NOT NULL AND time_key <= ?
+            ORDER BY time_key DESC, seq DESC LIMIT 1
+        ''', (end_time,))
+        row = cursor.fetchone()
+        return lo, row[0] if row else 0
+
+    def query(self, time_field: Optional[str] = None, start_time: Optional[str] = None,
+              end_time: Optional[str] = None, page: int = 1, page_size: int = 100) -> Dict[str, Any]:
+        """
+        按时间范围分页查询，返回 {'data', 'total'}
+
+        结果按时间字段排序。按其他时间字段过滤时无法使用索引，退回逐条比较（与原有行为一致）
+        """
+        offset = (page - 1) * page_size
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            if (start_time or end_time) and time_field and time_field != self.time_field:
+                path = f'$."{time_field}"'
+                where = "json_extract(data, ?) IS NOT NULL AND json_extract(data, ?) != ''"
+                params = [path, path]
+                if start_time:
+                    where += " AND CAST(json_extract(data, ?) AS TEXT) >= ?"
+                    params += [path, start_time]
+                if end_time:
+                    where += " AND CAST(json_extract(data, ?) AS TEXT) <= ?"
+                    params += [path, end_time]
+                cursor.execute(f'SELECT COUNT(*) FROM records WHERE {where}', params)
+                total = cursor.fetchone()[0]
+                cursor.execute(f'SELECT data FROM records WHERE {where} ORDER BY seq LIMIT ? OFFSET ?',
+                               params + [page_size, offset])
+            else:
+                lo, hi = self._seq_range(cursor, start_time or None, end_time or None)
+                total = max(0, hi - lo + 1)
+                cursor.execute('SELECT data FROM records WHERE seq BETWEEN ? AND ? ORDER BY seq',
+                               (lo + offset, min(hi, lo + offset + page_size - 1)))
+            data = [json.loads(row[0]) for row in cursor.fetchall()]
+        return {'data': data, 'total': total}
+
+    def count(self, start_time: Optional[str] = None, end_time: Optional[str] = None) -> int:
+        """时间范围内的记录数（O(log n)）"""
+        with sqlite3.connect(self.db_path) as conn:
+            lo, hi = self._seq_range(conn.cursor(), start_time or None, end_time or None)
+        return max(0, hi - lo + 1)
+
+    def remove(self):
+        """删除存储文件"""
+        try:
+            os.unlink(self.db_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SimHash指纹计算服务
+jieba 分词和 SimHash 位运算都是纯Python的CPU密集计算，批量去重时放在事件循环里会阻塞整个API进程。
+本服务把文本按块分发到进程池计算，每个子进程启动时预先加载 jieba 词典（只加载一次），
+结果以 uint64 数组（array('Q')）返回，顺序与输入一致。子进程的分词缓存命中情况随结果返回并累计。
+- 进程数 Config.SIMHASH_POOL_WORKERS，为 0 时在当前进程内计算
+- 文本数少于 Config.SIMHASH_POOL_MIN_BATCH 时不值得跨进程传输，直接计算
+- 进程池异常退出时重建进程池，本次在当前进程内计算
+"""
+
+import asyncio
+import logging
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# 与 TextDeduplicator.generate_simhash 一致的特征窗口
+SIMHASH_WINDOW = 6
+
+
+def _init_worker():
+    """子进程初始化：预先加载 jieba 词典（fork 启动时已随父进程加载），避免每批文本首次分词时加载"""
+    from text_deduplicator import init_jieba
+    init_jieba()
+
+
+def _noop() -> None:
+    return None
+
+
+def compute_simhashes(texts: Sequence[str], window_size: int = SIMHASH_WINDOW) -> array:
+    """计算一组文本的SimHash值（空文本为0），在子进程或当前进程内执行"""
+    from text_deduplicator import SimHash
+    return array('Q', (SimHash(text, window_size=window_size).value if text else 0 for text in texts))
+
+
+def _compute_chunk(texts: Sequence[str]) -> Tuple[array, int, int]:
+    """子进程任务：返回SimHash数组以及本块的分词缓存命中、未命中次数"""
+    from text_deduplicator import tokenization_cache
+    hits, misses = tokenization_cache.hits, tokenization_cache.misses
+    values = compute_simhashes(texts)
+    return values, tokenization_cache.hits - hits, tokenization_cache.misses - misses
+
+
+class FingerprintService:
+    """把SimHash计算分发到进程池"""
+
+    def __init__(self, workers: Optional[int] = None, chunk_size: Optional[int] = None,
+                 min_batch: Optional[int] = None):
+        self._workers = workers
+        self._chunk_size = chunk_size
+        self._min_batch = min_batch
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        # 进程池子进程的分词缓存累计命中情况
+        self.pool_cache_hits = 0
+        self.pool_cache_misses = 0
+
+    @property
+    def workers(self) -> int:
+        return max(0, Config.SIMHASH_POOL_WORKERS if self._workers is None else self._workers)
+
+    @property
+    def chunk_size(self) -> int:
+        return max(1, Config.SIMHASH_POOL_CHUNK_SIZE if self._chunk_size is None else self._chunk_size)
+
+    @property
+    def min_batch(self) -> int:
+        return Config.SIMHASH_POOL_MIN_BATCH if self._min_batch is None else self._min_batch
+
+    def _use_pool(self, count: int) -> bool:
+        return self.workers > 0 and count >= max(1, self.min_batch)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+            return self._pool
+
+    def _reset_pool(self, pool: ProcessPoolExecutor):
+        """进程池不可用（子进程被杀等）时丢弃，下次调用重建"""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _chunks(self, texts: List[str]) -> List[List[str]]:
+        size = self.chunk_size
+        return [texts[start:start + size] for start in range(0, len(texts), size)]
+
+    def _merge(self, chunks) -> array:
+        result = array('Q')
+        for values, hits, misses in chunks:
+            result.extend(values)
+            self.pool_cache_hits += hits
+            self.pool_cache_misses += misses
+        return result
+
+    def warm_up(self):
+        """启动全部子进程（每个子进程加载jieba词典），避免第一批去重承担进程启动时间"""
+        if self.workers <= 0:
+            return
+        pool = self._get_pool()
+        for future in [pool.submit(_noop) for _ in range(self.workers)]:
+            future.result()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """分词缓存统计：当前进程的缓存状态，以及进程池子进程累计的命中情况"""
+        from text_deduplicator import tokenization_cache
+        lookups = self.pool_cache_hits + self.pool_cache_misses
+        return {
+            'local': tokenization_cache.snapshot(),
+            'pool': {
+                'hits': self.pool_cache_hits,
+                'misses': self.pool_cache_misses,
+                'hit_rate': round(self.pool_cache_hits / lookups, 4) if lookups else None,
+            },
+        }
+
+    def fingerprint(self, texts: Sequence[str]) -> array:
+        """同步计算（供脚本和同步调用方使用），返回与输入顺序一致的SimHash数组"""
+        texts = [text or '' for text in texts]
+        if not self._use_pool(len(texts)):
+            return compute_simhashes(texts)
+        pool = self._get_pool()
+        try:
+            return self._merge(pool.map(_compute_chunk, self._chunks(texts)))
+        except BrokenProcessPool:
+            logger.warning("SimHash进程池异常，重建进程池，本批在当前进程内计算")
+            self._reset_pool(pool)
+            return compute_simhashes(texts)
+
+    async def fingerprint_async(self, texts: Sequence[str]) -> array:
+        """异步计算，不阻塞事件循环；不使用进程池时放到线程池中计算"""
+        texts = [text or '' for text in texts]
+        loop = asyncio.get_running_loop()
+        if not self._use_pool(len(texts)):
+            return await loop.run_in_executor(None, compute_simhashes, texts)
+        pool = self._get_pool()
+        try:
+            chunks = await asyncio.gather(*(
+                loop.run_in_executor(pool, _compute_chunk, chunk) for chunk in self._chunks(texts)
+            ))
+        except BrokenProcessPool:
+            logger.warning("SimHash进程池异常，重建进程池，本批在线程池中计算")
+            self._reset_pool(pool)
+            return await loop.run_in_executor(None, compute_simhashes, texts)
+        return self._merge(chunks)
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+# 全局服务实例，进程池在第一次使用时创建
+fingerprint_service = FingerprintService()
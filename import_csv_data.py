@@ -18,6 +18,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def print_progress(progress):
+    """打印导入进度"""
+    percent = progress['bytes_read'] * 100 / progress['total_bytes'] if progress['total_bytes'] else 100
+    print(f"\r已处理 {progress['processed']} 行（{percent:.1f}%），导入 {progress['imported']} 条，"
+          f"{progress['rows_per_second']} 行/秒", end='', flush=True)
+
 def main():
     """主函数"""
     # CSV文件路径
@@ -40,8 +46,9 @@ def main():
         
         # 导入CSV数据
         logger.info(f"开始导入CSV数据: {csv_path}")
-        result = sentiment_db.import_csv_data(csv_path, chunk_size=1000)
+        result = sentiment_db.import_csv_data(csv_path, chunk_size=5000, progress_callback=print_progress)
         
+        print()
         if result['success']:
             logger.info("数据导入成功!")
             print("=" * 50)
@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+持续采集分析守护进程
+每隔 Config.INGEST_INTERVAL 秒轮询数据源中水位之后的新数据，按微批分析并立即保存：
+- database 源：舆情数据库中 id 大于水位的行，水位保存在 Config.API_SYNC_STATE_FILE（与API高水位同一文件）
+- api 源：UnifiedDataSourceManager.sync_api_data 增量同步，高水位由API数据源管理器维护
+- 每批 Config.INGEST_BATCH_SIZE 条，批内并发 Config.INGEST_CONCURRENCY 条；
+  积压达到 Config.INGEST_BACKLOG_THRESHOLD 条或延迟超过 Config.INGEST_MAX_LAG 秒时进入追赶模式，
+  并发提高到 Config.INGEST_CATCHUP_CONCURRENCY
+- 每批分析后做SimHash重复检测（检测器跨批次保留）、保存结果，再推进水位；中途退出时未保存的批次下次重新分析，
+  结果库按 original_id（database 源）或 external_id（api 源，api:<上游ID>）跳过已保存的记录
+- 分析或保存失败的数据写入任务队列（work_queue.py）后再推进水位，每轮开始时领取到期的重试任务重新分析，
+  按队列的退避策略重试，次数达到 Config.WORK_QUEUE_MAX_ATTEMPTS 时转入死信
+- 正在处理的数据发布时间距当前超过 Config.INGEST_MAX_LAG 秒时记录告警（日志 + 状态接口）
+- Config.INGEST_MODE 为 queue 时只把新数据写入任务队列（work_queue.py），由 analysis_worker.py 的工作进程分析
+
+用法:
+    python ingestion_daemon.py [--source auto|database|api] [--once]
+设置 INGEST_DAEMON_ENABLED=true 时随 FastAPI 应用启动
+"""
+
+import argparse
+import asyncio
+import contextvars
+import logging
+import os
+import socket
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from config import Config
+from api_data_source_manager import QueryParams, sync_state_store
+from llm_resilience import llm_deadline, collect_llm_calls
+from result_database_new import ResultDatabase, DEGRADED_STATUS
+
+logger = logging.getLogger(__name__)
+
+# 重复检测器保留的最多文本数，超过后重新开始（避免常驻进程内存无限增长）
+DEDUP_WINDOW = 50000
+# 状态接口保留的最近告警数
+MAX_ALERTS = 20
+# 解析发布时间的格式
+TIME_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d')
+
+
+def parse_publish_time(value: Any) -> Optional[datetime]:
+    """解析发布时间，无法解析时返回 None"""
+    if not value:
+        return None
+    text = str(value).strip()[:19]
+    for time_format in TIME_FORMATS:
+        try:
+            return datetime.strptime(text, time_format)
+        except ValueError:
+            continue
+    return None
+
+
+def new_duplicate_manager():
+    from text_deduplicator import DuplicateDetectionManager
+    # 与批量解析相同的阈值
+    return DuplicateDetectionManager({
+        'similarity_threshold': 0.6,
+        'hamming_threshold': 25
+    })
+
+
+class DuplicateWindow:
+    """
+    跨批次保留的SimHash重复检测器，累计 DEDUP_WINDOW 条后重新开始
+
+    传入结果库时以结果库为共享存储：每批检测前先载入其他进程（多个工作进程、守护进程）保存的结果指纹，
+    启动或重新开始时载入最近的结果，分布在不同进程、或进程重启前后的相似文章也能互相匹配。
+    """
+
+    def __init__(self, result_db=None):
+        self.result_db = result_db
+        self.manager = new_duplicate_manager()
+        self.count = 0
+        self.last_result_id: Optional[int] = None
+        # 本进程已加入窗口、尚未从结果库读回的指纹（读回时跳过，避免重复加入）
+        self._local: Counter = Counter()
+        self._sequence = 0
+
+    def _reset(self):
+        self.manager = new_duplicate_manager()
+        self.count = 0
+        self.last_result_id = None
+        self._local.clear()
+
+    def _sync(self, page_size: int = 1000):
+        """载入结果库中新保存的指纹（首次或重新开始后载入最近 DEDUP_WINDOW / 2 条）"""
+        while True:
+            if self.last_result_id is None:
+                rows = self.result_db.get_fingerprints(limit=DEDUP_WINDOW // 2)
+                self.last_result_id = 0
+            else:
+                rows = self.result_db.get_fingerprints(self.last_result_id, page_size)
+            for result_id, value, publish_time in rows:
+                self.last_result_id = result_id
+                if not value:
+                    continue
+                if self._local[value]:
+                    self._local[value] -= 1
+                    continue
+                self.manager.deduplicator.add_text(f"r{result_id}", '', publish_time or None, simhash_value=value)
+                self.count += 1
+            if len(rows) < page_size:
+                return
+
+    async def annotate(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """为分析结果补充重复检测字段，顺序与输入一致（SimHash在指纹服务的进程池中计算）"""
+        if self.count >= DEDUP_WINDOW:
+            self._reset()
+        if self.result_db is not None:
+            try:
+                await asyncio.to_thread(self._sync)
+            except Exception as e:
+                logger.warning(f"载入共享重复检测指纹失败: {str(e)}")
+        self.count += len(results)
+        # 窗口内文本ID必须唯一，否则后一批会覆盖前一批同序号的指纹
+        duplicated = await self.manager.detect_duplicates_async([
+            {'id': f"n{self._sequence + index}", 'content': result['content'],
+             'publish_time': result['publish_time'], 'analysis_result': result}
+            for index, result in enumerate(results)
+        ])
+        self._sequence += len(results)
+        if self.result_db is not None:
+            self._local.update(int(item['duplicate_id'], 16) for item in duplicated if item['content'])
+        return [
+            {**item['analysis_result'], 'duplicate_id': item['duplicate_id'], 'duplication_rate': item['duplication_rate']}
+            for item in duplicated
+        ]
+
+
+def api_article_id(record: Dict[str, Any]) -> Optional[int]:
+    """API记录在任务队列中的文章ID（队列按数据源区分ID空间，只用于去重）；上游ID不是整数时不去重"""
+    try:
+        return int(record.get('id'))
+    except (TypeError, ValueError):
+        return None
+
+
+async def analyze_item(planner, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """分析一条数据，返回待保存的结果；内容为空时返回 None"""
+    from ali_llm_client import AliLLMClient
+
+    content = item.get('content') or item.get('title') or ''
+    if not content:
+        return None
+
+    started = time.time()
+    with llm_deadline(Config.LLM_ITEM_DEADLINE), collect_llm_calls() as llm_calls:
+        analysis = await planner.run(content)
+        # 摘要接口是同步调用，放到线程池中执行（复制上下文以沿用时间预算和调用记录）
+        context = contextvars.copy_context()
+        summary = await asyncio.get_running_loop().run_in_executor(
+            None, context.run, AliLLMClient().generate_summary, content
+        )
+
+    sentiment = analysis["sentiment"]
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return {
+        'original_id': item.get('original_id'),
+        'external_id': item.get('external_id'),
+        'title': item.get('title', '无标题'),
+        'content': content,
+        'summary': summary,
+        'source': item.get('source', '持续采集'),
+        'publish_time': item.get('publish_time') or now,
+        'sentiment_level': sentiment.level if sentiment else '未知',
+        'sentiment_reason': sentiment.reason if sentiment else '无原因',
+        'companies': ','.join(company.name for company in analysis["companies"]),
+        'processing_time': round(time.time() - started, 2),
+        'tag_results': {tag.tag: {'belongs': tag.belongs, 'reason': tag.reason} for tag in analysis["tags"]},
+        'processing_status': DEGRADED_STATUS if any(call["error"] for call in llm_calls) else 'completed',
+    }
+
+
+class IngestionDaemon:
+    """轮询数据源新数据并持续分析"""
+
+    def __init__(self, planner, source: Optional[str] = None, result_db_path: str = 'data/analysis_results.db'):
+        self.planner = planner
+        self.source = source or Config.INGEST_SOURCE
+        self.result_db = ResultDatabase(result_db_path)
+        self.duplicates = DuplicateWindow(self.result_db)
+        self._work_queue = None
+        self._retry_worker = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._stop_event: Optional[asyncio.Event] = None
+        self.status = {
+            'running': False, 'source': None, 'last_poll': None, 'last_error': None,
+            'processed': 0, 'saved': 0, 'failed': 0, 'degraded': 0, 'batches': 0, 'enqueued': 0,
+            'backlog': None, 'lag_seconds': None, 'catchup': False,
+        }
+        self.alerts: deque = deque(maxlen=MAX_ALERTS)
+
+    @property
+    def work_queue(self):
+        if self._work_queue is None:
+            from work_queue import WorkQueue
+            self._work_queue = WorkQueue()
+        return self._work_queue
+
+    # ---------- 数据源 ----------
+
+    def _resolve_source(self) -> str:
+        if self.source != 'auto':
+            return self.source
+        from data_source_config_api import get_data_source_manager
+        info = get_data_source_manager().get_current_source_info()
+        return 'api' if info['source_type'] == 'api' and info['status'] == 'configured' else 'database'
+
+    async def _database_batches(self) -> AsyncIterator[tuple]:
+        """产出 (批次数据, 剩余积压, 提交水位的回调)"""
+        from database_manager import UnifiedDatabaseManager
+
+        sentiment_db = UnifiedDatabaseManager().get_sentiment_database()
+        key = f"database:{sentiment_db.db_path}"
+        after_id = sync_state_store.get(key).get('watermark') or 0
+        while not self._stopping:
+            result = sentiment_db.get_rows_after(after_id, Config.INGEST_BATCH_SIZE)
+            if not result['success']:
+                raise RuntimeError(result['message'])
+            rows = result['data']
+            if not rows:
+                return
+            after_id = rows[-1]['id']
+
+            def commit(watermark=after_id):
+                sync_state_store.set(key, {'watermark': watermark,
+                                           'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')})
+
+            for row in rows:
+                row['original_id'] = row['id']
+            yield rows, result['remaining'], commit
+
+    async def _api_batches(self) -> AsyncIterator[tuple]:
+        """API增量同步的每页按批次大小切分；高水位在整轮同步完成后由API管理器提交"""
+        from data_source_config_api import get_data_source_manager
+
+        async for records in get_data_source_manager().sync_api_data(QueryParams()):
+            for start in range(0, len(records), Config.INGEST_BATCH_SIZE):
+                batch = records[start:start + Config.INGEST_BATCH_SIZE]
+                for record in batch:
+                    # 上游ID与本地 sentiment_data.id 不在同一ID空间，不能写入 original_id
+                    record['original_id'] = None
+                    record['external_id'] = f"api:{record['id']}" if record.get('id') is not None else None
+                yield batch, None, None
+                if self._stopping:
+                    return
+
+    # ---------- 分析 ----------
+
+    def _queue_items(self, batch: List[Dict[str, Any]], source: str) -> int:
+        """写入任务队列（database 源按文章ID入队，api 源携带记录本身），返回实际入队数"""
+        if source == 'database':
+            items = [{'article_id': item['id']} for item in batch]
+        else:
+            items = [{'article_id': api_article_id(item), 'payload': item} for item in batch]
+        return self.work_queue.enqueue(items, source)
+
+    def _enqueue_batch(self, batch: List[Dict[str, Any]], source: str):
+        """队列模式：只入队，由工作进程分析"""
+        self.status['enqueued'] += self._queue_items(batch, source)
+        self.status['batches'] += 1
+
+    async def _process_batch(self, batch: List[Dict[str, Any]], concurrency: int, session_id: str,
+                             source: str):
+        """分析并保存一批数据；失败的数据写入任务队列重试，返回后即可推进水位"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def analyze(item):
+            async with semaphore:
+                return await analyze_item(self.planner, item)
+
+        results = await asyncio.gather(*(analyze(item) for item in batch), return_exceptions=True)
+        self.status['processed'] += len(batch)
+
+        failed, analyzed_items, analyzed = [], [], []
+        for item, result in zip(batch, results):
+            if isinstance(result, Exception):
+                logger.error(f"持续采集分析失败: {str(result)}")
+                failed.append(item)
+            elif isinstance(result, BaseException):
+                raise result
+            elif result is not None:
+                analyzed_items.append(item)
+                analyzed.append(result)
+
+        for item, save_data in zip(analyzed_items, await self.duplicates.annotate(analyzed)):
+            save_result = self.result_db.save_analysis_result({**save_data, 'session_id': session_id})
+            if save_result['success']:
+                self.status['saved'] += 1
+                if save_data['processing_status'] == DEGRADED_STATUS:
+                    self.status['degraded'] += 1
+            elif not save_result.get('duplicate', False):
+                logger.error(f"持续采集结果保存失败: {save_result.get('message')}")
+                failed.append(item)
+
+        if failed:
+            self.status['failed'] += len(failed)
+            self.status['enqueued'] += self._queue_items(failed, source)
+            logger.warning(f"持续采集 {len(failed)} 条数据处理失败，已写入任务队列等待重试")
+        self.status['batches'] += 1
+
+    async def _process_retries(self):
+        """领取任务队列中到期的重试任务并分析（成功确认，失败按退避重试或转入死信）"""
+        from analysis_worker import AnalysisWorker
+
+        if self._retry_worker is None:
+            self._retry_worker = AnalysisWorker(f"ingest-{socket.gethostname()}-{os.getpid()}",
+                                                Config.INGEST_CONCURRENCY, self.result_db.db_path, self.planner)
+        worker = self._retry_worker
+        tasks = await asyncio.to_thread(self.work_queue.claim, worker.worker_id, Config.INGEST_BATCH_SIZE)
+        if tasks:
+            logger.info(f"持续采集重试任务队列中的 {len(tasks)} 条数据")
+            await worker.process(tasks)
+
+    def _check_lag(self, batch: List[Dict[str, Any]]) -> Optional[float]:
+        """本批最早一条数据的发布时间距当前的秒数，超过 Config.INGEST_MAX_LAG 时告警"""
+        times = [parse_publish_time(item.get('publish_time')) for item in batch]
+        times = [value for value in times if value is not None]
+        if not times:
+            return None
+        lag = (datetime.now() - min(times)).total_seconds()
+        self.status['lag_seconds'] = round(lag, 1)
+        if Config.INGEST_MAX_LAG and lag > Config.INGEST_MAX_LAG:
+            message = f"持续采集延迟 {lag / 60:.1f} 分钟，超过上限 {Config.INGEST_MAX_LAG / 60:.1f} 分钟"
+            if not self.alerts or self.alerts[-1]['message'] != message:
+                logger.warning(message)
+            self.alerts.append({'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'message': message})
+        return lag
+
+    # ---------- 调度 ----------
+
+    async def run_once(self) -> Dict[str, Any]:
+        """处理一轮：读取水位之后的全部新数据，返回本轮统计"""
+        import uuid
+
+        source = self._resolve_source()
+        self.status['source'] = source
+        self.status['last_poll'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        session_id = f"ingest-{uuid.uuid4()}"
+        processed_before = self.status['processed']
+        enqueued_before = self.status['enqueued']
+        batches = self._database_batches() if source == 'database' else self._api_batches()
+
+        if Config.INGEST_MODE != 'queue':
+            await self._process_retries()
+
+        catchup = False
+        async for batch, backlog, commit in batches:
+            lag = self._check_lag(batch)
+            self.status['backlog'] = backlog
+            catchup = bool((backlog is not None and backlog >= Config.INGEST_BACKLOG_THRESHOLD)
+                           or (lag is not None and Config.INGEST_MAX_LAG and lag > Config.INGEST_MAX_LAG))
+            self.status['catchup'] = catchup
+            if Config.INGEST_MODE == 'queue':
+                self._enqueue_batch(batch, source)
+            else:
+                concurrency = Config.INGEST_CATCHUP_CONCURRENCY if catchup else Config.INGEST_CONCURRENCY
+                await self._process_batch(batch, max(1, concurrency), session_id, source)
+            if commit:
+                commit()
+
+        self.status['backlog'] = 0
+        self.status['catchup'] = False
+        processed = self.status['processed'] - processed_before
+        enqueued = self.status['enqueued'] - enqueued_before
+        if processed or enqueued:
+            logger.info(f"持续采集本轮处理 {processed} 条，入队 {enqueued} 条（{source}）")
+        return {'source': source, 'processed': processed, 'enqueued': enqueued}
+
+    async def run_forever(self):
+        self.status['running'] = True
+        self._stopping = False
+        self._stop_event = asyncio.Event()
+        try:
+            while not self._stopping:
+                try:
+                    await self.run_once()
+                    self.status['last_error'] = None
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.status['last_error'] = str(e)
+                    logger.error(f"持续采集轮询失败: {str(e)}")
+                if not self._stopping:
+                    try:
+                        await asyncio.wait_for(self._stop_event.wait(), timeout=Config.INGEST_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            self.status['running'] = False
+
+    def start(self) -> bool:
+        """在当前事件循环中启动（已在运行时返回 False）"""
+        if self._task and not self._task.done():
+            return False
+        self._task = asyncio.ensure_future(self.run_forever())
+        return True
+
+    async def stop(self):
+        """停止轮询：当前批次处理完成后退出"""
+        self._stopping = True
+        if self._stop_event:
+            self._stop_event.set()
+        if self._task and not self._task.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), timeout=Config.LLM_ITEM_DEADLINE or None)
+            except asyncio.TimeoutError:
+                self._task.cancel()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.status, 'mode': Config.INGEST_MODE, 'interval': Config.INGEST_INTERVAL,
+                'alerts': list(self.alerts)}
+
+
+def main():
+    from agents.sentiment_agent import SentimentAgent
+    from agents.tag_agents import TagAgents
+    from agents.company_agent import CompanyAgent
+    from agents.analysis_planner import AnalysisPlanner
+
+    parser = argparse.ArgumentParser(description='持续采集并分析数据源中的新数据')
+    parser.add_argument('--source', choices=['auto', 'database', 'api'], default=None,
+                        help='数据源，默认使用 INGEST_SOURCE 配置')
+    parser.add_argument('--db', default='data/analysis_results.db', help='分析结果数据库路径')
+    parser.add_argument('--once', action='store_true', help='只处理一轮后退出')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    ResultDatabase(args.db).migrate()
+    daemon = IngestionDaemon(AnalysisPlanner(SentimentAgent(), TagAgents(), CompanyAgent()), args.source, args.db)
+    if args.once:
+        stats = asyncio.run(daemon.run_once())
+        print(f"持续采集完成: 数据源 {stats['source']}，处理 {stats['processed']} 条，入队 {stats['enqueued']} 条")
+        return
+    try:
+        asyncio.run(daemon.run_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+路由模块按需加载
+各路由模块（数据库、结果、导出、问答、数据源配置等）导入时会连带导入数据库层、HTTP客户端、
+去重和导出依赖，并初始化数据库，全部在启动时导入会拖慢冷启动。这里只登记模块名和路径前缀，
+请求路径第一次命中某个前缀时才导入该模块并注册其路由；请求 /openapi.json 时加载全部模块，保证接口文档完整。
+"""
+
+import asyncio
+import importlib
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 需要完整路由表的路径
+FULL_LOAD_PATHS = ('/openapi.json',)
+
+
+@dataclass
+class LazyRouter:
+    module: str
+    prefixes: Tuple[str, ...]
+    include_prefix: str = ''
+    loaded: bool = False
+    load_seconds: Optional[float] = None
+    error: Optional[str] = None
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+    def matches(self, path: str) -> bool:
+        # 按路径段匹配，/api/database 不匹配 /api/database-config
+        return any(path == prefix or path.startswith(prefix + '/') for prefix in self.prefixes)
+
+
+class LazyRouters:
+    """登记按需加载的路由模块（模块需提供 router 属性）"""
+
+    def __init__(self, app):
+        self.app = app
+        self.routers: List[LazyRouter] = []
+
+    def register(self, module: str, *prefixes: str, include_prefix: str = ''):
+        """
+        Args:
+            module: 模块名
+            prefixes: 该模块处理的路径前缀（不传时在启动完成后加载）
+            include_prefix: 注册路由时附加的前缀（与 app.include_router 的 prefix 参数相同）
+        """
+        self.routers.append(LazyRouter(module, tuple(prefixes), include_prefix))
+
+    async def load(self, router: LazyRouter):
+        """导入模块（在线程池中执行，不阻塞事件循环）并在事件循环线程中注册路由"""
+        if router.loaded or router.error:
+            return
+        async with router.lock:
+            if router.loaded or router.error:
+                return
+            started = time.perf_counter()
+            try:
+                module = await asyncio.get_running_loop().run_in_executor(None, importlib.import_module, router.module)
+            except Exception as e:
+                # 模块缺失或导入失败时只影响该模块的路由（返回404），不影响其他接口
+                router.error = f"{type(e).__name__}: {e}"
+                logger.error(f"路由模块 {router.module} 加载失败: {router.error}")
+                return
+            self.app.include_router(module.router, prefix=router.include_prefix)
+            self.app.openapi_schema = None
+            router.load_seconds = round(time.perf_counter() - started, 4)
+            router.loaded = True
+            logger.info(f"路由模块 {router.module} 已加载，耗时 {router.load_seconds}s")
+
+    async def ensure_for_path(self, path: str):
+        if path in FULL_LOAD_PATHS:
+            await self.load_all()
+            return
+        for router in self.routers:
+            if not router.loaded and router.matches(path):
+                await self.load(router)
+
+    async def load_all(self):
+        for router in self.routers:
+            await self.load(router)
+
+    async def load_unprefixed(self):
+        """没有登记路径前缀的模块无法按请求路径触发，启动完成后在后台加载"""
+        for router in self.routers:
+            if not router.prefixes:
+                await self.load(router)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            router.module: {'loaded': router.loaded, 'load_seconds': router.load_seconds, 'error': router.error}
+            for router in self.routers
+        }
+
+
+class LazyRouterMiddleware:
+    """ASGI中间件：路由匹配之前按请求路径加载对应的路由模块"""
+
+    def __init__(self, app, routers: LazyRouters):
+        self.app = app
+        self.routers = routers
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            await self.routers.ensure_for_path(scope['path'])
+        await self.app(scope, receive, send)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+LLM后端
+AliLLMClient（agents/ali_llm_client.py）负责模型路由、重试、对冲和统计，单次上游调用交给后端完成：
+- generate：一次完整生成，返回文本和token用量
+- stream：流式生成，逐段产出文本，最后一个数据块可携带token用量
+- batch：并发执行一组生成请求（并发数默认 Config.LLM_BATCH_CONCURRENCY），结果与请求顺序一致
+Config.LLM_BACKEND 选择后端：dashscope（阿里云百炼兼容模式接口）或 mock（本地模拟服务 mock_llm_server.py，
+用于离线压测）；其他实现可通过 register_backend 注册。
+"""
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+
+import aiohttp
+
+from config import Config
+from llm_resilience import LLMCallError
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LLMResult:
+    text: str
+    usage: Optional[Dict[str, int]] = None
+
+
+@dataclass
+class LLMChunk:
+    content: str = ''
+    usage: Optional[Dict[str, int]] = None
+
+
+@dataclass
+class LLMRequest:
+    model: str
+    messages: List[Dict[str, str]]
+    max_tokens: int = 2000
+    temperature: float = 0.7
+
+
+class LLMBackend:
+    """后端接口"""
+
+    name = 'base'
+    # 可重试的传输层异常（超时、连接错误）；接口返回的错误统一抛出 LLMCallError
+    retryable_errors: Tuple[type, ...] = (asyncio.TimeoutError,)
+
+    async def generate(self, model: str, messages: List[Dict[str, str]], max_tokens: int = 2000,
+                       temperature: float = 0.7, timeout: Optional[float] = None) -> LLMResult:
+        raise NotImplementedError
+
+    async def stream(self, model: str, messages: List[Dict[str, str]], max_tokens: int = 2000,
+                     temperature: float = 0.7, timeout: Optional[float] = None) -> AsyncIterator[LLMChunk]:
+        # 默认实现：不支持流式的后端一次性产出完整结果
+        result = await self.generate(model, messages, max_tokens, temperature, timeout)
+        yield LLMChunk(result.text, result.usage)
+
+    async def batch(self, requests: List[LLMRequest], concurrency: Optional[int] = None,
+                    timeout: Optional[float] = None) -> List[Union[LLMResult, BaseException]]:
+        """并发执行一组请求，单个请求失败时对应位置为异常对象"""
+        semaphore = asyncio.Semaphore(max(1, concurrency or Config.LLM_BATCH_CONCURRENCY))
+
+        async def run(request: LLMRequest) -> LLMResult:
+            async with semaphore:
+                return await self.generate(request.model, request.messages, request.max_tokens,
+                                           request.temperature, timeout)
+
+        return await asyncio.gather(*(run(request) for request in requests), return_exceptions=True)
+
+    async def close(self):
+        pass
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """OpenAI兼容的 /chat/completions 接口，会话（连接池）按事件循环复用"""
+
+    name = 'openai'
+    retryable_errors = (asyncio.TimeoutError, aiohttp.ClientError)
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None):
+        self._base_url = base_url
+        self._api_key = api_key
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop = None
+
+    @property
+    def base_url(self) -> str:
+        return self._base_url.rstrip('/')
+
+    @property
+    def api_key(self) -> Optional[str]:
+        return self._api_key
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """取得复用的会话，会话已关闭或属于其他事件循环时关闭旧会话并重新创建"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            self._discard_session()
+            self._session = aiohttp.ClientSession()
+            self._session_loop = loop
+        return self._session
+
+    def _discard_session(self):
+        """
+        关闭属于其他事件循环的旧会话：原事件循环仍在运行时交给它关闭，已停止时直接关闭底层连接
+        （原事件循环已关闭时只标记关闭，残留的套接字由垃圾回收释放）
+        """
+        session, loop = self._session, self._session_loop
+        self._session = None
+        self._session_loop = None
+        if session is None or session.closed:
+            return
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+            return
+        connector = session.connector
+        session.detach()
+        if connector is not None:
+            connector._close()
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            if self._session_loop is asyncio.get_running_loop():
+                await self._session.close()
+            else:
+                self._discard_session()
+        self._session = None
+        self._session_loop = None
+
+    def _headers(self) -> Dict[str, str]:
+        return {"Content-Type": "application/json", "Authorization": f"Bearer {self.api_key}"}
+
+    @staticmethod
+    async def _raise_for_error(response: aiohttp.ClientResponse):
+        if response.status == 200:
+            return
+        try:
+            response_data = await response.json(content_type=None)
+        except Exception:
+            response_data = {}
+        error_msg = ((response_data or {}).get("error") or {}).get("message", "未知错误")
+        logger.error(f"LLM API错误 ({response.status}): {error_msg}")
+        raise LLMCallError(f"LLM API错误: {error_msg}", status=response.status)
+
+    async def generate(self, model: str, messages: List[Dict[str, str]], max_tokens: int = 2000,
+                       temperature: float = 0.7, timeout: Optional[float] = None) -> LLMResult:
+        request_data = {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature}
+        async with self._get_session().post(
+            f"{self.base_url}/chat/completions", headers=self._headers(), json=request_data,
+            timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
+            await self._raise_for_error(response)
+            response_data = await response.json(content_type=None)
+        try:
+            text = response_data["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError) as e:
+            logger.error(f"解析LLM响应失败: {str(e)}, 响应: {response_data}")
+            raise LLMCallError(f"解析LLM响应失败: {str(e)}", retryable=False)
+        return LLMResult(text, response_data.get("usage"))
+
+    async def stream(self, model: str, messages: List[Dict[str, str]], max_tokens: int = 2000,
+                     temperature: float = 0.7, timeout: Optional[float] = None) -> AsyncIterator[LLMChunk]:
+        request_data = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stream": True,
+            # 最后一个数据块携带token用量
+            "stream_options": {"include_usage": True},
+        }
+        async with self._get_session().post(
+            f"{self.base_url}/chat/completions", headers=self._headers(), json=request_data,
+            timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
+            await self._raise_for_error(response)
+            # 按SSE格式逐行解析：data: {...}，以 data: [DONE] 结束
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(payload)
+                except json.JSONDecodeError:
+                    logger.warning(f"忽略无法解析的流式数据块: {payload[:200]}")
+                    continue
+                choices = chunk.get("choices") or []
+                delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                if delta or chunk.get("usage"):
+                    yield LLMChunk(delta or '', chunk.get("usage"))
+
+
+class DashScopeBackend(OpenAICompatibleBackend):
+    """阿里云百炼兼容模式接口，地址和API Key每次调用时从配置读取（运行时更新配置后立即生效）"""
+
+    name = 'dashscope'
+
+    def __init__(self):
+        super().__init__(Config.ALI_BASE_URL)
+
+    @property
+    def base_url(self) -> str:
+        return Config.ALI_BASE_URL.rstrip('/')
+
+    @property
+    def api_key(self) -> Optional[str]:
+        return Config.get_ali_api_key()
+
+
+class MockBackend(OpenAICompatibleBackend):
+    """本地模拟服务（mock_llm_server.py），地址为 Config.LLM_MOCK_BASE_URL"""
+
+    name = 'mock'
+
+    def __init__(self):
+        super().__init__(Config.LLM_MOCK_BASE_URL, 'mock')
+
+    @property
+    def base_url(self) -> str:
+        return Config.LLM_MOCK_BASE_URL.rstrip('/')
+
+
+BACKENDS: Dict[str, Callable[[], LLMBackend]] = {
+    'dashscope': DashScopeBackend,
+    'mock': MockBackend,
+}
+_instances: Dict[str, LLMBackend] = {}
+
+
+def register_backend(name: str, factory: Callable[[], LLMBackend]):
+    """注册后端实现，之后可通过 Config.LLM_BACKEND = name 选用"""
+    BACKENDS[name] = factory
+    _instances.pop(name, None)
+
+
+def get_backend(name: Optional[str] = None) -> LLMBackend:
+    """取得后端实例（每种后端一个实例，共享连接池）"""
+    name = name or Config.LLM_BACKEND
+    backend = _instances.get(name)
+    if backend is None:
+        if name not in BACKENDS:
+            raise ValueError(f"未知的LLM后端: {name}，可选: {', '.join(BACKENDS)}")
+        backend = _instances[name] = BACKENDS[name]()
+    return backend
+
+
+async def close_backends():
+    """关闭所有已创建的后端（释放连接池），应用退出时调用"""
+    for name, backend in list(_instances.items()):
+        try:
+            await backend.close()
+        except Exception as e:
+            logger.warning(f"关闭LLM后端 {name} 失败: {e}")
+
+
+def backend_endpoint(name: Optional[str] = None) -> Tuple[str, Optional[str]]:
+    """当前后端的兼容接口地址和API Key（供同步客户端 ali_llm_client.py 使用）；非兼容接口的后端回退到百炼配置"""
+    backend = get_backend(name)
+    if isinstance(backend, OpenAICompatibleBackend):
+        return backend.base_url, backend.api_key
+    return Config.ALI_BASE_URL, Config.get_ali_api_key()
@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+LLM调用容错
+- 分类重试：429、5xx、超时和连接错误按指数退避（带随机抖动）重试，其余错误直接失败
+- 截止时间传递：llm_deadline() 为一篇文本设置总的时间预算，该文本的所有LLM调用（包括并行的Agent）共享，
+  每次请求的超时和退避等待都不会超过剩余预算
+- 对冲请求：单次请求超过该模型近期延迟的P95仍未返回时，再发一个相同请求，取先返回的结果
+- 熔断：近期请求失败率超过阈值时熔断，熔断期间LLM调用立即失败（Agent转为规则分析），
+  冷却后放行少量试探请求，成功则恢复
+- 请求合并：完全相同的提示词同时在途时只发出一次上游请求，所有等待方共享结果（或异常）
+- 流式调用：stream_with_retry() 逐段转发模型输出，只在尚未输出任何内容时重试（不对冲、不合并）
+- 调用记录：collect_llm_calls() 收集范围内每次LLM调用的重试和对冲次数，调用失败的文本应标记为降级结果
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from config import Config
+from model_routing import routing_stats
+
+# 当前文本的截止时间（time.monotonic()），None 表示不限
+_deadline: contextvars.ContextVar = contextvars.ContextVar("llm_deadline", default=None)
+# 当前范围内的LLM调用记录，None 表示不收集
+_call_log: contextvars.ContextVar = contextvars.ContextVar("llm_call_log", default=None)
+
+
+class LLMCallError(Exception):
+    """LLM接口返回的错误，retryable 表示是否值得重试"""
+
+    def __init__(self, message: str, status: Optional[int] = None, retryable: Optional[bool] = None):
+        super().__init__(message)
+        self.status = status
+        if retryable is None:
+            retryable = status is not None and (status == 429 or status >= 500)
+        self.retryable = retryable
+
+
+class LLMDeadlineExceeded(Exception):
+    """文本的LLM时间预算已用完"""
+
+
+class LLMCircuitOpenError(LLMCallError):
+    """LLM服务熔断中，请求未发出"""
+
+    def __init__(self, message: str = "LLM服务熔断中，暂停调用"):
+        super().__init__(message, retryable=False)
+
+
+class CircuitBreaker:
+    """
+    LLM后端熔断器
+
+    closed: 正常放行，统计最近 LLM_BREAKER_WINDOW 次请求，失败率达到 LLM_BREAKER_ERROR_RATE
+            （且至少 LLM_BREAKER_MIN_CALLS 次）时熔断
+    open: 请求立即失败，LLM_BREAKER_COOLDOWN 秒后进入 half_open
+    half_open: 最多同时放行 LLM_BREAKER_HALF_OPEN_CALLS 个试探请求，全部成功后恢复，任一失败重新熔断
+    只有429/5xx/超时/连接错误计为失败，其他错误说明服务可达，按成功计
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._outcomes = deque(maxlen=max(1, Config.LLM_BREAKER_WINDOW))
+            self._opened_at = 0.0
+            self._trials_in_flight = 0
+            self._trial_successes = 0
+            self.open_count = 0
+            self.rejected = 0
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._trials_in_flight = 0
+        self._trial_successes = 0
+        self.open_count += 1
+
+    def before_call(self):
+        """请求前调用，熔断中时抛出 LLMCircuitOpenError"""
+        if not Config.LLM_BREAKER_ENABLED:
+            return
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < Config.LLM_BREAKER_COOLDOWN:
+                    self.rejected += 1
+                    raise LLMCircuitOpenError()
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self._trials_in_flight >= Config.LLM_BREAKER_HALF_OPEN_CALLS:
+                    self.rejected += 1
+                    raise LLMCircuitOpenError()
+                self._trials_in_flight += 1
+
+    def record(self, success: bool):
+        """请求结束后记录结果"""
+        if not Config.LLM_BREAKER_ENABLED:
+            return
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trials_in_flight = max(0, self._trials_in_flight - 1)
+                if not success:
+                    self._open()
+                    return
+                self._trial_successes += 1
+                if self._trial_successes >= Config.LLM_BREAKER_HALF_OPEN_CALLS:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                return
+            if self.state == self.OPEN:
+                return
+
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if (len(self._outcomes) >= Config.LLM_BREAKER_MIN_CALLS
+                    and failures / len(self._outcomes) >= Config.LLM_BREAKER_ERROR_RATE):
+                self._open()
+
+    def release(self):
+        """请求被取消、没有结果时释放试探名额"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trials_in_flight = max(0, self._trials_in_flight - 1)
+
+    def is_available(self) -> bool:
+        """当前是否可以调用LLM（熔断冷却中返回 False）"""
+        if not Config.LLM_BREAKER_ENABLED:
+            return True
+        with self._lock:
+            return not (self.state == self.OPEN
+                        and time.monotonic() - self._opened_at < Config.LLM_BREAKER_COOLDOWN)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            total = len(self._outcomes)
+            failures = self._outcomes.count(False)
+            return {
+                "enabled": Config.LLM_BREAKER_ENABLED,
+                "state": self.state,
+                "window_calls": total,
+                "window_error_rate": round(failures / total, 4) if total else None,
+                "open_count": self.open_count,
+                "rejected": self.rejected,
+                "retry_after": max(0.0, round(Config.LLM_BREAKER_COOLDOWN - (time.monotonic() - self._opened_at), 1))
+                if self.state == self.OPEN else 0.0,
+            }
+
+
+# 进程内共享的熔断器（所有客户端访问同一个LLM后端）
+circuit_breaker = CircuitBreaker()
+
+
+@contextmanager
+def llm_deadline(seconds: Optional[float]):
+    """为范围内的全部LLM调用设置共享的时间预算（嵌套时取更早的截止时间）"""
+    if not seconds or seconds <= 0:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(min(deadline, current) if current is not None else deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """当前截止时间前的剩余秒数，不限时返回 None"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def attempt_timeout(default_timeout: float) -> float:
+    """单次请求的超时：不超过剩余预算；预算已用完时抛出 LLMDeadlineExceeded"""
+    remaining = remaining_time()
+    if remaining is None:
+        return default_timeout
+    if remaining <= 0:
+        raise LLMDeadlineExceeded("LLM调用超出文本的时间预算")
+    return min(default_timeout, remaining)
+
+
+@contextmanager
+def collect_llm_calls():
+    """收集范围内每次LLM调用的记录（模型、尝试次数、重试次数、对冲次数、耗时、错误）"""
+    calls: List[dict] = []
+    token = _call_log.set(calls)
+    try:
+        yield calls
+    finally:
+        _call_log.reset(token)
+
+
+def backoff_delay(retry_index: int) -> float:
+    """第 retry_index 次重试前的等待时间：指数退避 + 全抖动"""
+    ceiling = min(Config.LLM_RETRY_MAX_DELAY, Config.LLM_RETRY_BASE_DELAY * (2 ** retry_index))
+    return random.uniform(0, ceiling)
+
+
+class LatencyTracker:
+    """记录各模型近期成功请求的延迟，用于计算对冲阈值"""
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._window = window
+        self._latencies: Dict[str, deque] = {}
+
+    def record(self, model: str, latency: float):
+        with self._lock:
+            self._latencies.setdefault(model, deque(maxlen=self._window)).append(latency)
+
+    def quantile(self, model: str, q: float) -> Optional[float]:
+        """近期延迟的分位数，样本不足 Config.LLM_HEDGE_MIN_SAMPLES 时返回 None"""
+        with self._lock:
+            samples = sorted(self._latencies.get(model, ()))
+        if not samples or len(samples) < Config.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+latency_tracker = LatencyTracker()
+
+
+def _is_retryable(error: Exception, retryable_errors: tuple) -> bool:
+    return error.retryable if isinstance(error, LLMCallError) else isinstance(error, retryable_errors)
+
+
+def _new_record(route: Optional[str], model: str) -> dict:
+    return {"route": route or "default", "model": model, "attempts": 0, "retries": 0,
+            "hedges": 0, "hedge_wins": 0, "latency": 0.0, "error": None}
+
+
+def _finish_record(record: dict, started: float):
+    record["latency"] = round(time.monotonic() - started, 3)
+    routing_stats.record_resilience(record["model"], record["retries"], record["hedges"],
+                                    record["hedge_wins"], record["error"] == "deadline",
+                                    record["error"] == "circuit_open")
+    calls = _call_log.get()
+    if calls is not None:
+        calls.append(record)
+
+
+class SingleFlight:
+    """
+    在途请求合并：相同键的请求在第一个请求完成前到达时不再发出上游请求，而是等待同一个结果
+
+    只覆盖响应返回前的并发窗口，不做持久缓存；上游请求在独立任务中执行，
+    单个等待方被取消不会影响其他等待方。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.leaders = 0
+            self.coalesced = 0
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """由请求参数生成合并键"""
+        payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[str]], route: Optional[str] = None) -> str:
+        """执行或加入相同键的在途请求"""
+        if not Config.LLM_SINGLE_FLIGHT_ENABLED:
+            return await factory()
+
+        # 在途任务只能在创建它的事件循环中等待
+        key = f"{id(asyncio.get_running_loop())}:{key}"
+        with self._lock:
+            task = self._inflight.get(key)
+            leader = task is None
+            if leader:
+                task = asyncio.ensure_future(factory())
+                self._inflight[key] = task
+                task.add_done_callback(lambda done: self._finish(key, done))
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if leader:
+            return await asyncio.shield(task)
+
+        # 合并的调用也写入调用记录，便于按文本判断是否降级
+        record = _new_record(route, "coalesced")
+        started = time.monotonic()
+        try:
+            return await asyncio.shield(task)
+        except Exception as e:
+            record["error"] = "circuit_open" if isinstance(e, LLMCircuitOpenError) else str(e)[:200]
+            raise
+        finally:
+            record["latency"] = round(time.monotonic() - started, 3)
+            calls = _call_log.get()
+            if calls is not None:
+                calls.append({**record, "coalesced": True})
+
+    def _finish(self, key: str, task: asyncio.Future):
+        with self._lock:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+        # 所有等待方都已取消时避免“异常未被获取”的警告
+        if not task.cancelled():
+            task.exception()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            total = self.leaders + self.coalesced
+            return {
+                "enabled": Config.LLM_SINGLE_FLIGHT_ENABLED,
+                "upstream_calls": self.leaders,
+                "coalesced_calls": self.coalesced,
+                "coalesced_rate": round(self.coalesced / total, 4) if total else None,
+                "in_flight": len(self._inflight),
+            }
+
+
+single_flight = SingleFlight()
+
+
+async def _hedged_attempt(attempt: Callable[[], Awaitable[str]], model: str, record: dict) -> str:
+    """执行一次请求，超过P95延迟仍未返回时发出对冲请求，返回先成功的结果"""
+    hedge_delay = latency_tracker.quantile(model, Config.LLM_HEDGE_QUANTILE) if Config.LLM_HEDGE_ENABLED else None
+    primary = asyncio.ensure_future(attempt())
+    if hedge_delay is None:
+        return await primary
+
+    done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+    if done:
+        return primary.result()
+
+    hedge = asyncio.ensure_future(attempt())
+    record["hedges"] += 1
+    pending = {primary, hedge}
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        record["hedge_wins"] += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def call_with_retry(attempt: Callable[[float], Awaitable[str]], model: str, route: Optional[str],
+                          default_timeout: float,
+                          retryable_errors: tuple = (asyncio.TimeoutError,)) -> str:
+    """
+    带分类重试、截止时间和对冲的异步LLM调用
+
+    Args:
+        attempt: 发起单次请求的函数，参数为本次请求的超时秒数
+        retryable_errors: 可重试的异常类型（如超时、连接错误），LLMCallError 按 retryable 判断
+    """
+    record = _new_record(route, model)
+    started = time.monotonic()
+    try:
+        for retry_index in range(Config.LLM_MAX_RETRIES + 1):
+            timeout = attempt_timeout(default_timeout)
+            circuit_breaker.before_call()
+            record["attempts"] += 1
+            try:
+                result = await _hedged_attempt(lambda: attempt(timeout), model, record)
+            except asyncio.CancelledError:
+                circuit_breaker.release()
+                raise
+            except Exception as e:
+                retryable = _is_retryable(e, retryable_errors)
+                circuit_breaker.record(not retryable)
+                if not retryable or retry_index >= Config.LLM_MAX_RETRIES:
+                    raise
+                delay = backoff_delay(retry_index)
+                remaining = remaining_time()
+                if remaining is not None and delay >= remaining:
+                    raise LLMDeadlineExceeded(f"LLM调用超出文本的时间预算（最后错误: {e}）")
+                record["retries"] += 1
+                await asyncio.sleep(delay)
+            else:
+                circuit_breaker.record(True)
+                return result
+    except LLMCircuitOpenError:
+        record["error"] = "circuit_open"
+        raise
+    except LLMDeadlineExceeded:
+        record["error"] = "deadline"
+        raise
+    except Exception as e:
+        record["error"] = str(e)[:200]
+        raise
+    finally:
+        _finish_record(record, started)
+
+
+async def stream_with_retry(open_stream: Callable[[float], AsyncIterator[str]], model: str, route: Optional[str],
+                            default_timeout: float,
+                            retryable_errors: tuple = (asyncio.TimeoutError,)) -> AsyncIterator[str]:
+    """
+    带分类重试和截止时间的流式LLM调用，逐段产出模型输出
+
+    只在尚未产出任何内容时重试；已向调用方转发部分内容后出错直接抛出，避免重复输出。
+    流式请求不发对冲请求，也不与相同请求合并。
+
+    Args:
+        open_stream: 发起单次流式请求的函数，参数为本次请求的超时秒数，返回输出片段的异步迭代器
+        retryable_errors: 可重试的异常类型（如超时、连接错误），LLMCallError 按 retryable 判断
+    """
+    record = _new_record(route, model)
+    started = time.monotonic()
+    try:
+        for retry_index in range(Config.LLM_MAX_RETRIES + 1):
+            timeout = attempt_timeout(default_timeout)
+            circuit_breaker.before_call()
+            record["attempts"] += 1
+            emitted = False
+            stream = open_stream(timeout)
+            try:
+                async for delta in stream:
+                    emitted = True
+                    yield delta
+            except (asyncio.CancelledError, GeneratorExit):
+                # 调用方中途停止读取（如客户端断开），不计入熔断统计
+                circuit_breaker.release()
+                raise
+            except Exception as e:
+                retryable = _is_retryable(e, retryable_errors)
+                circuit_breaker.record(not retryable)
+                if emitted or not retryable or retry_index >= Config.LLM_MAX_RETRIES:
+                    raise
+                delay = backoff_delay(retry_index)
+                remaining = remaining_time()
+                if remaining is not None and delay >= remaining:
+                    raise LLMDeadlineExceeded(f"LLM调用超出文本的时间预算（最后错误: {e}）")
+                record["retries"] += 1
+                await asyncio.sleep(delay)
+            else:
+                circuit_breaker.record(True)
+                return
+            finally:
+                await stream.aclose()
+    except LLMCircuitOpenError:
+        record["error"] = "circuit_open"
+        raise
+    except LLMDeadlineExceeded:
+        record["error"] = "deadline"
+        raise
+    except Exception as e:
+        record["error"] = str(e)[:200]
+        raise
+    finally:
+        _finish_record(record, started)
+
+
+def call_with_retry_sync(attempt: Callable[[float], str], model: str, route: Optional[str],
+                         default_timeout: float, retryable_errors: tuple = ()) -> str:
+    """同步版本的分类重试（同步客户端使用，不支持对冲）"""
+    record = _new_record(route, model)
+    started = time.monotonic()
+    try:
+        for retry_index in range(Config.LLM_MAX_RETRIES + 1):
+            timeout = attempt_timeout(default_timeout)
+            circuit_breaker.before_call()
+            record["attempts"] += 1
+            try:
+                result = attempt(timeout)
+            except Exception as e:
+                retryable = _is_retryable(e, retryable_errors)
+                circuit_breaker.record(not retryable)
+                if not retryable or retry_index >= Config.LLM_MAX_RETRIES:
+                    raise
+                delay = backoff_delay(retry_index)
+                remaining = remaining_time()
+                if remaining is not None and delay >= remaining:
+                    raise LLMDeadlineExceeded(f"LLM调用超出文本的时间预算（最后错误: {e}）")
+                record["retries"] += 1
+                time.sleep(delay)
+            else:
+                circuit_breaker.record(True)
+                return result
+    except LLMCircuitOpenError:
+        record["error"] = "circuit_open"
+        raise
+    except LLMDeadlineExceeded:
+        record["error"] = "deadline"
+        raise
+    except Exception as e:
+        record["error"] = str(e)[:200]
+        raise
+    finally:
+        _finish_record(record, started)
@@ -5,53 +5,134 @@
 
 from fastapi import FastAPI, Request, UploadFile, File, HTTPException, Query, Form
 from typing import Optional
+from contextlib import asynccontextmanager
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, JSONResponse
-import uvicorn
 import csv
 import io
 import time
 from models import AnalysisRequest, CompanyInfo, TagResult, SentimentResult
 from config import Config
-from api_key_manager import api_key_manager, ensure_api_key_configured
-import getpass
-from agents.company_agent import CompanyAgent
-from agents.tag_agents import TagAgents
-from agents.sentiment_agent import SentimentAgent
+from model_routing import routing_stats, validate_routing
+from llm_resilience import llm_deadline, collect_llm_calls, circuit_breaker, single_flight
+from work_queue import WorkQueue
+from fingerprint_service import fingerprint_service
+from lazy_routers import LazyRouters, LazyRouterMiddleware
 from fastapi.responses import StreamingResponse
-from database_api import router as database_router
-import pandas as pd
 from datetime import datetime
-from database_config_api import router as database_config_router
-from analysis_api import router as analysis_router
-from data_api import router as data_router
-from results_api import router as results_router
-from api_config_routes import router as api_config_router
-from chat_api import router as chat_router
-
-from unified_data_source_manager import UnifiedDataSourceManager, QueryParams
-from data_source_config_api import router as data_source_config_router, get_data_source_manager
-from test_database_api import router as test_database_router
 import asyncio
+import contextvars
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="多Agent情感分析系统", description="专门处理企业识别标签分类和情感等级分类")
-
-# 初始化各个agent
-company_agent = CompanyAgent()  # 企业识别模块
-tag_agents = TagAgents()
-sentiment_agent = SentimentAgent()
+# 各agent和持续采集在 lifespan 中创建（build_services），导入本模块时不创建LLM客户端
+company_agent = None  # 企业识别模块
+tag_agents = None
+sentiment_agent = None
+analysis_planner = None
+ingestion_daemon = None
 # system_agent = SystemAgent() # 暂时注释掉系统风险分析模块
 
+# 启动状态：lifespan 完成服务创建后即可接收请求（存活），后台预热（jieba词典、SimHash进程池）完成后才就绪
+startup_state = {"ready": False, "timings": {}, "error": None}
+_process_started = time.perf_counter()
+
+
+def build_services():
+    """创建各agent、分析计划器和持续采集"""
+    global company_agent, tag_agents, sentiment_agent, analysis_planner, ingestion_daemon
+    from agents.company_agent import CompanyAgent
+    from agents.tag_agents import TagAgents
+    from agents.sentiment_agent import SentimentAgent
+    from agents.analysis_planner import AnalysisPlanner
+    from ingestion_daemon import IngestionDaemon
+
+    company_agent = CompanyAgent()
+    tag_agents = TagAgents()
+    sentiment_agent = SentimentAgent()
+    analysis_planner = AnalysisPlanner(sentiment_agent, tag_agents, company_agent)
+    ingestion_daemon = IngestionDaemon(analysis_planner)
+
+
+def run_result_migrations():
+    from result_database_new import ResultDatabase
+    ResultDatabase('data/analysis_results.db').migrate()
+
+
+async def warm_up():
+    """后台预热：从缓存文件加载jieba词典并启动SimHash进程池、迁移分析结果库旧记录，第一个批量解析请求不再承担加载时间"""
+    from text_deduplicator import init_jieba
+
+    loop = asyncio.get_running_loop()
+    timings = startup_state["timings"]
+    try:
+        started = time.perf_counter()
+        await loop.run_in_executor(None, init_jieba)
+        timings["jieba"] = round(time.perf_counter() - started, 4)
+        # 先在主进程加载词典，fork 出的子进程直接继承
+        started = time.perf_counter()
+        await loop.run_in_executor(None, fingerprint_service.warm_up)
+        timings["simhash_pool"] = round(time.perf_counter() - started, 4)
+        await lazy_routers.load_unprefixed()
+        # 旧记录迁移只在启动时执行一次（ResultDatabase 构造函数不再执行）
+        started = time.perf_counter()
+        await loop.run_in_executor(None, run_result_migrations)
+        timings["migrations"] = round(time.perf_counter() - started, 4)
+        if Config.PRELOAD_ROUTERS:
+            started = time.perf_counter()
+            await lazy_routers.load_all()
+            timings["routers"] = round(time.perf_counter() - started, 4)
+    except Exception as e:
+        # 预热失败不影响服务，相关模块在第一次使用时加载
+        startup_state["error"] = f"{type(e).__name__}: {e}"
+        logger.error(f"启动预热失败: {startup_state['error']}")
+    timings["ready"] = round(time.perf_counter() - _process_started, 4)
+    startup_state["ready"] = True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    build_services()
+    startup_state["timings"]["services"] = round(time.perf_counter() - started, 4)
+    startup_state["timings"]["live"] = round(time.perf_counter() - _process_started, 4)
+    # 文件数据源配置只在进程内存中，上次运行留下的存储已无法使用，启动时清理以免占用磁盘配额
+    from file_data_store import purge_stores
+    purge_stores()
+    # INGEST_DAEMON_ENABLED 为 true 时随应用启动持续采集分析
+    if Config.INGEST_DAEMON_ENABLED:
+        ingestion_daemon.start()
+    warm_up_task = asyncio.create_task(warm_up())
+    yield
+    warm_up_task.cancel()
+    await ingestion_daemon.stop()
+    from llm_backends import close_backends
+    await close_backends()
+    fingerprint_service.shutdown()
+
+
+app = FastAPI(title="多Agent情感分析系统", description="专门处理企业识别标签分类和情感等级分类", lifespan=lifespan)
+
+# 路由模块在请求路径第一次命中时加载
+lazy_routers = LazyRouters(app)
+lazy_routers.register("database_api", "/api/database")
+lazy_routers.register("database_config_api", "/api/database-config")
+lazy_routers.register("analysis_api", "/api/analysis")
+lazy_routers.register("data_api", "/api/data", include_prefix="/api/data")
+lazy_routers.register("results_api", "/api/results", include_prefix="/api/results")
+lazy_routers.register("api_config_routes", "/api/config")
+lazy_routers.register("chat_api", "/api/chat")
+lazy_routers.register("data_source_config_api", "/api/data-source")
+lazy_routers.register("test_database_api")
+app.add_middleware(LazyRouterMiddleware, routers=lazy_routers)
+
 # 设置模板和静态文件
 templates = Jinja2Templates(directory="templates")
 
 # 自定义静态文件处理添加防缓存头部
-from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 import os
 
@@ -68,17 +149,6 @@ class NoCacheStaticFiles(StaticFiles):
 
 app.mount("/static", NoCacheStaticFiles(directory="static"), name="static")
 
-# 集成数据库API
-app.include_router(database_router)
-app.include_router(database_config_router)
-app.include_router(analysis_router)
-app.include_router(data_router, prefix="/api/data")
-app.include_router(results_router, prefix="/api/results")
-app.include_router(api_config_router)
-app.include_router(chat_router)
-app.include_router(data_source_config_router)
-app.include_router(test_database_router)
-
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
     """主页 - 显示分析界面"""
@@ -128,6 +198,11 @@ async def analyze_text(request: AnalysisRequest):
         if not request.content or not request.content.strip():
             raise HTTPException(status_code=400, detail="文本内容不能为空")
         
+        try:
+            policy_name, policy = analysis_planner.resolve_policy(request.analysis_policy, request.policy_overrides)
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"detail": str(e)})
+        
         # 创建流式响应
         async def generate_stream():
             # 开始分析
@@ -136,12 +211,31 @@ async def analyze_text(request: AnalysisRequest):
             # 定义异步生成器函数
             async def sentiment_analysis():
                 yield f"data: {json.dumps({'type': 'progress', 'step': 'sentiment', 'message': '正在进行情感分析...'})}\n\n"
-                result = await sentiment_agent.analyze_sentiment(request.content)
+                if Config.LLM_STREAM_ENABLED:
+                    # 模型输出边生成边推送（delta 事件），解析后的最终结果仍以 result 事件为准
+                    result = None
+                    async for event in sentiment_agent.analyze_sentiment_stream(request.content):
+                        if event["type"] == "delta":
+                            yield f"data: {json.dumps({'type': 'delta', 'step': 'sentiment', 'content': event['content']})}\n\n"
+                        else:
+                            result = event["data"]
+                else:
+                    result = await sentiment_agent.analyze_sentiment(request.content)
                 yield f"data: {json.dumps({'type': 'result', 'step': 'sentiment', 'data': result.model_dump()})}\n\n"
+                
+                # 根据情感分析结果生成下游分析计划
+                plan = analysis_planner.plan(request.content, result, policy_name, policy)
+                analysis_planner.stats.record(plan)
+                plan_state["plan"] = plan
+                yield f"data: {json.dumps({'type': 'plan', 'data': plan})}\n\n"
 
             async def tag_analysis():
-                yield f"data: {json.dumps({'type': 'progress', 'step': 'tags', 'message': '正在进行标签分析...'})}\n\n"
-                results = await tag_agents.analyze_tags(request.content)
+                plan = plan_state["plan"]
+                if not plan["run_tags"]:
+                    yield f"data: {json.dumps({'type': 'progress', 'step': 'tags', 'message': '根据分析计划跳过标签分析'})}\n\n"
+                else:
+                    yield f"data: {json.dumps({'type': 'progress', 'step': 'tags', 'message': '正在进行标签分析...'})}\n\n"
+                results = await analysis_planner.analyze_tags(request.content, plan)
                 for tag_result in results:
                     yield f"data: {json.dumps({'type': 'progress', 'step': 'tags', 'message': f'正在分析标签: {tag_result.tag}'})}\n\n"
                     yield f"data: {json.dumps({'type': 'result', 'step': 'tags', 'data': tag_result.model_dump()})}\n\n"
@@ -149,13 +243,18 @@ async def analyze_text(request: AnalysisRequest):
                     yield f"data: {json.dumps({'type': 'progress', 'step': 'tags', 'message': f'标签 {tag_result.tag} 分析完成: {tag_status}'})}\n\n"
 
             async def company_analysis():
+                if not plan_state["plan"]["run_companies"]:
+                    yield f"data: {json.dumps({'type': 'progress', 'step': 'companies', 'message': '根据分析计划跳过企业识别'})}\n\n"
+                    yield f"data: {json.dumps({'type': 'result', 'step': 'companies', 'data': []})}\n\n"
+                    return
                 yield f"data: {json.dumps({'type': 'progress', 'step': 'companies', 'message': '正在识别企业信息...'})}\n\n"
                 results = await company_agent.analyze_companies(request.content)
                 # 现在企业识别只返回企业名称转换为兼容格式
                 company_data = [{"name": c.name, "credit_code": "", "reason": f"LLM智能识别: {c.name}"} for c in results]
                 yield f"data: {json.dumps({'type': 'result', 'step': 'companies', 'data': company_data})}\n\n"
 
-            # 创建任务列表
+            # 情感分析先执行，其结果决定标签分析和企业识别的计划
+            plan_state = {}
             generators = [
                 sentiment_analysis(),
                 tag_analysis(),
@@ -188,15 +287,31 @@ async def analyze_text(request: AnalysisRequest):
 
 @app.get("/api/health")
 async def health_check():
-    """健康检查接口"""
+    """健康检查接口（存活检查：进程能响应请求即返回正常）"""
     return {"status": "healthy", "message": "多Agent情感分析系统运行正常"}
 
+@app.get("/api/health/ready")
+async def readiness_check():
+    """就绪检查：启动预热完成前返回503，同时返回各启动阶段耗时（秒）和路由模块加载情况"""
+    content = {
+        "status": "ready" if startup_state["ready"] else "starting",
+        "timings": startup_state["timings"],
+        "error": startup_state["error"],
+        "routers": lazy_routers.snapshot(),
+    }
+    return JSONResponse(status_code=200 if startup_state["ready"] else 503, content=content)
+
 @app.post("/api/upload_csv")
-async def upload_csv(file: UploadFile = File(...)):
+async def upload_csv(file: UploadFile = File(...), analysis_policy: Optional[str] = Form(None)):
     """上传CSV文件进行批量分析"""
     if not file.filename.endswith('.csv'):
         return {"detail": "只支持CSV文件"}
     
+    try:
+        analysis_planner.resolve_policy(analysis_policy)
+    except ValueError as e:
+        return {"detail": str(e)}
+    
     try:
         # 读取CSV文件内容
         content = await file.read()
@@ -218,23 +333,19 @@ async def upload_csv(file: UploadFile = File(...)):
         for row in rows:
             content_text = row['content'].strip()
             if content_text:
-                # 分析单条内容
-                # 创建所有分析任务
-                tasks = [
-                    company_agent.analyze_companies(content_text),
-                    tag_agents.analyze_tags(content_text),
-                    sentiment_agent.analyze_sentiment(content_text)
-                ]
-                
-                # 并行执行所有任务
-                companies, tags, sentiment = await asyncio.gather(*tasks)
+                # 按分析策略分析单条内容，该条内容的全部LLM调用共享时间预算
+                with llm_deadline(Config.LLM_ITEM_DEADLINE):
+                    analysis = await analysis_planner.run(content_text, analysis_policy)
+                companies = analysis["companies"]
+                sentiment = analysis["sentiment"]
                 
                 # 直接使用对象的model_dump方法转换为字典
                 results.append({
                     "content": content_text,
                     "companies": [{"name": company.name, "credit_code": "", "reason": f"LLM智能识别: {company.name}"} for company in companies],
-                    "tags": [tag.model_dump() for tag in tags],
-                    "sentiment": sentiment.model_dump()
+                    "tags": [tag.model_dump() for tag in analysis["tags"]],
+                    "sentiment": sentiment.model_dump() if sentiment else None,
+                    "plan": analysis["plan"]
                 })
         
         return {
@@ -250,7 +361,7 @@ async def batch_parse_data(request: Request):
     """批量解析数据接口 - 使用真实数据"""
     try:
         from database_manager import UnifiedDatabaseManager
-        from result_database_new import ResultDatabase
+        from result_database_new import ResultDatabase, DEGRADED_STATUS
         import hashlib
         
         body = await request.json()
@@ -263,6 +374,12 @@ async def batch_parse_data(request: Request):
         enable_sentiment = body.get("enable_sentiment", True)
         enable_tags = body.get("enable_tags", True)
         enable_companies = body.get("enable_companies", True)
+        analysis_policy = body.get("analysis_policy")
+        policy_overrides = body.get("policy_overrides")
+        try:
+            analysis_planner.resolve_policy(analysis_policy, policy_overrides)
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"detail": str(e)})
         
         # 生成唯一的会话ID
         import uuid
@@ -370,32 +487,44 @@ async def batch_parse_data(request: Request):
                         # 生成原始ID (使用序号)
                         original_id = processed
                         
-                        # 创建分析任务
-                        analysis_tasks = []
-                        if enable_sentiment:
-                            analysis_tasks.append(sentiment_agent.analyze_sentiment(content_text))
-                        if enable_tags:
-                            analysis_tasks.append(tag_agents.analyze_tags(content_text))
-                        if enable_companies:
-                            analysis_tasks.append(company_agent.analyze_companies(content_text))
+                        # 该条数据的全部LLM调用（分析和摘要）共享时间预算，并记录重试/对冲次数
+                        summary_error = None
+                        with llm_deadline(Config.LLM_ITEM_DEADLINE), collect_llm_calls() as llm_calls:
+                            # 按分析策略执行分析（级联策略先做情感分析，再决定下游分析）
+                            analysis = await analysis_planner.run(
+                                content_text, analysis_policy, policy_overrides,
+                                enable_sentiment=enable_sentiment, enable_tags=enable_tags, enable_companies=enable_companies
+                            )
+                            
+                            # 生成内容摘要 - 使用AI生成真正的摘要
+                            # 摘要接口是同步调用（含重试退避），放到线程池中执行，避免阻塞事件循环
+                            # （复制上下文以沿用时间预算和调用记录）
+                            try:
+                                from ali_llm_client import AliLLMClient
+                                llm_client = AliLLMClient()
+                                context = contextvars.copy_context()
+                                summary = await asyncio.get_running_loop().run_in_executor(
+                                    None, context.run, llm_client.generate_summary, content_text
+                                )
+                            except Exception as e:
+                                summary_error = e
+                                summary = content_text[:200] + "..." if len(content_text) > 200 else content_text
                         
-                        # 并行执行所有分析任务
-                        analysis_results = await asyncio.gather(*analysis_tasks, return_exceptions=True)
+                        sentiment_result = analysis["sentiment"]
+                        tag_results = analysis["tags"]
+                        company_results = analysis["companies"]
                         
-                        # 解析分析结果
-                        sentiment_result = None
-                        tag_results = []
-                        company_results = []
+                        plan = analysis["plan"]
+                        if plan["saved_calls"]:
+                            plan_message = f"第 {processed} 条数据按策略 {plan['policy']} 节省 {plan['saved_calls']} 次LLM调用"
+                            yield f"data: {json.dumps({'type': 'log', 'message': plan_message})}\n\n"
                         
-                        result_index = 0
-                        if enable_sentiment:
-                            sentiment_result = analysis_results[result_index] if not isinstance(analysis_results[result_index], Exception) else None
-                            result_index += 1
-                        if enable_tags:
-                            tag_results = analysis_results[result_index] if not isinstance(analysis_results[result_index], Exception) else []
-                            result_index += 1
-                        if enable_companies:
-                            company_results = analysis_results[result_index] if not isinstance(analysis_results[result_index], Exception) else []
+                        retries = sum(call["retries"] for call in llm_calls)
+                        hedges = sum(call["hedges"] for call in llm_calls)
+                        failed_calls = [call for call in llm_calls if call["error"]]
+                        if retries or hedges or failed_calls:
+                            resilience_message = f"第 {processed} 条数据LLM调用 {len(llm_calls)} 次，重试 {retries} 次，对冲 {hedges} 次，失败 {len(failed_calls)} 次"
+                            yield f"data: {json.dumps({'type': 'warning' if failed_calls else 'log', 'message': resilience_message})}\n\n"
                         
                         # 构建标签结果字典
                         tag_results_dict = {}
@@ -406,15 +535,10 @@ async def batch_parse_data(request: Request):
                                     'reason': tag_result.reason
                                 }
                         
-                        # 生成内容摘要 - 使用AI生成真正的摘要
-                        try:
-                            from ali_llm_client import AliLLMClient
-                            llm_client = AliLLMClient()
-                            summary = llm_client.generate_summary(content_text)
+                        if summary_error is None:
                             yield f"data: {json.dumps({'type': 'log', 'message': f'第 {processed} 条数据摘要生成完成'})}\n\n"
-                        except Exception as e:
-                            summary = content_text[:200] + "..." if len(content_text) > 200 else content_text
-                            yield f"data: {json.dumps({'type': 'warning', 'message': f'第 {processed} 条数据摘要生成失败使用截取摘要: {str(e)}'})}\n\n"
+                        else:
+                            yield f"data: {json.dumps({'type': 'warning', 'message': f'第 {processed} 条数据摘要生成失败使用截取摘要: {str(summary_error)}'})}\n\n"
                         
                         # 准备数据用于重复检测
                         data_for_duplicate = {
@@ -437,7 +561,9 @@ async def batch_parse_data(request: Request):
                             'sentiment_reason': sentiment_result.reason if sentiment_result else '无原因',
                             'companies': ','.join([company.name for company in company_results]) if company_results else '',
                             'processing_time': round(time.time() - processing_start_time, 2),  # 处理时间秒
-                            'tag_results': tag_results_dict
+                            'tag_results': tag_results_dict,
+                            # 有LLM调用失败（熔断、超时等）时结果来自规则分析，标记为降级等待回填
+                            'processing_status': DEGRADED_STATUS if failed_calls else 'completed'
                         }
                         
                         # 将分析结果与数据项关联
@@ -455,8 +581,8 @@ async def batch_parse_data(request: Request):
                     yield f"data: {json.dumps({'type': 'log', 'message': f'开始执行SimHash重复检测共 {len(all_data_items)} 条数据...'})}\n\n"
                     
                     try:
-                        # 执行重复检测
-                        duplicated_results = duplicate_manager.detect_duplicates(all_data_items)
+                        # 执行重复检测（分词和SimHash计算在进程池中执行，不阻塞事件循环）
+                        duplicated_results = await duplicate_manager.detect_duplicates_async(all_data_items)
                         
                         yield f"data: {json.dumps({'type': 'log', 'message': '重复检测完成开始保存到数据库...'})}\n\n"
                         
@@ -564,20 +690,33 @@ async def get_analysis_results(
     tags: Optional[str] = Query(None, description="风险标签"),
     date_range: Optional[str] = Query(None, description="时间范围"),
     page: int = Query(1, ge=1, description="页码"),
-    page_size: int = Query(10, ge=1, le=100, description="每页大小")
+    page_size: int = Query(10, ge=1, le=100, description="每页大小"),
+    cursor: Optional[str] = Query(None, description="分页游标（上一次返回的next_cursor/prev_cursor）"),
+    after_id: Optional[int] = Query(None, description="返回id小于该值的下一页"),
+    before_id: Optional[int] = Query(None, description="返回id大于该值的上一页"),
+    count: str = Query('approx', regex="^(exact|approx|none)$", description="计数方式")
 ):
-    """获取分析结果数据"""
+    """获取分析结果数据，支持页码分页和游标分页（深分页时推荐使用游标）"""
     try:
         from result_database_new import ResultDatabase
+        from pagination import INVALID_CURSOR
         
         # 直接使用结果数据库 - 修复数据库路径
         result_db = ResultDatabase('data/analysis_results.db')
         
-        # 获取分析结果支持搜索
-        result = result_db.get_analysis_results(
+        # 风险标签过滤（逗号分隔，命中任一标签），通过tag_mask按位过滤
+        tag_list = [tag.strip() for tag in tags.split(',') if tag.strip()] if tags else None
+        
+        # 列表只返回轻量字段，正文和各类原因通过 /api/results/article/{id} 或 /api/results/articles 按需获取
+        result = result_db.get_analysis_result_list(
             page=page, 
             page_size=page_size,
-            search_keyword=search
+            search_keyword=search,
+            tags=tag_list,
+            cursor=cursor,
+            after_id=after_id,
+            before_id=before_id,
+            count=count
         )
         
         logger.info(f"数据库查询结果 - success: {result.get('success')}, total: {result.get('total')}")
@@ -590,6 +729,8 @@ async def get_analysis_results(
                 content=result,
                 media_type="application/json; charset=utf-8"
             )
+        elif result.get('error_code') == INVALID_CURSOR:
+            raise HTTPException(status_code=400, detail=result['message'])
         else:
             return {
                 "success": False,
@@ -601,6 +742,8 @@ async def get_analysis_results(
                 "total_pages": 0
             }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取分析结果失败: {str(e)}")
         return {
@@ -662,6 +805,125 @@ async def enhanced_export(
         logger.error(f"增强导出失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"增强导出失败: {str(e)}")
 
+@app.get("/api/tag_prescreen/stats")
+async def get_tag_prescreen_stats():
+    """获取标签预筛选影子模式统计（各标签相对LLM结果的精确率、召回率和可跳过比例）"""
+    return tag_agents.get_prescreen_stats()
+
+@app.post("/api/tag_prescreen/stats/reset")
+async def reset_tag_prescreen_stats():
+    """重置标签预筛选统计（调整规则后重新开始统计）"""
+    tag_agents.prescreen_stats.reset()
+    return {"message": "预筛选统计已重置"}
+
+@app.get("/api/dedup/cache")
+async def get_dedup_cache_stats():
+    """获取分词缓存统计（条目数、内存、命中率、淘汰数）"""
+    return fingerprint_service.cache_stats()
+
+@app.get("/api/ingestion/status")
+async def get_ingestion_status():
+    """获取持续采集分析状态（处理量、积压、延迟、追赶模式、延迟告警）"""
+    return ingestion_daemon.snapshot()
+
+@app.post("/api/ingestion/start")
+async def start_ingestion():
+    """启动持续采集分析"""
+    started = ingestion_daemon.start()
+    return {"message": "持续采集已启动" if started else "持续采集已在运行"}
+
+@app.post("/api/ingestion/stop")
+async def stop_ingestion():
+    """停止持续采集分析（当前批次处理完成后停止）"""
+    await ingestion_daemon.stop()
+    return {"message": "持续采集已停止"}
+
+@app.get("/api/work_queue/status")
+async def get_work_queue_status():
+    """获取分析任务队列状态（各状态任务数、最早待处理任务的等待时间、各工作进程持有的任务数）"""
+    return WorkQueue().stats()
+
+@app.post("/api/work_queue/enqueue")
+async def enqueue_work(payload: dict):
+    """
+    把舆情数据库中的文章加入分析任务队列
+    body: {"article_ids": [...]} 或 {"start_time": ..., "end_time": ...}（按发布时间范围入队）
+    """
+    article_ids = payload.get("article_ids")
+    if article_ids is not None:
+        enqueued = WorkQueue().enqueue([{"article_id": int(article_id)} for article_id in article_ids])
+        total = len(article_ids)
+    else:
+        start_time, end_time = payload.get("start_time"), payload.get("end_time")
+        filters = {"publish_time": {"start": start_time, "end": end_time}} if start_time and end_time else None
+        try:
+            enqueued, total = await asyncio.to_thread(enqueue_articles_in_range, filters)
+        except Exception as e:
+            logger.error(f"按时间范围入队失败: {str(e)}")
+            return JSONResponse(status_code=500, content={"detail": f"按时间范围入队失败: {str(e)}"})
+    return {"message": f"已入队 {enqueued} 条（共 {total} 条，其余已在队列中）", "enqueued": enqueued}
+
+def enqueue_articles_in_range(filters: Optional[dict], batch_size: int = 1000):
+    """按 id 顺序逐批读取满足条件的文章并入队（不在内存中累积全部id），返回 (入队数, 文章数)"""
+    from database_manager import UnifiedDatabaseManager
+    
+    sentiment_db = UnifiedDatabaseManager().get_sentiment_database()
+    queue = WorkQueue()
+    enqueued = total = 0
+    after_id = 0
+    while True:
+        ids = sentiment_db.get_ids_after(after_id, batch_size, filters)
+        if not ids:
+            return enqueued, total
+        enqueued += queue.enqueue([{"article_id": article_id} for article_id in ids])
+        total += len(ids)
+        after_id = ids[-1]
+
+@app.get("/api/work_queue/dead")
+async def get_dead_tasks(limit: int = Query(100, ge=1, le=1000)):
+    """查看死信任务（多次失败后不再重试的任务）"""
+    return {"tasks": WorkQueue().list_dead(limit)}
+
+@app.post("/api/work_queue/dead/retry")
+async def retry_dead_tasks(payload: Optional[dict] = None):
+    """死信任务重新入队，body: {"task_ids": [...]}，不指定时全部重新入队"""
+    retried = WorkQueue().retry_dead((payload or {}).get("task_ids"))
+    return {"message": f"已重新入队 {retried} 个任务", "retried": retried}
+
+@app.get("/api/analysis_planner/stats")
+async def get_analysis_planner_stats():
+    """获取分析计划统计（各策略的LLM调用次数及相对完整分析节省的调用次数）"""
+    return analysis_planner.get_stats()
+
+@app.post("/api/analysis_planner/stats/reset")
+async def reset_analysis_planner_stats():
+    """重置分析计划统计"""
+    analysis_planner.stats.reset()
+    return {"message": "分析计划统计已重置"}
+
+@app.get("/api/model_routing/stats")
+async def get_model_routing_stats():
+    """获取模型分级路由统计（各模型的延迟、估算费用和升级率，各路由的升级原因）"""
+    return {"routing": Config.MODEL_ROUTING, **routing_stats.snapshot(), "single_flight": single_flight.snapshot()}
+
+@app.post("/api/model_routing/stats/reset")
+async def reset_model_routing_stats():
+    """重置模型分级路由统计"""
+    routing_stats.reset()
+    single_flight.reset()
+    return {"message": "模型路由统计已重置"}
+
+@app.get("/api/llm_circuit")
+async def get_llm_circuit():
+    """获取LLM熔断器状态"""
+    return circuit_breaker.snapshot()
+
+@app.post("/api/llm_circuit/reset")
+async def reset_llm_circuit():
+    """手动关闭熔断器（确认LLM服务恢复后使用）"""
+    circuit_breaker.reset()
+    return {"message": "熔断器已重置", **circuit_breaker.snapshot()}
+
 @app.get("/api/config")
 async def get_config():
     """获取当前配置仅返回非敏感项和API Key掩码"""
@@ -681,6 +943,53 @@ async def get_config():
         "BATCH_SIZE": Config.BATCH_SIZE,
         "TAG_PROMPT_TEMPLATE": Config.TAG_PROMPT_TEMPLATE,
         "AGENT_PROMPTS": Config.AGENT_PROMPTS,
+        "TAG_PRESCREEN_MODE": Config.TAG_PRESCREEN_MODE,
+        "TAG_PRESCREEN_RULES": Config.TAG_PRESCREEN_RULES,
+        "ANALYSIS_POLICY": Config.ANALYSIS_POLICY,
+        "ANALYSIS_POLICIES": Config.ANALYSIS_POLICIES,
+        "MODEL_ROUTING": Config.MODEL_ROUTING,
+        "MODEL_PRICES": Config.MODEL_PRICES,
+        "LLM_MAX_RETRIES": Config.LLM_MAX_RETRIES,
+        "LLM_RETRY_BASE_DELAY": Config.LLM_RETRY_BASE_DELAY,
+        "LLM_RETRY_MAX_DELAY": Config.LLM_RETRY_MAX_DELAY,
+        "LLM_ITEM_DEADLINE": Config.LLM_ITEM_DEADLINE,
+        "LLM_HEDGE_ENABLED": Config.LLM_HEDGE_ENABLED,
+        "LLM_HEDGE_QUANTILE": Config.LLM_HEDGE_QUANTILE,
+        "LLM_HEDGE_MIN_SAMPLES": Config.LLM_HEDGE_MIN_SAMPLES,
+        "LLM_BREAKER_ENABLED": Config.LLM_BREAKER_ENABLED,
+        "LLM_BREAKER_WINDOW": Config.LLM_BREAKER_WINDOW,
+        "LLM_BREAKER_MIN_CALLS": Config.LLM_BREAKER_MIN_CALLS,
+        "LLM_BREAKER_ERROR_RATE": Config.LLM_BREAKER_ERROR_RATE,
+        "LLM_BREAKER_COOLDOWN": Config.LLM_BREAKER_COOLDOWN,
+        "LLM_BREAKER_HALF_OPEN_CALLS": Config.LLM_BREAKER_HALF_OPEN_CALLS,
+        "LLM_SINGLE_FLIGHT_ENABLED": Config.LLM_SINGLE_FLIGHT_ENABLED,
+        "LLM_STREAM_ENABLED": Config.LLM_STREAM_ENABLED,
+        "CHAT_RETRIEVAL_LIMIT": Config.CHAT_RETRIEVAL_LIMIT,
+        "CHAT_CONTEXT_TOKEN_BUDGET": Config.CHAT_CONTEXT_TOKEN_BUDGET,
+        "CHAT_RETRIEVAL_CACHE_TTL": Config.CHAT_RETRIEVAL_CACHE_TTL,
+        "CHAT_HISTORY_TOKEN_BUDGET": Config.CHAT_HISTORY_TOKEN_BUDGET,
+        "CHAT_SUMMARY_TOKEN_BUDGET": Config.CHAT_SUMMARY_TOKEN_BUDGET,
+        "CHAT_MEMORY_TTL": Config.CHAT_MEMORY_TTL,
+        "FILE_SOURCE_DISK_QUOTA_MB": Config.FILE_SOURCE_DISK_QUOTA_MB,
+        "API_SYNC_CONCURRENCY": Config.API_SYNC_CONCURRENCY,
+        "API_SYNC_MAX_RETRIES": Config.API_SYNC_MAX_RETRIES,
+        "INGEST_INTERVAL": Config.INGEST_INTERVAL,
+        "INGEST_BATCH_SIZE": Config.INGEST_BATCH_SIZE,
+        "INGEST_CONCURRENCY": Config.INGEST_CONCURRENCY,
+        "INGEST_CATCHUP_CONCURRENCY": Config.INGEST_CATCHUP_CONCURRENCY,
+        "INGEST_BACKLOG_THRESHOLD": Config.INGEST_BACKLOG_THRESHOLD,
+        "INGEST_MAX_LAG": Config.INGEST_MAX_LAG,
+        "INGEST_MODE": Config.INGEST_MODE,
+        "WORK_QUEUE_VISIBILITY_TIMEOUT": Config.WORK_QUEUE_VISIBILITY_TIMEOUT,
+        "WORK_QUEUE_MAX_ATTEMPTS": Config.WORK_QUEUE_MAX_ATTEMPTS,
+        "SIMHASH_POOL_WORKERS": Config.SIMHASH_POOL_WORKERS,
+        "SIMHASH_POOL_CHUNK_SIZE": Config.SIMHASH_POOL_CHUNK_SIZE,
+        "SIMHASH_POOL_MIN_BATCH": Config.SIMHASH_POOL_MIN_BATCH,
+        "TOKEN_CACHE_MAX_ENTRIES": Config.TOKEN_CACHE_MAX_ENTRIES,
+        "TOKEN_CACHE_MAX_MB": Config.TOKEN_CACHE_MAX_MB,
+        "LLM_BACKEND": Config.LLM_BACKEND,
+        "LLM_MOCK_BASE_URL": Config.LLM_MOCK_BASE_URL,
+        "LLM_BATCH_CONCURRENCY": Config.LLM_BATCH_CONCURRENCY,
     }
 
 @app.post("/api/config")
@@ -697,7 +1006,70 @@ async def update_config(payload: dict):
         "MAX_CONTENT_LENGTH": int,
         "BATCH_SIZE": int,
         "TAG_PROMPT_TEMPLATE": str,
+        "TAG_PRESCREEN_MODE": str,
+        "LLM_MAX_RETRIES": int,
+        "LLM_RETRY_BASE_DELAY": float,
+        "LLM_RETRY_MAX_DELAY": float,
+        "LLM_ITEM_DEADLINE": float,
+        "LLM_HEDGE_ENABLED": bool,
+        "LLM_HEDGE_QUANTILE": float,
+        "LLM_HEDGE_MIN_SAMPLES": int,
+        "LLM_BREAKER_ENABLED": bool,
+        "LLM_BREAKER_MIN_CALLS": int,
+        "LLM_BREAKER_ERROR_RATE": float,
+        "LLM_BREAKER_COOLDOWN": float,
+        "LLM_BREAKER_HALF_OPEN_CALLS": int,
+        "LLM_SINGLE_FLIGHT_ENABLED": bool,
+        "LLM_STREAM_ENABLED": bool,
+        "CHAT_RETRIEVAL_LIMIT": int,
+        "CHAT_CONTEXT_TOKEN_BUDGET": int,
+        "CHAT_RETRIEVAL_CACHE_TTL": float,
+        "CHAT_HISTORY_TOKEN_BUDGET": int,
+        "CHAT_SUMMARY_TOKEN_BUDGET": int,
+        "CHAT_MEMORY_TTL": float,
+        "FILE_SOURCE_DISK_QUOTA_MB": float,
+        "API_SYNC_CONCURRENCY": int,
+        "API_SYNC_MAX_RETRIES": int,
+        "INGEST_INTERVAL": float,
+        "INGEST_BATCH_SIZE": int,
+        "INGEST_CONCURRENCY": int,
+        "INGEST_CATCHUP_CONCURRENCY": int,
+        "INGEST_BACKLOG_THRESHOLD": int,
+        "INGEST_MAX_LAG": float,
+        "INGEST_MODE": str,
+        "WORK_QUEUE_VISIBILITY_TIMEOUT": float,
+        "WORK_QUEUE_MAX_ATTEMPTS": int,
+        "SIMHASH_POOL_CHUNK_SIZE": int,
+        "SIMHASH_POOL_MIN_BATCH": int,
+        "TOKEN_CACHE_MAX_ENTRIES": int,
+        "TOKEN_CACHE_MAX_MB": float,
+        "LLM_BACKEND": str,
+        "LLM_MOCK_BASE_URL": str,
+        "LLM_BATCH_CONCURRENCY": int,
     }
+    if "TAG_PRESCREEN_MODE" in payload and payload["TAG_PRESCREEN_MODE"] not in (None, "off", "shadow", "enforce"):
+        return JSONResponse(status_code=400, content={"detail": "TAG_PRESCREEN_MODE 只能是 off / shadow / enforce"})
+    if "INGEST_MODE" in payload and payload["INGEST_MODE"] not in (None, "inline", "queue"):
+        return JSONResponse(status_code=400, content={"detail": "INGEST_MODE 只能是 inline / queue"})
+    if payload.get("LLM_BACKEND") is not None:
+        from llm_backends import BACKENDS
+        if payload["LLM_BACKEND"] not in BACKENDS:
+            return JSONResponse(status_code=400, content={"detail": f"LLM_BACKEND 只能是 {' / '.join(BACKENDS)}"})
+    
+    # 分析策略先校验（自定义策略与默认策略一起校验），全部合法后再生效
+    if payload.get("ANALYSIS_POLICIES") is not None or payload.get("ANALYSIS_POLICY") is not None:
+        previous_policies = Config.ANALYSIS_POLICIES
+        try:
+            if payload.get("ANALYSIS_POLICIES") is not None:
+                from agents.analysis_planner import validate_policies
+                validate_policies(payload["ANALYSIS_POLICIES"])
+                Config.ANALYSIS_POLICIES = payload["ANALYSIS_POLICIES"]
+            if payload.get("ANALYSIS_POLICY") is not None:
+                analysis_planner.resolve_policy(str(payload["ANALYSIS_POLICY"]))
+        except ValueError as e:
+            Config.ANALYSIS_POLICIES = previous_policies
+            return JSONResponse(status_code=400, content={"detail": f"分析策略配置无效: {e}"})
+    
     updated = {}
     for key, caster in updatable_fields.items():
         if key in payload and payload[key] is not None:
@@ -708,6 +1080,8 @@ async def update_config(payload: dict):
                     value = value.lower() == "true"
                 elif caster is int and isinstance(value, str):
                     value = int(value)
+                elif caster is float:
+                    value = float(value)
                 setattr(Config, key, value)
                 updated[key] = value if key != "ALI_API_KEY" else "UPDATED"
             except Exception as e:
@@ -736,6 +1110,36 @@ async def update_config(payload: dict):
         except Exception as e:
             return JSONResponse(status_code=400, content={"detail": f"AGENT_PROMPTS更新失败: {e}"})
 
+    # 标签预筛选规则更新后立即重新编译
+    if "TAG_PRESCREEN_RULES" in payload and payload["TAG_PRESCREEN_RULES"] is not None:
+        try:
+            if not isinstance(payload["TAG_PRESCREEN_RULES"], dict):
+                return JSONResponse(status_code=400, content={"detail": "TAG_PRESCREEN_RULES必须是字典格式"})
+            tag_agents.reload_prescreen_rules(payload["TAG_PRESCREEN_RULES"])
+            updated["TAG_PRESCREEN_RULES"] = "UPDATED"
+        except Exception as e:
+            return JSONResponse(status_code=400, content={"detail": f"TAG_PRESCREEN_RULES更新失败: {e}"})
+
+    if payload.get("ANALYSIS_POLICY") is not None:
+        Config.ANALYSIS_POLICY = str(payload["ANALYSIS_POLICY"])
+        updated["ANALYSIS_POLICY"] = Config.ANALYSIS_POLICY
+    if payload.get("ANALYSIS_POLICIES") is not None:
+        updated["ANALYSIS_POLICIES"] = "UPDATED"
+
+    # 模型路由配置下一次LLM调用即生效
+    if payload.get("MODEL_ROUTING") is not None:
+        try:
+            validate_routing(payload["MODEL_ROUTING"])
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"detail": f"MODEL_ROUTING无效: {e}"})
+        Config.MODEL_ROUTING = payload["MODEL_ROUTING"]
+        updated["MODEL_ROUTING"] = "UPDATED"
+    if payload.get("MODEL_PRICES") is not None:
+        if not isinstance(payload["MODEL_PRICES"], dict):
+            return JSONResponse(status_code=400, content={"detail": "MODEL_PRICES必须是字典格式"})
+        Config.MODEL_PRICES = payload["MODEL_PRICES"]
+        updated["MODEL_PRICES"] = "UPDATED"
+
     # 同步到相关运行实例例如AliLLMClient此处仅在下次实例化生效
     # 如需立刻生效可考虑重新创建相关客户端实例
     return {"message": "配置已更新进程内", "updated": updated}
@@ -743,6 +1147,9 @@ async def update_config(payload: dict):
 
 def setup_api_key():
     """在启动时要求用户输入API密钥"""
+    import getpass
+    from api_key_manager import api_key_manager
+    
     print("=" * 60)
     print(" 舆情分析系统启动")
     print("=" * 60)
@@ -785,6 +1192,8 @@ def setup_api_key():
 
 
 if __name__ == "__main__":
+    import uvicorn
+    
     # 启动时配置API密钥
     setup_api_key()
     
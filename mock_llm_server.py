@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+本地模拟LLM服务（OpenAI兼容接口），用于离线压测 /api/batch_parse 等完整分析链路
+- POST /v1/chat/completions：支持普通和流式（SSE）响应，返回token用量
+- GET  /v1/models：模型列表
+- GET  /mock/stats、POST /mock/stats/reset：请求计数、错误计数和延迟统计
+- POST /mock/settings：运行时调整延迟、错误率、限流等参数
+按提示词识别任务类型，返回各Agent能够解析的格式：
+- 标签分析：判断结果：是/否 + 分析原因
+- 情感分析：情感等级 + 分析原因
+- 企业识别：```json [...]``` 企业名称数组（同步客户端为逗号分隔），企业名从文本中按后缀匹配
+- 摘要：截取文本开头
+随机数使用固定种子，并以请求内容参与取值，同一份语料多次压测结果可复现。
+
+启动：python mock_llm_server.py --port 8900 --latency lognormal --latency-ms 300 --error-rate 0.02
+之后设置 LLM_BACKEND=mock（或通过 /api/config 修改）即可让分析服务调用本服务。
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'normal', 'lognormal', 'exponential')
+
+SENTIMENT_LEVELS = ('负面三级', '负面二级', '负面一级', '中性', '正面')
+
+# 企业名称：2-20个字符加常见企业后缀；以代词开头的泛称（“其子公司”“该公司”）不算企业名
+COMPANY_PATTERN = re.compile(
+    r'(?<![其该本此])(?![其该本此子母司])(?:(?!公司|集团)[一-龥A-Za-z0-9（）()]){2,20}?'
+    r'(?:股份有限公司|有限责任公司|有限公司|集团|银行|证券|公司)'
+)
+
+
+@dataclass
+class MockSettings:
+    # 延迟分布及参数：latency_ms 为均值（fixed/normal/lognormal/exponential）或下限（uniform），
+    # latency_jitter_ms 为标准差（normal/lognormal）或 uniform 的区间宽度
+    latency: str = 'fixed'
+    latency_ms: float = 200.0
+    latency_jitter_ms: float = 50.0
+    # 流式响应每个数据块的字符数和间隔
+    stream_chunk_chars: int = 8
+    stream_interval_ms: float = 10.0
+    # 错误注入：按 error_rate 返回 error_statuses 中的状态码；按 timeout_rate 挂起 timeout_ms 后断开
+    error_rate: float = 0.0
+    error_statuses: List[int] = field(default_factory=lambda: [500, 502, 503])
+    timeout_rate: float = 0.0
+    timeout_ms: float = 60000.0
+    # 令牌桶限流（每秒请求数，0 表示不限流），超出时返回429和 Retry-After
+    rate_limit_rps: float = 0.0
+    rate_limit_burst: int = 10
+    # 标签分析返回“是”的比例；情感等级分布（与 SENTIMENT_LEVELS 顺序一致）
+    tag_positive_rate: float = 0.2
+    sentiment_weights: List[float] = field(default_factory=lambda: [0.05, 0.15, 0.25, 0.4, 0.15])
+    seed: int = 42
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def acquire(self) -> Optional[float]:
+        """取一个令牌，成功返回None，失败返回需要等待的秒数"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return None
+        return (1 - self.tokens) / self.rate
+
+
+class MockLLMServer:
+    """模拟服务状态：参数、随机数、限流器和统计"""
+
+    def __init__(self, settings: Optional[MockSettings] = None, responses: Optional[Dict[str, str]] = None):
+        self.settings = settings or MockSettings()
+        # 固定回复：任务类型（tag/sentiment/company/summary/chat）-> 回复文本，优先于生成的回复
+        self.responses = dict(responses or {})
+        self.rng = random.Random(self.settings.seed)
+        self.bucket = self._make_bucket()
+        self.reset_stats()
+
+    def _make_bucket(self) -> Optional[TokenBucket]:
+        if self.settings.rate_limit_rps > 0:
+            return TokenBucket(self.settings.rate_limit_rps, self.settings.rate_limit_burst)
+        return None
+
+    def reset_stats(self):
+        self.stats: Dict[str, Any] = {'requests': 0, 'streams': 0, 'errors': 0, 'timeouts': 0,
+                                      'rate_limited': 0, 'by_task': {}, 'latencies_ms': []}
+        self.started = time.time()
+
+    def update_settings(self, values: Dict[str, Any]) -> List[str]:
+        """更新参数，返回已更新的字段名；未知字段和非法的延迟分布抛出 ValueError"""
+        known = {item.name: item for item in fields(MockSettings)}
+        unknown = [key for key in values if key not in known]
+        if unknown:
+            raise ValueError(f"未知参数: {', '.join(unknown)}")
+        if 'latency' in values and values['latency'] not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"latency 只能是 {' / '.join(LATENCY_DISTRIBUTIONS)}")
+        for key, value in values.items():
+            setattr(self.settings, key, value)
+        if 'seed' in values:
+            self.rng = random.Random(self.settings.seed)
+        if {'rate_limit_rps', 'rate_limit_burst'} & set(values):
+            self.bucket = self._make_bucket()
+        return list(values)
+
+    def snapshot(self) -> Dict[str, Any]:
+        latencies = sorted(self.stats['latencies_ms'])
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 2)
+
+        elapsed = time.time() - self.started
+        return {
+            **{key: value for key, value in self.stats.items() if key != 'latencies_ms'},
+            'elapsed_seconds': round(elapsed, 2),
+            'rps': round(self.stats['requests'] / elapsed, 2) if elapsed > 0 else None,
+            'latency_ms': {'p50': percentile(0.5), 'p95': percentile(0.95), 'p99': percentile(0.99)},
+            'settings': asdict(self.settings),
+        }
+
+    def sample_latency(self) -> float:
+        """按配置的分布取一次延迟（秒）"""
+        s, rng = self.settings, self.rng
+        mean, jitter = max(0.0, s.latency_ms), max(0.0, s.latency_jitter_ms)
+        if s.latency == 'uniform':
+            value = rng.uniform(mean, mean + jitter)
+        elif s.latency == 'normal':
+            value = rng.gauss(mean, jitter)
+        elif s.latency == 'lognormal' and mean > 0:
+            # 由均值和标准差换算对数正态分布参数
+            sigma2 = math.log(1 + (jitter / mean) ** 2)
+            value = rng.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+        elif s.latency == 'exponential' and mean > 0:
+            value = rng.expovariate(1 / mean)
+        else:
+            value = mean
+        return max(0.0, value) / 1000
+
+    # ---------- 回复生成 ----------
+
+    @staticmethod
+    def detect_task(prompt: str) -> str:
+        if '判断结果' in prompt:
+            return 'tag'
+        if '情感等级' in prompt:
+            return 'sentiment'
+        if '企业' in prompt and ('JSON' in prompt or '涉及企业' in prompt):
+            return 'company'
+        if '摘要' in prompt:
+            return 'summary'
+        return 'chat'
+
+    @staticmethod
+    def extract_content(prompt: str) -> str:
+        """取出提示词中的待分析文本（模板在“文本内容：”之后填入文本），找不到标记时返回整个提示词"""
+        marker = prompt.rfind('文本内容：')
+        content = prompt[marker + len('文本内容：'):] if marker >= 0 else prompt
+        for suffix in ('涉及企业：', '摘要：'):
+            if content.rstrip().endswith(suffix):
+                content = content.rstrip()[:-len(suffix)]
+        return content.strip()
+
+    def _content_rng(self, prompt: str) -> random.Random:
+        # 以种子和提示词摘要确定随机数，同一文本的结果不受请求并发顺序影响
+        digest = hashlib.blake2b(prompt.encode('utf-8'), digest_size=8).digest()
+        return random.Random(self.settings.seed ^ int.from_bytes(digest, 'big'))
+
+    def build_reply(self, task: str, prompt: str) -> str:
+        if task in self.responses:
+            return self.responses[task]
+        rng = self._content_rng(prompt)
+        if task == 'tag':
+            if rng.random() < self.settings.tag_positive_rate:
+                return "判断结果：是\n分析原因：文本提及相关事件，涉及该标签定义的风险点（模拟回复）。"
+            return "判断结果：否\n分析原因：文本未提及该标签定义的风险事件（模拟回复）。"
+        if task == 'sentiment':
+            level = rng.choices(SENTIMENT_LEVELS, weights=self.settings.sentiment_weights)[0]
+            return f"情感等级：{level}\n分析原因：根据文本描述的事件判断为{level}（模拟回复）。"
+        content = self.extract_content(prompt)
+        if task == 'company':
+            names = list(dict.fromkeys(COMPANY_PATTERN.findall(content)))[:10]
+            if '涉及企业' in prompt:
+                return ', '.join(names) if names else '无'
+            return "```json\n" + json.dumps(names, ensure_ascii=False, indent=4) + "\n```"
+        if task == 'summary':
+            return content[:100] or '无内容'
+        return "这是模拟服务的回复，用于离线压测。"
+
+    @staticmethod
+    def count_tokens(text: str) -> int:
+        # 粗略估算：中文约每字一个token
+        return max(1, len(text))
+
+    # ---------- 请求处理 ----------
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            return self._error(400, "请求体不是合法的JSON")
+        messages = body.get('messages') or []
+        if not messages:
+            return self._error(400, "messages 不能为空")
+        started = time.perf_counter()
+        prompt = str(messages[-1].get('content', ''))
+        task = self.detect_task(prompt)
+        stream = bool(body.get('stream'))
+        self.stats['requests'] += 1
+        self.stats['by_task'][task] = self.stats['by_task'].get(task, 0) + 1
+
+        if self.bucket is not None:
+            wait = self.bucket.acquire()
+            if wait is not None:
+                self.stats['rate_limited'] += 1
+                return self._error(429, "请求过于频繁", headers={'Retry-After': str(max(1, math.ceil(wait)))})
+
+        await asyncio.sleep(self.sample_latency())
+        roll = self.rng.random()
+        if roll < self.settings.timeout_rate:
+            self.stats['timeouts'] += 1
+            await asyncio.sleep(self.settings.timeout_ms / 1000)
+            return self._error(504, "模拟超时")
+        if roll < self.settings.timeout_rate + self.settings.error_rate:
+            self.stats['errors'] += 1
+            return self._error(self.rng.choice(self.settings.error_statuses or [500]), "模拟服务错误")
+
+        reply = self.build_reply(task, prompt)
+        model = body.get('model', 'mock')
+        usage = {
+            'prompt_tokens': sum(self.count_tokens(str(m.get('content', ''))) for m in messages),
+            'completion_tokens': self.count_tokens(reply),
+        }
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        if stream:
+            self.stats['streams'] += 1
+            response = await self._stream(request, model, reply, usage, body.get('stream_options') or {})
+        else:
+            response = web.json_response({
+                'id': f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': reply}, 'finish_reason': 'stop'}],
+                'usage': usage,
+            })
+        self.stats['latencies_ms'].append((time.perf_counter() - started) * 1000)
+        return response
+
+    async def _stream(self, request: web.Request, model: str, reply: str, usage: Dict[str, int],
+                      stream_options: Dict[str, Any]) -> web.StreamResponse:
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'})
+        await response.prepare(request)
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        size = max(1, self.settings.stream_chunk_chars)
+
+        async def send(payload: Dict[str, Any]):
+            await response.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode('utf-8'))
+
+        for start in range(0, len(reply), size):
+            await send({'id': chunk_id, 'object': 'chat.completion.chunk', 'model': model,
+                        'choices': [{'index': 0, 'delta': {'content': reply[start:start + size]}, 'finish_reason': None}]})
+            if self.settings.stream_interval_ms > 0:
+                await asyncio.sleep(self.settings.stream_interval_ms / 1000)
+        await send({'id': chunk_id, 'object': 'chat.completion.chunk', 'model': model,
+                    'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})
+        if stream_options.get('include_usage'):
+            await send({'id': chunk_id, 'object': 'chat.completion.chunk', 'model': model,
+                        'choices': [], 'usage': usage})
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    @staticmethod
+    def _error(status: int, message: str, headers: Optional[Dict[str, str]] = None) -> web.Response:
+        return web.json_response({'error': {'message': message, 'code': status}}, status=status, headers=headers)
+
+    async def models(self, request: web.Request) -> web.Response:
+        from config import Config
+        names = dict.fromkeys([Config.ALI_MODEL_NAME, *Config.MODEL_PRICES, 'mock'])
+        return web.json_response({'object': 'list', 'data': [{'id': name, 'object': 'model'} for name in names if name]})
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.snapshot())
+
+    async def post_reset(self, request: web.Request) -> web.Response:
+        self.reset_stats()
+        return web.json_response({'success': True})
+
+    async def post_settings(self, request: web.Request) -> web.Response:
+        try:
+            updated = self.update_settings(await request.json())
+        except (ValueError, json.JSONDecodeError) as e:
+            return self._error(400, str(e))
+        return web.json_response({'success': True, 'updated': updated, 'settings': asdict(self.settings)})
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/v1/chat/completions', self.chat_completions)
+        app.router.add_get('/v1/models', self.models)
+        app.router.add_get('/mock/stats', self.get_stats)
+        app.router.add_post('/mock/stats/reset', self.post_reset)
+        app.router.add_post('/mock/settings', self.post_settings)
+        return app
+
+
+def start_in_thread(server: Optional[MockLLMServer] = None, host: str = '127.0.0.1',
+                    port: int = 8900) -> Tuple[MockLLMServer, threading.Thread, asyncio.AbstractEventLoop]:
+    """在后台线程中启动模拟服务（供压测脚本使用），返回服务、线程和事件循环；停止时调用 loop.call_soon_threadsafe(loop.stop)"""
+    server = server or MockLLMServer()
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        runner = web.AppRunner(server.make_app(), access_log=None)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, host, port).start())
+        ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.run_until_complete(runner.cleanup())
+            loop.close()
+
+    thread = threading.Thread(target=run, name='mock-llm-server', daemon=True)
+    thread.start()
+    if not ready.wait(10):
+        raise RuntimeError(f"模拟LLM服务启动失败: {host}:{port}")
+    return server, thread, loop
+
+
+def load_responses(path: Optional[str]) -> Dict[str, str]:
+    """读取固定回复文件（JSON对象：任务类型 -> 回复文本）"""
+    if not path:
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟LLM服务（OpenAI兼容接口）')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', choices=LATENCY_DISTRIBUTIONS, default='fixed', help='延迟分布')
+    parser.add_argument('--latency-ms', type=float, default=200.0, help='延迟均值（uniform 为下限）')
+    parser.add_argument('--latency-jitter-ms', type=float, default=50.0, help='延迟标准差（uniform 为区间宽度）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回错误状态码的比例')
+    parser.add_argument('--error-statuses', default='500,502,503', help='错误状态码，逗号分隔')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='挂起不响应的比例')
+    parser.add_argument('--rate-limit-rps', type=float, default=0.0, help='限流（每秒请求数，0 不限流）')
+    parser.add_argument('--rate-limit-burst', type=int, default=10)
+    parser.add_argument('--tag-positive-rate', type=float, default=0.2)
+    parser.add_argument('--responses', help='固定回复文件（JSON：任务类型 -> 回复文本）')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    settings = MockSettings(
+        latency=args.latency,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        error_rate=args.error_rate,
+        error_statuses=[int(code) for code in args.error_statuses.split(',') if code.strip()],
+        timeout_rate=args.timeout_rate,
+        rate_limit_rps=args.rate_limit_rps,
+        rate_limit_burst=args.rate_limit_burst,
+        tag_positive_rate=args.tag_positive_rate,
+        seed=args.seed,
+    )
+    server = MockLLMServer(settings, load_responses(args.responses))
+    print(f"模拟LLM服务: http://{args.host}:{args.port}/v1 （设置 LLM_BACKEND=mock 使用）")
+    web.run_app(server.make_app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == '__main__':
+    main()
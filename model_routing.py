@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+模型分级路由
+按Agent配置由快到强的候选模型（tiers），先调用便宜的模型，结果无法解析、置信度不足或命中高风险等级时
+升级到下一级模型；同时按模型统计调用次数、延迟、估算费用和升级率，用于调整阈值
+
+路由配置（Config.MODEL_ROUTING）:
+    {
+        "情感分析": {"tiers": ["qwen-turbo", "qwen-plus"], "min_confidence": 0.6, "escalate_on": ["负面三级"]},
+        "default": {"tiers": ["qwen-turbo"]}
+    }
+路由名称：情感分析 / 企业识别 / 各标签名称 / 摘要 / 聊天 / 对话摘要；未配置的路由使用 default，
+都未配置时只使用客户端的默认模型（与原有行为一致）
+"""
+
+import threading
+from typing import Callable, Dict, List, Optional
+
+from config import Config
+
+# 路由字段及默认值
+#   tiers: 候选模型，由快到强
+#   min_confidence: 响应置信度（由调用方的校验函数给出，0~1）低于该值时升级
+#   escalate_on: 响应中包含这些词时升级（用于高风险结论的复核，如 负面三级）
+ROUTE_DEFAULTS = {
+    "tiers": [],
+    "min_confidence": 0.6,
+    "escalate_on": [],
+}
+
+# 升级原因
+ESCALATE_UNPARSEABLE = "unparseable"
+ESCALATE_LOW_CONFIDENCE = "low_confidence"
+ESCALATE_HIGH_SEVERITY = "high_severity"
+
+
+def resolve_route(route: Optional[str], default_model: str) -> dict:
+    """解析路由配置，返回补全默认值后的配置（tiers 至少包含一个模型）"""
+    routing = Config.MODEL_ROUTING or {}
+    config = (routing.get(route) if route else None) or routing.get("default") or {}
+    merged = {**ROUTE_DEFAULTS, **config}
+    merged["tiers"] = list(merged["tiers"] or []) or [default_model]
+    return merged
+
+
+def validate_routing(routing: Dict[str, dict]) -> None:
+    """校验路由配置，非法时抛出 ValueError"""
+    if not isinstance(routing, dict):
+        raise ValueError("MODEL_ROUTING必须是字典格式")
+    for route, config in routing.items():
+        if not isinstance(config, dict):
+            raise ValueError(f"路由 {route} 必须是字典格式")
+        unknown = set(config) - set(ROUTE_DEFAULTS)
+        if unknown:
+            raise ValueError(f"路由 {route} 包含未知字段: {', '.join(sorted(unknown))}")
+        tiers = config.get("tiers", [])
+        if not isinstance(tiers, list) or not all(isinstance(model, str) and model for model in tiers):
+            raise ValueError(f"路由 {route} 的 tiers 必须是模型名称列表")
+        if not isinstance(config.get("escalate_on", []), list):
+            raise ValueError(f"路由 {route} 的 escalate_on 必须是列表")
+        try:
+            float(config.get("min_confidence", 0))
+        except (TypeError, ValueError):
+            raise ValueError(f"路由 {route} 的 min_confidence 必须是数字")
+
+
+def escalation_reason(response: str, route_config: dict,
+                      validator: Optional[Callable[[str], float]] = None) -> Optional[str]:
+    """
+    判断响应是否需要升级到下一级模型
+
+    Args:
+        validator: 调用方提供的校验函数，返回响应的置信度（0 表示无法解析）
+
+    Returns:
+        升级原因，不需要升级时返回 None
+    """
+    if validator is not None:
+        try:
+            confidence = float(validator(response))
+        except Exception:
+            confidence = 0.0
+        if confidence <= 0:
+            return ESCALATE_UNPARSEABLE
+        if confidence < float(route_config["min_confidence"]):
+            return ESCALATE_LOW_CONFIDENCE
+
+    for keyword in route_config["escalate_on"]:
+        if keyword and keyword in response:
+            return ESCALATE_HIGH_SEVERITY
+    return None
+
+
+def estimate_cost(model: str, usage: Optional[dict]) -> float:
+    """按 Config.MODEL_PRICES（元/千token）估算单次调用费用，未配置价格的模型按0计算"""
+    if not usage:
+        return 0.0
+    price = (Config.MODEL_PRICES or {}).get(model) or {}
+    return (usage.get("prompt_tokens", 0) * price.get("input", 0.0)
+            + usage.get("completion_tokens", 0) * price.get("output", 0.0)) / 1000
+
+
+class ModelRoutingStats:
+    """按模型统计调用次数、失败次数、延迟、token、估算费用、重试和对冲次数，按路由统计升级率"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._models: Dict[str, dict] = {}
+            self._routes: Dict[str, dict] = {}
+
+    def _model_stats(self, model: str) -> dict:
+        return self._models.setdefault(model, {
+            "calls": 0,
+            "errors": 0,
+            "total_latency": 0.0,
+            "max_latency": 0.0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "estimated_cost": 0.0,
+            "escalations": 0,
+            "retries": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "deadline_exceeded": 0,
+            "circuit_rejected": 0,
+        })
+
+    def record_call(self, model: str, latency: float, usage: Optional[dict] = None, success: bool = True):
+        """记录一次模型请求（每次重试、对冲都单独记录）"""
+        usage = usage or {}
+        with self._lock:
+            stats = self._model_stats(model)
+            stats["calls"] += 1
+            if not success:
+                stats["errors"] += 1
+            stats["total_latency"] += latency
+            stats["max_latency"] = max(stats["max_latency"], latency)
+            stats["prompt_tokens"] += usage.get("prompt_tokens", 0)
+            stats["completion_tokens"] += usage.get("completion_tokens", 0)
+            stats["estimated_cost"] += estimate_cost(model, usage)
+
+    def record_resilience(self, model: str, retries: int, hedges: int, hedge_wins: int, deadline_exceeded: bool,
+                          circuit_open: bool = False):
+        """记录一次LLM调用的重试、对冲次数，以及是否超出时间预算、是否因熔断被拒绝"""
+        with self._lock:
+            stats = self._model_stats(model)
+            stats["retries"] += retries
+            stats["hedges"] += hedges
+            stats["hedge_wins"] += hedge_wins
+            if deadline_exceeded:
+                stats["deadline_exceeded"] += 1
+            if circuit_open:
+                stats["circuit_rejected"] += 1
+
+    def record_request(self, route: Optional[str], final_model: str, escalations: List[tuple]):
+        """
+        记录一次路由请求的结果
+
+        Args:
+            final_model: 最终采用结果的模型
+            escalations: 升级记录 [(升级前模型, 升级原因)]
+        """
+        route = route or "default"
+        with self._lock:
+            stats = self._routes.setdefault(route, {"requests": 0, "escalated": 0, "reasons": {}, "final_models": {}})
+            stats["requests"] += 1
+            if escalations:
+                stats["escalated"] += 1
+            for model, reason in escalations:
+                stats["reasons"][reason] = stats["reasons"].get(reason, 0) + 1
+                if model in self._models:
+                    self._models[model]["escalations"] += 1
+            stats["final_models"][final_model] = stats["final_models"].get(final_model, 0) + 1
+
+    def snapshot(self) -> dict:
+        """返回各模型和各路由的统计"""
+        with self._lock:
+            models = {}
+            for model, stats in self._models.items():
+                models[model] = {
+                    **stats,
+                    "total_latency": round(stats["total_latency"], 3),
+                    "max_latency": round(stats["max_latency"], 3),
+                    "avg_latency": round(stats["total_latency"] / stats["calls"], 3) if stats["calls"] else None,
+                    "estimated_cost": round(stats["estimated_cost"], 6),
+                    "escalation_rate": round(stats["escalations"] / stats["calls"], 4) if stats["calls"] else None,
+                }
+            routes = {
+                route: {
+                    **stats,
+                    "reasons": dict(stats["reasons"]),
+                    "final_models": dict(stats["final_models"]),
+                    "escalation_rate": round(stats["escalated"] / stats["requests"], 4) if stats["requests"] else None,
+                }
+                for route, stats in self._routes.items()
+            }
+            return {"models": models, "routes": routes}
+
+
+# 进程内共享的统计（各Agent分别持有客户端实例）
+routing_stats = ModelRoutingStats()
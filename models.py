@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 
 class AnalysisRequest(BaseModel):
     content: str
+    # 分析策略名称及请求级覆盖字段，为空时使用 Config.ANALYSIS_POLICY
+    analysis_policy: Optional[str] = None
+    policy_overrides: Optional[dict] = None
 
 class AnalyzeRequest(BaseModel):
     content: str
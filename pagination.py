@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+分页工具
+提供基于游标（keyset）的分页和可选的近似计数，避免深分页时 OFFSET 扫描和全表 COUNT(*)
+"""
+
+import base64
+import binascii
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# 近似计数最多扫描的行数，超过后返回估算值
+APPROX_COUNT_LIMIT = 10000
+
+# 计数模式: approx 近似（默认）, exact 精确, none 不计数
+COUNT_MODES = ('approx', 'exact', 'none')
+
+# 游标无效时数据层返回的错误码，接口据此返回 400
+INVALID_CURSOR = 'invalid_cursor'
+
+
+class InvalidCursorError(ValueError):
+    """分页游标格式错误，或与当前排序方式不匹配"""
+
+
+def encode_cursor(values: Sequence[Any], direction: str = 'next', sort: Optional[str] = None) -> str:
+    """将排序键（及生成游标时的排序方式）编码为不透明游标"""
+    payload = {'v': list(values), 'd': direction}
+    if sort is not None:
+        payload['s'] = sort
+    payload = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: Optional[str] = None) -> Tuple[List[Any], str]:
+    """
+    解析游标，返回 (排序键, 方向)
+
+    Args:
+        sort: 当前查询的排序方式，与游标中记录的不一致时拒绝（换了排序后沿用旧游标会返回错误的行）
+
+    Raises:
+        InvalidCursorError: 格式错误或排序方式不匹配
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        values = payload['v']
+        direction = payload.get('d', 'next')
+        cursor_sort = payload.get('s')
+    except (ValueError, KeyError, TypeError, AttributeError, binascii.Error, UnicodeError) as e:
+        raise InvalidCursorError(f"无效的分页游标: {cursor}") from e
+
+    if not isinstance(values, list) or direction not in ('next', 'prev'):
+        raise InvalidCursorError(f"无效的分页游标: {cursor}")
+    if sort is not None and cursor_sort != sort:
+        raise InvalidCursorError(f"分页游标与当前排序方式不匹配: {cursor_sort} != {sort}")
+    return values, direction
+
+
+def keyset_condition(columns: Sequence[str], values: Sequence[Any], order: str,
+                     direction: str) -> Tuple[str, List[Any], str]:
+    """
+    构建 keyset 分页条件
+
+    多列时在行值比较前加上首列的范围条件（如 a <= ? AND (a, id) < (?, ?)），
+    SQLite 不会用行值比较定位索引，有了首列范围才能直接 SEARCH 到游标位置而不是从头扫描索引。
+
+    Args:
+        columns: 排序键列（表达式），最后一列应为唯一键（如 id）
+        values: 游标中的排序键值
+        order: 列表的排序方向 ASC / DESC
+        direction: next 下一页 / prev 上一页
+
+    Returns:
+        (WHERE条件, 参数, 本次查询实际使用的排序方向)
+    """
+    order = order.upper()
+    if len(values) != len(columns):
+        raise InvalidCursorError("分页游标与排序字段不匹配")
+
+    forward = direction == 'next'
+    operator = '<' if (order == 'DESC') == forward else '>'
+    query_order = order if forward else ('ASC' if order == 'DESC' else 'DESC')
+
+    if len(columns) == 1:
+        return f"{columns[0]} {operator} ?", list(values), query_order
+
+    placeholders = ', '.join(['?'] * len(columns))
+    condition = f"{columns[0]} {operator}= ? AND ({', '.join(columns)}) {operator} ({placeholders})"
+    return condition, [values[0]] + list(values), query_order
+
+
+def build_page(rows: List[Any], page_size: int, key_func: Callable[[Any], Sequence[Any]],
+               direction: str = 'next', has_previous: bool = False,
+               sort: Optional[str] = None) -> Tuple[List[Any], Dict[str, Any]]:
+    """
+    根据多取一行的查询结果生成当前页和前后游标
+
+    Args:
+        rows: 以 LIMIT page_size + 1 查询得到的行（按本次查询排序）
+        page_size: 每页大小
+        key_func: 从行中提取排序键
+        direction: 本次查询方向
+        has_previous: 正向查询时是否存在上一页（带游标或页码大于1）
+        sort: 排序方式，写入游标供下次解析时校验
+
+    Returns:
+        (当前页行, 分页信息)
+    """
+    has_extra = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == 'prev':
+        rows.reverse()
+
+    has_next = has_extra if direction == 'next' else True
+    has_prev = has_previous if direction == 'next' else has_extra
+
+    return rows, {
+        'has_more': has_next,
+        'next_cursor': encode_cursor(key_func(rows[-1]), 'next', sort) if rows and has_next else None,
+        'prev_cursor': encode_cursor(key_func(rows[0]), 'prev', sort) if rows and has_prev else None,
+    }
+
+
+def count_rows(cursor, table: str, where_clause: str, params: Sequence[Any],
+               mode: str = 'approx', limit: int = APPROX_COUNT_LIMIT) -> Tuple[Optional[int], bool]:
+    """
+    按模式统计记录数
+
+    approx 模式最多扫描 limit 行：未超过时即为精确值；超过时无过滤条件用 rowid 范围估算，
+    有过滤条件则返回下限 limit。
+
+    Returns:
+        (记录数, 是否精确)，none 模式返回 (None, False)
+    """
+    if mode == 'none':
+        return None, False
+
+    if mode == 'exact':
+        cursor.execute(f'SELECT COUNT(*) FROM {table} {where_clause}', list(params))
+        return cursor.fetchone()[0], True
+
+    cursor.execute(
+        f'SELECT COUNT(*) FROM (SELECT 1 FROM {table} {where_clause} LIMIT ?)',
+        list(params) + [limit + 1]
+    )
+    counted = cursor.fetchone()[0]
+    if counted <= limit:
+        return counted, True
+
+    if not where_clause:
+        cursor.execute(f'SELECT MAX(rowid) - MIN(rowid) + 1 FROM {table}')
+        estimate = cursor.fetchone()[0] or limit
+        return max(estimate, limit), False
+    return limit, False
+
+
+def total_pages(total: Optional[int], page_size: int) -> Optional[int]:
+    """根据记录数计算总页数"""
+    if total is None:
+        return None
+    return (total + page_size - 1) // page_size
@@ -2,14 +2,155 @@
 
 import sqlite3
 import os
+import re
+import threading
 from datetime import datetime
 import json
+from pagination import (INVALID_CURSOR, InvalidCursorError, build_page, count_rows, decode_cursor, keyset_condition,
+                        total_pages)
+from stats_rollup import (DAY_EXPR, dimension, install_rollup_triggers, read_rollup, read_rollup_series,
+                          read_rollup_total, rebuild_rollups)
+
+# 14个风险标签，列表顺序即tag_mask中的位序，新增标签只能追加到末尾
+TAG_NAMES = [
+    "同业竞争", "股权与控制权", "关联交易", "历史沿革与股东核查", "重大违法违规",
+    "收入与成本", "财务内控不规范", "客户与供应商", "资产质量与减值", "研发与技术",
+    "募集资金用途", "突击分红与对赌协议", "市场传闻与负面报道", "行业政策与环境"
+]
+TAG_BITS = {tag_name: 1 << index for index, tag_name in enumerate(TAG_NAMES)}
+
+# LLM不可用时由规则分析产生的结果使用的处理状态，等待回填任务重新分析
+DEGRADED_STATUS = 'degraded'
+
+# 列表/详情查询使用的基础字段，标签原因单独从tag_reasons表读取
+BASE_RESULT_FIELDS = '''
+    id,
+    COALESCE(original_id, id) as original_id,
+    COALESCE(title, '无标题') as title,
+    COALESCE(content, '无内容') as content,
+    COALESCE(summary, '无摘要') as summary,
+    COALESCE(source, '未知来源') as source,
+    COALESCE(publish_time, '未知时间') as publish_time,
+    COALESCE(sentiment_level, '未知') as sentiment_level,
+    COALESCE(sentiment_reason, '无原因') as sentiment_reason,
+    COALESCE(companies, '') as companies,
+    COALESCE(duplicate_id, '无') as duplicate_id,
+    COALESCE(duplication_rate, 0.0) as duplication_rate,
+    COALESCE(processing_time, 0) as processing_time,
+    COALESCE(processing_status, 'completed') as processing_status,
+    COALESCE(tag_mask, 0) as tag_mask
+'''
+BASE_RESULT_KEYS = [
+    'id', 'original_id', 'title', 'content', 'summary', 'source', 'publish_time',
+    'sentiment_level', 'sentiment_reason', 'companies', 'duplicate_id',
+    'duplication_rate', 'processing_time', 'processing_status', 'tag_mask'
+]
+
+# 列表页轻量投影：不读取正文、情感原因和标签原因，摘要按字符截断
+LIST_SUMMARY_LENGTH = 120
+LIST_RESULT_FIELDS = '''
+    id,
+    COALESCE(original_id, id) as original_id,
+    COALESCE(title, '无标题') as title,
+    COALESCE(source, '未知来源') as source,
+    COALESCE(publish_time, '未知时间') as publish_time,
+    COALESCE(sentiment_level, '未知') as sentiment_level,
+    COALESCE(tag_mask, 0) as tag_mask,
+    COALESCE(companies, '') as companies,
+    COALESCE(substr(summary, 1, ?1), '无摘要') as summary,
+    length(summary) > ?1 as summary_truncated
+'''
+LIST_RESULT_KEYS = [
+    'id', 'original_id', 'title', 'source', 'publish_time', 'sentiment_level',
+    'tag_mask', 'companies', 'summary', 'summary_truncated'
+]
+# 列表游标记录的排序方式（列表固定按 id 倒序）
+LIST_CURSOR_SORT = 'id DESC'
+
+
+def build_tag_mask(tag_names):
+    """将命中的标签名称列表转换为位掩码"""
+    mask = 0
+    for tag_name in tag_names:
+        mask |= TAG_BITS.get(tag_name, 0)
+    return mask
+
+
+def expand_tag_mask(mask):
+    """将位掩码还原为命中的标签名称列表"""
+    mask = mask or 0
+    return [tag_name for tag_name in TAG_NAMES if mask & TAG_BITS[tag_name]]
+
+
+def normalize_company_name(name):
+    """企业名称归一化（用作别名表的键）：去除空白，统一括号，英文小写"""
+    name = re.sub(r'\s+', '', str(name or ''))
+    return name.replace('（', '(').replace('）', ')').lower()
+
+
+def split_company_names(companies):
+    """
+    将企业字段拆分为名称列表
+
+    Args:
+        companies: 逗号分隔的字符串，或 CompanyAgent.analyze_companies 返回的列表（CompanyName 或字符串）
+    """
+    if not companies:
+        return []
+    if isinstance(companies, str):
+        names = re.split(r'[,，]', companies)
+    else:
+        names = [getattr(company, 'name', company) for company in companies]
+
+    result = []
+    for name in names:
+        name = str(name).strip()
+        if name and name != '无' and name not in result:
+            result.append(name)
+    return result
+
+
+# 全文索引：FTS5 trigram 分词支持中文任意子串检索，外部内容表由触发器与 sentiment_results 同步
+FULLTEXT_TABLE = 'sentiment_results_fts'
+FULLTEXT_COLUMNS = ['title', 'summary', 'content', 'companies']
+# trigram 分词只能用 MATCH 检索不少于3个字符的词，更短的词按 LIKE 匹配
+FULLTEXT_MIN_TERM_LENGTH = 3
+
+
+# 统计汇总维度，由 sentiment_results 上的触发器增量维护
+RESULT_ROLLUP_DIMENSIONS = [
+    dimension('total', "''"),
+    dimension('status', "IFNULL({r}.processing_status, '')"),
+    dimension('sentiment', "IFNULL({r}.sentiment_level, '')", day=DAY_EXPR),
+    dimension('tag', 'rollup_tag_bits.tag_name', day=DAY_EXPR, joins='rollup_tag_bits',
+              where="(IFNULL({r}.tag_mask, 0) & (1 << rollup_tag_bits.tag_index)) != 0"),
+    dimension('source', "IFNULL({r}.source, '')"),
+]
+RESULT_ROLLUP_COLUMNS = ['processing_status', 'sentiment_level', 'tag_mask', 'publish_time', 'source']
+# 企业提及数按规范名称统计，由 result_companies 上的触发器维护
+COMPANY_ROLLUP_DIMENSIONS = [
+    dimension('company', 'companies.canonical_name', joins='companies', where='companies.id = {r}.company_id'),
+]
+ERROR_ROLLUP_DIMENSIONS = [dimension('error_logs', "''")]
+
+
+# 本进程中已完成表结构初始化的数据库文件 -> 全文索引是否可用
+# （构造函数在每个请求中调用，表结构、汇总触发器和全文索引只需初始化一次）
+_initialized_paths = {}
+_init_lock = threading.Lock()
+
 
 class ResultDatabase:
     def __init__(self, db_path="data/analysis_results.db"):
         """Initialize database connection"""
         self.db_path = db_path
-        self.init_database()
+
+        path_key = os.path.abspath(db_path)
+        with _init_lock:
+            if path_key not in _initialized_paths or not os.path.exists(db_path):
+                self.init_database()
+                _initialized_paths[path_key] = self.fulltext_available
+            self.fulltext_available = _initialized_paths[path_key]
     
     def init_database(self):
         """Initialize database table structure"""
@@ -69,10 +210,36 @@ class ResultDatabase:
                         processing_time INTEGER DEFAULT 0,
                         analysis_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                         processing_status TEXT DEFAULT 'completed',
-                        session_id TEXT  -- 批量解析会话ID
+                        session_id TEXT,  -- 批量解析会话ID
+                        tag_mask INTEGER,  -- 14个标签的位掩码，NULL表示旧记录尚未迁移
+                        external_id TEXT  -- 外部数据源的记录键（api:<上游ID>），与本地 original_id 分开去重
                     )
                 ''')
-                
+
+                self._ensure_tag_storage(cursor)
+                self._ensure_company_index(cursor)
+
+                # 降级结果（LLM不可用时由规则分析产生）的部分索引，供回填任务查找
+                cursor.execute(f'''
+                    CREATE INDEX IF NOT EXISTS idx_sentiment_results_degraded
+                    ON sentiment_results (id) WHERE processing_status = '{DEGRADED_STATUS}'
+                ''')
+
+                # 保存前按 original_id 检查是否已存在，没有索引时每次保存都要全表扫描
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_sentiment_results_original_id
+                    ON sentiment_results (original_id)
+                ''')
+
+                # 外部数据源（API）的记录ID与本地 sentiment_data.id 不在同一ID空间，单独一列按它去重
+                cursor.execute("PRAGMA table_info(sentiment_results)")
+                if 'external_id' not in [row[1] for row in cursor.fetchall()]:
+                    cursor.execute('ALTER TABLE sentiment_results ADD COLUMN external_id TEXT')
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_sentiment_results_external_id
+                    ON sentiment_results (external_id) WHERE external_id IS NOT NULL
+                ''')
+
                 # Create tags table for detailed tag information
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS tag_matches (
@@ -113,11 +280,519 @@ class ResultDatabase:
                 
                 conn.commit()
                 print(f"Database initialized successfully: {self.db_path}")
-                
+
         except Exception as e:
             print(f"Database initialization failed: {e}")
             raise
-    
+
+        # 统计汇总表（首次安装时从头计算；旧记录迁移时由更新触发器增量维护）
+        self._ensure_rollups()
+
+        # 全文索引（首次创建时为已有记录建立索引）
+        self.fulltext_available = self._ensure_fulltext_index()
+
+    def migrate(self):
+        """
+        迁移旧记录（标签存储、企业提及索引），在服务启动时执行一次
+
+        Returns:
+            dict: 各项迁移本次处理的记录数
+        """
+        return {
+            # 在线迁移旧记录的标签存储（分批提交，不长时间占用写锁）
+            'tag_storage': self.migrate_tag_storage(),
+            # 为旧记录补建企业提及索引
+            'company_index': self.migrate_company_index(),
+        }
+
+    def _ensure_rollups(self):
+        """Install rollup triggers; rebuild rollup data when they are first installed"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+
+                # 标签位序表，供触发器按位展开 tag_mask
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS rollup_tag_bits (
+                        tag_index INTEGER PRIMARY KEY,
+                        tag_name TEXT NOT NULL
+                    )
+                ''')
+                cursor.executemany(
+                    'INSERT OR REPLACE INTO rollup_tag_bits (tag_index, tag_name) VALUES (?, ?)',
+                    list(enumerate(TAG_NAMES))
+                )
+
+                missing = install_rollup_triggers(cursor, 'sentiment_results', RESULT_ROLLUP_DIMENSIONS,
+                                                  RESULT_ROLLUP_COLUMNS)
+                missing |= install_rollup_triggers(cursor, 'result_companies', COMPANY_ROLLUP_DIMENSIONS,
+                                                   ['company_id'])
+                missing |= install_rollup_triggers(cursor, 'error_logs', ERROR_ROLLUP_DIMENSIONS, [])
+                if missing:
+                    rebuild_rollups(cursor, 'sentiment_results', RESULT_ROLLUP_DIMENSIONS)
+                    rebuild_rollups(cursor, 'result_companies', COMPANY_ROLLUP_DIMENSIONS)
+                    rebuild_rollups(cursor, 'error_logs', ERROR_ROLLUP_DIMENSIONS)
+                conn.commit()
+
+        except Exception as e:
+            print(f"Failed to install rollup triggers: {e}")
+
+    def _ensure_fulltext_index(self):
+        """Create the FTS5 index and its sync triggers; returns False when SQLite lacks FTS5 trigram support"""
+        columns = ', '.join(FULLTEXT_COLUMNS)
+        new_values = ', '.join(f'NEW.{column}' for column in FULLTEXT_COLUMNS)
+        old_values = ', '.join(f'OLD.{column}' for column in FULLTEXT_COLUMNS)
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FULLTEXT_TABLE,))
+                created = cursor.fetchone() is None
+
+                cursor.execute(f'''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS {FULLTEXT_TABLE} USING fts5(
+                        {columns},
+                        content='sentiment_results',
+                        content_rowid='id',
+                        tokenize='trigram'
+                    )
+                ''')
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS trg_sentiment_results_fts_insert
+                    AFTER INSERT ON sentiment_results BEGIN
+                        INSERT INTO {FULLTEXT_TABLE} (rowid, {columns}) VALUES (NEW.id, {new_values});
+                    END
+                ''')
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS trg_sentiment_results_fts_delete
+                    AFTER DELETE ON sentiment_results BEGIN
+                        INSERT INTO {FULLTEXT_TABLE} ({FULLTEXT_TABLE}, rowid, {columns})
+                        VALUES ('delete', OLD.id, {old_values});
+                    END
+                ''')
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS trg_sentiment_results_fts_update
+                    AFTER UPDATE OF {columns} ON sentiment_results BEGIN
+                        INSERT INTO {FULLTEXT_TABLE} ({FULLTEXT_TABLE}, rowid, {columns})
+                        VALUES ('delete', OLD.id, {old_values});
+                        INSERT INTO {FULLTEXT_TABLE} (rowid, {columns}) VALUES (NEW.id, {new_values});
+                    END
+                ''')
+                if created:
+                    cursor.execute(f"INSERT INTO {FULLTEXT_TABLE} ({FULLTEXT_TABLE}) VALUES ('rebuild')")
+                conn.commit()
+            return True
+
+        except sqlite3.OperationalError as e:
+            print(f"Full-text index unavailable, falling back to LIKE search: {e}")
+            return False
+
+    def get_fingerprints(self, after_id=None, limit=1000):
+        """
+        读取已保存结果的SimHash指纹（duplicate_id 列），供多个分析进程共享重复检测窗口
+
+        Args:
+            after_id: 只读取 id 大于该值的结果；为空时读取最近的 limit 条
+            limit: 最多读取的条数
+
+        Returns:
+            list: [(id, SimHash值, 发布时间)]，按 id 升序；无法解析的指纹跳过
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            if after_id is None:
+                cursor.execute('''
+                    SELECT id, duplicate_id, publish_time FROM (
+                        SELECT id, duplicate_id, publish_time FROM sentiment_results ORDER BY id DESC LIMIT ?
+                    ) ORDER BY id
+                ''', (limit,))
+            else:
+                cursor.execute('''
+                    SELECT id, duplicate_id, publish_time FROM sentiment_results
+                    WHERE id > ? ORDER BY id LIMIT ?
+                ''', (after_id, limit))
+            rows = cursor.fetchall()
+
+        fingerprints = []
+        for result_id, duplicate_id, publish_time in rows:
+            try:
+                fingerprints.append((result_id, int(duplicate_id, 16), publish_time))
+            except (TypeError, ValueError):
+                continue
+        return fingerprints
+
+    def rebuild_rollups(self):
+        """
+        从头重新计算统计汇总表
+
+        Returns:
+            dict: 重建结果
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                rebuild_rollups(cursor, 'sentiment_results', RESULT_ROLLUP_DIMENSIONS)
+                rebuild_rollups(cursor, 'result_companies', COMPANY_ROLLUP_DIMENSIONS)
+                rebuild_rollups(cursor, 'error_logs', ERROR_ROLLUP_DIMENSIONS)
+                conn.commit()
+                total = read_rollup_total(cursor, 'total')
+
+            return {'success': True, 'message': f'统计汇总表重建完成，共 {total} 条分析结果'}
+
+        except Exception as e:
+            print(f"Failed to rebuild rollups: {e}")
+            return {'success': False, 'message': f'重建统计汇总表失败: {str(e)}'}
+
+    def _ensure_tag_storage(self, cursor):
+        """Ensure tag bitmask column, index and tag reason side table exist"""
+        cursor.execute("PRAGMA table_info(sentiment_results)")
+        columns = [row[1] for row in cursor.fetchall()]
+        if 'tag_mask' not in columns:
+            cursor.execute('ALTER TABLE sentiment_results ADD COLUMN tag_mask INTEGER')
+
+        # (tag_mask, id) 覆盖索引：按位过滤时只需扫描窄索引，无需读取宽行
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_sentiment_results_tag_mask
+            ON sentiment_results (tag_mask, id)
+        ''')
+
+        # 标签原因只在详情页和导出时使用，单独存放
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tag_reasons (
+                result_id INTEGER NOT NULL,
+                tag_index INTEGER NOT NULL,
+                reason TEXT,
+                PRIMARY KEY (result_id, tag_index)
+            ) WITHOUT ROWID
+        ''')
+
+        # 删除结果时同步删除标签原因（包括维护脚本直接执行的DELETE），首次创建时清理此前遗留的孤立记录
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_sentiment_results_tag_reason_cleanup'"
+        )
+        if not cursor.fetchone():
+            cursor.execute('''
+                CREATE TRIGGER trg_sentiment_results_tag_reason_cleanup
+                AFTER DELETE ON sentiment_results BEGIN
+                    DELETE FROM tag_reasons WHERE result_id = OLD.id;
+                END
+            ''')
+            self._delete_orphan_tag_reasons(cursor)
+
+    def _ensure_company_index(self, cursor):
+        """Ensure company dictionary, alias and mention index tables exist"""
+        # 企业字典：规范名称
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS companies (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                canonical_name TEXT UNIQUE NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # 别名表：归一化名称 -> 企业，规范名称本身也登记为别名
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS company_aliases (
+                alias TEXT PRIMARY KEY,
+                company_id INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+
+        # 企业提及索引：按企业查文章走主键范围扫描
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS result_companies (
+                company_id INTEGER NOT NULL,
+                result_id INTEGER NOT NULL,
+                PRIMARY KEY (company_id, result_id)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_result_companies_result
+            ON result_companies (result_id)
+        ''')
+
+        # 删除结果时同步删除提及记录（包括维护脚本直接执行的DELETE）
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_sentiment_results_company_cleanup
+            AFTER DELETE ON sentiment_results BEGIN
+                DELETE FROM result_companies WHERE result_id = OLD.id;
+            END
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS index_state (
+                name TEXT PRIMARY KEY,
+                value INTEGER
+            )
+        ''')
+
+    def _resolve_company_id(self, cursor, name, create=True):
+        """按别名查找企业ID，不存在且 create 为 True 时以该名称为规范名称新建"""
+        alias = normalize_company_name(name)
+        if not alias:
+            return None
+
+        cursor.execute('SELECT company_id FROM company_aliases WHERE alias = ?', (alias,))
+        row = cursor.fetchone()
+        if row:
+            return row[0]
+        if not create:
+            return None
+
+        cursor.execute('INSERT OR IGNORE INTO companies (canonical_name) VALUES (?)', (name,))
+        cursor.execute('SELECT id FROM companies WHERE canonical_name = ?', (name,))
+        company_id = cursor.fetchone()[0]
+        cursor.execute('INSERT OR IGNORE INTO company_aliases (alias, company_id) VALUES (?, ?)',
+                       (alias, company_id))
+        return company_id
+
+    def _save_result_companies(self, cursor, result_id, companies):
+        """将企业识别结果写入企业提及索引"""
+        company_ids = set()
+        for name in split_company_names(companies):
+            company_id = self._resolve_company_id(cursor, name)
+            if company_id is not None:
+                company_ids.add(company_id)
+
+        cursor.executemany(
+            'INSERT OR IGNORE INTO result_companies (company_id, result_id) VALUES (?, ?)',
+            [(company_id, result_id) for company_id in company_ids]
+        )
+
+    def migrate_company_index(self, batch_size=500):
+        """
+        为旧记录补建企业提及索引
+
+        按 id 递增分批处理，进度记录在 index_state 表中，中断后再次调用会从上次位置继续。
+
+        Args:
+            batch_size: 每批处理的记录数
+
+        Returns:
+            int: 本次处理的记录数
+        """
+        migrated = 0
+
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT value FROM index_state WHERE name = 'company_index_last_id'")
+                row = cursor.fetchone()
+                last_id = row[0] if row else 0
+
+                while True:
+                    cursor.execute('''
+                        SELECT id, companies FROM sentiment_results
+                        WHERE id > ?
+                        ORDER BY id
+                        LIMIT ?
+                    ''', (last_id, batch_size))
+                    rows = cursor.fetchall()
+                    if not rows:
+                        break
+
+                    for result_id, companies in rows:
+                        self._save_result_companies(cursor, result_id, companies)
+                    last_id = rows[-1][0]
+                    cursor.execute('''
+                        INSERT OR REPLACE INTO index_state (name, value)
+                        VALUES ('company_index_last_id', ?)
+                    ''', (last_id,))
+                    conn.commit()
+                    migrated += len(rows)
+
+            if migrated:
+                print(f"Company index migrated: {migrated} records")
+
+        except Exception as e:
+            print(f"Failed to migrate company index: {e}")
+
+        return migrated
+
+    def get_company_names(self):
+        """
+        Get all canonical company names (vocabulary for matching companies mentioned in questions)
+
+        Returns:
+            list: 规范企业名称
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT canonical_name FROM companies')
+                return [row[0] for row in cursor.fetchall()]
+
+        except Exception as e:
+            print(f"Failed to get company names: {e}")
+            return []
+
+    def add_company_aliases(self, canonical_name, aliases):
+        """
+        为企业登记别名，别名已归属其他企业时将该企业合并到当前企业
+
+        Args:
+            canonical_name: 企业名称（或其已有别名）
+            aliases: 别名列表
+
+        Returns:
+            dict: 操作结果，包含企业ID和合并的企业数
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                company_id = self._resolve_company_id(cursor, canonical_name)
+                if company_id is None:
+                    return {'success': False, 'message': '企业名称不能为空'}
+
+                merged = 0
+                for name in aliases:
+                    alias = normalize_company_name(name)
+                    if not alias:
+                        continue
+
+                    cursor.execute('SELECT company_id FROM company_aliases WHERE alias = ?', (alias,))
+                    row = cursor.fetchone()
+                    if row is None:
+                        cursor.execute('INSERT INTO company_aliases (alias, company_id) VALUES (?, ?)',
+                                       (alias, company_id))
+                        continue
+                    if row[0] == company_id:
+                        continue
+
+                    # 合并企业：提及记录和别名全部转移到当前企业
+                    other_id = row[0]
+                    cursor.execute('''
+                        UPDATE OR IGNORE result_companies SET company_id = ? WHERE company_id = ?
+                    ''', (company_id, other_id))
+                    cursor.execute('DELETE FROM result_companies WHERE company_id = ?', (other_id,))
+                    cursor.execute('UPDATE company_aliases SET company_id = ? WHERE company_id = ?',
+                                   (company_id, other_id))
+                    cursor.execute('DELETE FROM companies WHERE id = ?', (other_id,))
+                    merged += 1
+
+                conn.commit()
+                return {
+                    'success': True,
+                    'message': '别名登记成功',
+                    'company_id': company_id,
+                    'merged': merged
+                }
+
+        except Exception as e:
+            print(f"Failed to add company aliases: {e}")
+            return {'success': False, 'message': str(e)}
+
+    def migrate_tag_storage(self, batch_size=500):
+        """
+        将旧记录的 tag_X / reason_X 列迁移到 tag_mask 和 tag_reasons 表
+
+        每批单独提交，可在服务运行期间执行；中断后再次调用会从未迁移的记录继续。
+
+        Args:
+            batch_size: 每批迁移的记录数
+
+        Returns:
+            int: 本次迁移的记录数
+        """
+        tag_columns = ', '.join(f'tag_{tag_name}' for tag_name in TAG_NAMES)
+        reason_columns = ', '.join(f'reason_{tag_name}' for tag_name in TAG_NAMES)
+        migrated = 0
+
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+
+                while True:
+                    cursor.execute(f'''
+                        SELECT id, {tag_columns}, {reason_columns}
+                        FROM sentiment_results
+                        WHERE tag_mask IS NULL
+                        LIMIT ?
+                    ''', (batch_size,))
+                    rows = cursor.fetchall()
+                    if not rows:
+                        break
+
+                    mask_updates = []
+                    reason_rows = []
+                    for row in rows:
+                        result_id = row[0]
+                        tag_values = row[1:1 + len(TAG_NAMES)]
+                        reason_values = row[1 + len(TAG_NAMES):]
+                        matched = [name for name, value in zip(TAG_NAMES, tag_values) if value == '是']
+                        mask_updates.append((build_tag_mask(matched), result_id))
+                        for tag_index, reason in enumerate(reason_values):
+                            if reason and reason != '无':
+                                reason_rows.append((result_id, tag_index, reason))
+
+                    cursor.executemany('UPDATE sentiment_results SET tag_mask = ? WHERE id = ?', mask_updates)
+                    cursor.executemany('''
+                        INSERT OR REPLACE INTO tag_reasons (result_id, tag_index, reason)
+                        VALUES (?, ?, ?)
+                    ''', reason_rows)
+                    conn.commit()
+                    migrated += len(rows)
+
+            if migrated:
+                print(f"Tag storage migrated: {migrated} records")
+
+        except Exception as e:
+            print(f"Failed to migrate tag storage: {e}")
+
+        return migrated
+
+    def _save_tag_reasons(self, cursor, result_id, reasons):
+        """Save tag reasons ({tag_name: reason}) to the side table"""
+        reason_rows = [
+            (result_id, TAG_NAMES.index(tag_name), reason)
+            for tag_name, reason in reasons.items()
+            if tag_name in TAG_BITS and reason and reason != '无'
+        ]
+        if reason_rows:
+            cursor.executemany('''
+                INSERT OR REPLACE INTO tag_reasons (result_id, tag_index, reason)
+                VALUES (?, ?, ?)
+            ''', reason_rows)
+
+    def _load_tag_reasons(self, cursor, result_ids):
+        """Load tag reasons for a batch of results, returns {result_id: {tag_name: reason}}"""
+        reasons = {result_id: {} for result_id in result_ids}
+        if not result_ids:
+            return reasons
+
+        placeholders = ', '.join(['?'] * len(result_ids))
+        cursor.execute(f'''
+            SELECT result_id, tag_index, reason
+            FROM tag_reasons
+            WHERE result_id IN ({placeholders})
+        ''', list(result_ids))
+
+        for result_id, tag_index, reason in cursor.fetchall():
+            if 0 <= tag_index < len(TAG_NAMES):
+                reasons[result_id][TAG_NAMES[tag_index]] = reason
+        return reasons
+
+    def _build_result_dict(self, row, reasons=None):
+        """将 BASE_RESULT_FIELDS 查询行转换为API返回格式，tag_X 字段由位掩码展开"""
+        result_dict = dict(zip(BASE_RESULT_KEYS, row))
+        tag_mask = result_dict.pop('tag_mask')
+
+        for tag_name in TAG_NAMES:
+            result_dict[f'tag_{tag_name}'] = '是' if tag_mask & TAG_BITS[tag_name] else '否'
+
+        if reasons is not None:
+            for tag_name in TAG_NAMES:
+                result_dict[f'reason_{tag_name}'] = reasons.get(tag_name, '无')
+
+        result_dict['tags'] = expand_tag_mask(tag_mask)
+        return result_dict
+
+    def _delete_orphan_tag_reasons(self, cursor):
+        """Remove tag reasons whose result row no longer exists"""
+        cursor.execute('''
+            DELETE FROM tag_reasons
+            WHERE result_id NOT IN (SELECT id FROM sentiment_results)
+        ''')
+
     def save_result(self, original_id=None, title=None, content=None, summary=None, 
                    source=None, publish_time=None, sentiment_level=None, sentiment_reason=None,
                    companies=None, duplicate_id=None, duplication_rate=None, processing_time_ms=None,
@@ -139,37 +814,41 @@ class ResultDatabase:
                             reason_fields[key] = value
                 
                 # Build column names and values for all tag and reason fields
-                tag_columns = ['tag_同业竞争', 'tag_股权与控制权', 'tag_关联交易', 'tag_历史沿革与股东核查',
-                              'tag_重大违法违规', 'tag_收入与成本', 'tag_财务内控不规范', 'tag_客户与供应商',
-                              'tag_资产质量与减值', 'tag_研发与技术', 'tag_募集资金用途', 'tag_突击分红与对赌协议',
-                              'tag_市场传闻与负面报道', 'tag_行业政策与环境']
-                
-                reason_columns = ['reason_同业竞争', 'reason_股权与控制权', 'reason_关联交易', 'reason_历史沿革与股东核查',
-                                 'reason_重大违法违规', 'reason_收入与成本', 'reason_财务内控不规范', 'reason_客户与供应商',
-                                 'reason_资产质量与减值', 'reason_研发与技术', 'reason_募集资金用途', 'reason_突击分红与对赌协议',
-                                 'reason_市场传闻与负面报道', 'reason_行业政策与环境']
-                
+                tag_columns = [f'tag_{tag_name}' for tag_name in TAG_NAMES]
+                reason_columns = [f'reason_{tag_name}' for tag_name in TAG_NAMES]
+
                 # Prepare values for tag and reason columns
                 tag_values = [tag_fields.get(col, '否') for col in tag_columns]
                 reason_values = [reason_fields.get(col, '无') for col in reason_columns]
-                
-                cursor.execute('''
-                    INSERT INTO sentiment_results 
-                    (original_id, title, content, summary, source, publish_time, sentiment_level, 
-                     sentiment_reason, tag_同业竞争, tag_股权与控制权, tag_关联交易, tag_历史沿革与股东核查, tag_重大违法违规,
-                     tag_收入与成本, tag_财务内控不规范, tag_客户与供应商, tag_资产质量与减值, tag_研发与技术,
-                     tag_募集资金用途, tag_突击分红与对赌协议, tag_市场传闻与负面报道, tag_行业政策与环境,
-                     reason_同业竞争, reason_股权与控制权, reason_关联交易, reason_历史沿革与股东核查, reason_重大违法违规,
-                     reason_收入与成本, reason_财务内控不规范, reason_客户与供应商, reason_资产质量与减值, reason_研发与技术,
-                     reason_募集资金用途, reason_突击分红与对赌协议, reason_市场传闻与负面报道, reason_行业政策与环境,
-                     companies, duplicate_id, duplication_rate, processing_time, processing_status, session_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (original_id, title, content, summary, source, publish_time, sentiment_level,
-                     sentiment_reason) + tuple(tag_values) + tuple(reason_values) + 
-                     (companies, duplicate_id, duplication_rate, processing_time_ms, 'completed', kwargs.get('session_id')))
-                
+                tag_mask = build_tag_mask(
+                    [tag_name for tag_name, value in zip(TAG_NAMES, tag_values) if value == '是']
+                )
+
+                # 企业字段可为 CompanyAgent 返回的列表，旧列仍保存逗号分隔的名称
+                company_names = split_company_names(companies)
+                if companies is not None and not isinstance(companies, str):
+                    companies = ','.join(company_names)
+
+                insert_columns = (
+                    ['original_id', 'title', 'content', 'summary', 'source', 'publish_time',
+                     'sentiment_level', 'sentiment_reason'] + tag_columns + reason_columns +
+                    ['companies', 'duplicate_id', 'duplication_rate', 'processing_time',
+                     'processing_status', 'session_id', 'tag_mask']
+                )
+                values = ((original_id, title, content, summary, source, publish_time, sentiment_level,
+                           sentiment_reason) + tuple(tag_values) + tuple(reason_values) +
+                          (companies, duplicate_id, duplication_rate, processing_time_ms, 'completed',
+                           kwargs.get('session_id'), tag_mask))
+
+                cursor.execute(f'''
+                    INSERT INTO sentiment_results ({', '.join(insert_columns)})
+                    VALUES ({', '.join(['?'] * len(values))})
+                ''', values)
+
                 result_id = cursor.lastrowid
-                
+                self._save_tag_reasons(cursor, result_id, dict(zip(TAG_NAMES, reason_values)))
+                self._save_result_companies(cursor, result_id, company_names)
+
                 conn.commit()
                 return result_id
                 
@@ -311,17 +990,10 @@ class ResultDatabase:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 
-                # Total results
-                cursor.execute('SELECT COUNT(*) FROM sentiment_results')
-                total_results = cursor.fetchone()[0]
-                
-                # Successful results
-                cursor.execute('SELECT COUNT(*) FROM sentiment_results WHERE processing_status = "completed"')
-                successful_results = cursor.fetchone()[0]
-                
-                # Error logs
-                cursor.execute('SELECT COUNT(*) FROM error_logs')
-                total_errors = cursor.fetchone()[0]
+                # 计数均从统计汇总表读取
+                total_results = read_rollup_total(cursor, 'total')
+                successful_results = read_rollup_total(cursor, 'status', 'completed')
+                total_errors = read_rollup_total(cursor, 'error_logs')
                 
                 # API stats
                 cursor.execute('SELECT * FROM api_stats')
@@ -394,110 +1066,290 @@ class ResultDatabase:
             print(f"Export failed: {e}")
             return False
     
-    def get_analysis_results(self, page=1, page_size=50, search_keyword=None):
-        """Get analysis results with pagination and search - enhanced with new structure"""
+    def _build_result_filters(self, search_keyword=None, tags=None):
+        """Build WHERE clause and params shared by list queries"""
+        where_clauses = []
+        params = []
+
+        if search_keyword and search_keyword.strip():
+            where_clauses.append("""(
+                title LIKE ? OR 
+                content LIKE ? OR 
+                summary LIKE ? OR 
+                companies LIKE ?
+            )""")
+            search_term = f"%{search_keyword.strip()}%"
+            params.extend([search_term, search_term, search_term, search_term])
+
+        if tags:
+            where_clauses.append("(tag_mask & ?) != 0")
+            params.append(build_tag_mask(tags))
+
+        where_clause = ""
+        if where_clauses:
+            where_clause = "WHERE " + " AND ".join(where_clauses)
+        return where_clause, params
+
+    def search_context_results(self, terms, limit=20, result_ids=None):
+        """
+        按关键词检索与问题相关的结果（智能问答在服务端检索上下文）
+
+        不少于3个字符的词走全文索引，按 bm25 相关度排序；全文索引无命中时，
+        较短的词（或全文索引不可用时的全部词）按 LIKE 匹配，按 id 倒序。
+
+        Args:
+            terms: 检索词列表，命中任一词即返回
+            limit: 最多返回的记录数
+            result_ids: 只在这些结果中检索（如页面当前的搜索结果）
+
+        Returns:
+            dict: data 为结果列表（不含标签原因，tags 为命中的标签名称）
+        """
         try:
+            terms = [term.strip() for term in terms or [] if term and term.strip()]
+            id_clause, id_params = '', []
+            if result_ids is not None:
+                result_ids = list(dict.fromkeys(int(result_id) for result_id in result_ids))
+                if not result_ids:
+                    return {'success': True, 'data': []}
+                id_clause = f"AND sentiment_results.id IN ({', '.join(['?'] * len(result_ids))})"
+                id_params = result_ids
+
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
-                
-                # 构建搜索条件
-                where_clause = ""
-                search_params = []
-                
-                if search_keyword and search_keyword.strip():
-                    where_clause = """WHERE (
-                        title LIKE ? OR 
-                        content LIKE ? OR 
-                        summary LIKE ? OR 
-                        companies LIKE ?
-                    )"""
-                    search_term = f"%{search_keyword.strip()}%"
-                    search_params = [search_term, search_term, search_term, search_term]
-                
-                # 获取总记录数
-                count_query = f'SELECT COUNT(*) FROM sentiment_results {where_clause}'
-                cursor.execute(count_query, search_params)
-                total = cursor.fetchone()[0]
-                
-                # 计算分页
-                offset = (page - 1) * page_size
-                total_pages = (total + page_size - 1) // page_size
-                
-                # 获取标签名称列表
-                tag_names = [
-                    "同业竞争", "股权与控制权", "关联交易", "历史沿革与股东核查", "重大违法违规",
-                    "收入与成本", "财务内控不规范", "客户与供应商", "资产质量与减值", "研发与技术",
-                    "募集资金用途", "突击分红与对赌协议", "市场传闻与负面报道", "行业政策与环境"
+                rows = []
+
+                match_terms = [term for term in terms if len(term) >= FULLTEXT_MIN_TERM_LENGTH]
+                if self.fulltext_available and match_terms:
+                    # 每个词作为短语检索（双引号转义），多个词之间为 OR
+                    match_query = ' OR '.join('"{}"'.format(term.replace('"', '""')) for term in match_terms)
+                    cursor.execute(f'''
+                        SELECT {BASE_RESULT_FIELDS}
+                        FROM sentiment_results
+                        JOIN (
+                            SELECT rowid AS match_id, bm25({FULLTEXT_TABLE}) AS match_rank
+                            FROM {FULLTEXT_TABLE}
+                            WHERE {FULLTEXT_TABLE} MATCH ?
+                        ) ON sentiment_results.id = match_id
+                        WHERE 1 = 1 {id_clause}
+                        ORDER BY match_rank
+                        LIMIT ?
+                    ''', [match_query] + id_params + [limit])
+                    rows = cursor.fetchall()
+
+                like_terms = terms if not self.fulltext_available else [
+                    term for term in terms if len(term) < FULLTEXT_MIN_TERM_LENGTH
                 ]
-                
-                # 构建标签字段查询
-                tag_fields = []
-                reason_fields = []
-                for tag_name in tag_names:
-                    tag_fields.append(f'tag_{tag_name}')
-                    reason_fields.append(f'reason_{tag_name}')
-                
-                all_tag_fields = ', '.join(tag_fields + reason_fields)
-                
-                # 使用新的表结构查询，包含搜索条件
-                query_params = search_params + [page_size, offset]
-                cursor.execute(f'''
-                    SELECT 
-                        id,
-                        COALESCE(original_id, id) as original_id,
-                        COALESCE(title, '无标题') as title,
-                        COALESCE(content, '无内容') as content,
-                        COALESCE(summary, '无摘要') as summary,
-                        COALESCE(source, '未知来源') as source,
-                        COALESCE(publish_time, '未知时间') as publish_time,
-                        COALESCE(sentiment_level, '未知') as sentiment_level,
-                        COALESCE(sentiment_reason, '无原因') as sentiment_reason,
-                        COALESCE(companies, '') as companies,
-                        COALESCE(duplicate_id, '无') as duplicate_id,
-                        COALESCE(duplication_rate, 0.0) as duplication_rate,
-                        COALESCE(processing_time, 0) as processing_time,
-                        {all_tag_fields}
-                    FROM sentiment_results 
-                    {where_clause}
-                    ORDER BY id DESC 
-                    LIMIT ? OFFSET ?
-                ''', query_params)
-                
-                results = cursor.fetchall()
-                
-                # Convert to list of dictionaries with proper format
+                if not rows and like_terms:
+                    like_clauses = []
+                    like_params = []
+                    for term in like_terms:
+                        like_clauses.append('(title LIKE ? OR summary LIKE ? OR content LIKE ? OR companies LIKE ?)')
+                        like_params.extend([f'%{term}%'] * 4)
+                    cursor.execute(f'''
+                        SELECT {BASE_RESULT_FIELDS}
+                        FROM sentiment_results
+                        WHERE ({' OR '.join(like_clauses)}) {id_clause}
+                        ORDER BY id DESC
+                        LIMIT ?
+                    ''', like_params + id_params + [limit])
+                    rows = cursor.fetchall()
+
                 data = []
-                for row in results:
-                    # 构建基本字段
-                    result_dict = {
-                        'id': row[0],
-                        'original_id': row[1],
-                        'title': row[2],
-                        'content': row[3],
-                        'summary': row[4],
-                        'source': row[5],
-                        'publish_time': row[6],
-                        'sentiment_level': row[7],
-                        'sentiment_reason': row[8],
-                        'companies': row[9],
-                        'duplicate_id': row[10],
-                        'duplication_rate': row[11],
-                        'processing_time': row[12]
-                    }
-                    
-                    # 添加标签字段（从第13个字段开始）
-                    field_index = 13
-                    for tag_name in tag_names:
-                        result_dict[f'tag_{tag_name}'] = row[field_index] if field_index < len(row) else '否'
-                        field_index += 1
-                    
-                    # 添加原因字段
-                    for tag_name in tag_names:
-                        result_dict[f'reason_{tag_name}'] = row[field_index] if field_index < len(row) else '无'
-                        field_index += 1
-                    
-                    data.append(result_dict)
-                
+                for row in rows:
+                    item = dict(zip(BASE_RESULT_KEYS, row))
+                    item['tags'] = expand_tag_mask(item.pop('tag_mask'))
+                    data.append(item)
+                return {'success': True, 'data': data}
+
+        except Exception as e:
+            print(f"Failed to search context results: {e}")
+            return {
+                'success': False,
+                'message': str(e)
+            }
+
+    def get_analysis_result_list(self, page=1, page_size=50, search_keyword=None, tags=None,
+                                 summary_length=LIST_SUMMARY_LENGTH, cursor=None, after_id=None,
+                                 before_id=None, count='approx'):
+        """
+        获取列表页使用的轻量结果（不含正文、情感原因和标签原因）
+
+        完整内容通过 get_analysis_result_by_id / get_analysis_results_by_ids 按需获取。
+        传入 cursor / after_id / before_id 时使用 keyset 分页（按 id 倒序），忽略 page。
+
+        Args:
+            page: 页码（未传游标时使用 OFFSET 分页，兼容旧调用）
+            page_size: 每页大小
+            search_keyword: 搜索关键词
+            tags: 标签名称列表，命中其中任一标签即返回
+            summary_length: 摘要截断长度（字符数）
+            cursor: 上次返回的 next_cursor / prev_cursor
+            after_id: 返回 id 小于该值的下一页
+            before_id: 返回 id 大于该值的上一页
+            count: 计数模式 approx / exact / none
+        """
+        try:
+            # 解析分页游标
+            direction = 'next'
+            cursor_key = None
+            if cursor:
+                cursor_key, direction = decode_cursor(cursor, LIST_CURSOR_SORT)
+            elif after_id is not None:
+                cursor_key = [int(after_id)]
+            elif before_id is not None:
+                cursor_key, direction = [int(before_id)], 'prev'
+
+            with sqlite3.connect(self.db_path) as conn:
+                db_cursor = conn.cursor()
+
+                where_clause, search_params = self._build_result_filters(search_keyword, tags)
+                total, total_exact = count_rows(db_cursor, 'sentiment_results', where_clause, search_params, count)
+
+                query_params = [summary_length] + search_params
+                order = 'DESC'
+                limit_clause = 'LIMIT ?'
+                if cursor_key is not None:
+                    condition, keyset_params, order = keyset_condition(['id'], cursor_key, 'DESC', direction)
+                    where_clause = f"{where_clause} AND {condition}" if where_clause else f"WHERE {condition}"
+                    query_params += keyset_params + [page_size + 1]
+                else:
+                    limit_clause = 'LIMIT ? OFFSET ?'
+                    query_params += [page_size + 1, (page - 1) * page_size]
+
+                db_cursor.execute(f'''
+                    SELECT {LIST_RESULT_FIELDS}
+                    FROM sentiment_results
+                    {where_clause}
+                    ORDER BY id {order}
+                    {limit_clause}
+                ''', query_params)
+
+                rows, page_info = build_page(
+                    db_cursor.fetchall(), page_size, lambda row: [row[0]], direction,
+                    has_previous=cursor_key is not None or page > 1, sort=LIST_CURSOR_SORT
+                )
+
+                data = []
+                for row in rows:
+                    item = dict(zip(LIST_RESULT_KEYS, row))
+                    item['summary_truncated'] = bool(item['summary_truncated'])
+                    item['tags'] = expand_tag_mask(item['tag_mask'])
+                    data.append(item)
+
+                return {
+                    'success': True,
+                    'data': data,
+                    'total': total,
+                    'total_exact': total_exact,
+                    'page': page,
+                    'page_size': page_size,
+                    'total_pages': total_pages(total, page_size),
+                    **page_info
+                }
+
+        except InvalidCursorError as e:
+            return {
+                'success': False,
+                'error_code': INVALID_CURSOR,
+                'message': str(e)
+            }
+        except Exception as e:
+            print(f"Failed to get analysis result list: {e}")
+            return {
+                'success': False,
+                'message': str(e)
+            }
+
+    def get_analysis_results_by_ids(self, result_ids):
+        """
+        批量获取完整结果（含正文和标签原因），供前端预取可见行详情
+
+        Args:
+            result_ids: 结果ID列表
+
+        Returns:
+            dict: data 为 {id: 结果详情}
+        """
+        try:
+            result_ids = list(dict.fromkeys(int(result_id) for result_id in result_ids))
+            if not result_ids:
+                return {'success': True, 'data': {}}
+
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+
+                placeholders = ', '.join(['?'] * len(result_ids))
+                cursor.execute(f'''
+                    SELECT {BASE_RESULT_FIELDS}
+                    FROM sentiment_results
+                    WHERE id IN ({placeholders})
+                ''', result_ids)
+                rows = cursor.fetchall()
+
+                reasons_by_id = self._load_tag_reasons(cursor, [row[0] for row in rows])
+                data = {row[0]: self._build_result_dict(row, reasons_by_id[row[0]]) for row in rows}
+
+                return {
+                    'success': True,
+                    'data': data
+                }
+
+        except Exception as e:
+            print(f"Failed to get analysis results by ids: {e}")
+            return {
+                'success': False,
+                'message': str(e)
+            }
+
+    def get_analysis_results(self, page=1, page_size=50, search_keyword=None, tags=None,
+                             include_reasons=False):
+        """
+        Get analysis results with pagination and search
+
+        Args:
+            page: 页码
+            page_size: 每页大小
+            search_keyword: 搜索关键词
+            tags: 标签名称列表，命中其中任一标签即返回（通过tag_mask按位过滤）
+            include_reasons: 是否附带14个标签原因（列表页默认不读取，详情和导出时使用）
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+
+                # 构建搜索条件
+                where_clause, search_params = self._build_result_filters(search_keyword, tags)
+
+                # 获取总记录数
+                count_query = f'SELECT COUNT(*) FROM sentiment_results {where_clause}'
+                cursor.execute(count_query, search_params)
+                total = cursor.fetchone()[0]
+
+                # 计算分页
+                offset = (page - 1) * page_size
+                total_pages = (total + page_size - 1) // page_size
+
+                query_params = search_params + [page_size, offset]
+                cursor.execute(f'''
+                    SELECT {BASE_RESULT_FIELDS}
+                    FROM sentiment_results 
+                    {where_clause}
+                    ORDER BY id DESC 
+                    LIMIT ? OFFSET ?
+                ''', query_params)
+
+                rows = cursor.fetchall()
+
+                reasons_by_id = None
+                if include_reasons:
+                    reasons_by_id = self._load_tag_reasons(cursor, [row[0] for row in rows])
+
+                data = [
+                    self._build_result_dict(row, reasons_by_id[row[0]] if reasons_by_id is not None else None)
+                    for row in rows
+                ]
+
                 return {
                     'success': True,
                     'data': data,
@@ -506,7 +1358,7 @@ class ResultDatabase:
                     'page_size': page_size,
                     'total_pages': total_pages
                 }
-                
+
         except Exception as e:
             print(f"Failed to get analysis results: {e}")
             return {
@@ -519,90 +1371,30 @@ class ResultDatabase:
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
-                
-                # 获取标签名称列表
-                tag_names = [
-                    "同业竞争", "股权与控制权", "关联交易", "历史沿革与股东核查", "重大违法违规",
-                    "收入与成本", "财务内控不规范", "客户与供应商", "资产质量与减值", "研发与技术",
-                    "募集资金用途", "突击分红与对赌协议", "市场传闻与负面报道", "行业政策与环境"
-                ]
-                
-                # 构建标签字段查询
-                tag_fields = []
-                reason_fields = []
-                for tag_name in tag_names:
-                    tag_fields.append(f'tag_{tag_name}')
-                    reason_fields.append(f'reason_{tag_name}')
-                
-                all_tag_fields = ', '.join(tag_fields + reason_fields)
-                
+
                 # 查询单条结果
                 cursor.execute(f'''
-                    SELECT 
-                        id,
-                        COALESCE(original_id, id) as original_id,
-                        COALESCE(title, '无标题') as title,
-                        COALESCE(content, '无内容') as content,
-                        COALESCE(summary, '无摘要') as summary,
-                        COALESCE(source, '未知来源') as source,
-                        COALESCE(publish_time, '未知时间') as publish_time,
-                        COALESCE(sentiment_level, '未知') as sentiment_level,
-                        COALESCE(sentiment_reason, '无原因') as sentiment_reason,
-                        COALESCE(companies, '') as companies,
-                        COALESCE(duplicate_id, '无') as duplicate_id,
-                        COALESCE(duplication_rate, 0.0) as duplication_rate,
-                        COALESCE(processing_time, 0) as processing_time,
-                        {all_tag_fields}
+                    SELECT {BASE_RESULT_FIELDS}
                     FROM sentiment_results 
                     WHERE id = ?
                 ''', (result_id,))
-                
+
                 row = cursor.fetchone()
-                
+
                 if not row:
                     return {
                         'success': False,
                         'message': f'未找到ID为 {result_id} 的结果'
                     }
-                
-                # 构建结果字典
-                result_dict = {
-                    'id': row[0],
-                    'original_id': row[1],
-                    'title': row[2],
-                    'content': row[3],
-                    'summary': row[4],
-                    'source': row[5],
-                    'publish_time': row[6],
-                    'sentiment_level': row[7],
-                    'sentiment_reason': row[8],
-                    'companies': row[9],
-                    'duplicate_id': row[10],
-                    'duplication_rate': row[11],
-                    'processing_time': row[12]
-                }
-                
-                # 添加标签字段（从第13个字段开始）
-                field_index = 13
-                for tag_name in tag_names:
-                    result_dict[f'tag_{tag_name}'] = row[field_index] if field_index < len(row) else '否'
-                    result_dict[f'reason_{tag_name}'] = row[field_index + len(tag_names)] if field_index < len(row) else ''
-                    field_index += 1
-                
-                # 构建标签列表
-                tags = []
-                for tag_name in tag_names:
-                    tag_key = f'tag_{tag_name}'
-                    if result_dict.get(tag_key) == '是':
-                        tags.append(tag_name)
-                
-                result_dict['tags'] = tags
-                
+
+                # 详情页才读取标签原因附表
+                reasons = self._load_tag_reasons(cursor, [row[0]])[row[0]]
+
                 return {
                     'success': True,
-                    'data': result_dict
+                    'data': self._build_result_dict(row, reasons)
                 }
-                
+
         except Exception as e:
             print(f"Error getting analysis result by ID: {e}")
             return {
@@ -678,97 +1470,9 @@ class ResultDatabase:
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
-                
-                # 提取基本字段
-                original_id = data.get('original_id')
-                
-                # 检查是否已存在相同original_id的记录
-                if original_id is not None:
-                    cursor.execute('SELECT id FROM sentiment_results WHERE original_id = ?', (original_id,))
-                    existing_record = cursor.fetchone()
-                    if existing_record:
-                        return {
-                            'success': False,
-                            'message': f'记录已存在，original_id: {original_id}，跳过重复保存',
-                            'duplicate': True,
-                            'existing_id': existing_record[0]
-                        }
-                title = data.get('title', '无标题')
-                content = data.get('content', '无内容')
-                summary = data.get('summary', '无摘要')
-                source = data.get('source', '未知来源')
-                publish_time = data.get('publish_time', '未知时间')
-                sentiment_level = data.get('sentiment_level', '未知')
-                sentiment_reason = data.get('sentiment_reason', '无原因')
-                companies = data.get('companies', '')
-                duplicate_id = data.get('duplicate_id', '无')
-                duplication_rate = data.get('duplication_rate', 0.0)
-                processing_time = data.get('processing_time', 0)
-                session_id = data.get('session_id')  # 会话ID
-                
-                # 提取标签数据
-                tag_results = data.get('tag_results', {})
-                
-                # 准备标签字段和原因字段的值
-                tag_fields = {}
-                reason_fields = {}
-                
-                # 获取所有14个标签的配置
-                tag_names = [
-                    "同业竞争", "股权与控制权", "关联交易", "历史沿革与股东核查", "重大违法违规",
-                    "收入与成本", "财务内控不规范", "客户与供应商", "资产质量与减值", "研发与技术",
-                    "募集资金用途", "突击分红与对赌协议", "市场传闻与负面报道", "行业政策与环境"
-                ]
-                
-                # 处理标签结果
-                for tag_name in tag_names:
-                    if tag_name in tag_results:
-                        tag_result = tag_results[tag_name]
-                        tag_fields[f'tag_{tag_name}'] = '是' if tag_result.get('belongs', False) else '否'
-                        reason_fields[f'reason_{tag_name}'] = tag_result.get('reason', '无')
-                    else:
-                        tag_fields[f'tag_{tag_name}'] = '否'
-                        reason_fields[f'reason_{tag_name}'] = '无'
-                
-                # 构建插入语句
-                insert_fields = [
-                    'original_id', 'title', 'content', 'summary', 'source', 'publish_time',
-                    'sentiment_level', 'sentiment_reason', 'companies', 'duplicate_id',
-                    'duplication_rate', 'processing_time', 'session_id'
-                ]
-                
-                # 添加标签字段
-                insert_fields.extend(tag_fields.keys())
-                insert_fields.extend(reason_fields.keys())
-                
-                # 准备值列表
-                values = [
-                    original_id, title, content, summary, source, publish_time,
-                    sentiment_level, sentiment_reason, companies, duplicate_id,
-                    duplication_rate, processing_time, session_id
-                ]
-                
-                # 添加标签值
-                values.extend(tag_fields.values())
-                values.extend(reason_fields.values())
-                
-                # 构建SQL语句
-                placeholders = ', '.join(['?'] * len(values))
-                field_names = ', '.join(insert_fields)
-                
-                cursor.execute(f'''
-                    INSERT INTO sentiment_results ({field_names})
-                    VALUES ({placeholders})
-                ''', values)
-                
-                result_id = cursor.lastrowid
+                result = self._insert_analysis_result(cursor, data)
                 conn.commit()
-                
-                return {
-                    'success': True,
-                    'message': '结果保存成功',
-                    'id': result_id
-                }
+                return result
                 
         except Exception as e:
             print(f"Failed to save analysis result: {e}")
@@ -777,6 +1481,227 @@ class ResultDatabase:
                 'message': str(e)
             }
     
+    def save_analysis_results(self, items):
+        """
+        批量保存分析结果：同一个连接、同一个事务内逐条插入，只提交一次
+        （逐条调用 save_analysis_result 时每条结果都要单独打开连接并提交）。
+        已存在的 original_id / external_id 跳过，与 save_analysis_result 一致；任一条插入出错时整批回滚。
+        """
+        saved_ids = []
+        duplicates = 0
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                for data in items:
+                    result = self._insert_analysis_result(cursor, data)
+                    if result['success']:
+                        saved_ids.append(result['id'])
+                    else:
+                        duplicates += 1
+                conn.commit()
+            return {
+                'success': True,
+                'message': f'批量保存成功 {len(saved_ids)} 条，跳过重复 {duplicates} 条',
+                'saved': len(saved_ids),
+                'duplicates': duplicates,
+                'ids': saved_ids
+            }
+        except Exception as e:
+            print(f"Failed to save analysis results: {e}")
+            return {
+                'success': False,
+                'message': str(e)
+            }
+    
+    def _insert_analysis_result(self, cursor, data):
+        """在调用方的事务中插入一条分析结果（不提交）"""
+        # 提取基本字段
+        original_id = data.get('original_id')
+        external_id = data.get('external_id')
+        
+        # 检查是否已存在相同记录：外部数据源按 external_id，本地数据按 original_id
+        if external_id is not None:
+            key_name, key_value = 'external_id', external_id
+        else:
+            key_name, key_value = 'original_id', original_id
+        if key_value is not None:
+            cursor.execute(f'SELECT id FROM sentiment_results WHERE {key_name} = ?', (key_value,))
+            existing_record = cursor.fetchone()
+            if existing_record:
+                return {
+                    'success': False,
+                    'message': f'记录已存在，{key_name}: {key_value}，跳过重复保存',
+                    'duplicate': True,
+                    'existing_id': existing_record[0]
+                }
+        title = data.get('title', '无标题')
+        content = data.get('content', '无内容')
+        summary = data.get('summary', '无摘要')
+        source = data.get('source', '未知来源')
+        publish_time = data.get('publish_time', '未知时间')
+        sentiment_level = data.get('sentiment_level', '未知')
+        sentiment_reason = data.get('sentiment_reason', '无原因')
+        company_names = split_company_names(data.get('companies', ''))
+        companies = data.get('companies', '')
+        if not isinstance(companies, str):
+            companies = ','.join(company_names)
+        duplicate_id = data.get('duplicate_id', '无')
+        duplication_rate = data.get('duplication_rate', 0.0)
+        processing_time = data.get('processing_time', 0)
+        session_id = data.get('session_id')  # 会话ID
+        processing_status = data.get('processing_status', 'completed')
+        
+        # 准备标签字段和原因字段的值
+        tag_fields, reason_fields, matched_tags, tag_reasons = self._build_tag_fields(
+            data.get('tag_results', {})
+        )
+        
+        # 构建插入语句（tag_X/reason_X 列继续写入，兼容仍使用 SELECT * 的导出和维护脚本）
+        insert_fields = [
+            'original_id', 'external_id', 'title', 'content', 'summary', 'source', 'publish_time',
+            'sentiment_level', 'sentiment_reason', 'companies', 'duplicate_id',
+            'duplication_rate', 'processing_time', 'session_id', 'tag_mask', 'processing_status'
+        ]
+        
+        # 添加标签字段
+        insert_fields.extend(tag_fields.keys())
+        insert_fields.extend(reason_fields.keys())
+        
+        # 准备值列表
+        values = [
+            original_id, external_id, title, content, summary, source, publish_time,
+            sentiment_level, sentiment_reason, companies, duplicate_id,
+            duplication_rate, processing_time, session_id, build_tag_mask(matched_tags), processing_status
+        ]
+        
+        # 添加标签值
+        values.extend(tag_fields.values())
+        values.extend(reason_fields.values())
+        
+        # 构建SQL语句
+        placeholders = ', '.join(['?'] * len(values))
+        field_names = ', '.join(insert_fields)
+        
+        cursor.execute(f'''
+            INSERT INTO sentiment_results ({field_names})
+            VALUES ({placeholders})
+        ''', values)
+        
+        result_id = cursor.lastrowid
+        self._save_tag_reasons(cursor, result_id, tag_reasons)
+        self._save_result_companies(cursor, result_id, company_names)
+        
+        return {
+            'success': True,
+            'message': '结果保存成功',
+            'id': result_id
+        }
+    
+    def _build_tag_fields(self, tag_results):
+        """Convert {tag_name: {'belongs', 'reason'}} into tag_X/reason_X column values, matched tags and reasons"""
+        tag_fields = {}
+        reason_fields = {}
+        matched_tags = []
+        tag_reasons = {}
+
+        for tag_name in TAG_NAMES:
+            if tag_name in tag_results:
+                tag_result = tag_results[tag_name]
+                belongs = tag_result.get('belongs', False)
+                tag_fields[f'tag_{tag_name}'] = '是' if belongs else '否'
+                reason_fields[f'reason_{tag_name}'] = tag_result.get('reason', '无')
+                tag_reasons[tag_name] = tag_result.get('reason', '无')
+                if belongs:
+                    matched_tags.append(tag_name)
+            else:
+                tag_fields[f'tag_{tag_name}'] = '否'
+                reason_fields[f'reason_{tag_name}'] = '无'
+
+        return tag_fields, reason_fields, matched_tags, tag_reasons
+
+    def get_degraded_results(self, limit=100, after_id=0):
+        """
+        Get degraded results (produced by rule-based fallback while the LLM was unavailable)
+
+        Args:
+            limit: 最多返回的记录数
+            after_id: 只返回 id 大于该值的记录（分批遍历）
+
+        Returns:
+            list: [{'id', 'original_id', 'title', 'content', 'source', 'publish_time'}]
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT id, original_id, title, content, source, publish_time
+                    FROM sentiment_results
+                    WHERE processing_status = '{DEGRADED_STATUS}' AND id > ?
+                    ORDER BY id
+                    LIMIT ?
+                ''', (after_id, limit))
+                keys = ['id', 'original_id', 'title', 'content', 'source', 'publish_time']
+                return [dict(zip(keys, row)) for row in cursor.fetchall()]
+
+        except Exception as e:
+            print(f"Failed to get degraded results: {e}")
+            return []
+
+    def update_reanalyzed_result(self, result_id, data):
+        """
+        Overwrite the analysis fields of an existing result (used when backfilling degraded results)
+
+        Args:
+            result_id: 结果ID
+            data: 与 save_analysis_result 相同格式的分析字段（summary、sentiment_level、sentiment_reason、
+                  companies、tag_results、processing_time、processing_status）
+
+        Returns:
+            dict: 更新结果
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+
+                company_names = split_company_names(data.get('companies', ''))
+                companies = data.get('companies', '')
+                if not isinstance(companies, str):
+                    companies = ','.join(company_names)
+
+                tag_fields, reason_fields, matched_tags, tag_reasons = self._build_tag_fields(
+                    data.get('tag_results', {})
+                )
+                fields = {
+                    'summary': data.get('summary', '无摘要'),
+                    'sentiment_level': data.get('sentiment_level', '未知'),
+                    'sentiment_reason': data.get('sentiment_reason', '无原因'),
+                    'companies': companies,
+                    'processing_time': data.get('processing_time', 0),
+                    'processing_status': data.get('processing_status', 'completed'),
+                    'tag_mask': build_tag_mask(matched_tags),
+                    **tag_fields,
+                    **reason_fields,
+                }
+                assignments = ', '.join(f'{column} = ?' for column in fields)
+                cursor.execute(
+                    f'UPDATE sentiment_results SET {assignments}, analysis_time = CURRENT_TIMESTAMP WHERE id = ?',
+                    list(fields.values()) + [result_id]
+                )
+                if cursor.rowcount == 0:
+                    return {'success': False, 'message': f'结果 {result_id} 不存在'}
+
+                cursor.execute('DELETE FROM tag_reasons WHERE result_id = ?', (result_id,))
+                self._save_tag_reasons(cursor, result_id, tag_reasons)
+                cursor.execute('DELETE FROM result_companies WHERE result_id = ?', (result_id,))
+                self._save_result_companies(cursor, result_id, company_names)
+                conn.commit()
+
+            return {'success': True, 'message': '结果已更新', 'id': result_id}
+
+        except Exception as e:
+            print(f"Failed to update reanalyzed result: {e}")
+            return {'success': False, 'message': str(e)}
+
     def get_database_info(self):
         """Get database information - compatible with existing API"""
         try:
@@ -822,21 +1747,9 @@ class ResultDatabase:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 
-                # Get total analyses
-                cursor.execute('SELECT COUNT(*) FROM sentiment_results')
-                total_analyses = cursor.fetchone()[0]
-                
-                # Get sentiment distribution
-                cursor.execute('''
-                    SELECT sentiment_label, COUNT(*) as count
-                    FROM sentiment_results 
-                    WHERE sentiment_label IS NOT NULL
-                    GROUP BY sentiment_label
-                ''')
-                
-                sentiment_distribution = {}
-                for row in cursor.fetchall():
-                    sentiment_distribution[row[0]] = row[1]
+                # Get total analyses and sentiment distribution from rollups
+                total_analyses = read_rollup_total(cursor, 'total')
+                sentiment_distribution = read_rollup(cursor, 'sentiment')
                 
                 # Get average processing time (placeholder)
                 avg_processing_time_ms = 0
@@ -854,7 +1767,134 @@ class ResultDatabase:
                 'sentiment_distribution': {},
                 'avg_processing_time_ms': 0
             }
-    
+
+    def get_dashboard_statistics(self, start_day=None, end_day=None, top_n=10):
+        """
+        获取看板统计数据（全部从统计汇总表读取）
+
+        Args:
+            start_day: 开始日期 YYYY-MM-DD（按发布时间，包含）
+            end_day: 结束日期 YYYY-MM-DD（包含）
+            top_n: 来源和企业排行返回的数量
+
+        Returns:
+            dict: 情感/标签分布、按日趋势、来源和企业排行
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+
+                return {
+                    'success': True,
+                    'data': {
+                        'total_results': read_rollup_total(cursor, 'total'),
+                        'sentiment_distribution': read_rollup(cursor, 'sentiment', start_day, end_day),
+                        'tag_distribution': read_rollup(cursor, 'tag', start_day, end_day),
+                        'sentiment_trend': read_rollup_series(cursor, 'sentiment', start_day, end_day),
+                        'tag_trend': read_rollup_series(cursor, 'tag', start_day, end_day),
+                        'top_sources': read_rollup(cursor, 'source', limit=top_n),
+                        'top_companies': read_rollup(cursor, 'company', limit=top_n)
+                    }
+                }
+
+        except Exception as e:
+            print(f"Failed to get dashboard statistics: {e}")
+            return {'success': False, 'message': f'获取看板统计失败: {str(e)}'}
+
+    def get_company_timeline(self, company_name, start_day=None, end_day=None, limit=100,
+                             summary_length=LIST_SUMMARY_LENGTH):
+        """
+        获取企业的风险时间线：相关文章（按发布时间倒序）、按日情感分布、情感分布和标签计数
+
+        Args:
+            company_name: 企业名称或别名
+            start_day: 开始日期 YYYY-MM-DD（按发布时间，包含）
+            end_day: 结束日期 YYYY-MM-DD（包含）
+            limit: 返回的文章数量上限
+            summary_length: 摘要截断长度
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+
+                company_id = self._resolve_company_id(cursor, company_name, create=False)
+                if company_id is None:
+                    return {'success': False, 'message': f'未找到企业: {company_name}'}
+
+                cursor.execute('SELECT canonical_name FROM companies WHERE id = ?', (company_id,))
+                canonical_name = cursor.fetchone()[0]
+                cursor.execute('SELECT alias FROM company_aliases WHERE company_id = ? ORDER BY alias', (company_id,))
+                aliases = [row[0] for row in cursor.fetchall()]
+
+                # 通过提及索引定位文章，再按日期过滤
+                conditions = ['rc.company_id = ?']
+                params = [company_id]
+                if start_day:
+                    conditions.append('substr(r.publish_time, 1, 10) >= ?')
+                    params.append(start_day)
+                if end_day:
+                    conditions.append('substr(r.publish_time, 1, 10) <= ?')
+                    params.append(end_day)
+                source = f'''
+                    FROM result_companies rc
+                    JOIN sentiment_results r ON r.id = rc.result_id
+                    WHERE {' AND '.join(conditions)}
+                '''
+
+                cursor.execute(f'''
+                    SELECT {LIST_RESULT_FIELDS}
+                    {source}
+                    ORDER BY r.publish_time DESC, r.id DESC
+                    LIMIT ?
+                ''', [summary_length] + params + [limit])
+                articles = []
+                for row in cursor.fetchall():
+                    item = dict(zip(LIST_RESULT_KEYS, row))
+                    item['summary_truncated'] = bool(item['summary_truncated'])
+                    item['tags'] = expand_tag_mask(item['tag_mask'])
+                    articles.append(item)
+
+                cursor.execute(f'''
+                    SELECT substr(r.publish_time, 1, 10) as day, COALESCE(r.sentiment_level, '未知'), COUNT(*)
+                    {source}
+                    GROUP BY 1, 2
+                    ORDER BY 1, 2
+                ''', params)
+                daily = [{'day': day, 'sentiment_level': level, 'count': count}
+                         for day, level, count in cursor.fetchall()]
+
+                sentiment_distribution = {}
+                for item in daily:
+                    level = item['sentiment_level']
+                    sentiment_distribution[level] = sentiment_distribution.get(level, 0) + item['count']
+
+                cursor.execute(f'''
+                    SELECT COALESCE(r.tag_mask, 0), COUNT(*)
+                    {source}
+                    GROUP BY 1
+                ''', params)
+                tag_counts = {}
+                for mask, count in cursor.fetchall():
+                    for tag_name in expand_tag_mask(mask):
+                        tag_counts[tag_name] = tag_counts.get(tag_name, 0) + count
+
+                return {
+                    'success': True,
+                    'data': {
+                        'company': canonical_name,
+                        'aliases': aliases,
+                        'total_articles': sum(sentiment_distribution.values()),
+                        'articles': articles,
+                        'daily': daily,
+                        'sentiment_distribution': sentiment_distribution,
+                        'tag_counts': dict(sorted(tag_counts.items(), key=lambda item: -item[1]))
+                    }
+                }
+
+        except Exception as e:
+            print(f"Failed to get company timeline: {e}")
+            return {'success': False, 'message': str(e)}
+
     def cleanup_old_results(self, days=30):
         """Clean up old results - compatible with existing API"""
         try:
@@ -901,9 +1941,10 @@ class ResultDatabase:
                 
                 # 删除记录
                 cursor.execute('DELETE FROM sentiment_results WHERE id = ?', (result_id,))
+                deleted = cursor.rowcount
                 conn.commit()
                 
-                if cursor.rowcount > 0:
+                if deleted > 0:
                     return {
                         'success': True,
                         'message': f'成功删除记录ID {result_id}'
@@ -965,7 +2006,7 @@ class ResultDatabase:
                 'total': 0
             }
 
-    def search_analysis_results(self, search_conditions=None, page=1, page_size=20):
+    def search_analysis_results(self, search_conditions=None, page=1, page_size=20, include_reasons=False):
         """Advanced search with multiple conditions"""
         try:
             with sqlite3.connect(self.db_path) as conn:
@@ -974,38 +2015,35 @@ class ResultDatabase:
                 # 构建搜索条件
                 where_clauses = []
                 search_params = []
+                search_conditions = search_conditions or {}
 
-                if search_conditions:
-                    # 关键词搜索
-                    if 'query' in search_conditions and search_conditions['query']:
-                        query = search_conditions['query'].strip()
-                        if query:
-                            where_clauses.append("""(
-                            title LIKE ? OR
-                            content LIKE ? OR
-                            summary LIKE ? OR
-                            companies LIKE ?
-                        )""")
-                        search_term = f"%{query}%"
-                        search_params.extend([search_term, search_term, search_term, search_term])
+                # 关键词搜索
+                query = (search_conditions.get('query') or '').strip()
+                if query:
+                    where_clauses.append("""(
+                        title LIKE ? OR
+                        content LIKE ? OR
+                        summary LIKE ? OR
+                        companies LIKE ?
+                    )""")
+                    search_term = f"%{query}%"
+                    search_params.extend([search_term, search_term, search_term, search_term])
 
                 # 情感等级搜索
-                if 'sentiment_level' in search_conditions and search_conditions['sentiment_level']:
-                    sentiment = search_conditions['sentiment_level']
+                if search_conditions.get('sentiment_level'):
                     where_clauses.append("sentiment_level = ?")
-                    search_params.append(sentiment)
+                    search_params.append(search_conditions['sentiment_level'])
 
-                # 标签搜索 - 检查是否有匹配的标签
-                if 'tag' in search_conditions and search_conditions['tag']:
-                    tag = search_conditions['tag']
-                    where_clauses.append(f"tag_{tag} = '是'")
+                # 标签搜索 - 按位过滤tag_mask，未知标签不会命中任何记录
+                if search_conditions.get('tag'):
+                    where_clauses.append("(tag_mask & ?) != 0")
+                    search_params.append(build_tag_mask([search_conditions['tag']]))
 
                 # 日期范围搜索
-                if 'date_range' in search_conditions and search_conditions['date_range']:
-                    date_range = search_conditions['date_range']
-                    if 'start_date' in date_range and 'end_date' in date_range:
-                        where_clauses.append("publish_time >= ? AND publish_time <= ?")
-                        search_params.extend([date_range['start_date'], date_range['end_date']])
+                date_range = search_conditions.get('date_range')
+                if date_range and 'start_date' in date_range and 'end_date' in date_range:
+                    where_clauses.append("publish_time >= ? AND publish_time <= ?")
+                    search_params.extend([date_range['start_date'], date_range['end_date']])
 
                 # 组合WHERE条件
                 where_clause = ""
@@ -1021,85 +2059,26 @@ class ResultDatabase:
                 offset = (page - 1) * page_size
                 total_pages = (total + page_size - 1) // page_size
 
-                # 获取标签名称列表
-                tag_names = [
-                    "同业竞争", "股权与控制权", "关联交易", "历史沿革与股东核查", "重大违法违规",
-                    "收入与成本", "财务内控不规范", "客户与供应商", "资产质量与减值", "研发与技术",
-                    "募集资金用途", "突击分红与对赌协议", "市场传闻与负面报道", "行业政策与环境"
-                ]
-
-                # 构建标签字段查询
-                tag_fields = []
-                reason_fields = []
-                for tag_name in tag_names:
-                    tag_fields.append(f'tag_{tag_name}')
-                    reason_fields.append(f'reason_{tag_name}')
-
-                all_tag_fields = ', '.join(tag_fields + reason_fields)
-
                 # 查询数据
                 query_params = search_params + [page_size, offset]
                 cursor.execute(f'''
-                    SELECT
-                        COALESCE(original_id, id) as original_id,
-                        COALESCE(title, '无标题') as title,
-                        COALESCE(content, '无内容') as content,
-                        COALESCE(summary, '无摘要') as summary,
-                        COALESCE(source, '未知来源') as source,
-                        COALESCE(publish_time, '未知时间') as publish_time,
-                        COALESCE(sentiment_level, '未知') as sentiment_level,
-                        COALESCE(sentiment_reason, '无原因') as sentiment_reason,
-                        COALESCE(companies, '') as companies,
-                        COALESCE(duplicate_id, '无') as duplicate_id,
-                        COALESCE(duplication_rate, 0.0) as duplication_rate,
-                        COALESCE(processing_time, 0) as processing_time,
-                        {all_tag_fields}
+                    SELECT {BASE_RESULT_FIELDS}
                     FROM sentiment_results
                     {where_clause}
                     ORDER BY id DESC
                     LIMIT ? OFFSET ?
                 ''', query_params)
 
-                results = cursor.fetchall()
+                rows = cursor.fetchall()
 
-                # 转换数据格式
-                data = []
-                for row in results:
-                    # 构建基本字段
-                    result_dict = {
-                        'id': row[0],
-                        'title': row[1],
-                        'content': row[2],
-                        'summary': row[3],
-                        'source': row[4],
-                        'publish_time': row[5],
-                        'sentiment_level': row[6],
-                        'sentiment_reason': row[7],
-                        'companies': row[8],
-                        'duplicate_id': row[9],
-                        'duplication_rate': row[10],
-                        'processing_time': row[11]
-                    }
+                reasons_by_id = None
+                if include_reasons:
+                    reasons_by_id = self._load_tag_reasons(cursor, [row[0] for row in rows])
 
-                    # 添加标签字段（从第12个字段开始）
-                    field_index = 12
-                    tags = []
-                    for tag_name in tag_names:
-                        tag_value = row[field_index] if field_index < len(row) else '否'
-                        result_dict[f'tag_{tag_name}'] = tag_value
-                        if tag_value == '是':
-                            tags.append(tag_name)
-                        field_index += 1
-
-                    # 添加原因字段
-                    for tag_name in tag_names:
-                        result_dict[f'reason_{tag_name}'] = row[field_index] if field_index < len(row) else '无'
-                        field_index += 1
-
-                    # 添加标签列表（用于前端显示）
-                    result_dict['tags'] = tags
-
-                    data.append(result_dict)
+                data = [
+                    self._build_result_dict(row, reasons_by_id[row[0]] if reasons_by_id is not None else None)
+                    for row in rows
+                ]
 
                 return {
                     'success': True,
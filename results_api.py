@@ -6,12 +6,13 @@
 提供分析结果的保存、查询和导出功能
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from fastapi.responses import StreamingResponse
 from typing import List, Dict, Optional, Any
 from pydantic import BaseModel
 from database_manager import UnifiedDatabaseManager
 from result_database_new import ResultDatabase
+from pagination import INVALID_CURSOR
 import logging
 
 # 初始化数据库实例
@@ -28,6 +29,9 @@ logger = logging.getLogger(__name__)
 # 创建API路由器
 router = APIRouter(tags=["结果"])
 
+# 批量详情接口单次允许的最大ID数
+MAX_BATCH_ARTICLE_IDS = 100
+
 # 数据模型
 class ExportRequest(BaseModel):
     format: str = "csv"  # csv, json, excel
@@ -106,14 +110,22 @@ async def save_results(
 async def list_results(
     page: int = 1,
     page_size: int = 50,
+    cursor: Optional[str] = None,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    count: str = Query('approx', regex="^(exact|approx|none)$"),
     result_db: ResultDatabase = Depends(get_result_db)
 ):
-    """获取分析结果列表"""
+    """获取分析结果列表（轻量字段，详情通过 /article/{id} 获取），传入游标时使用keyset分页"""
     try:
         # 查询结果
-        result = result_db.get_analysis_results(
+        result = result_db.get_analysis_result_list(
             page=page,
-            page_size=page_size
+            page_size=page_size,
+            cursor=cursor,
+            after_id=after_id,
+            before_id=before_id,
+            count=count
         )
         
         if result['success']:
@@ -121,13 +133,21 @@ async def list_results(
                 "success": True,
                 "data": result['data'],
                 "total": result['total'],
+                "total_exact": result['total_exact'],
                 "page": page,
                 "page_size": page_size,
-                "total_pages": result['total_pages']
+                "total_pages": result['total_pages'],
+                "has_more": result['has_more'],
+                "next_cursor": result['next_cursor'],
+                "prev_cursor": result['prev_cursor']
             }
+        elif result.get('error_code') == INVALID_CURSOR:
+            raise HTTPException(status_code=400, detail=result['message'])
         else:
             raise HTTPException(status_code=500, detail=result['message'])
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取分析结果失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取分析结果失败: {str(e)}")
@@ -154,6 +174,30 @@ async def get_article_detail(
         logger.error(f"获取文章详情失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取文章详情失败: {str(e)}")
 
+@router.get("/articles")
+async def get_article_details(
+    ids: str,
+    result_db: ResultDatabase = Depends(get_result_db)
+):
+    """批量获取文章详情，用于前端预取当前页可见行"""
+    try:
+        article_ids = [int(article_id) for article_id in ids.split(',') if article_id.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids必须是逗号分隔的整数")
+    
+    if len(article_ids) > MAX_BATCH_ARTICLE_IDS:
+        raise HTTPException(status_code=400, detail=f"单次最多获取 {MAX_BATCH_ARTICLE_IDS} 条详情")
+    
+    result = result_db.get_analysis_results_by_ids(article_ids)
+    if not result['success']:
+        logger.error(f"批量获取文章详情失败: {result['message']}")
+        raise HTTPException(status_code=500, detail=f"批量获取文章详情失败: {result['message']}")
+    
+    return {
+        "success": True,
+        "data": result['data']
+    }
+
 @router.post("/export")
 async def export_results(
     request: ExportRequest,
@@ -175,7 +219,8 @@ async def export_results(
             # 获取所有结果数据
             result = result_db.get_analysis_results(
                 page=1,
-                page_size=10000  # 获取大量数据用于导出
+                page_size=10000,  # 获取大量数据用于导出
+                include_reasons=True
             )
             
             if not result['success']:
@@ -662,6 +707,45 @@ async def get_database_stats():
         logger.error(f"获取数据库统计失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取统计信息失败: {str(e)}")
 
+@router.get("/statistics")
+async def get_result_statistics(
+    start_day: Optional[str] = Query(None, description="开始日期 YYYY-MM-DD"),
+    end_day: Optional[str] = Query(None, description="结束日期 YYYY-MM-DD"),
+    top_n: int = Query(10, ge=1, le=100, description="来源和企业排行数量"),
+    result_db: ResultDatabase = Depends(get_result_db)
+):
+    """获取看板统计（情感/标签按日分布、来源和企业排行），从统计汇总表读取"""
+    result = result_db.get_dashboard_statistics(start_day=start_day, end_day=end_day, top_n=top_n)
+    if not result['success']:
+        raise HTTPException(status_code=500, detail=result['message'])
+    return result
+
+@router.get("/companies/{company_name}/timeline")
+async def get_company_timeline(
+    company_name: str,
+    start_day: Optional[str] = Query(None, description="开始日期 YYYY-MM-DD"),
+    end_day: Optional[str] = Query(None, description="结束日期 YYYY-MM-DD"),
+    limit: int = Query(100, ge=1, le=1000, description="返回的文章数量上限"),
+    result_db: ResultDatabase = Depends(get_result_db)
+):
+    """获取企业风险时间线（文章列表、按日情感分布、标签计数），企业名称支持别名"""
+    result = result_db.get_company_timeline(company_name, start_day=start_day, end_day=end_day, limit=limit)
+    if not result['success']:
+        raise HTTPException(status_code=404, detail=result['message'])
+    return result
+
+@router.post("/companies/{company_name}/aliases")
+async def add_company_aliases(
+    company_name: str,
+    aliases: List[str],
+    result_db: ResultDatabase = Depends(get_result_db)
+):
+    """登记企业别名，别名已归属其他企业时合并两家企业"""
+    result = result_db.add_company_aliases(company_name, aliases)
+    if not result['success']:
+        raise HTTPException(status_code=400, detail=result['message'])
+    return result
+
 @router.post("/database/fix-summaries")
 async def fix_empty_summaries():
     """修复空摘要"""
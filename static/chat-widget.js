@@ -7,6 +7,7 @@ class ChatWidget {
     constructor() {
         this.isOpen = false;
         this.conversationHistory = [];
+        this.conversationId = this.newConversationId();
         this.currentResults = [];
         this.isTyping = false;
         
@@ -212,8 +213,8 @@ class ChatWidget {
                 <div class="chat-widget-welcome-text">
                     我是您的专属AI助手，可以基于搜索结果为您提供智能问答服务。<br><br>
                     <strong>使用提示：</strong><br>
-                    • 先在主页面搜索数据<br>
-                    • 我会基于搜索结果回答问题<br>
+                    • 直接提问，我会从分析结果库中检索相关数据<br>
+                    • 在主页面搜索后，只在搜索结果中检索<br>
                     • 可在设置中选择分析字段<br>
                     • 支持连续对话
                 </div>
@@ -240,40 +241,81 @@ class ChatWidget {
             // 获取知识库字段
             const knowledgeBaseFields = this.getSelectedKnowledgeBaseFields();
             
-            // 发送请求
-            const response = await fetch('/api/chat', {
+            // 只上传当前搜索结果的ID，相关数据由服务端检索并流式返回回答
+            const resultIds = this.currentResults
+                .map(result => result.id)
+                .filter(id => id !== undefined && id !== null);
+            const response = await fetch('/api/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
                 body: JSON.stringify({
                     message: message,
-                    search_results: this.currentResults,
+                    conversation_id: this.conversationId,
+                    result_ids: resultIds.length > 0 ? resultIds : null,
                     knowledge_base_fields: knowledgeBaseFields,
                     conversation_history: this.conversationHistory
                 })
             });
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
             
-            const result = await response.json();
-            
-            // 隐藏输入状态
-            this.hideTyping();
-            
-            if (result.success) {
-                this.addMessage('ai', result.response);
-                
-                // 更新对话历史
-                this.conversationHistory.push(
-                    { role: 'user', content: message },
-                    { role: 'assistant', content: result.response }
-                );
+            // 逐段显示回答
+            let answer = '';
+            let bubble = null;
+            let finished = false;
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (!finished) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
                 
-                // 限制对话历史长度
-                if (this.conversationHistory.length > 20) {
-                    this.conversationHistory = this.conversationHistory.slice(-20);
+                for (const raw of events) {
+                    if (!raw.startsWith('data: ')) continue;
+                    const event = JSON.parse(raw.slice(6));
+                    
+                    if (event.type === 'delta') {
+                        if (!bubble) {
+                            bubble = this.startStreamingMessage();
+                        }
+                        answer += event.content;
+                        bubble.innerHTML = this.formatMessage(answer);
+                        this.scrollToBottom();
+                    } else if (event.type === 'done') {
+                        // 最终回答可能与流式片段不同（升级到更强模型时），以最终回答为准
+                        answer = event.response;
+                        if (!bubble) {
+                            bubble = this.startStreamingMessage();
+                        }
+                        bubble.innerHTML = this.formatMessage(answer);
+                        this.scrollToBottom();
+                        
+                        // 更新对话历史
+                        this.conversationHistory.push(
+                            { role: 'user', content: message },
+                            { role: 'assistant', content: answer }
+                        );
+                        
+                        // 限制对话历史长度
+                        if (this.conversationHistory.length > 20) {
+                            this.conversationHistory = this.conversationHistory.slice(-20);
+                        }
+                        finished = true;
+                    } else if (event.type === 'error') {
+                        this.addMessage('ai', `抱歉，出现了错误：${event.error}`);
+                        finished = true;
+                    }
                 }
-            } else {
-                this.addMessage('ai', `抱歉，出现了错误：${result.error}`);
+            }
+            this.hideTyping();
+            if (!finished) {
+                this.addMessage('ai', '抱歉，回答未完整返回，请重试');
             }
             
         } catch (error) {
@@ -345,6 +387,15 @@ class ChatWidget {
         this.scrollToBottom();
     }
     
+    startStreamingMessage() {
+        // 收到第一段回答时移除输入提示（发送按钮在回答结束前保持禁用）
+        const typingDiv = document.getElementById('chatWidgetTyping');
+        if (typingDiv) {
+            typingDiv.remove();
+        }
+        return this.addMessage('ai', '').querySelector('.chat-widget-message-bubble');
+    }
+    
     hideTyping() {
         this.isTyping = false;
         this.sendButton.disabled = false;
@@ -355,8 +406,13 @@ class ChatWidget {
         }
     }
     
+    newConversationId() {
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+    }
+    
     clearChat() {
         this.conversationHistory = [];
+        this.conversationId = this.newConversationId();
         this.loadWelcomeMessage();
     }
     
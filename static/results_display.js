@@ -11,6 +11,9 @@ class ResultsDisplayManager {
         this.currentResults = [];
         this.selectedArticle = null;
         this.searchTimeout = null;
+        // 文章详情缓存: id -> Promise<详情|null>，列表接口只返回轻量字段
+        this.detailCache = new Map();
+        this.maxDetailCacheSize = 500;
         
         this.initElements();
         this.bindEvents();
@@ -210,9 +213,51 @@ class ResultsDisplayManager {
         } else {
             this.hideNoResults();
             this.renderResultsList(results);
+            this.prefetchDetails(results);
         }
     }
 
+    prefetchDetails(results) {
+        // 批量预取当前页可见行的完整详情，点击时无需再等待请求
+        const ids = results.map(result => result.id).filter(id => id && !this.detailCache.has(id));
+        if (ids.length === 0) return;
+        
+        if (this.detailCache.size + ids.length > this.maxDetailCacheSize) {
+            this.detailCache.clear();
+        }
+        
+        const batch = fetch(`/api/results/articles?ids=${ids.join(',')}`)
+            .then(response => response.json())
+            .then(result => (result.success ? result.data : {}))
+            .catch(error => {
+                console.error('预取文章详情失败:', error);
+                return {};
+            });
+        ids.forEach(id => {
+            this.detailCache.set(id, batch.then(data => data[id] || null));
+        });
+    }
+
+    async loadArticleDetail(article) {
+        // 获取完整详情（正文、情感原因、标签原因），优先使用预取结果
+        if (!article.id) return article;
+        
+        let detail = this.detailCache.has(article.id) ? await this.detailCache.get(article.id) : null;
+        if (!detail) {
+            try {
+                const response = await fetch(`/api/results/article/${article.id}`);
+                const result = await response.json();
+                if (result.success) {
+                    detail = result.data;
+                    this.detailCache.set(article.id, Promise.resolve(detail));
+                }
+            } catch (error) {
+                console.error('获取文章详情失败:', error);
+            }
+        }
+        return detail ? { ...article, ...detail } : article;
+    }
+
     renderResultsList(results) {
         this.resultsList.innerHTML = '';
         
@@ -318,11 +363,18 @@ class ResultsDisplayManager {
         return 'neutral';
     }
 
-    selectArticle(article) {
+    async selectArticle(article) {
         console.log('选择文章:', article);
         this.selectedArticle = article;
         this.showArticleDetail(article);
         this.highlightSelectedArticle(article.original_id || article.id);
+        
+        // 先用列表数据渲染，完整详情到达后再补全
+        const detail = await this.loadArticleDetail(article);
+        if (this.selectedArticle === article && detail !== article) {
+            this.selectedArticle = detail;
+            this.showArticleDetail(detail);
+        }
     }
 
     showArticleDetail(article) {
@@ -402,12 +454,18 @@ class ResultsDisplayManager {
             articleDuplicateStatus.className = `duplicate-badge duplicate-${(article.duplicate_status === '重复') ? 'duplicate' : 'unique'}`;
         }
         
-        // 填充文章内容（这里应该从数据库获取完整内容）
+        // 填充文章内容，完整正文由详情接口按需加载
         if (articleContent) {
-            articleContent.innerHTML = `
-                <p>${article.summary || '无摘要内容'}</p>
-                <p class="content-note">注：此处显示的是文章摘要，完整内容需要从数据库获取。</p>
-            `;
+            articleContent.innerHTML = '';
+            const contentParagraph = document.createElement('p');
+            contentParagraph.textContent = article.content || article.summary || '无摘要内容';
+            articleContent.appendChild(contentParagraph);
+            if (!article.content) {
+                const note = document.createElement('p');
+                note.className = 'content-note';
+                note.textContent = '正在加载完整内容...';
+                articleContent.appendChild(note);
+            }
         }
         
         // 填充详细分析结果
@@ -424,20 +482,24 @@ class ResultsDisplayManager {
         // 情感分析详情
         const sentiment = article.sentiment_level || article.sentiment || '';
         if (detailSentimentLevel) detailSentimentLevel.textContent = sentiment;
-        if (detailSentimentReason) detailSentimentReason.textContent = '详细的分析原因将在这里显示...';
+        if (detailSentimentReason) detailSentimentReason.textContent = article.sentiment_reason || '正在加载分析原因...';
         
         // 标签分析详情
         if (detailTags) {
             detailTags.innerHTML = '';
             const detailTagsArray = this.extractMatchedTags(article);
+            const reasonsMap = this.extractTagReasonsMap(article);
             if (detailTagsArray.length > 0) {
                 detailTagsArray.forEach(tag => {
                     const tagDetail = document.createElement('div');
                     tagDetail.className = 'analysis-item';
-                    tagDetail.innerHTML = `
-                        <span class="label">${tag}：</span>
-                        <span>该标签的详细分析原因将在这里显示...</span>
-                    `;
+                    const label = document.createElement('span');
+                    label.className = 'label';
+                    label.textContent = `${tag}：`;
+                    const reason = document.createElement('span');
+                    reason.textContent = reasonsMap[tag] || '正在加载标签原因...';
+                    tagDetail.appendChild(label);
+                    tagDetail.appendChild(reason);
                     detailTags.appendChild(tagDetail);
                 });
             } else {
@@ -600,17 +662,19 @@ class ResultsDisplayManager {
         }
     }
 
-    showTagReason(tag, result) {
-        // 显示标签匹配原因的弹窗或提示
-        const reasonsMap = this.extractTagReasonsMap(result);
+    async showTagReason(tag, result) {
+        // 显示标签匹配原因的弹窗或提示（列表不含原因，从详情获取）
+        const detail = await this.loadArticleDetail(result);
+        const reasonsMap = this.extractTagReasonsMap(detail);
         const reason = reasonsMap[tag] || '暂无详细原因';
         alert(`标签: ${tag}\n匹配原因: ${reason}`);
     }
 
-    showSentimentReason(result) {
-        // 显示情感分析原因的弹窗或提示
-        const sentiment = result.sentiment_level || result.sentiment || '';
-        const reason = result.sentiment_reason || '暂无详细原因';
+    async showSentimentReason(result) {
+        // 显示情感分析原因的弹窗或提示（列表不含原因，从详情获取）
+        const detail = await this.loadArticleDetail(result);
+        const sentiment = detail.sentiment_level || detail.sentiment || '';
+        const reason = detail.sentiment_reason || '暂无详细原因';
         alert(`情感等级: ${sentiment}\n分析原因: ${reason}`);
     }
 
@@ -394,21 +394,8 @@ function createSearchResultRow(result) {
 
     const publishTime = result.publish_time ? new Date(result.publish_time).toLocaleDateString('zh-CN') : '未知';
 
-    // 处理标签 - 直接从API返回的标签字段中提取
-    const tags = [];
-    const tagNames = [
-        '同业竞争', '股权与控制权', '关联交易', '历史沿革与股东核查', '重大违法违规',
-        '收入与成本', '财务内控不规范', '客户与供应商', '资产质量与减值', '研发与技术',
-        '募集资金用途', '突击分红与对赌协议', '市场传闻与负面报道', '行业政策与环境'
-    ];
-    
-    // 从API返回的标签字段中提取标签
-    for (const tagName of tagNames) {
-        const tagKey = `tag_${tagName}`;
-        if (result[tagKey] === '是') {
-            tags.push(tagName);
-        }
-    }
+    // 处理标签 - 列表接口返回tags数组，详情接口同时返回tag_字段
+    const tags = extractResultTags(result);
 
     const tagsHtml = tags.length > 0 ?
         tags.map(tag => `<span class="tag-item clickable-tag" onclick="showTagDetail('${tag}', event)">${tag}</span>`).join('') :
@@ -428,14 +415,13 @@ function createSearchResultRow(result) {
         companies.slice(0, 1).map(company => `<span class="company">${company}</span>`).join('') :
         '<span class="no-company">无相关公司</span>';
 
-    // 处理情感分析结果 - 直接从API返回的字段获取
+    // 处理情感分析结果 - 原因不在列表接口中，点击时按需获取
     const sentimentLevel = result.sentiment_level || '未知';
-    const sentimentReason = result.sentiment_reason || '';
 
     row.innerHTML = `
         <div class="result-header">
             <h3 class="result-title">${result.title || '无标题'}</h3>
-            <span class="sentiment-level clickable-sentiment" onclick="showSentimentDetail('${sentimentLevel}', '${sentimentReason}', event)">
+            <span class="sentiment-level clickable-sentiment">
                 ${sentimentLevel}
             </span>
             <span class="result-time">${publishTime}</span>
@@ -449,6 +435,15 @@ function createSearchResultRow(result) {
         </div>
     `;
 
+    const sentimentElement = row.querySelector('.clickable-sentiment');
+    if (sentimentElement) {
+        sentimentElement.addEventListener('click', async (event) => {
+            event.stopPropagation();
+            const detail = await fetchArticleDetail(result);
+            showSentimentDetail(sentimentLevel, detail.sentiment_reason || '', event);
+        });
+    }
+
     // 为标题添加点击事件，确保可以跳转
     const titleElement = row.querySelector('.result-title');
     if (titleElement) {
@@ -467,21 +462,8 @@ function showArticleDetail(result) {
     const articleDetail = document.getElementById('articleDetail');
     if (!articleDetail) return;
 
-    // 处理标签 - 直接从API返回的标签字段中提取
-    const tags = [];
-    const tagNames = [
-        '同业竞争', '股权与控制权', '关联交易', '历史沿革与股东核查', '重大违法违规',
-        '收入与成本', '财务内控不规范', '客户与供应商', '资产质量与减值', '研发与技术',
-        '募集资金用途', '突击分红与对赌协议', '市场传闻与负面报道', '行业政策与环境'
-    ];
-    
-    // 从API返回的标签字段中提取标签
-    for (const tagName of tagNames) {
-        const tagKey = `tag_${tagName}`;
-        if (result[tagKey] === '是') {
-            tags.push(tagName);
-        }
-    }
+    // 处理标签 - 列表接口返回tags数组，详情接口同时返回tag_字段
+    const tags = extractResultTags(result);
 
     // 处理公司 - 直接从API返回的companies字段获取
     let companies = [];
@@ -534,6 +516,41 @@ function showArticleDetail(result) {
             ` : ''}
         </div>
     `;
+
+    // 列表数据不含情感原因等详情字段，加载完成后重新渲染
+    if (result.id && result.sentiment_reason === undefined) {
+        fetchArticleDetail(result).then(detail => {
+            if (detail !== result) showArticleDetail(detail);
+        });
+    }
+}
+
+// 从结果中提取命中的标签（兼容tags数组和tag_字段）
+function extractResultTags(result) {
+    if (Array.isArray(result.tags)) {
+        return result.tags.filter(Boolean);
+    }
+    const tagNames = [
+        '同业竞争', '股权与控制权', '关联交易', '历史沿革与股东核查', '重大违法违规',
+        '收入与成本', '财务内控不规范', '客户与供应商', '资产质量与减值', '研发与技术',
+        '募集资金用途', '突击分红与对赌协议', '市场传闻与负面报道', '行业政策与环境'
+    ];
+    return tagNames.filter(tagName => result[`tag_${tagName}`] === '是');
+}
+
+// 按需获取文章完整详情（正文、情感原因、标签原因）
+async function fetchArticleDetail(result) {
+    if (!result.id) return result;
+    try {
+        const response = await fetch(`/api/results/article/${result.id}`);
+        const detail = await response.json();
+        if (detail.success) {
+            return { ...result, ...detail.data };
+        }
+    } catch (error) {
+        console.error('获取文章详情失败:', error);
+    }
+    return result;
 }
 
 // 显示搜索加载状态
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+统计汇总表
+通过触发器在插入/删除/更新时增量维护按维度（日期 × 键）的计数，
+统计接口直接读取汇总表，避免每次全表 GROUP BY 扫描
+
+用法（从头重建汇总表）:
+    python stats_rollup.py [--sentiment-db PATH] [--result-db PATH]
+"""
+
+import argparse
+from collections import namedtuple
+from typing import Any, Dict, List, Optional, Sequence
+
+ROLLUP_TABLE = 'stats_rollup'
+
+# 汇总维度定义，表达式中的 {r} 在触发器中替换为 NEW/OLD，重建时替换为表名
+#   name: 维度名
+#   day: 日期表达式（不按日期汇总的维度使用 ''）
+#   key: 键表达式，结果不能为 NULL
+#   joins: 额外的 FROM 子句（如表值函数），可为空
+#   where: 过滤条件
+RollupDimension = namedtuple('RollupDimension', ['name', 'day', 'key', 'joins', 'where'])
+
+# 发布时间取前10位作为日期
+DAY_EXPR = "substr(IFNULL({r}.publish_time, ''), 1, 10)"
+
+
+def dimension(name: str, key: str, day: str = "''", joins: str = '', where: str = 'true') -> RollupDimension:
+    """创建汇总维度"""
+    return RollupDimension(name, day, key, joins, where)
+
+
+def ensure_rollup_table(cursor):
+    """创建汇总表"""
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+            dimension TEXT NOT NULL,
+            day TEXT NOT NULL,
+            key TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, day, key)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _render(template: str, row: str) -> str:
+    return template.replace('{r}', row)
+
+
+def _upsert_statement(dim: RollupDimension, row: str, delta: int) -> str:
+    """生成触发器中单个维度的增量更新语句"""
+    from_clause = f"FROM {_render(dim.joins, row)} " if dim.joins else ''
+    return (
+        f"INSERT INTO {ROLLUP_TABLE} (dimension, day, key, count) "
+        f"SELECT '{dim.name}', {_render(dim.day, row)}, {_render(dim.key, row)}, {delta} "
+        f"{from_clause}WHERE {_render(dim.where, row)} "
+        f"ON CONFLICT(dimension, day, key) DO UPDATE SET count = count + excluded.count;"
+    )
+
+
+def _trigger_names(table: str) -> List[str]:
+    return [f'trg_{table}_rollup_{event}' for event in ('insert', 'delete', 'update')]
+
+
+def install_rollup_triggers(cursor, table: str, dimensions: Sequence[RollupDimension],
+                            columns: Sequence[str]) -> bool:
+    """
+    安装汇总触发器
+
+    已安装的触发器定义（sqlite_master 中保存的 SQL）与当前定义一致时不执行任何 DDL，
+    只有触发器缺失或维度定义变化时才删除并重新创建。
+
+    Args:
+        table: 源表
+        dimensions: 汇总维度
+        columns: 维度依赖的列，仅这些列被更新时才触发重新计数
+
+    Returns:
+        触发器是否被（重新）创建（此时调用方需要重建汇总数据）
+    """
+    ensure_rollup_table(cursor)
+
+    insert_name, delete_name, update_name = _trigger_names(table)
+    add_new = '\n'.join(_upsert_statement(dim, 'NEW', 1) for dim in dimensions)
+    remove_old = '\n'.join(_upsert_statement(dim, 'OLD', -1) for dim in dimensions)
+
+    expected = {
+        insert_name: f'CREATE TRIGGER {insert_name} AFTER INSERT ON {table} BEGIN\n{add_new}\nEND',
+        delete_name: f'CREATE TRIGGER {delete_name} AFTER DELETE ON {table} BEGIN\n{remove_old}\nEND',
+    }
+    if columns:
+        expected[update_name] = (
+            f"CREATE TRIGGER {update_name} AFTER UPDATE OF {', '.join(columns)} ON {table} "
+            f"BEGIN\n{remove_old}\n{add_new}\nEND"
+        )
+
+    names = [insert_name, delete_name, update_name]
+    cursor.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name IN ({','.join(['?'] * len(names))})",
+        names
+    )
+    if dict(cursor.fetchall()) == expected:
+        return False
+
+    for name in names:
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+    for sql in expected.values():
+        cursor.execute(sql)
+    return True
+
+
+def drop_rollup_triggers(cursor, table: str):
+    """删除汇总触发器（批量导入前调用，导入后重新安装并重建汇总数据）"""
+    for name in _trigger_names(table):
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def rebuild_rollups(cursor, table: str, dimensions: Sequence[RollupDimension]):
+    """根据源表从头重新计算指定维度的汇总数据（需在同一事务中提交）"""
+    ensure_rollup_table(cursor)
+    names = [dim.name for dim in dimensions]
+    placeholders = ','.join(['?'] * len(names))
+    cursor.execute(f'DELETE FROM {ROLLUP_TABLE} WHERE dimension IN ({placeholders})', names)
+
+    for dim in dimensions:
+        joins = f", {_render(dim.joins, table)}" if dim.joins else ''
+        cursor.execute(
+            f"INSERT INTO {ROLLUP_TABLE} (dimension, day, key, count) "
+            f"SELECT '{dim.name}', {_render(dim.day, table)}, {_render(dim.key, table)}, COUNT(*) "
+            f"FROM {table}{joins} WHERE {_render(dim.where, table)} GROUP BY 2, 3"
+        )
+
+
+def add_rollups(cursor, table: str, dimensions: Sequence[RollupDimension], after_id: int):
+    """把源表中 id 大于 after_id 的行计入汇总数据（批量导入后只补计新导入的行，需在同一事务中提交）"""
+    ensure_rollup_table(cursor)
+    for dim in dimensions:
+        joins = f", {_render(dim.joins, table)}" if dim.joins else ''
+        cursor.execute(
+            f"INSERT INTO {ROLLUP_TABLE} (dimension, day, key, count) "
+            f"SELECT '{dim.name}', {_render(dim.day, table)}, {_render(dim.key, table)}, COUNT(*) "
+            f"FROM {table}{joins} WHERE {table}.id > ? AND ({_render(dim.where, table)}) GROUP BY 2, 3 "
+            f"ON CONFLICT(dimension, day, key) DO UPDATE SET count = count + excluded.count",
+            (after_id,)
+        )
+
+
+def read_rollup_total(cursor, dimension_name: str, key: Optional[str] = None) -> int:
+    """读取某个维度（或其中某个键）的总计数"""
+    if key is None:
+        cursor.execute(f'SELECT COALESCE(SUM(count), 0) FROM {ROLLUP_TABLE} WHERE dimension = ?',
+                       (dimension_name,))
+    else:
+        cursor.execute(f'SELECT COALESCE(SUM(count), 0) FROM {ROLLUP_TABLE} WHERE dimension = ? AND key = ?',
+                       (dimension_name, key))
+    return cursor.fetchone()[0]
+
+
+def read_rollup(cursor, dimension_name: str, start_day: Optional[str] = None, end_day: Optional[str] = None,
+                limit: Optional[int] = None, skip_empty: bool = True) -> Dict[str, int]:
+    """
+    读取某个维度按键汇总的计数（可按日期范围过滤），按计数降序
+
+    Args:
+        start_day/end_day: 日期范围（YYYY-MM-DD，包含边界）
+        limit: 只返回前 N 个键
+        skip_empty: 是否跳过空键
+    """
+    conditions = ['dimension = ?']
+    params: List[Any] = [dimension_name]
+    if start_day:
+        conditions.append('day >= ?')
+        params.append(start_day)
+    if end_day:
+        conditions.append('day <= ?')
+        params.append(end_day)
+    if skip_empty:
+        conditions.append("key != ''")
+
+    query = f'''
+        SELECT key, SUM(count) as total FROM {ROLLUP_TABLE}
+        WHERE {' AND '.join(conditions)}
+        GROUP BY key HAVING total > 0
+        ORDER BY total DESC
+    '''
+    if limit:
+        query += ' LIMIT ?'
+        params.append(limit)
+
+    cursor.execute(query, params)
+    return dict(cursor.fetchall())
+
+
+def read_rollup_series(cursor, dimension_name: str, start_day: Optional[str] = None,
+                       end_day: Optional[str] = None) -> List[Dict[str, Any]]:
+    """读取某个维度按日期 × 键的计数序列"""
+    conditions = ['dimension = ?', 'count > 0', "day != ''"]
+    params: List[Any] = [dimension_name]
+    if start_day:
+        conditions.append('day >= ?')
+        params.append(start_day)
+    if end_day:
+        conditions.append('day <= ?')
+        params.append(end_day)
+
+    cursor.execute(f'''
+        SELECT day, key, count FROM {ROLLUP_TABLE}
+        WHERE {' AND '.join(conditions)}
+        ORDER BY day, key
+    ''', params)
+    return [{'day': day, 'key': key, 'count': count} for day, key, count in cursor.fetchall()]
+
+
+def whole_day_range(start_time: Optional[str], end_time: Optional[str]):
+    """
+    判断时间范围是否按整天对齐，对齐时返回 (开始日期, 结束日期)，否则返回 None
+
+    publish_time BETWEEN start AND end 仅在 start 为当天零点、end 为当天 23:59:59 时
+    与按日汇总的结果一致
+    """
+    if not start_time or not end_time:
+        return None
+    if len(start_time) < 10 or len(end_time) < 10:
+        return None
+    if start_time[10:] not in ('', ' 00:00:00', ' 00:00') or end_time[10:] != ' 23:59:59':
+        return None
+    return start_time[:10], end_time[:10]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='从头重建统计汇总表')
+    parser.add_argument('--sentiment-db', default='data/sentiment_analysis.db', help='舆情数据库路径')
+    parser.add_argument('--result-db', default='data/analysis_results.db', help='分析结果数据库路径')
+    args = parser.parse_args()
+
+    from database import DatabaseManager
+    from result_database_new import ResultDatabase
+
+    for name, db in (('舆情数据库', DatabaseManager(args.sentiment_db)),
+                     ('分析结果数据库', ResultDatabase(args.result_db))):
+        result = db.rebuild_rollups()
+        print(f"{name}: {result.get('message')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+"""CSV批量导入：延迟索引导入后只补计导入行的汇总数据，结果与从头重建一致；按已有行数决定是否延迟"""
+
+import csv
+import sqlite3
+
+import pytest
+
+import database
+from database import SENTIMENT_ROLLUP_DIMENSIONS, DatabaseManager
+from stats_rollup import rebuild_rollups
+
+
+def _write_csv(path, rows, offset=0):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['标题', '内容', '来源', '发布时间', '行业', '情感等级'])
+        for i in range(offset, offset + rows):
+            writer.writerow([f'标题{i}', f'内容{i}', f'来源{i % 5}', f'2024-01-{i % 28 + 1:02d} 10:00:00',
+                             f'行业{i % 3}', ['正面', '中性', '负面'][i % 3]])
+
+
+def _rollups(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return sorted(conn.execute('SELECT dimension, day, key, count FROM stats_rollup WHERE count != 0'))
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'sentiment.db'))
+    _write_csv(tmp_path / 'first.csv', 300)
+    assert db.import_csv_data(str(tmp_path / 'first.csv'), defer_indexes=False)['imported'] == 300
+    return db
+
+
+def test_deferred_import_adds_rollups_for_imported_rows(db, tmp_path):
+    _write_csv(tmp_path / 'second.csv', 200, offset=300)
+    assert db.import_csv_data(str(tmp_path / 'second.csv'), chunk_size=50, defer_indexes=True)['imported'] == 200
+
+    incremental = _rollups(db.db_path)
+    with sqlite3.connect(db.db_path) as conn:
+        rebuild_rollups(conn.cursor(), 'sentiment_data', SENTIMENT_ROLLUP_DIMENSIONS)
+    assert incremental == _rollups(db.db_path)
+    assert ('total', '', '', 500) in incremental
+
+    with sqlite3.connect(db.db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'idx_sentiment_data_publish_time'"
+                            ).fetchone()[0] == 1
+        assert conn.execute("SELECT COUNT(*) FROM import_state").fetchone()[0] == 0
+
+
+@pytest.mark.parametrize('rows, expected', [(20, False), (200, True)])
+def test_defer_decision_weighs_existing_rows(db, tmp_path, monkeypatch, rows, expected):
+    monkeypatch.setattr(database, 'DEFER_INDEX_MIN_BYTES', 0)
+    path = tmp_path / 'next.csv'
+    _write_csv(path, rows)
+    with sqlite3.connect(db.db_path) as conn:
+        assert db._should_defer_indexes(conn.cursor(), str(path), path.stat().st_size) is expected
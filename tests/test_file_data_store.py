@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+"""iter_json_records 增量解析与 json.load 结果一致；存储目录的磁盘配额与启动清理"""
+
+import io
+import json
+import os
+
+import pytest
+
+from config import Config
+from file_data_store import DiskQuotaExceeded, FileDataStore, directory_usage, iter_json_records, purge_stores
+
+RECORDS = [{"title": "标题1", "content": "内容1"}, {"title": "标题2", "content": "内容2"}]
+
+
+def _parse(text):
+    return list(iter_json_records(io.StringIO(text)))
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+@pytest.mark.parametrize("payload", [
+    RECORDS,
+    {"total": 2, "data": RECORDS},
+    {"code": 0, "items": RECORDS, "message": "ok"},
+    {"results": RECORDS},
+])
+def test_wrapped_arrays(payload, indent):
+    assert _parse(json.dumps(payload, ensure_ascii=False, indent=indent)) == RECORDS
+
+
+@pytest.mark.parametrize("text", [
+    '{"a": 1, "b": 2}',
+    '{\n  "a": 1,\n  "b": [1, 2]\n}',
+    '{"a":1,"b":{"c":  "d"}}',
+])
+def test_single_object(text):
+    assert _parse(text) == [json.loads(text)]
+
+
+def test_metadata_after_non_record_array_key():
+    text = '{"tags": ["x"], "data":\n  [ {"id": 1} , {"id": 2} ]\n}'
+    assert _parse(text) == [{"id": 1}, {"id": 2}]
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'FILE_SOURCE_DIR', str(tmp_path / 'file_source'))
+    monkeypatch.setattr(Config, 'FILE_SOURCE_DISK_QUOTA_MB', 1)
+    source = tmp_path / 'upload.jsonl'
+    source.write_text('\n'.join(json.dumps({'title': 'x' * 2000, 'publish_time': f'2024-01-{i % 28 + 1:02d}'})
+                                for i in range(150)), encoding='utf-8')
+    return source
+
+
+def test_quota_counts_other_stores_in_directory(store_dir):
+    first = FileDataStore.build(str(store_dir), 'jsonl')
+    # 目录中已有的存储（如重启前遗留的）计入配额
+    with pytest.raises(DiskQuotaExceeded):
+        FileDataStore.build(str(store_dir), 'jsonl')
+    assert os.listdir(Config.FILE_SOURCE_DIR) == [os.path.basename(first.db_path)]
+
+    # 被替换的存储不计入
+    second = FileDataStore.build(str(store_dir), 'jsonl', replaces=first)
+    assert second.total == 150
+
+
+def test_purge_stores_removes_leftover_stores(store_dir):
+    FileDataStore.build(str(store_dir), 'jsonl')
+    assert purge_stores() == 1
+    assert os.listdir(Config.FILE_SOURCE_DIR) == []
+    assert directory_usage() == 0
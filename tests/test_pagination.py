@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+"""keyset 分页：游标翻页结果与 OFFSET 一致、查询计划直接定位索引、无效游标被拒绝"""
+
+import sqlite3
+
+import pytest
+
+import database
+from database import DatabaseManager
+from pagination import INVALID_CURSOR, decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def sentiment_db(tmp_path):
+    db = DatabaseManager(str(tmp_path / 'sentiment.db'))
+    with sqlite3.connect(db.db_path) as conn:
+        conn.executemany(
+            'INSERT INTO sentiment_data (title, publish_time) VALUES (?, ?)',
+            [(f'标题{i}', None if i % 7 == 0 else f'2024-01-{i % 28 + 1:02d} 10:00:00') for i in range(300)]
+        )
+    return db
+
+
+def _walk(db, sort_order, page_size=40):
+    ids, cursor = [], None
+    while True:
+        page = db.get_data(fields=['id'], sort_order=sort_order, page_size=page_size, cursor=cursor, count='none')
+        assert page['success'], page
+        ids += [row['id'] for row in page['data']]
+        cursor = page['next_cursor']
+        if not cursor:
+            return ids
+
+
+@pytest.mark.parametrize('sort_order', ['DESC', 'ASC'])
+def test_cursor_walk_matches_offset(sentiment_db, sort_order):
+    full = sentiment_db.get_data(fields=['id'], sort_order=sort_order, page_size=1000, count='none')
+    assert _walk(sentiment_db, sort_order) == [row['id'] for row in full['data']]
+
+
+def test_prev_cursor_returns_previous_page(sentiment_db):
+    first = sentiment_db.get_data(fields=['id'], page_size=20, count='none')
+    second = sentiment_db.get_data(fields=['id'], page_size=20, cursor=first['next_cursor'], count='none')
+    back = sentiment_db.get_data(fields=['id'], page_size=20, cursor=second['prev_cursor'], count='none')
+    assert back['data'] == first['data']
+
+
+@pytest.mark.parametrize('sort_order', ['DESC', 'ASC'])
+def test_cursor_query_searches_index(sentiment_db, monkeypatch, sort_order):
+    statements = []
+    connect = sqlite3.connect
+
+    def traced_connect(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    first = sentiment_db.get_data(fields=['id'], sort_order=sort_order, page_size=20, count='none')
+    monkeypatch.setattr(database.sqlite3, 'connect', traced_connect)
+    sentiment_db.get_data(fields=['id'], sort_order=sort_order, page_size=20, cursor=first['next_cursor'],
+                          count='none')
+    monkeypatch.undo()
+
+    query = next(sql for sql in statements if 'ORDER BY' in sql)
+    with sqlite3.connect(sentiment_db.db_path) as conn:
+        plan = ' '.join(row[-1] for row in conn.execute(f'EXPLAIN QUERY PLAN {query}'))
+    assert 'SEARCH sentiment_data USING INDEX idx_sentiment_data_publish_time' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', encode_cursor(['x'], 'sideways'), encode_cursor([1, 2, 3])])
+def test_malformed_cursor_is_rejected(sentiment_db, cursor):
+    result = sentiment_db.get_data(cursor=cursor)
+    assert not result['success']
+    assert result['error_code'] == INVALID_CURSOR
+
+
+def test_cursor_from_other_sort_is_rejected(sentiment_db):
+    page = sentiment_db.get_data(fields=['id'], sort_by='publish_time', page_size=20, count='none')
+    values, _ = decode_cursor(page['next_cursor'], 'publish_time DESC')
+
+    for sort_by, sort_order in (('title', 'DESC'), ('publish_time', 'ASC')):
+        result = sentiment_db.get_data(sort_by=sort_by, sort_order=sort_order, cursor=page['next_cursor'])
+        assert result['error_code'] == INVALID_CURSOR
+
+    # 不带排序方式的游标（被篡改）同样拒绝
+    result = sentiment_db.get_data(cursor=encode_cursor(values))
+    assert result['error_code'] == INVALID_CURSOR
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+"""任务队列的状态转换：入队去重、领取与租约、确认、失败重试、租约过期、死信"""
+
+import types
+
+import pytest
+
+import work_queue
+from config import Config
+from work_queue import DEAD, DONE, PENDING, RETRY_BASE_DELAY, RUNNING, WorkQueue
+
+TIMEOUT = 60
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(work_queue, 'time', types.SimpleNamespace(time=clock.time))
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(Config, 'WORK_QUEUE_MAX_ATTEMPTS', 3)
+    monkeypatch.setattr(Config, 'WORK_QUEUE_VISIBILITY_TIMEOUT', TIMEOUT)
+    return WorkQueue(str(tmp_path / 'queue.db'))
+
+
+def _task(queue, task_id):
+    with queue._connect() as conn:
+        return dict(conn.execute('SELECT * FROM tasks WHERE id = ?', (task_id,)).fetchone())
+
+
+def _set_attempts(queue, task_id, attempts):
+    with queue._connect() as conn:
+        conn.execute('UPDATE tasks SET attempts = ? WHERE id = ?', (attempts, task_id))
+
+
+def test_enqueue_skips_articles_with_unfinished_tasks(queue):
+    assert queue.enqueue([{'article_id': 1}, {'article_id': 2}]) == 2
+    assert queue.enqueue([{'article_id': 1}, {'article_id': 3}]) == 1
+    # 不同数据源的同一ID互不影响，API数据源携带记录本身
+    assert queue.enqueue([{'article_id': 1, 'payload': {'title': '标题'}}], 'api') == 1
+
+    task = queue.claim('w1', limit=1)[0]
+    assert queue.ack(task['id'], 'w1')
+    assert queue.enqueue([{'article_id': task['article_id']}]) == 1
+
+
+def test_claim_sets_lease_and_hides_task(queue, clock):
+    queue.enqueue([{'article_id': 1}, {'article_id': 2}])
+    tasks = queue.claim('w1', limit=5)
+    assert [task['article_id'] for task in tasks] == [1, 2]
+    assert all(task['status'] == RUNNING and task['attempts'] == 1 and task['lease_owner'] == 'w1'
+               for task in tasks)
+    assert tasks[0]['lease_until'] == clock.now + TIMEOUT
+
+    assert queue.claim('w2', limit=5) == []
+    assert queue.stats()['workers'] == {'w1': 2}
+
+
+def test_payload_round_trip(queue):
+    queue.enqueue([{'article_id': 7, 'payload': {'title': '标题', 'content': '内容'}}], 'api')
+    task = queue.claim('w1')[0]
+    assert task['source'] == 'api'
+    assert task['payload'] == {'title': '标题', 'content': '内容'}
+
+
+def test_ack_only_by_lease_owner(queue):
+    queue.enqueue([{'article_id': 1}])
+    task = queue.claim('w1')[0]
+    assert not queue.ack(task['id'], 'w2')
+    assert queue.ack(task['id'], 'w1')
+    assert _task(queue, task['id'])['status'] == DONE
+    assert not queue.ack(task['id'], 'w1')
+
+
+def test_expired_lease_is_reclaimed_and_old_owner_loses_it(queue, clock):
+    queue.enqueue([{'article_id': 1}])
+    task = queue.claim('w1')[0]
+
+    clock.advance(TIMEOUT + 1)
+    reclaimed = queue.claim('w2')
+    assert [t['id'] for t in reclaimed] == [task['id']]
+    assert reclaimed[0]['attempts'] == 2
+
+    assert not queue.extend(task['id'], 'w1')
+    assert not queue.ack(task['id'], 'w1')
+    assert queue.fail(task['id'], 'w1', 'late') == ''
+    assert queue.ack(task['id'], 'w2')
+
+
+def test_extend_keeps_task_leased(queue, clock):
+    queue.enqueue([{'article_id': 1}])
+    task = queue.claim('w1')[0]
+
+    clock.advance(TIMEOUT - 1)
+    assert queue.extend(task['id'], 'w1')
+    clock.advance(TIMEOUT - 1)
+    assert queue.claim('w2') == []
+    clock.advance(2)
+    assert [t['id'] for t in queue.claim('w2')] == [task['id']]
+
+
+def test_fail_backs_off_then_dead_letters(queue, clock):
+    queue.enqueue([{'article_id': 1}])
+    task_id = queue.claim('w1')[0]['id']
+
+    assert queue.fail(task_id, 'w1', '第一次失败') == PENDING
+    row = _task(queue, task_id)
+    assert row['available_at'] == clock.now + RETRY_BASE_DELAY
+    assert row['lease_owner'] is None and row['last_error'] == '第一次失败'
+    assert queue.claim('w1') == []
+
+    clock.advance(RETRY_BASE_DELAY)
+    assert queue.claim('w1')[0]['attempts'] == 2
+    assert queue.fail(task_id, 'w1', '第二次失败') == PENDING
+    assert _task(queue, task_id)['available_at'] == clock.now + RETRY_BASE_DELAY * 2
+
+    clock.advance(RETRY_BASE_DELAY * 2)
+    assert queue.claim('w1')[0]['attempts'] == 3
+    assert queue.fail(task_id, 'w1', '第三次失败') == DEAD
+
+    clock.advance(3600)
+    assert queue.claim('w1') == []
+    assert [task['id'] for task in queue.list_dead()] == [task_id]
+    assert queue.stats()[DEAD] == 1
+
+
+def test_repeatedly_expired_lease_dead_letters(queue, clock):
+    queue.enqueue([{'article_id': 1}])
+    for attempt in range(1, 4):
+        tasks = queue.claim(f'w{attempt}')
+        assert tasks and tasks[0]['attempts'] == attempt
+        clock.advance(TIMEOUT + 1)
+
+    # 第三次领取后租约再次过期：领取次数已达上限，转入死信而不是继续领取
+    assert queue.claim('w4') == []
+    row = _task(queue, tasks[0]['id'])
+    assert row['status'] == DEAD
+    assert '租约过期 3 次' in row['last_error']
+
+
+def test_retry_dead_requeues_with_attempts_reset(queue, clock):
+    queue.enqueue([{'article_id': 1}, {'article_id': 2}])
+    for task in queue.claim('w1', limit=2):
+        _set_attempts(queue, task['id'], 3)
+        assert queue.fail(task['id'], 'w1', 'boom') == DEAD
+
+    first_id = queue.list_dead()[-1]['id']
+    assert queue.retry_dead([first_id]) == 1
+    assert queue.stats()[DEAD] == 1
+    task = queue.claim('w2')[0]
+    assert task['id'] == first_id and task['attempts'] == 1
+
+    assert queue.retry_dead() == 1
+    assert queue.stats()[DEAD] == 0
+
+
+def test_retry_dead_skips_article_with_new_active_task(queue):
+    queue.enqueue([{'article_id': 1}])
+    task = queue.claim('w1')[0]
+    _set_attempts(queue, task['id'], 3)
+    queue.fail(task['id'], 'w1', 'boom')
+
+    # 死信期间同一文章重新入队，死信任务不再恢复（同一文章只保留一个未完成任务）
+    assert queue.enqueue([{'article_id': 1}]) == 1
+    assert queue.retry_dead() == 0
+
+
+def test_purge_done(queue, clock):
+    queue.enqueue([{'article_id': 1}, {'article_id': 2}])
+    first, second = queue.claim('w1', limit=2)
+    queue.ack(first['id'], 'w1')
+    clock.advance(100)
+    queue.ack(second['id'], 'w1')
+
+    assert queue.purge_done(older_than=50) == 1
+    assert queue.stats()[DONE] == 1
@@ -4,17 +4,126 @@
 """
 
 import hashlib
+import os
 import re
+import sys
+import threading
+import time
 import jieba
-from typing import Dict, List, Optional, Tuple, Any
-from collections import defaultdict, Counter
+from typing import Dict, List, Optional, Sequence, Tuple, Any
+from collections import defaultdict, Counter, OrderedDict
 from datetime import datetime
 import json
 import redis
 import logging
 
+from config import Config
+
 logger = logging.getLogger(__name__)
 
+# 分词时过滤的停用词
+STOPWORDS = frozenset({'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '一个', '上', '也', '很', '到', '说', '要', '去', '你', '会', '着', '没有', '看', '好', '自己', '这'})
+
+
+def init_jieba() -> float:
+    """
+    加载jieba词典（进程内只加载一次）
+    
+    前缀词典序列化缓存到 Config.JIEBA_CACHE_FILE，之后的进程直接反序列化，不再逐行解析词典文件；
+    缓存不存在或词典更新时由jieba重新生成。应用启动、工作进程启动时调用，避免第一个请求承担加载时间。
+    
+    Returns:
+        本次加载耗时（秒），已加载时为0
+    """
+    if jieba.dt.initialized:
+        return 0.0
+    if Config.JIEBA_CACHE_FILE:
+        cache_file = os.path.abspath(Config.JIEBA_CACHE_FILE)
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        jieba.dt.tmp_dir = os.path.dirname(cache_file)
+        jieba.dt.cache_file = os.path.basename(cache_file)
+    jieba.setLogLevel(logging.WARNING)
+    started = time.perf_counter()
+    jieba.initialize()
+    elapsed = time.perf_counter() - started
+    logger.info(f"jieba词典加载完成，耗时 {elapsed:.2f}s")
+    return elapsed
+
+
+class TokenizationCache:
+    """
+    分词结果LRU缓存，按规范化后的句子（分段）哈希索引
+    
+    文本按句末标点和换行分段后逐段查缓存，整篇不同但包含相同标题、免责声明、模板段落的文本
+    也能复用这些句子的分词结果。条目数和估算内存分别受
+    Config.TOKEN_CACHE_MAX_ENTRIES、Config.TOKEN_CACHE_MAX_MB 限制，超出时淘汰最久未使用的条目。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[bytes, Tuple[Tuple[str, ...], int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(normalized_text: str) -> bytes:
+        return hashlib.blake2b(normalized_text.encode('utf-8'), digest_size=16).digest()
+
+    def get(self, key: bytes) -> Optional[Tuple[str, ...]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: bytes, tokens: Tuple[str, ...]):
+        max_entries = Config.TOKEN_CACHE_MAX_ENTRIES
+        max_bytes = Config.TOKEN_CACHE_MAX_MB * 1024 * 1024
+        if max_entries <= 0 or max_bytes <= 0:
+            return
+        size = sys.getsizeof(key) + sys.getsizeof(tokens) + sum(sys.getsizeof(token) for token in tokens)
+        if size > max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (tokens, size)
+            self._bytes += size
+            while len(self._entries) > max_entries or self._bytes > max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'memory_mb': round(self._bytes / 1024 / 1024, 2),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+            }
+
+
+# 进程内共享的分词缓存（进程池的每个子进程各有一份）
+tokenization_cache = TokenizationCache()
+
+# 分词缓存的分段边界：句末标点和换行（清理时都会变成空格，jieba 在空格处本就断开，分段不改变分词结果）
+SEGMENT_PATTERN = re.compile(r'[。！？!?\r\n]+')
+
 class SimHash:
     """SimHash算法实现"""
     
@@ -31,6 +140,15 @@ class SimHash:
         self.window_size = window_size
         self.value = self._calculate_simhash(text)
     
+    @classmethod
+    def from_value(cls, value: int, window_size: int = 6, hash_bits: int = 64) -> 'SimHash':
+        """由已计算好的SimHash值构造（指纹由进程池批量计算时使用）"""
+        simhash = cls.__new__(cls)
+        simhash.hash_bits = hash_bits
+        simhash.window_size = window_size
+        simhash.value = value
+        return simhash
+    
     def _calculate_simhash(self, text: str) -> int:
         """计算文本的SimHash值"""
         # 文本预处理和分词
@@ -39,44 +157,60 @@ class SimHash:
         # 生成特征子串
         features = self._generate_features(tokens)
         
-        # 计算权重向量
-        weights = [0] * self.hash_bits
+        # 统计每一位为1的特征权重之和：该位加权和 = 置位权重 - (总权重 - 置位权重)
+        set_weights = [0] * self.hash_bits
+        total_weight = 0
+        mask = (1 << self.hash_bits) - 1
         
         for feature, count in features.items():
-            # 计算特征的hash值
-            feature_hash = hashlib.md5(feature.encode('utf-8')).hexdigest()
-            feature_int = int(feature_hash, 16)
+            # 计算特征的hash值（只取低 hash_bits 位）
+            feature_int = int.from_bytes(hashlib.md5(feature.encode('utf-8')).digest(), 'big') & mask
+            total_weight += count
             
-            # 对每一位进行加权
-            for i in range(self.hash_bits):
-                bit = (feature_int >> i) & 1
-                if bit:
-                    weights[i] += count
-                else:
-                    weights[i] -= count
-        
-        # 生成最终的SimHash值
+            # 只遍历置位的位
+            while feature_int:
+                low_bit = feature_int & -feature_int
+                set_weights[low_bit.bit_length() - 1] += count
+                feature_int ^= low_bit
+        
+        # 生成最终的SimHash值：加权和大于0的位置1
         simhash_value = 0
         for i in range(self.hash_bits):
-            if weights[i] > 0:
+            if 2 * set_weights[i] > total_weight:
                 simhash_value |= (1 << i)
         
         return simhash_value
     
     def _tokenize(self, text: str) -> List[str]:
-        """文本分词和清理"""
-        # 清理HTML标签和特殊字符
+        """文本分词和清理（按句分段，逐段使用分词缓存后拼接）"""
+        # 清理HTML标签
         text = re.sub(r'<[^>]+>', '', text)
-        text = re.sub(r'[^\u4e00-\u9fa5a-zA-Z0-9\s]', ' ', text)
-        text = re.sub(r'\s+', ' ', text).strip()
+        
+        tokens = []
+        for segment in SEGMENT_PATTERN.split(text):
+            tokens.extend(self._tokenize_segment(segment))
+        return tokens
+    
+    def _tokenize_segment(self, segment: str) -> Tuple[str, ...]:
+        """单个分段的分词和清理（结果按规范化后的分段缓存）"""
+        # 清理特殊字符
+        segment = re.sub(r'[^\u4e00-\u9fa5a-zA-Z0-9\s]', ' ', segment)
+        segment = re.sub(r'\s+', ' ', segment).strip()
+        if not segment:
+            return ()
+        
+        cache_key = tokenization_cache.key(segment)
+        cached = tokenization_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
         # 中文分词
-        tokens = list(jieba.cut(text))
+        tokens = list(jieba.cut(segment))
         
         # 过滤停用词和短词
-        stopwords = {'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '一个', '上', '也', '很', '到', '说', '要', '去', '你', '会', '着', '没有', '看', '好', '自己', '这'}
-        tokens = [token.strip() for token in tokens if len(token.strip()) > 1 and token.strip() not in stopwords]
+        tokens = tuple(token.strip() for token in tokens if len(token.strip()) > 1 and token.strip() not in STOPWORDS)
         
+        tokenization_cache.put(cache_key, tokens)
         return tokens
     
     def _generate_features(self, tokens: List[str]) -> Dict[str, int]:
@@ -143,7 +277,8 @@ class TextDeduplicator:
                 logger.warning(f"Redis连接失败: {e}")
                 self.use_redis = False
     
-    def add_text(self, text_id: str, text: str, publish_time: str = None) -> Dict[str, Any]:
+    def add_text(self, text_id: str, text: str, publish_time: str = None,
+                 simhash_value: Optional[int] = None) -> Dict[str, Any]:
         """
         添加文本到去重系统
         
@@ -151,6 +286,7 @@ class TextDeduplicator:
             text_id: 文本唯一标识
             text: 文本内容
             publish_time: 发布时间
+            simhash_value: 已计算好的SimHash值（不传时在当前进程内计算）
             
         Returns:
             包含去重结果的字典
@@ -159,7 +295,10 @@ class TextDeduplicator:
             publish_time = datetime.now().isoformat()
         
         # 生成SimHash
-        simhash = self.generate_simhash(text)
+        if simhash_value is None:
+            simhash = self.generate_simhash(text)
+        else:
+            simhash = SimHash.from_value(simhash_value, window_size=6)
         
         # 查找相似文本
         similar_texts = self._find_similar_texts(simhash)
@@ -315,19 +454,25 @@ class DuplicateDetectionManager:
         self.config = {**default_config, **(config or {})}
         self.deduplicator = TextDeduplicator(**self.config)
     
-    def detect_duplicates(self, texts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def detect_duplicates(self, texts: List[Dict[str, Any]],
+                          fingerprints: Optional[Sequence[int]] = None) -> List[Dict[str, Any]]:
         """
         批量检测重复文本
         
         Args:
             texts: 文本列表，每个元素包含id和content字段
+            fingerprints: 与 texts 一一对应的SimHash值，不传时由指纹服务批量计算
             
         Returns:
             包含重复检测结果的文本列表
         """
+        if fingerprints is None:
+            from fingerprint_service import fingerprint_service
+            fingerprints = fingerprint_service.fingerprint([item.get('content', '') for item in texts])
+        
         results = []
         
-        for text_item in texts:
+        for text_item, simhash_value in zip(texts, fingerprints):
             text_id = str(text_item.get('id', ''))
             content = text_item.get('content', '')
             publish_time = text_item.get('publish_time', '')
@@ -347,7 +492,8 @@ class DuplicateDetectionManager:
                 duplicate_result = self.deduplicator.add_text(
                     text_id=text_id,
                     text=content,
-                    publish_time=publish_time
+                    publish_time=publish_time,
+                    simhash_value=simhash_value
                 )
                 
                 # 构建结果
@@ -363,6 +509,17 @@ class DuplicateDetectionManager:
             results.append(result)
         
         return results
+    
+    async def detect_duplicates_async(self, texts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量检测重复文本（异步）
+        
+        分词和SimHash计算在指纹服务的进程池中完成，不阻塞事件循环；
+        索引查找和更新开销很小，仍在当前线程内按顺序执行，保证结果与同步版本一致
+        """
+        from fingerprint_service import fingerprint_service
+        fingerprints = await fingerprint_service.fingerprint_async([item.get('content', '') for item in texts])
+        return self.detect_duplicates(texts, fingerprints)
 
 
 # 使用示例
@@ -7,12 +7,13 @@ import json
 import logging
 import tempfile
 import os
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Union, AsyncIterator
 from datetime import datetime
-import pandas as pd
 from dataclasses import dataclass
 
 from api_data_source_manager import APIDataSourceManager, APIConfig, QueryParams
+from config import Config
+from file_data_store import FileDataStore, DiskQuotaExceeded
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +21,7 @@ logger = logging.getLogger(__name__)
 class FileUploadConfig:
     """文件上传配置"""
     file_path: str
-    file_type: str  # csv, json
+    file_type: str  # csv, json, jsonl
     field_mapping: Dict[str, str] = None
     encoding: str = "utf-8"
 
@@ -31,7 +32,8 @@ class UnifiedDataSourceManager:
         self.current_source_type = "api"  # api, file
         self.api_manager = APIDataSourceManager()
         self.file_config: Optional[FileUploadConfig] = None
-        self.uploaded_data: List[Dict[str, Any]] = []
+        # 上传文件解析后存入本地SQLite，按时间字段建索引
+        self.file_store: Optional[FileDataStore] = None
         
     async def configure_api_source(self, config_data: Dict[str, Any]) -> Dict[str, Any]:
         """配置API数据源"""
@@ -76,61 +78,52 @@ class UnifiedDataSourceManager:
     def configure_file_source(self, file_path: str, file_type: str, 
                             field_mapping: Dict[str, str] = None, 
                             encoding: str = "utf-8") -> Dict[str, Any]:
-        """配置文件数据源"""
+        """配置文件数据源（逐条解析文件写入本地存储，大小受 Config.FILE_SOURCE_DISK_QUOTA_MB 限制）"""
         try:
-            # 检查文件大小（10MB限制）
-            file_size = os.path.getsize(file_path)
-            if file_size > 10 * 1024 * 1024:  # 10MB
+            if file_type.lower() not in ('csv', 'json', 'jsonl'):
                 return {
                     'success': False,
-                    'error': '文件过大',
-                    'message': '文件大小不能超过10MB'
+                    'error': '不支持的文件格式',
+                    'message': f'不支持的文件格式: {file_type}'
                 }
             
-            # 读取文件数据
-            if file_type.lower() == 'csv':
-                df = pd.read_csv(file_path, encoding=encoding)
-                data = df.to_dict('records')
-            elif file_type.lower() == 'json':
-                with open(file_path, 'r', encoding=encoding) as f:
-                    data = json.load(f)
-                if isinstance(data, dict):
-                    # 如果是字典，尝试获取数据数组
-                    data = data.get('data', data.get('items', data.get('results', [data])))
-            else:
+            # 检查文件大小（磁盘配额）
+            file_size = os.path.getsize(file_path)
+            if file_size > Config.FILE_SOURCE_DISK_QUOTA_MB * 1024 * 1024:
                 return {
                     'success': False,
-                    'error': '不支持的文件格式',
-                    'message': f'不支持的文件格式: {file_type}'
+                    'error': '文件过大',
+                    'message': f'文件大小不能超过{Config.FILE_SOURCE_DISK_QUOTA_MB:g}MB'
                 }
             
-            # 应用字段映射
-            if field_mapping:
-                mapped_data = []
-                for item in data:
-                    mapped_item = {}
-                    for system_field, file_field in field_mapping.items():
-                        if file_field in item:
-                            mapped_item[system_field] = item[file_field]
-                    mapped_data.append(mapped_item)
-                data = mapped_data
+            # 解析文件并应用字段映射，写入新的本地存储
+            store = FileDataStore.build(file_path, file_type, field_mapping, encoding, replaces=self.file_store)
             
-            # 保存配置和数据
+            # 保存配置，替换旧的存储
             self.file_config = FileUploadConfig(
                 file_path=file_path,
                 file_type=file_type,
                 field_mapping=field_mapping,
                 encoding=encoding
             )
-            self.uploaded_data = data
+            if self.file_store:
+                self.file_store.remove()
+            self.file_store = store
             self.current_source_type = "file"
             
             return {
                 'success': True,
-                'message': f'文件数据源配置成功，共加载 {len(data)} 条数据',
-                'total_records': len(data)
+                'message': f'文件数据源配置成功，共加载 {store.total} 条数据',
+                'total_records': store.total
             }
             
+        except DiskQuotaExceeded as e:
+            logger.error(f"配置文件数据源失败: {str(e)}")
+            return {
+                'success': False,
+                'error': '文件过大',
+                'message': str(e)
+            }
         except Exception as e:
             logger.error(f"配置文件数据源失败: {str(e)}")
             return {
@@ -153,40 +146,49 @@ class UnifiedDataSourceManager:
             }
     
     async def get_api_data(self, query_params: QueryParams) -> Dict[str, Any]:
-        """从API获取数据"""
-        async with self.api_manager:
-            return await self.api_manager.get_data(query_params)
+        """从API获取数据（复用API管理器的会话）"""
+        return await self.api_manager.get_data(query_params)
+    
+    async def sync_api_data(self, query_params: QueryParams, incremental: bool = True,
+                            id_field: str = 'id') -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        从API批量拉取数据，逐页产出字段映射后的记录（其余页并发请求）
+        
+        Args:
+            incremental: 是否增量同步（只拉取高水位之后的新记录，完成后更新高水位）
+            id_field: 记录ID字段，用于排除高水位时间点上已同步的记录
+        """
+        if incremental:
+            async for records in self.api_manager.sync(query_params, id_field=id_field):
+                yield records
+        else:
+            async for records in self.api_manager.iter_records(query_params):
+                yield records
     
     def get_file_data(self, query_params: QueryParams) -> Dict[str, Any]:
         """从文件获取数据"""
         try:
-            if not self.uploaded_data:
+            if not self.file_store or not self.file_store.total:
                 return {
                     'success': False,
                     'error': '无数据',
                     'message': '没有上传的数据文件'
                 }
             
-            # 应用时间过滤
-            filtered_data = self.uploaded_data.copy()
-            
-            if query_params.start_time and query_params.end_time:
-                time_field = query_params.time_field
-                filtered_data = [
-                    item for item in filtered_data
-                    if item.get(time_field) and 
-                    query_params.start_time <= item[time_field] <= query_params.end_time
-                ]
-            
-            # 应用分页
-            total = len(filtered_data)
-            start_idx = (query_params.page - 1) * query_params.page_size
-            end_idx = start_idx + query_params.page_size
-            paginated_data = filtered_data[start_idx:end_idx]
+            # 时间过滤和分页在本地存储中按索引完成
+            has_time_range = bool(query_params.start_time and query_params.end_time)
+            result = self.file_store.query(
+                time_field=query_params.time_field,
+                start_time=query_params.start_time if has_time_range else None,
+                end_time=query_params.end_time if has_time_range else None,
+                page=query_params.page,
+                page_size=query_params.page_size
+            )
+            total = result['total']
             
             return {
                 'success': True,
-                'data': paginated_data,
+                'data': result['data'],
                 'total': total,
                 'page': query_params.page,
                 'page_size': query_params.page_size,
@@ -221,10 +223,20 @@ class UnifiedDataSourceManager:
                 return result
                 
         elif self.current_source_type == "file":
-            # 对于文件，直接返回数据长度
+            # 对于文件，按时间范围在本地存储中计数
+            if not self.file_store:
+                return {
+                    'success': True,
+                    'total': 0
+                }
+            time_range = (filters or {}).get('publish_time') or {}
+            if time_range.get('start') and time_range.get('end'):
+                total = self.file_store.count(time_range['start'], time_range['end'])
+            else:
+                total = self.file_store.total
             return {
                 'success': True,
-                'total': len(self.uploaded_data)
+                'total': total
             }
         else:
             return {
@@ -249,9 +261,9 @@ class UnifiedDataSourceManager:
                     'file_path': self.file_config.file_path if self.file_config else None,
                     'file_type': self.file_config.file_type if self.file_config else None,
                     'field_mapping': self.file_config.field_mapping if self.file_config else None,
-                    'total_records': len(self.uploaded_data)
+                    'total_records': self.file_store.total if self.file_store else 0
                 },
-                'status': 'configured' if self.uploaded_data else 'not_configured'
+                'status': 'configured' if self.file_store and self.file_store.total else 'not_configured'
             }
         else:
             return {
@@ -278,7 +290,9 @@ class UnifiedDataSourceManager:
     
     def clear_file_data(self):
         """清除文件数据"""
-        self.uploaded_data = []
+        if self.file_store:
+            self.file_store.remove()
+        self.file_store = None
         self.file_config = None
         if self.current_source_type == "file":
             self.current_source_type = "api"  # 回退到API模式
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+分析任务队列（本地SQLite，持久化）
+API进程只入队，分析由 analysis_worker.py 启动的工作进程领取执行，可在同一台机器上启动多组工作进程横向扩展。
+- 领取：事务内把到期的待处理任务（或租约已过期的执行中任务）标记为执行中并设置租约，
+  租约时长 Config.WORK_QUEUE_VISIBILITY_TIMEOUT 秒，工作进程处理期间定期续租；
+  工作进程崩溃时任务在租约到期后重新可见，租约过期次数达到上限的任务转入死信
+- 失败：按指数退避延后重试，领取次数达到 Config.WORK_QUEUE_MAX_ATTEMPTS 时转入死信（dead），
+  死信任务可查看并手动重新入队
+- 去重：同一数据源的同一文章只保留一个未完成的任务
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+DEAD = 'dead'
+
+# 失败重试的退避（秒）
+RETRY_BASE_DELAY = 30
+RETRY_MAX_DELAY = 1800
+
+
+class WorkQueue:
+    """SQLite持久化任务队列，多进程共享同一数据库文件"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or Config.WORK_QUEUE_DB
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        # 写事务之间互斥，等待其他进程的事务提交
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    source TEXT NOT NULL,
+                    article_id INTEGER,
+                    payload TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    available_at REAL NOT NULL,
+                    lease_owner TEXT,
+                    lease_until REAL,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            # 同一文章只保留一个未完成任务；完成或进入死信后可再次入队
+            conn.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_active_article
+                ON tasks (source, article_id) WHERE status IN ('pending', 'running') AND article_id IS NOT NULL
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status_available ON tasks (status, available_at)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status_lease ON tasks (status, lease_until)')
+
+    def enqueue(self, items: List[Dict[str, Any]], source: str = 'database') -> int:
+        """
+        批量入队
+
+        Args:
+            items: [{'article_id': 文章ID, 'payload': 文章数据（可选，API数据源没有本地文章时携带）}]
+
+        Returns:
+            实际入队的任务数（已有未完成任务的文章跳过）
+        """
+        now = time.time()
+        rows = [
+            (source, item.get('article_id'),
+             json.dumps(item['payload'], ensure_ascii=False) if item.get('payload') is not None else None,
+             now, now, now)
+            for item in items
+        ]
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            before = conn.total_changes
+            conn.executemany('''
+                INSERT OR IGNORE INTO tasks (source, article_id, payload, available_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', rows)
+            inserted = conn.total_changes - before
+            conn.execute('COMMIT')
+        return inserted
+
+    def claim(self, worker_id: str, limit: int = 1,
+              visibility_timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        领取最多 limit 个任务（到期的待处理任务，或租约已过期的执行中任务），领取次数加一
+
+        租约过期说明上次领取的工作进程崩溃或卡住，此类任务领取次数已达上限时转入死信，不再领取
+        """
+        now = time.time()
+        lease_until = now + (visibility_timeout or Config.WORK_QUEUE_VISIBILITY_TIMEOUT)
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            cursor = conn.execute('''
+                UPDATE tasks SET status = 'dead', lease_owner = NULL, lease_until = NULL, updated_at = ?,
+                                 last_error = '租约过期 ' || attempts || ' 次（工作进程崩溃或处理超时）'
+                                              || COALESCE('；上次错误: ' || last_error, '')
+                WHERE status = 'running' AND lease_until < ? AND attempts >= ?
+            ''', (now, now, Config.WORK_QUEUE_MAX_ATTEMPTS))
+            if cursor.rowcount:
+                logger.error(f"{cursor.rowcount} 个任务租约过期且领取次数达到上限，转入死信")
+            rows = conn.execute('''
+                SELECT id FROM tasks WHERE status = 'pending' AND available_at <= ?
+                UNION ALL
+                SELECT id FROM tasks WHERE status = 'running' AND lease_until < ?
+                ORDER BY id LIMIT ?
+            ''', (now, now, limit)).fetchall()
+            task_ids = [row['id'] for row in rows]
+            if not task_ids:
+                conn.execute('COMMIT')
+                return []
+            placeholders = ','.join('?' * len(task_ids))
+            conn.execute(f'''
+                UPDATE tasks SET status = 'running', attempts = attempts + 1, lease_owner = ?, lease_until = ?,
+                                 updated_at = ?
+                WHERE id IN ({placeholders})
+            ''', [worker_id, lease_until, now] + task_ids)
+            tasks = conn.execute(f'SELECT * FROM tasks WHERE id IN ({placeholders}) ORDER BY id',
+                                 task_ids).fetchall()
+            conn.execute('COMMIT')
+        return [self._task_dict(task) for task in tasks]
+
+    def ack(self, task_id: int, worker_id: str) -> bool:
+        """任务完成；租约已被其他工作进程接管时返回 False"""
+        with self._connect() as conn:
+            cursor = conn.execute('''
+                UPDATE tasks SET status = 'done', lease_owner = NULL, lease_until = NULL, last_error = NULL,
+                                 updated_at = ?
+                WHERE id = ? AND status = 'running' AND lease_owner = ?
+            ''', (time.time(), task_id, worker_id))
+            return cursor.rowcount == 1
+
+    def fail(self, task_id: int, worker_id: str, error: str) -> str:
+        """
+        任务失败：领取次数未达上限时按退避延后重试，否则转入死信
+
+        Returns:
+            任务的新状态（pending / dead），租约已被接管时返回空字符串
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT attempts FROM tasks WHERE id = ? AND status = ? AND lease_owner = ?',
+                               (task_id, RUNNING, worker_id)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return ''
+            if row['attempts'] >= Config.WORK_QUEUE_MAX_ATTEMPTS:
+                status, available_at = DEAD, now
+                logger.error(f"任务 {task_id} 失败 {row['attempts']} 次，转入死信: {error}")
+            else:
+                status = PENDING
+                available_at = now + min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** (row['attempts'] - 1)))
+            conn.execute('''
+                UPDATE tasks SET status = ?, available_at = ?, lease_owner = NULL, lease_until = NULL,
+                                 last_error = ?, updated_at = ?
+                WHERE id = ?
+            ''', (status, available_at, (error or '')[:1000], now, task_id))
+            conn.execute('COMMIT')
+        return status
+
+    def extend(self, task_id: int, worker_id: str, visibility_timeout: Optional[float] = None) -> bool:
+        """延长租约（处理时间可能超过可见性超时时调用）"""
+        lease_until = time.time() + (visibility_timeout or Config.WORK_QUEUE_VISIBILITY_TIMEOUT)
+        with self._connect() as conn:
+            cursor = conn.execute('''
+                UPDATE tasks SET lease_until = ? WHERE id = ? AND status = 'running' AND lease_owner = ?
+            ''', (lease_until, task_id, worker_id))
+            return cursor.rowcount == 1
+
+    def stats(self) -> Dict[str, Any]:
+        """各状态任务数、最早待处理任务的等待时间、各工作进程持有的任务数"""
+        now = time.time()
+        with self._connect() as conn:
+            counts = {status: 0 for status in (PENDING, RUNNING, DONE, DEAD)}
+            for row in conn.execute('SELECT status, COUNT(*) AS total FROM tasks GROUP BY status'):
+                counts[row['status']] = row['total']
+            oldest = conn.execute("SELECT MIN(created_at) FROM tasks WHERE status = 'pending'").fetchone()[0]
+            workers = {row['lease_owner']: row['total'] for row in conn.execute('''
+                SELECT lease_owner, COUNT(*) AS total FROM tasks
+                WHERE status = 'running' AND lease_until >= ? GROUP BY lease_owner
+            ''', (now,))}
+        return {
+            **counts,
+            'oldest_pending_seconds': round(now - oldest, 1) if oldest else None,
+            'workers': workers,
+        }
+
+    def list_dead(self, limit: int = 100) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM tasks WHERE status = 'dead' ORDER BY updated_at DESC LIMIT ?",
+                                (limit,)).fetchall()
+        return [self._task_dict(row) for row in rows]
+
+    def retry_dead(self, task_ids: Optional[List[int]] = None) -> int:
+        """死信任务重新入队（不指定ID时全部），领取次数清零"""
+        now = time.time()
+        condition, params = "status = 'dead'", []
+        if task_ids:
+            condition += f" AND id IN ({','.join('?' * len(task_ids))})"
+            params = list(task_ids)
+        with self._connect() as conn:
+            cursor = conn.execute(f'''
+                UPDATE OR IGNORE tasks SET status = 'pending', attempts = 0, available_at = ?, updated_at = ?
+                WHERE {condition}
+            ''', [now, now] + params)
+            return cursor.rowcount
+
+    def purge_done(self, older_than: float = 86400) -> int:
+        """删除完成超过 older_than 秒的任务"""
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM tasks WHERE status = 'done' AND updated_at < ?",
+                                  (time.time() - older_than,))
+            return cursor.rowcount
+
+    @staticmethod
+    def _task_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        task = dict(row)
+        task['payload'] = json.loads(task['payload']) if task['payload'] else None
+        return task